@@ -5,8 +5,8 @@ from django.template.response import TemplateResponse
 from django.conf import settings
 from django.contrib import messages, admin
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Sum, Count, F, Q, Prefetch
-from django.http import HttpResponseRedirect, JsonResponse
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.utils.decorators import method_decorator
@@ -23,10 +23,12 @@ from catalog.admin_utils.excell import (export_prices_to_excel,
                                         ExcelImportError)
 
 from delivery_contacts.models import Courier, Restaurant
-from shop.admin_reports import get_report_data
-from shop.models import Order, OrderDish
+from shop.models import Order, OrderDish, ReportJob
 from shop.reports import excel as xls_reports
+from shop.reports.jobs import visible_report_jobs
 from shop.reports.report_page_forms import AdminXlsReportForm
+from shop.reports.sales import SALES_RANGES, get_daily_sales
+from shop.reports.summary import get_reports_data
 
 
 import logging.config
@@ -35,6 +37,7 @@ logger = logging.getLogger(__name__)
 
 
 STANDARD_HEIGHT_ITEMS = 6  # Standard height is based on 6 items
+REPORT_JOBS_ON_PAGE = 10  # последние фоновые выгрузки на странице отчета
 # When using DOUBLE_BOTH, the actual characters per line is reduced
 NORMAL_LINE_WIDTH = 48  # Maximum characters per line for 72mm paper
 DOUBLE_LINE_WIDTH = 24  # When using double width, line width is halved
@@ -44,105 +47,23 @@ DOUBLE_LINE_WIDTH = 24  # When using double width, line width is halved
 def sales_data(request):
     """Отчет по продажам за последний месяц на начальной странице.
     Разделяет типы заказов с сайта/ботоа.
-    Для админов ресторанов показывается статистика их ресторана. Для суперюзера полная статистика."""
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
-    date_range = [(last_30_days + timedelta(days=i)) for i in range(31)]
-
-    def fill_missing_dates(queryset, date_range):
-        data_dict = {entry['day']: entry['total'] for entry in queryset}
-        filled_data = [{'day': day, 'total': data_dict.get(day, 0)} for day in date_range]
-        return filled_data
-
-    def fill_missing_order_dates(queryset, date_range):
-        data_dict = {entry['day']: entry['total_orders'] for entry in queryset}
-        filled_data = [{'day': day, 'total_orders': data_dict.get(day, 0)} for day in date_range]
-        return filled_data
-
-    # Добавляем фильтр для исключения заказов со статусом "CND"
-    not_canceled_filter = ~Q(status='CND')
+    Для админов ресторанов показывается статистика их ресторана. Для суперюзера полная статистика.
+    ?days=90/365 — более длинный период; данные — из итогов дня
+    (shop/reports/sales.py), один запрос на любой период."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in SALES_RANGES:
+        days = 30
 
+    restaurant = None
     restaurant_title = None
     if not request.user.is_superuser:
-        # Для DateField не требуется timezone.make_aware
-        base_filter_ = Q(execution_date__gte=last_30_days) & not_canceled_filter
         restaurant = request.user.restaurant
         restaurant_title = str(restaurant)
-        rest_filter = Q(restaurant=restaurant.id)
-        base_filter = base_filter_ & rest_filter
-    else:
-        # Для DateField не требуется timezone.make_aware
-        base_filter = Q(execution_date__gte=last_30_days) & not_canceled_filter
-
-    web_filter = Q(source='4')
-    bot_filter = Q(source='3')
-
-    base_filter_q = base_filter
-    base_web_filter_q = base_filter & web_filter
-    base_bot_filter_q = base_filter & bot_filter
-
-    # Запросы для подсчета общих продаж по дням
-    total_sales_qs = Order.objects.filter(
-            base_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),  # Если execution_date это DateField
-            total=Sum('final_amount_with_shipping')
-        ).order_by('day')
-    total_sales = fill_missing_dates(total_sales_qs, date_range)
-
-    # Запросы для подсчета продаж с сайта (source='4') по дням
-    site_sales_qs = Order.objects.filter(
-            base_web_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),
-            total=Sum('final_amount_with_shipping')
-        ).order_by('day')
-    site_sales = fill_missing_dates(site_sales_qs, date_range)
-
-    # Запросы для подсчета продаж с бота (source='3') по дням
-    bot_sales_qs = Order.objects.filter(
-            base_bot_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),
-            total=Sum('final_amount_with_shipping')
-        ).order_by('day')
-    bot_sales = fill_missing_dates(bot_sales_qs, date_range)
-
-    # Запросы для подсчета общего количества заказов по дням
-    total_orders_qs = Order.objects.filter(
-            base_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),
-            total_orders=Count('id')
-        ).order_by('day')
-    total_orders = fill_missing_order_dates(total_orders_qs, date_range)
-
-    # Запросы для подсчета количества заказов с сайта (source='4') по дням
-    site_orders_qs = Order.objects.filter(
-            base_web_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),
-            total_orders=Count('id')
-        ).order_by('day')
-    site_orders = fill_missing_order_dates(site_orders_qs, date_range)
-
-    # Запросы для подсчета количества заказов с бота (source='3') по дням
-    bot_orders_qs = Order.objects.filter(
-            base_bot_filter_q
-        ).values('execution_date').annotate(
-            day=F('execution_date'),
-            total_orders=Count('id')
-        ).order_by('day')
-    bot_orders = fill_missing_order_dates(bot_orders_qs, date_range)
-
-    data = {
-        'total_sales': total_sales,
-        'site_sales': site_sales,
-        'bot_sales': bot_sales,
-        'total_orders': total_orders,
-        'site_orders': site_orders,
-        'bot_orders': bot_orders,
-    }
+
+    data = get_daily_sales(days, restaurant)
 
     for key, value in data.items():
         for item in value:
@@ -150,6 +71,7 @@ def sales_data(request):
                 item['day'],
                 datetime.min.time())
     data['restaurant'] = restaurant_title
+    data['days'] = days
     return JsonResponse(data)
 
 
@@ -546,34 +468,31 @@ class AdminReportView(TemplateView):
                 restaurant__in=restaurants,
             )
             .exclude(status='CND')
-            .select_related('delivery', 'delivery_zone', 'courier', 'restaurant')
         )
 
+        # 4. Отчеты по всем ресторанам — двумя запросами сразу
+        reports = get_reports_data(orders, group_by=('city', 'restaurant'))
+        restaurants = list(restaurants)
+
         restaurants_data = {}
 
-        # 4. Идём только по разрешённым городам
+        # 5. Идём только по разрешённым городам
         for city_code in allowed_city_codes:
-            city_orders = orders.filter(city=city_code)
-
-            if not city_orders.exists():
-                continue
-
             city_data = {
                 'name': city_name_map.get(city_code, city_code),
                 'restaurants': {}
             }
 
-            city_restaurants = restaurants.filter(city=city_code)
-
-            for restaurant in city_restaurants:
-                restaurant_orders = city_orders.filter(restaurant=restaurant)
-
-                if not restaurant_orders.exists():
+            for restaurant in restaurants:
+                if restaurant.city != city_code:
+                    continue
+                report = reports.get((city_code, restaurant.id))
+                if report is None:
                     continue
 
                 city_data['restaurants'][restaurant.id] = {
                     "name": restaurant.address,
-                    "data": get_report_data(restaurant_orders)
+                    "data": report
                 }
 
             if city_data['restaurants']:
@@ -600,9 +519,12 @@ class AdminXlsReportView(View):
         export_request = self._build_export_request(request, form.cleaned_data)
         report_type = form.cleaned_data['report_type']
 
-        if report_type == AdminXlsReportForm.REPORT_FULL:
-            return xls_reports.export_full_orders_to_excel(None, export_request, None)
-        return xls_reports.export_orders_to_excel(None, export_request, None)
+        return xls_reports.export_orders_report(
+            export_request,
+            xls_reports.REPORT_FULL
+            if report_type == AdminXlsReportForm.REPORT_FULL
+            else xls_reports.REPORT_SHORT,
+            background=form.cleaned_data['background'])
 
     def _get_context(self, request, form):
         from shop.models import Order
@@ -611,6 +533,8 @@ class AdminXlsReportView(View):
             'opts': Order._meta,
             'form': form,
             'back_url': reverse('admin:shop_order_changelist'),
+            'report_jobs': visible_report_jobs(request.user)[:REPORT_JOBS_ON_PAGE],
+            'report_jobs_url': reverse('admin:shop_order_xls_report_jobs'),
         }
 
     def _build_export_request(self, request, cleaned_data):
@@ -632,6 +556,44 @@ class AdminXlsReportView(View):
         return export_request
 
 
+def _report_job_json(job):
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'download_url': (reverse('admin:shop_order_xls_report_download',
+                                 args=[job.pk])
+                         if job.status == ReportJob.Status.DONE else None),
+    }
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class AdminXlsReportJobsView(View):
+    """Статус и процент фоновых выгрузок для страницы отчета (опрос JS)."""
+
+    def get(self, request):
+        jobs = visible_report_jobs(request.user)[:REPORT_JOBS_ON_PAGE]
+        return JsonResponse({'jobs': [_report_job_json(job) for job in jobs]})
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class AdminXlsReportDownloadView(View):
+    """Файл готовой выгрузки: суперюзеру и админам того же ресторана."""
+
+    def get(self, request, pk):
+        job = visible_report_jobs(request.user).filter(pk=pk).first()
+        if job is None:
+            raise Http404
+        if job.status != ReportJob.Status.DONE or not job.file:
+            messages.warning(request, 'Отчет еще формируется, '
+                                      'попробуйте через минуту.')
+            return redirect(reverse('admin:shop_order_xls_report'))
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=job.filename,
+                            content_type=xls_reports.XLSX_CONTENT_TYPE)
+
+
 class AdminDishPriceXlsDownloadView(View):
 
     @method_decorator(staff_member_required)
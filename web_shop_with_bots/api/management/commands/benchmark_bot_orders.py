@@ -0,0 +1,130 @@
+import random
+import statistics
+import time
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+import api.views as views
+from api.tasks import process_bot_order_events
+from catalog.models import Dish
+from delivery_contacts.models import Delivery
+from tm_bot.models import BotOrderInbox, OrdersBot
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк вебхука /save_bot_order/ на всплеске синтетических "
+        "заказов из бота: время ответа вебхука при обработке внутри "
+        "запроса (старый путь) и с записью в BotOrderInbox + 202, "
+        "затем пропускная способность консьюмера. --duplicates — доля "
+        "повторов вебхука (Botobot ретраит медленные ответы). "
+        "Всё откатывается.\n"
+        "Пример: python manage.py benchmark_bot_orders --orders 300 "
+        "--duplicates 0.2"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--dishes", type=int, default=3)
+        parser.add_argument("--duplicates", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        bot = OrdersBot.objects.exclude(source_id=None).first()
+        dishes = list(Dish.objects.filter(is_active=True)
+                      .values_list("article", flat=True)[:options["dishes"]])
+        if not (bot and dishes and Delivery.objects.filter(
+                city=bot.city, type="takeaway").exists()):
+            raise CommandError(
+                "Нужны бот с ID Botobot, самовывоз в его городе и блюда в БД.")
+
+        self.bot = bot
+        self.dishes = dishes
+        self.factory = RequestFactory()
+
+        burst = self._burst(options["orders"], options["duplicates"])
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{len(burst)} вебхуков, {options['orders']} заказов"))
+
+        self._run(burst, inline=True)
+        self._run(burst, inline=False)
+
+    def _burst(self, orders, duplicates):
+        base_id = random.randint(10 ** 8, 10 ** 9)
+        payloads = [self._payload(base_id + i) for i in range(orders)]
+        repeats = random.sample(payloads, int(orders * duplicates))
+        burst = payloads + repeats
+        random.shuffle(burst)
+        return burst
+
+    def _payload(self, order_id):
+        payload = {
+            "id": str(order_id),
+            "shop[id]": self.bot.source_id,
+            "statusName": "ожидает обработки",
+            "recipient": "Benchmark",
+            "mobile": "+381600000000",
+            "delivery[type]": "pickup",
+            "address": "",
+            "comment": "",
+            "time": "как можно скорее",
+            "user_telegram[id]": str(order_id),
+            "user_telegram[first_name]": "Benchmark",
+            "user_chat_id": str(order_id),
+        }
+        for index, article in enumerate(self.dishes):
+            payload[f"goods[{index}][article]"] = article
+            payload[f"goods[{index}][count]"] = "1"
+        return payload
+
+    def _webhook(self, payload, inline):
+        request = self.factory.post("/api/v1/save_bot_order/", payload)
+        start = time.perf_counter()
+        with transaction.atomic():
+            response = views.save_bot_order(request)
+            if inline:
+                # старый путь: заказ создаётся в самом запросе
+                process_bot_order_events("3", self.bot.city, payload["id"])
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    def _run(self, burst, inline):
+        label = "inline" if inline else "inbox + 202"
+        try:
+            with transaction.atomic(), \
+                    patch.object(views.process_bot_order_inbox_task, "delay"), \
+                    patch("tm_bot.services.send_message_telegram"):
+                start = time.perf_counter()
+                timings = [self._webhook(payload, inline)[0]
+                           for payload in burst]
+                elapsed = time.perf_counter() - start
+                self._report(label, timings, elapsed)
+
+                if not inline:
+                    self._drain()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _drain(self):
+        keys = list(BotOrderInbox.objects
+                    .filter(state=BotOrderInbox.PENDING)
+                    .values("source", "city", "source_id").distinct())
+        start = time.perf_counter()
+        processed = sum(process_bot_order_events(**key) for key in keys)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {'consumer':<12} events={processed:<6} "
+            f"{processed / elapsed:8.1f} events/s  total={elapsed:6.2f} s")
+
+    def _report(self, label, timings, elapsed):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"  {label:<12} p50={statistics.median(timings):8.2f} ms  "
+            f"p99={p99:8.2f} ms  {len(timings) / elapsed:8.1f} req/s")
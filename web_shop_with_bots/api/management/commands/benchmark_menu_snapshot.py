@@ -0,0 +1,154 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import DishMenuSerializer
+from api.utils.core_cache import MENU_GROUP, bump_generation
+from api.utils.menu_snapshot import (build_menu_snapshot, get_menu_snapshot,
+                                     menu_queryset, menu_snapshot_key)
+
+
+def _legacy_menu():
+    """
+    Старый путь MenuViewSet.list как он был: ORM + два прохода по
+    queryset + сериализация на каждый промах кэша.
+    """
+    qs = menu_queryset()
+
+    categories_map = {}
+    seen_pairs = set()
+
+    for dish in qs:
+        for dc in dish.dishcategory.all():
+            category = dc.category
+
+            if not category.is_active:
+                continue
+
+            slug = category.slug
+            pair_key = (slug, dish.article)
+
+            if pair_key in seen_pairs:
+                continue
+            seen_pairs.add(pair_key)
+
+            if slug not in categories_map:
+                category_translations = {}
+                for tr in category.translations.all():
+                    category_translations[tr.language_code] = {
+                        k: v for k, v in {
+                            'name': getattr(tr, 'name', None),
+                            'description': getattr(tr, 'description', None),
+                            'messenger_name': getattr(tr, 'messenger_name', None),
+                        }.items() if v is not None
+                    }
+                    category_translations[tr.language_code].pop('messenger_name', None)
+
+                categories_map[slug] = {
+                    'slug': slug,
+                    'translations': category_translations,
+                    'articles': [],
+                    'priority': category.priority,
+                }
+
+            categories_map[slug]['articles'].append({
+                'article': dish.article,
+                'dish_priority': dc.dish_priority if dc.dish_priority is not None else 999999
+            })
+
+    categories = list(categories_map.values())
+
+    categories.sort(
+        key=lambda item: item['priority'] if item['priority'] is not None else 999999
+    )
+
+    for category in categories:
+        category['articles'] = [
+            item['article']
+            for item in sorted(category['articles'], key=lambda x: x['dish_priority'])
+        ]
+
+    unique_qs = []
+    seen_ids = set()
+    for dish in qs:
+        if dish.id not in seen_ids:
+            unique_qs.append(dish)
+            seen_ids.add(dish.id)
+
+    menu_list = DishMenuSerializer(unique_qs, many=True, context={}).data
+
+    return JSONRenderer().render({
+        'categories': categories,
+        'menu_list': menu_list,
+    })
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def _timed_in_thread(func):
+    # у каждого потока своё соединение с БД — закрываем, чтобы не текли
+    try:
+        return _timed(func)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк /api/v1/menu/: старый путь (ORM + сериализация) против "
+        "снапшота — холодная сборка, тёплое чтение, наплыв запросов "
+        "сразу после инвалидации.\n"
+        "Пример: python manage.py benchmark_menu_snapshot --runs 50 --concurrency 16"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--concurrency", type=int, default=16)
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+        concurrency = options["concurrency"]
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Холодная сборка"))
+        self._report("legacy", [_timed(_legacy_menu) for _ in range(runs)])
+        self._report("snapshot build", [
+            _timed(lambda: build_menu_snapshot(version=bump_generation(MENU_GROUP)))
+            for _ in range(runs)
+        ])
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Тёплое чтение"))
+        build_menu_snapshot()
+        self._report("snapshot hit", [
+            _timed(get_menu_snapshot) for _ in range(runs * 10)
+        ])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Наплыв: {concurrency} параллельных запросов после инвалидации"))
+        self._report("legacy", self._stampede(_legacy_menu, concurrency))
+
+        bump_generation(MENU_GROUP)
+        self._report("snapshot", self._stampede(get_menu_snapshot, concurrency))
+
+        cache.delete(menu_snapshot_key())
+
+    def _stampede(self, func, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda _: _timed_in_thread(func), range(concurrency)))
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"  {label:<16} n={len(timings):<5} "
+            f"p50={statistics.median(timings):8.2f} ms  "
+            f"p99={p99:8.2f} ms  max={timings[-1]:8.2f} ms"
+        )
@@ -36,6 +36,7 @@ from shop.validators import (validate_delivery_time, validate_payment_type,
 from shop.utils import split_and_get_comment
 import tm_bot.services as tmbs
 import tm_bot.models as tmbmod
+from tm_bot.registry import get_bot_by_id
 from tm_bot.validators import (get_msgr_data_validated, check_telegram_auth)
 from users.models import (BaseProfile, UserAddress, validate_phone_unique,
                           user_add_new_order_data)
@@ -959,6 +960,43 @@ class DeliveryZonesSerializer(TranslatableModelSerializer):
         }
 
 
+class DeliveryBulkPointSerializer(serializers.Serializer):
+    """Точка для пакетного расчёта доставки."""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                      required=False, default=Decimal(0))
+
+
+class DeliveryCalculateBulkSerializer(serializers.Serializer):
+    """
+    Запрос пакетного расчёта зоны и стоимости доставки
+    (/calculate_delivery_bulk/).
+    """
+    city = serializers.ChoiceField(choices=settings.CITY_CHOICES)
+    delivery = serializers.IntegerField(required=False)
+    free_delivery = serializers.BooleanField(required=False, default=False)
+    points = DeliveryBulkPointSerializer(many=True, allow_empty=False)
+
+    def validate_points(self, value):
+        if len(value) > settings.DELIVERY_BULK_MAX_POINTS:
+            raise serializers.ValidationError(
+                _("Too many points, maximum is %(max)s.")
+                % {'max': settings.DELIVERY_BULK_MAX_POINTS})
+        return value
+
+    def validate(self, data):
+        delivery = Delivery.objects.filter(city=data['city'],
+                                           type='delivery')
+        if 'delivery' in data:
+            delivery = delivery.filter(id=data['delivery'])
+        data['delivery'] = delivery.first()
+        if data['delivery'] is None:
+            raise serializers.ValidationError(
+                {'delivery': _("Delivery is not found.")})
+        return data
+
+
 class ContactsDeliverySerializer(serializers.Serializer):
     """
     Базовый сериализатор для модели Delivery, только чтение!
@@ -1356,7 +1394,7 @@ class BaseOrderSerializer(serializers.ModelSerializer):
         valid_pk = isinstance(pk, int) and 0 < pk < 50
 
         if valid_pk:
-            orders_bot_obj = tmbmod.OrdersBot.objects.filter(pk=pk).first()
+            orders_bot_obj = get_bot_by_id(pk)
             if orders_bot_obj is None:
                 # логируем неизвестный pk и берём дефолт
                 req = self.context.get('request')
@@ -1590,9 +1628,11 @@ class OrderWriteMixin(serializers.Serializer):
         orderdishes = self.validated_data.pop('orderdishes')
 
         with transaction.atomic():
-            order = Order.objects.create(**self.validated_data)
-            OrderDish.create_orderdishes_from_cartdishes(
-                order, no_cart_cartdishes=orderdishes)
+            # блюда собираются в памяти, заказ сохраняется один раз,
+            # OrderDish — одним bulk_create
+            order = Order(**self.validated_data)
+            order.save(orderdishes=OrderDish.build_for_order(order,
+                                                             orderdishes))
 
             if order.user:
                 # если пользователь определился, то обновляем статистику заказов, имя, телефон, адрес
@@ -1602,7 +1642,9 @@ class OrderWriteMixin(serializers.Serializer):
                     lambda order_id=order.pk: post_order_user_updates_task.delay(order_id)
                 )
 
-            tmbs.send_message_new_order_admin_user(order)
+            # сообщение админам уходит celery-таской после коммита,
+            # оформление заказа не ждёт Telegram
+            tmbs.schedule_new_order_admin_notification(order)
 
         return order
 
@@ -2045,7 +2087,7 @@ class BotOrderSerializer(serializers.ModelSerializer):
                 if msngr_account.registered:
                     user = msngr_account.profile
 
-                order = Order.objects.create(
+                order = Order(
                     source_id=int(data.get('id')),
                     recipient_name=data.get("recipient"),
                     recipient_phone=data.get("mobile"),
@@ -2066,8 +2108,8 @@ class BotOrderSerializer(serializers.ModelSerializer):
                     orders_bot=bot,
                     # оплата?     #!!!!!!!!!!!!!!!!!!!!!!!!!!
                 )
-                OrderDish.create_orderdishes_from_cartdishes(
-                        order, no_cart_cartdishes=orderdishes)
+                order.save(orderdishes=OrderDish.build_for_order(
+                    order, orderdishes))
 
                 if order.user:
                     user_add_new_order_data(order)
@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.utils import InterfaceError, OperationalError
+from django.utils import timezone
+
+from api.serializers import BotOrderSerializer
+from api.utils.menu_snapshot import (build_menu_snapshot, get_menu_version,
+                                     menu_snapshot_key)
+from shop.models import Order
+from tm_bot.models import BotOrderInbox, get_status_tmbot
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    queue="orders",
+    bind=True,
+    max_retries=2,
+    default_retry_delay=5)
+def rebuild_menu_snapshot_task(self):
+    """
+    Фоновая пересборка снапшота меню после изменений каталога.
+    Если за пачку правок прилетело несколько тасок — собирает только
+    первая, остальные видят готовый снапшот текущей версии и выходят.
+    """
+    version = get_menu_version()
+    if cache.get(menu_snapshot_key(version)) is not None:
+        return "up to date"
+
+    try:
+        build_menu_snapshot(version=version)
+    except Exception as exc:
+        raise self.retry(exc=exc)
+
+    return "ok"
+
+
+# ------------------------- ВХОДЯЩИЕ ЗАКАЗЫ БОТА -------------------------
+
+def _apply_bot_order_event(event):
+    """Создаёт заказ по событию или меняет его статус (как раньше вебхук)."""
+    data = event.payload
+    status = get_status_tmbot(data.get("statusName"))
+    order = Order.objects.filter(source=event.source,
+                                 city=event.city,
+                                 source_id=event.source_id).first()
+    if order:
+        if status is None or status == order.status:
+            logger.info(f'Bot order #{order.source_id}/ '
+                        'status changed in bot, but not in ORM.')
+            event.mark_done(BotOrderInbox.UNCHANGED, order)
+            return
+
+        order.status = status
+        order.save()
+        logger.info(f'Bot order #{order.source_id}/ '
+                    f'ORM order #{order.id} '
+                    f'updated status {order.status}.')
+        event.mark_done(BotOrderInbox.STATUS_CHANGED, order)
+        return
+
+    # ошибки сериализатор логирует и шлёт в админский чат сам
+    serializer = BotOrderSerializer(data=data,
+                                    context={'extra_kwargs': {'bot': event.bot}})
+    serializer.is_valid()
+    order = Order.objects.filter(source=event.source,
+                                 city=event.city,
+                                 source_id=event.source_id).first()
+    if order is None:
+        event.mark_failed("order is not saved")
+    else:
+        event.mark_done(BotOrderInbox.CREATED, order)
+
+
+def process_bot_order_events(source, city, source_id):
+    """
+    Обрабатывает по порядку поступления все ожидающие события одного
+    заказа бота. Строки событий берутся select_for_update: воркер
+    с другим событием того же заказа ждёт коммита и видит уже
+    созданный заказ, поэтому дубля не будет и при параллельной
+    обработке. Возвращает число обработанных событий.
+    """
+    with transaction.atomic():
+        events = list(
+            BotOrderInbox.objects
+            .select_for_update(of=('self',))
+            .select_related('bot')
+            .filter(source=source, city=city, source_id=source_id,
+                    state=BotOrderInbox.PENDING)
+            .order_by('id'))
+
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    _apply_bot_order_event(event)
+            except (InterfaceError, OperationalError):
+                raise
+            except Exception as e:
+                logger.error(f"Bot order event #{event.id} "
+                             f"isn't processed: {e}.")
+                event.mark_failed(e)
+    return len(events)
+
+
+@shared_task(
+    queue="orders",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=10)
+def process_bot_order_inbox_task(self, event_id):
+    """
+    Консьюмер вебхука /save_bot_order/ (BotOrderInbox). Идемпотентна:
+    повторный запуск по обработанному событию ничего не делает.
+    """
+    key = (BotOrderInbox.objects.filter(id=event_id)
+           .values('source', 'city', 'source_id').first())
+    if key is None:
+        return f"Event {event_id} does not exist."
+
+    try:
+        return process_bot_order_events(**key)
+    except (InterfaceError, OperationalError) as exc:
+        raise self.retry(exc=exc)
+
+
+@shared_task(
+    queue="orders",
+    bind=True)
+def process_pending_bot_orders_task(self):
+    """
+    Подбирает события, таска которых потерялась (брокер недоступен
+    в момент вебхука, воркер упал). Запускается периодически через
+    django-celery-beat.
+    """
+    threshold = timezone.now() - timedelta(
+        seconds=settings.BOT_ORDER_INBOX_RETRY_AFTER)
+    keys = (BotOrderInbox.objects
+            .filter(state=BotOrderInbox.PENDING, received_at__lt=threshold)
+            .values('source', 'city', 'source_id')
+            .distinct())
+    processed = sum(process_bot_order_events(**key) for key in keys)
+    if processed:
+        logger.warning(f"Pending bot order events processed: {processed}.")
+    return processed
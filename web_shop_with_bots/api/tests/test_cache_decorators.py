@@ -0,0 +1,153 @@
+"""
+Тесты cache_response (api/utils/cache_decorators.py).
+
+Проверяют:
+- hit/miss и запись CacheEntry с soft TTL;
+- stale-while-revalidate: после soft TTL, пока лок держит другой воркер,
+  отдаётся старое значение и view не вызывается; после сдвига поколения
+  группы — значение прошлого поколения;
+- single-flight: при промахе и чужом локе запрос ждёт значение,
+  которое положит держатель лока, а не считает сам;
+- совместимость со значениями без обёртки CacheEntry;
+- счётчики get_cache_stats();
+- если поколение группы не прочитать, ответ считается без кэша.
+"""
+
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from api.utils.cache_decorators import (LOCK_KEY, CacheEntry, cache_response,
+                                        get_cache_stats, reset_cache_stats)
+from api.utils.core_cache import bump_generation, versioned_key
+
+TEST_GROUP = "test_group"
+
+
+class DummyView:
+    def __init__(self):
+        self.calls = 0
+
+    @cache_response(lambda self, request, *args, **kwargs: "dummy")
+    def list(self, request):
+        self.calls += 1
+        return Response({"calls": self.calls})
+
+    @cache_response(lambda self, request, *args, **kwargs: "grouped",
+                    group=TEST_GROUP)
+    def grouped(self, request):
+        self.calls += 1
+        return Response({"calls": self.calls})
+
+
+@override_settings(
+    CACHE_TIME=180,
+    CACHE_STALE_TIME=60,
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-cache-decorators",
+        }
+    },
+)
+class CacheResponseTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.view = DummyView()
+        self.request = APIRequestFactory().get("/dummy/")
+
+    def tearDown(self):
+        cache.clear()
+
+    def _stats(self):
+        return get_cache_stats().get(DummyView.list.__qualname__, {})
+
+    def test_miss_then_hit(self):
+        first = self.view.list(self.request)
+        second = self.view.list(self.request)
+
+        self.assertEqual(first.data, {"calls": 1})
+        self.assertEqual(second.data, {"calls": 1})
+        self.assertEqual(self.view.calls, 1)
+        self.assertIsInstance(cache.get("dummy"), CacheEntry)
+        self.assertEqual(self._stats()["miss"], 1)
+        self.assertEqual(self._stats()["hit"], 1)
+
+    def test_stale_value_served_while_other_worker_rebuilds(self):
+        cache.set("dummy", CacheEntry({"calls": 0}, time.time() - 1), 240)
+        cache.add(LOCK_KEY.format(key="dummy"), 1, 30)
+
+        response = self.view.list(self.request)
+
+        self.assertEqual(response.data, {"calls": 0})
+        self.assertEqual(self.view.calls, 0)
+        self.assertEqual(self._stats()["stale"], 1)
+
+    def test_stale_value_rebuilt_by_lock_holder(self):
+        cache.set("dummy", CacheEntry({"calls": 0}, time.time() - 1), 240)
+
+        response = self.view.list(self.request)
+
+        self.assertEqual(response.data, {"calls": 1})
+        self.assertIsNone(cache.get(LOCK_KEY.format(key="dummy")))
+        self.assertGreater(cache.get("dummy").fresh_until, time.time())
+
+    def test_miss_waits_for_lock_holder(self):
+        cache.add(LOCK_KEY.format(key="dummy"), 1, 30)
+
+        def holder_finishes(key):
+            cache.set(key, CacheEntry({"calls": 42}, time.time() + 180), 240)
+            return cache.get(key)
+
+        with patch("api.utils.cache_decorators.wait_for",
+                   side_effect=holder_finishes):
+            response = self.view.list(self.request)
+
+        self.assertEqual(response.data, {"calls": 42})
+        self.assertEqual(self.view.calls, 0)
+        self.assertEqual(self._stats()["wait"], 1)
+
+    def test_plain_cached_value_is_served_as_fresh(self):
+        cache.set("dummy", {"legacy": True}, 180)
+
+        response = self.view.list(self.request)
+
+        self.assertEqual(response.data, {"legacy": True})
+        self.assertEqual(self.view.calls, 0)
+
+    @override_settings(CACHE_TIME=0)
+    def test_zero_cache_time_disables_cache(self):
+        self.view.list(self.request)
+        self.view.list(self.request)
+
+        self.assertEqual(self.view.calls, 2)
+        self.assertIsNone(cache.get("dummy"))
+
+    def test_previous_generation_served_while_other_worker_rebuilds(self):
+        self.view.grouped(self.request)
+        bump_generation(TEST_GROUP)
+        cache.add(LOCK_KEY.format(key=versioned_key(TEST_GROUP, "grouped")),
+                  1, 30)
+
+        response = self.view.grouped(self.request)
+
+        self.assertEqual(response.data, {"calls": 1})
+        self.assertEqual(self.view.calls, 1)
+        stats = get_cache_stats()[DummyView.grouped.__qualname__]
+        self.assertEqual(stats["stale"], 1)
+
+    def test_generation_error_computes_without_cache(self):
+        with patch("api.utils.cache_decorators.versioned_key",
+                   side_effect=ConnectionError("redis down")):
+            first = self.view.grouped(self.request)
+            second = self.view.grouped(self.request)
+
+        self.assertEqual((first.data, second.data),
+                         ({"calls": 1}, {"calls": 2}))
+        stats = get_cache_stats()[DummyView.grouped.__qualname__]
+        self.assertEqual(stats["error"], 2)
@@ -15,22 +15,40 @@
 - admin actions make_active / make_inactive.
 
 Это integration тесты consistency между DB state и cache layer.
+
+Инвалидация — смена поколения группы (core_cache), поэтому "удалён"
+здесь означает: по АКТУАЛЬНОМУ версионированному ключу значения нет.
+Ключи ниже — пары (группа, логический ключ), версия подставляется
+в момент проверки.
+
+Внутри транзакции инвалидация применяется только после коммита,
+поэтому вызовы обёрнуты в captureOnCommitCallbacks(execute=True).
 """
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from django.core.cache import cache
 from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
 from api.utils.core_cache import (
+    BANNERS_GROUP,
+    CONTACTS_GROUP,
+    DELIVERY_ZONES_GROUP,
+    MENU_GROUP,
+    ORDERS_CONDITIONS_GROUP,
+    PROMONEWS_GROUP,
     CONTACTS_DELIVERY_CACHE_KEY,
     DELIVERY_ZONES_CACHE_KEY,
     PROMONEWS_CACHE_KEY,
     BANNERS_CACHE_KEY,
     TAKEAWAY_CONDITIONS_CACHE_KEY,
     DELIVERY_CONDITIONS_CACHE_KEY,
-    MENU_CACHE_KEYS,
     invalidate_cache_for_model,
+    get_invalidation_stats,
+    invalidate_menu_cache,
+    reset_invalidation_stats,
+    versioned_key,
 )
 from catalog.models import (Dish, Category, DishCategory,
                             DishPartnerPrice, DishCityPrice)
@@ -41,6 +59,18 @@ from tm_bot.models import OrdersBot
 from utils.utils import make_active, make_inactive
 
 
+MENU_CACHE_KEYS = [
+    (MENU_GROUP, "menu_/api/v1/menu/"),
+    (MENU_GROUP, "menu_/api/v1/menu/?category=rolls"),
+]
+CONTACTS_DELIVERY = (CONTACTS_GROUP, CONTACTS_DELIVERY_CACHE_KEY)
+DELIVERY_ZONES = (DELIVERY_ZONES_GROUP, DELIVERY_ZONES_CACHE_KEY)
+PROMONEWS = (PROMONEWS_GROUP, PROMONEWS_CACHE_KEY)
+BANNERS = (BANNERS_GROUP, BANNERS_CACHE_KEY)
+TAKEAWAY_CONDITIONS = (ORDERS_CONDITIONS_GROUP, TAKEAWAY_CONDITIONS_CACHE_KEY)
+DELIVERY_CONDITIONS = (ORDERS_CONDITIONS_GROUP, DELIVERY_CONDITIONS_CACHE_KEY)
+
+
 @override_settings(
     CACHE_TIME=180,
     CACHES={
@@ -53,6 +83,11 @@ from utils.utils import make_active, make_inactive
 class CacheInvalidationTests(TestCase):
     def setUp(self):
         cache.clear()
+        reset_invalidation_stats()
+        # фоновая пересборка снапшота меню — celery, в тестах не нужна
+        patcher = patch("api.tasks.rebuild_menu_snapshot_task")
+        self.rebuild_task = patcher.start()
+        self.addCleanup(patcher.stop)
 
     def tearDown(self):
         cache.clear()
@@ -60,107 +95,119 @@ class CacheInvalidationTests(TestCase):
     def _fill_all_cache_keys(self):
         keys = [
             *MENU_CACHE_KEYS,
-            CONTACTS_DELIVERY_CACHE_KEY,
-            DELIVERY_ZONES_CACHE_KEY,
-            PROMONEWS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            CONTACTS_DELIVERY,
+            DELIVERY_ZONES,
+            PROMONEWS,
+            BANNERS,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         ]
 
-        for key in keys:
-            cache.set(key, {"cached": True}, 180)
+        for group, key in keys:
+            cache.set(versioned_key(group, key), {"cached": True}, 180)
 
     def _assert_deleted(self, *keys):
-        for key in keys:
-            self.assertIsNone(cache.get(key), f"Cache key was not deleted: {key}")
+        for group, key in keys:
+            self.assertIsNone(
+                cache.get(versioned_key(group, key)),
+                f"Cache key was not deleted: {key}")
 
     def _assert_exists(self, *keys):
-        for key in keys:
-            self.assertIsNotNone(cache.get(key), f"Cache key was unexpectedly deleted: {key}")
+        for group, key in keys:
+            self.assertIsNotNone(
+                cache.get(versioned_key(group, key)),
+                f"Cache key was unexpectedly deleted: {key}")
 
     def test_dish_invalidates_menu_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(Dish)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(Dish)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
+            BANNERS,
         )
 
     def test_category_invalidates_menu_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(Category)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(Category)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
+            BANNERS,
         )
 
     def test_dishcategory_invalidates_menu_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(DishCategory)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(DishCategory)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
+            BANNERS,
         )
 
     def test_restaurant_invalidates_contacts_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(Restaurant)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(Restaurant)
 
         self._assert_deleted(
-            CONTACTS_DELIVERY_CACHE_KEY,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            CONTACTS_DELIVERY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         )
 
     def test_delivery_invalidates_contacts_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(Delivery)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(Delivery)
 
         self._assert_deleted(
-            CONTACTS_DELIVERY_CACHE_KEY,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            CONTACTS_DELIVERY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         )
 
     def test_ordersbot_invalidates_contacts_and_order_conditions(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(OrdersBot)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(OrdersBot)
 
         self._assert_deleted(
-            CONTACTS_DELIVERY_CACHE_KEY,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            CONTACTS_DELIVERY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         )
 
     def test_delivery_zone_invalidates_delivery_zones(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(DeliveryZone)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(DeliveryZone)
 
-        self._assert_deleted(DELIVERY_ZONES_CACHE_KEY)
+        self._assert_deleted(DELIVERY_ZONES)
 
     def test_promonews_invalidates_promonews(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(PromoNews)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(PromoNews)
 
-        self._assert_deleted(PROMONEWS_CACHE_KEY)
+        self._assert_deleted(PROMONEWS)
 
     def test_make_inactive_admin_action_invalidates_cache(self):
         self._fill_all_cache_keys()
@@ -168,14 +215,15 @@ class CacheInvalidationTests(TestCase):
         queryset = Mock()
         queryset.model = Dish
 
-        make_inactive(modeladmin=None, request=None, queryset=queryset)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_inactive(modeladmin=None, request=None, queryset=queryset)
 
         queryset.update.assert_called_once_with(is_active=False)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         )
 
     def test_make_active_admin_action_invalidates_cache(self):
@@ -184,36 +232,122 @@ class CacheInvalidationTests(TestCase):
         queryset = Mock()
         queryset.model = Dish
 
-        make_active(modeladmin=None, request=None, queryset=queryset)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_active(modeladmin=None, request=None, queryset=queryset)
 
         queryset.update.assert_called_once_with(is_active=True)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
         )
 
     def test_dish_city_price_invalidates_menu(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(DishCityPrice)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(DishCityPrice)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
+            BANNERS,
         )
 
     def test_dish_partner_price_invalidates_menu(self):
         self._fill_all_cache_keys()
 
-        invalidate_cache_for_model(DishPartnerPrice)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_for_model(DishPartnerPrice)
 
         self._assert_deleted(
             *MENU_CACHE_KEYS,
-            TAKEAWAY_CONDITIONS_CACHE_KEY,
-            DELIVERY_CONDITIONS_CACHE_KEY,
-            BANNERS_CACHE_KEY,
+            TAKEAWAY_CONDITIONS,
+            DELIVERY_CONDITIONS,
+            BANNERS,
         )
+
+    def test_filtered_menu_url_is_invalidated(self):
+        """
+        Раньше инвалидировался только литеральный ключ
+        "menu_/api/v1/menu/", а вариант с ?category=... жил до TTL.
+        """
+        filtered = (MENU_GROUP, "menu_/api/v1/menu/?category=rolls")
+        self._fill_all_cache_keys()
+        self._assert_exists(filtered)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_menu_cache()
+
+        self._assert_deleted(filtered)
+        self._assert_exists(CONTACTS_DELIVERY, DELIVERY_ZONES)
+
+    def test_filtered_menu_response_is_invalidated(self):
+        """
+        Тот же сценарий end-to-end через /api/v1/menu/?category=...:
+        после инвалидации view пересчитывает ответ, а не отдаёт кэш.
+        """
+        url = "/api/v1/menu/?category=rolls"
+        cache.set(versioned_key(MENU_GROUP, f"menu_{url}"),
+                  {"categories": ["stale"], "menu_list": []}, 180)
+
+        client = APIClient()
+        self.assertEqual(client.get(url).data["categories"], ["stale"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_menu_cache()
+
+        self.assertEqual(client.get(url).data["categories"], [])
+
+    def test_invalidation_is_deferred_until_commit(self):
+        self._fill_all_cache_keys()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate_cache_for_model(Dish)
+            # до коммита кэш ещё старый — читатели не закэшируют
+            # незакоммиченные данные под новым поколением
+            self._assert_exists(*MENU_CACHE_KEYS, BANNERS)
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+
+        self._assert_deleted(*MENU_CACHE_KEYS, BANNERS)
+
+    def test_burst_of_invalidations_is_coalesced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            menu = Category.objects.create(slug="burst", priority=99)
+        reset_invalidation_stats()
+        self.rebuild_task.reset_mock()
+        self._fill_all_cache_keys()
+        generation_before = cache.get("cache_gen:menu")
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for priority in range(100, 120):
+                menu.priority = priority
+                menu.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache.get("cache_gen:menu"), generation_before + 1)
+
+        stats = get_invalidation_stats()[MENU_GROUP]
+        self.assertEqual(stats["flushed"], 1)
+        self.assertEqual(stats["coalesced"], stats["requested"] - 1)
+        self.assertGreaterEqual(stats["requested"], 20)
+        self.rebuild_task.apply_async.assert_called_once()
+
+    def test_rolled_back_invalidation_is_discarded(self):
+        from django.db import transaction
+
+        self._fill_all_cache_keys()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    invalidate_cache_for_model(PromoNews)
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+
+        self._assert_exists(PROMONEWS)
@@ -21,18 +21,24 @@ DishMenuSerializer, единственный сериализатор меню,
 - сортировку категорий по priority и блюд внутри категории по
   dish_priority (DishCategory.dish_priority).
 
-ВАЖНО: MenuViewSet.list() кэширует ответ под фиксированным ключом
-f"menu_{request.get_full_path()}" — для "/api/v1/menu/" без query это
-всегда один и тот же ключ на все тесты этого файла. cache.clear() в
-setUp/tearDown обязателен, иначе тесты будут видеть кэш друг друга.
+ВАЖНО: MenuViewSet.list() без фильтров отдаёт снапшот меню
+(api/utils/menu_snapshot.py) — JSON-байты под ключом версии каталога.
+Цены в JSON приходят числами (Decimal("500.00") == 500.0), поэтому
+сравнения с Decimal ниже остаются валидными. Версия сдвигается
+сигналами после коммита (captureOnCommitCallbacks в тестах), поэтому
+cache.clear() в setUp/tearDown обязателен, иначе тесты будут видеть
+кэш друг друга. Снапшот работает только с CACHE_TIME > 0 — тесты
+снапшота включают его явно.
 """
 
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.core.cache import cache
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 
+from api.utils.menu_snapshot import get_menu_version, menu_snapshot_key
 from catalog.models import Category, Dish, DishCategory, DishCityPrice
 
 
@@ -42,49 +48,59 @@ class MenuAPITests(TestCase):
         self.url = "/api/v1/menu/"
         cache.clear()
 
-        self.category = Category.objects.create(
-            slug="rolls",
-            priority=1,
-            is_active=True,
-        )
-        self.category.set_current_language("ru")
-        self.category.name = "Роллы"
-        self.category.save()
-
-        self.dish = Dish.objects.create(
-            article="T001",
-            is_active=True,
-            weight_volume="250",
-            units_in_set="8",
-        )
-        self.dish.set_current_language("ru")
-        self.dish.short_name = "Тестовый ролл"
-        self.dish.text = "Описание тестового ролла"
-        self.dish.save()
-
-        DishCategory.objects.create(
-            dish=self.dish,
-            category=self.category,
-            dish_priority=1,
-        )
-
-        # discount=10% от price=500.00 -> final_price=450.00 считается
-        # моделью в DishCityPrice.save(), явно передавать final_price
-        # бессмысленно — модель его пересчитает сама.
-        DishCityPrice.objects.create(
-            dish=self.dish,
-            city="Beograd",
-            price=Decimal("500.00"),
-            discount=Decimal("10.00"),
-        )
+        # инвалидация кэша меню применяется после коммита — выполняем
+        # её сразу, чтобы пачка setUp не поглотила инвалидации тестов;
+        # фоновая пересборка снапшота (celery) в тестах не нужна
+        patcher = patch("api.tasks.rebuild_menu_snapshot_task")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(
+                slug="rolls",
+                priority=1,
+                is_active=True,
+            )
+            self.category.set_current_language("ru")
+            self.category.name = "Роллы"
+            self.category.save()
+
+            self.dish = Dish.objects.create(
+                article="T001",
+                is_active=True,
+                weight_volume="250",
+                units_in_set="8",
+            )
+            self.dish.set_current_language("ru")
+            self.dish.short_name = "Тестовый ролл"
+            self.dish.text = "Описание тестового ролла"
+            self.dish.save()
+
+            DishCategory.objects.create(
+                dish=self.dish,
+                category=self.category,
+                dish_priority=1,
+            )
+
+            # discount=10% от price=500.00 -> final_price=450.00 считается
+            # моделью в DishCityPrice.save(), явно передавать final_price
+            # бессмысленно — модель его пересчитает сама.
+            DishCityPrice.objects.create(
+                dish=self.dish,
+                city="Beograd",
+                price=Decimal("500.00"),
+                discount=Decimal("10.00"),
+            )
 
     def tearDown(self):
         cache.clear()
 
     def _get(self):
+        # полное меню отдаётся готовыми JSON-байтами снапшота
+        # (HttpResponse, без response.data) — читаем распарсенный JSON
         response = self.client.get(self.url)
-        self.assertEqual(response.status_code, 200, response.data)
-        return response.data
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
 
     def _menu_item(self, article):
         data = self._get()
@@ -330,3 +346,53 @@ class MenuAPITests(TestCase):
             category_item["articles"],
             ["T001", "T004", "T006", "T005"],
         )
+
+    # ------------------------------------------------------------------
+    # Снапшот меню
+    # ------------------------------------------------------------------
+
+    @override_settings(CACHE_TIME=180)
+    def test_warm_snapshot_is_served_without_db_queries(self):
+        self._get()
+
+        with patch("audit.models.AuditLog.objects.create"):
+            with self.assertNumQueries(0):
+                response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    @override_settings(CACHE_TIME=180)
+    def test_snapshot_is_rebuilt_after_catalog_change(self):
+        version = get_menu_version()
+        self._get()
+        self.assertIsNotNone(
+            cache.get(menu_snapshot_key(version)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.is_active = False
+            self.dish.save(update_fields=["is_active"])
+
+        self.assertNotEqual(get_menu_version(), version)
+        articles = [item["article"] for item in self._get()["menu_list"]]
+        self.assertNotIn("T001", articles)
+
+    @override_settings(CACHE_TIME=0)
+    def test_zero_cache_time_disables_snapshot(self):
+        self._get()
+
+        self.assertIsNone(cache.get(menu_snapshot_key()))
+
+    @override_settings(CACHE_TIME=180)
+    def test_cache_error_falls_back_to_db(self):
+        with patch("api.utils.menu_snapshot.get_menu_version",
+                   side_effect=ConnectionError("redis down")):
+            articles = [item["article"] for item in self._get()["menu_list"]]
+
+        self.assertIn("T001", articles)
+
+    def test_filtered_menu_bypasses_snapshot(self):
+        response = self.client.get(self.url, {"category": "rolls"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [c["slug"] for c in response.data["categories"]], ["rolls"])
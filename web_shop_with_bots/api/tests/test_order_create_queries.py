@@ -0,0 +1,171 @@
+"""
+Тесты сборки заказа (OrderWriteMixin._create_order_with_dishes).
+
+Проверяют:
+- число запросов при создании заказа самовывозом и с доставкой не
+  зависит от числа блюд: цены подтягиваются разом, OrderDish — одним
+  bulk_create, заказ сохраняется один раз (раньше — save заказа на
+  каждое блюдо);
+- итоги заказа (amount, items_qty, final_amount_with_shipping)
+  совпадают с суммой по блюдам.
+
+Сериализатор проходит тот же путь, что и во вьюсете: is_valid(), затем
+save(). Запросы считаются только у save() — валидация проверяет каждое
+блюдо отдельно и к сборке заказа не относится. Время выдачи — завтра
+в 12:00, чтобы проверка рабочих часов не зависела от часа запуска.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.serializers import (DeliveryOrderWriteSerializer,
+                             TakeawayOrderWriteSerializer)
+from catalog.models import (CityDishList, Dish, DishCityPrice,
+                            RestaurantDishList)
+from delivery_contacts.geocoding import StubGeocoder, set_geocoder
+from delivery_contacts.models import Delivery, DeliveryZone, Restaurant
+from shop.models import OrderDish
+
+
+GOOGLE_OK = {
+    "status": "OK",
+    "results": [
+        {"geometry": {"location": {"lat": 44.81, "lng": 20.46},
+                      "location_type": "ROOFTOP"}},
+    ],
+}
+
+
+@override_settings(CACHES={"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "order-create-queries-tests"}})
+class OrderCreateQueriesTests(TestCase):
+    def setUp(self):
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        patcher = patch("tm_bot.tasks.send_new_order_admin_notification_task")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        self.takeaway = Delivery.objects.create(
+            type='takeaway',
+            city='Beograd',
+            is_active=True,
+        )
+        self.delivery = Delivery.objects.create(
+            type='delivery',
+            city='Beograd',
+            is_active=True,
+        )
+        DeliveryZone.objects.create(name='уточнить')
+
+        city_menu = CityDishList.objects.create(city='Beograd')
+        restaurant_menu = RestaurantDishList.objects.create(
+            restaurant=self.restaurant)
+        # pk блюда — артикул, в OrderDish.dish_article он пишется числом
+        self.articles = [str(9000 + i) for i in range(10)]
+        for article in self.articles:
+            dish = Dish.objects.create(
+                article=article,
+                is_active=True,
+                weight_volume="250",
+                units_in_set="8",
+            )
+            DishCityPrice.objects.create(
+                dish=dish,
+                city="Beograd",
+                price=Decimal("500.00"),
+                discount=Decimal("10.00"),
+            )
+            city_menu.dish.add(dish)
+            restaurant_menu.dish.add(dish)
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.delivery_time = timezone.make_aware(
+            datetime.combine(tomorrow, time(12, 0))).isoformat()
+
+    def _serializer(self, serializer_class, delivery, dishes_qty, **data):
+        request = RequestFactory().post('/')
+        request.user = AnonymousUser()
+        data.update({
+            'city': 'Beograd',
+            'delivery_time': self.delivery_time,
+            'recipient_name': 'Тест',
+            'recipient_phone': '+381601234567',
+            'payment_type': 'cash',
+            'promocode': None,
+            'source': 'website',
+            'orderdishes': [{'dish': article, 'quantity': 2}
+                            for article in self.articles[:dishes_qty]],
+        })
+        serializer = serializer_class(
+            data=data,
+            context={'extra_kwargs': {'delivery': delivery},
+                     'request': request})
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    def _takeaway(self, dishes_qty):
+        return self._serializer(TakeawayOrderWriteSerializer, self.takeaway,
+                                dishes_qty, restaurant=self.restaurant.pk)
+
+    def _delivery(self, dishes_qty):
+        return self._serializer(
+            DeliveryOrderWriteSerializer, self.delivery, dishes_qty,
+            recipient_address='Knez Mihailova 1',
+            coordinates='44.81, 20.46',
+            comment='flat: 1, floor: 2, interfon: 3')
+
+    def _assert_save_queries_do_not_grow(self, build):
+        # первый заказ дня создаёт счётчик номеров — прогрев
+        build(1).save()
+
+        one_dish, ten_dishes = build(1), build(10)
+        with CaptureQueriesContext(connection) as one_dish_queries:
+            one_dish.save()
+        with CaptureQueriesContext(connection) as ten_dishes_queries:
+            ten_dishes.save()
+
+        self.assertEqual(
+            len(ten_dishes_queries), len(one_dish_queries),
+            "\n".join(query["sql"]
+                      for query in ten_dishes_queries.captured_queries))
+
+    def test_takeaway_query_count_does_not_grow_with_dishes(self):
+        self._assert_save_queries_do_not_grow(self._takeaway)
+
+    def test_delivery_query_count_does_not_grow_with_dishes(self):
+        self._assert_save_queries_do_not_grow(self._delivery)
+
+    def test_totals_match_orderdishes(self):
+        order = self._takeaway(10).save()
+        order.refresh_from_db()
+
+        orderdishes = OrderDish.objects.filter(order=order)
+        self.assertEqual(orderdishes.count(), 10)
+        self.assertTrue(all(od.unit_amount == Decimal("900.00")
+                            and od.order_number == order.pk
+                            and str(od.dish_article) == od.dish_id
+                            for od in orderdishes))
+
+        self.assertEqual(order.amount, Decimal("9000.00"))
+        self.assertEqual(order.items_qty, 20)
+        self.assertEqual(order.amount_with_shipping, Decimal("9000.00"))
+        self.assertEqual(order.final_amount_with_shipping,
+                         order.discounted_amount)
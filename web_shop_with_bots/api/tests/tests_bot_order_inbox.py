@@ -0,0 +1,156 @@
+import logging
+logging.disable(logging.CRITICAL)
+
+from datetime import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.tasks import process_bot_order_inbox_task
+from delivery_contacts.geocoding import StubGeocoder, set_geocoder
+from delivery_contacts.models import Delivery, Restaurant
+from shop.models import Order
+from tm_bot.models import BotOrderInbox, OrdersBot
+
+
+GOOGLE_OK = {
+    "status": "OK",
+    "results": [
+        {"geometry": {"location": {"lat": 44.81, "lng": 20.46},
+                      "location_type": "ROOFTOP"}},
+    ],
+}
+
+
+class BotOrderInboxTests(TestCase):
+    """
+    Вебхук /api/v1/save_bot_order/ и его консьюмер:
+
+    * вебхук пишет payload в BotOrderInbox и отвечает 202, таска
+      ставится после коммита;
+    * повтор того же вебхука не создаёт второе событие, а возврат
+      статуса (A→B→A) и тот же payload после окна дедупликации — создают;
+    * события одного заказа обрабатываются по порядку, заказ один,
+      повторный запуск таски ничего не делает.
+    """
+
+    def setUp(self):
+        self.url = "/api/v1/save_bot_order/"
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        Delivery.objects.create(type='takeaway', city='Beograd',
+                                is_active=True)
+        self.bot = OrdersBot.objects.create(
+            msngr_type="tm",
+            name="Test TG Bot",
+            source_id="shop-1",
+            city="Beograd",
+            link="https://t.me/test_bot",
+            frontend_link="https://frontend.example/test_bot",
+        )
+
+    def _payload(self, **override):
+        payload = {
+            "id": "5001",
+            "shop[id]": "shop-1",
+            "statusName": "ожидает обработки",
+            "recipient": "Иван",
+            "mobile": "+381600000000",
+            "delivery[type]": "pickup",
+            "address": "",
+            "comment": "",
+            "time": "как можно скорее",
+            "user_telegram[id]": "700001",
+            "user_telegram[first_name]": "Иван",
+            "user_telegram[username]": "ivan",
+            "user_chat_id": "700001",
+        }
+        payload.update(override)
+        return payload
+
+    def _post(self, payload):
+        with mock.patch("api.views.process_bot_order_inbox_task.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload)
+        return response, delay
+
+    def test_webhook_persists_payload(self):
+        response, delay = self._post(self._payload())
+
+        self.assertEqual(response.status_code, 202)
+        event = BotOrderInbox.objects.get()
+        self.assertEqual((event.city, event.source_id), ("Beograd", "5001"))
+        self.assertEqual(event.state, BotOrderInbox.PENDING)
+        self.assertEqual(event.payload["recipient"], "Иван")
+        delay.assert_called_once_with(event.id)
+        self.assertFalse(Order.objects.exists())
+
+    def test_repeated_webhook_is_deduplicated(self):
+        self._post(self._payload())
+        response, delay = self._post(self._payload())
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(BotOrderInbox.objects.count(), 1)
+        delay.assert_not_called()
+
+    def test_status_returned_back_is_a_new_event(self):
+        self._post(self._payload())
+        self._post(self._payload(statusName="подтвержден"))
+        response, delay = self._post(self._payload())
+
+        self.assertEqual(response.status_code, 202)
+        events = list(BotOrderInbox.objects.order_by("id"))
+        self.assertEqual([e.sequence for e in events], [1, 2, 3])
+        self.assertEqual(events[0].payload_hash, events[2].payload_hash)
+        delay.assert_called_once_with(events[2].id)
+
+        process_bot_order_inbox_task.apply(args=[events[2].id]).get()
+        order = Order.objects.get(source="3", source_id="5001")
+        self.assertEqual(order.status, "WCO")
+
+    @override_settings(BOT_ORDER_INBOX_DEDUP_WINDOW=0)
+    def test_same_payload_after_window_is_a_new_event(self):
+        self._post(self._payload())
+        response, delay = self._post(self._payload())
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(BotOrderInbox.objects.count(), 2)
+        delay.assert_called_once()
+
+    def test_unknown_shop(self):
+        response, delay = self._post(self._payload(**{"shop[id]": "nope"}))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BotOrderInbox.objects.exists())
+        delay.assert_not_called()
+
+    def test_events_of_one_order_are_processed_in_order(self):
+        self._post(self._payload())
+        self._post(self._payload(statusName="подтвержден"))
+        first, second = BotOrderInbox.objects.order_by("id")
+
+        # таска второго события пришла раньше — забирает оба по порядку
+        processed = process_bot_order_inbox_task.apply(args=[second.id]).get()
+        self.assertEqual(processed, 2)
+
+        order = Order.objects.get(source="3", source_id="5001")
+        self.assertEqual(order.status, "CFD")
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.result, BotOrderInbox.CREATED)
+        self.assertEqual(second.result, BotOrderInbox.STATUS_CHANGED)
+        self.assertEqual(first.order, order)
+
+        # повтор таски ничего не делает
+        processed = process_bot_order_inbox_task.apply(args=[first.id]).get()
+        self.assertEqual(processed, 0)
+        self.assertEqual(Order.objects.filter(source_id="5001").count(), 1)
@@ -37,12 +37,20 @@
      после уточнения, как инвалидация должна работать.
 """
 
+import json
+
 from django.conf import settings
 from django.core.cache import cache
 from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from unittest.mock import patch
 
+from api.utils.core_cache import (BANNERS_GROUP, CONTACTS_GROUP,
+                                  DELIVERY_ZONES_GROUP, MENU_GROUP,
+                                  ORDERS_CONDITIONS_GROUP, PROMONEWS_GROUP,
+                                  versioned_key)
+from api.utils.menu_snapshot import menu_snapshot_key
+
 
 @override_settings(CACHE_TIME=180)
 class CachedPublicEndpointsTests(TestCase):
@@ -61,8 +69,11 @@ class CachedPublicEndpointsTests(TestCase):
     def tearDown(self):
         cache.clear()
 
-    def _assert_endpoint_returns_cached_data(self, url, cache_key, cached_data):
-        cache.set(cache_key, cached_data, timeout=settings.CACHE_TIME)
+    def _assert_endpoint_returns_cached_data(self, url, group, cache_key,
+                                             cached_data):
+        # ключи версионируются поколением группы (core_cache.versioned_key)
+        cache.set(versioned_key(group, cache_key), cached_data,
+                  timeout=settings.CACHE_TIME)
 
         # Audit-логирование пишет запись в БД на КАЖДЫЙ запрос, включая
         # обслуженные из кэша — это ожидаемо и не то, что мы здесь
@@ -79,42 +90,62 @@ class CachedPublicEndpointsTests(TestCase):
     # /api/v1/menu/
     # ------------------------------------------------------------------
 
+    MENU_CACHED_DATA = {
+        "categories": [
+            {
+                "slug": "rolls",
+                "translations": {
+                    "ru": {"name": "Роллы"}
+                },
+                "articles": ["TEST_DISH"],
+                "priority": 1,
+            }
+        ],
+        "menu_list": [
+            {
+                "article": "TEST_DISH",
+                "translations": {
+                    "ru": {"short_name": "Тестовое блюдо"}
+                },
+                "price": {
+                    "Beograd": {
+                        "price": "100.00",
+                        "final_price": "90.00",
+                    }
+                },
+            }
+        ],
+    }
+
     def test_menu_endpoint_returns_cached_data(self):
         """
-        cache_key: f"menu_{request.get_full_path()}" (MenuViewSet.list,
-        через декоратор @cache_response). Форма menu_list соответствует
-        NEWDishMenuSerializer.get_price(), где цена — вложенный словарь
-        по городам, а не плоское поле final_price.
+        Полное меню — снапшот (MenuViewSet.list -> menu_snapshot_response):
+        JSON-байты под ключом menu_snapshot_key() текущего поколения меню.
+        Форма menu_list соответствует DishMenuSerializer.get_price(),
+        где цена — вложенный словарь по городам.
+        """
+        snapshot_key = menu_snapshot_key()
+        cache.set(snapshot_key,
+                  json.dumps(self.MENU_CACHED_DATA).encode(),
+                  timeout=settings.CACHE_TIME)
+
+        with patch("audit.models.AuditLog.objects.create"):
+            with self.assertNumQueries(0):
+                response = self.client.get("/api/v1/menu/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.MENU_CACHED_DATA)
+
+    def test_filtered_menu_endpoint_returns_cached_data(self):
+        """
+        cache_key: f"menu_{request.get_full_path()}"
+        (MenuViewSet._filtered_list, через декоратор @cache_response).
         """
         self._assert_endpoint_returns_cached_data(
-            url="/api/v1/menu/",
-            cache_key="menu_/api/v1/menu/",
-            cached_data={
-                "categories": [
-                    {
-                        "slug": "rolls",
-                        "translations": {
-                            "ru": {"name": "Роллы"}
-                        },
-                        "articles": ["TEST_DISH"],
-                        "priority": 1,
-                    }
-                ],
-                "menu_list": [
-                    {
-                        "article": "TEST_DISH",
-                        "translations": {
-                            "ru": {"short_name": "Тестовое блюдо"}
-                        },
-                        "price": {
-                            "Beograd": {
-                                "price": "100.00",
-                                "final_price": "90.00",
-                            }
-                        },
-                    }
-                ],
-            },
+            url="/api/v1/menu/?category=rolls",
+            group=MENU_GROUP,
+            cache_key="menu_/api/v1/menu/?category=rolls",
+            cached_data=self.MENU_CACHED_DATA,
         )
 
     def test_menu2_route_is_currently_disabled(self):
@@ -151,6 +182,7 @@ class CachedPublicEndpointsTests(TestCase):
         """
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/contacts/",
+            group=CONTACTS_GROUP,
             cache_key="contacts_delivery",
             cached_data=[
                 {
@@ -177,6 +209,7 @@ class CachedPublicEndpointsTests(TestCase):
         """
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/delivery_zones/",
+            group=DELIVERY_ZONES_GROUP,
             cache_key="delivery_zones",
             cached_data={
                 "Beograd": {
@@ -198,6 +231,7 @@ class CachedPublicEndpointsTests(TestCase):
         """cache_key: "promonews" (PromoNewsViewSet.list)."""
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/promonews/",
+            group=PROMONEWS_GROUP,
             cache_key="promonews",
             cached_data=[
                 {
@@ -223,6 +257,7 @@ class CachedPublicEndpointsTests(TestCase):
         """
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/banners/",
+            group=BANNERS_GROUP,
             cache_key="banners",
             cached_data=[
                 {
@@ -245,6 +280,7 @@ class CachedPublicEndpointsTests(TestCase):
         """
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/create_order_takeaway/",
+            group=ORDERS_CONDITIONS_GROUP,
             cache_key="create_order_takeaway_conditions",
             cached_data=[
                 {
@@ -266,6 +302,7 @@ class CachedPublicEndpointsTests(TestCase):
         """
         self._assert_endpoint_returns_cached_data(
             url="/api/v1/create_order_delivery/",
+            group=ORDERS_CONDITIONS_GROUP,
             cache_key="create_order_delivery_conditions",
             cached_data=[
                 {
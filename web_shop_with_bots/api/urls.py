@@ -71,6 +71,9 @@ urlpatterns = [
          name='get_google_api_key'),
     path('v1/calculate_delivery/', views.calculate_delivery,
          name='calculate_delivery'),
+    path('v1/calculate_delivery_bulk/',
+         views.CalculateDeliveryBulkAPIView.as_view(),
+         name='calculate_delivery_bulk'),
     path('v1/save_bot_order/', views.save_bot_order, name='save_bot_order'),
 
     path('v1/auth/', include('djoser.urls.jwt')),
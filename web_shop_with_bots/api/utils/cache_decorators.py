@@ -1,25 +1,167 @@
+"""
+cache_decorators.py — кэширование ответов GET-эндпоинтов.
+
+cache_response хранит в кэше CacheEntry(data, fresh_until):
+- пока time() < fresh_until (soft TTL) — отдаём из кэша (hit);
+- после soft TTL, но до hard TTL (ключ ещё жив) — в режиме
+  stale-while-revalidate отдаём старое значение, а пересчитывает
+  его ровно один воркер, взявший лок (stale);
+- ключа нет (истёк hard TTL, а после инвалидации нет и значения
+  прошлого поколения) — пересчитывает держатель лока, остальные ждут
+  его результат (single-flight), а не идут в БД всей толпой.
+
+Ключ группы (group=...) версионируется поколением из core_cache.
+После инвалидации (сдвиг поколения) нового ключа ещё нет: рядом с ним
+хранится указатель LAST_KEY на ключ прошлого поколения, и в режиме
+stale-while-revalidate, пока держатель лока пересчитывает, остальные
+отдают значение прошлого поколения (оно живёт до своего hard TTL).
+Если поколение не прочитать (redis недоступен) — считаем без кэша.
+
+Лок — cache.add (SET NX в redis, общий для всех gunicorn-воркеров).
+Если redis недоступен — локальный threading.Lock на процесс.
+
+Счётчики hit/stale/miss/rebuild/wait/error — на процесс,
+см. get_cache_stats().
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
 from functools import wraps
 
 from django.conf import settings
 from django.core.cache import cache
 from rest_framework.response import Response
 
+from api.utils.core_cache import versioned_key
+
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple("CacheEntry", ["data", "fresh_until"])
+
+LOCK_KEY = "lock:{key}"
+LAST_KEY = "last:{key}"
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+# ---------------------------- СЧЁТЧИКИ ----------------------------
+
+def _count(name, event):
+    with _stats_lock:
+        _stats[(name, event)] += 1
+
+
+def get_cache_stats():
+    """{name: {'hit': n, 'stale': n, 'miss': n, 'rebuild': n, ...}}"""
+    with _stats_lock:
+        result = {}
+        for (name, event), value in _stats.items():
+            result.setdefault(name, {})[event] = value
+        return result
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ---------------------------- ЛОК (SINGLE-FLIGHT) ----------------------------
+
+LOCK_REDIS = "redis"
+LOCK_LOCAL = "local"
+
+
+def acquire_lock(key, timeout=LOCK_TIMEOUT):
+    """
+    Пытается взять лок без ожидания. Возвращает LOCK_REDIS / LOCK_LOCAL,
+    если лок наш (его надо вернуть через release_lock), или None.
+    Redis-лок через cache.add; при ошибке кэша — локальный на процесс.
+    """
+    try:
+        return LOCK_REDIS if cache.add(LOCK_KEY.format(key=key), 1, timeout) else None
+    except Exception as exc:
+        logger.warning("CACHE LOCK FALLBACK TO LOCAL: %s %s", key, exc)
+
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(key, threading.Lock())
+    return LOCK_LOCAL if lock.acquire(blocking=False) else None
 
-def cache_response(cache_key_func, timeout=None):
-    def decorator(view_method):
-        @wraps(view_method)
-        def wrapper(view_instance, request, *args, **kwargs):
-            cache_key = cache_key_func(
-                view_instance,
-                request,
-                *args,
-                **kwargs
-            )
 
-            cached = cache.get(cache_key)
-            if cached is not None:
-                return Response(cached)
+def release_lock(key, lock_type):
+    if lock_type == LOCK_LOCAL:
+        _local_locks[key].release()
+        return
 
+    try:
+        cache.delete(LOCK_KEY.format(key=key))
+    except Exception as exc:
+        logger.warning("CACHE LOCK RELEASE FAILED: %s %s", key, exc)
+
+
+def _is_fresh(value):
+    # значения без обёртки (снапшоты, записи до CacheEntry) считаем свежими
+    return not isinstance(value, CacheEntry) or value.fresh_until > time.time()
+
+
+def wait_for(key, wait=LOCK_WAIT):
+    """Ждёт, пока держатель лока положит свежее значение по ключу."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = _safe_get(key)
+        if value is not None and _is_fresh(value):
+            return value
+    return None
+
+
+def _safe_get(key):
+    try:
+        return cache.get(key)
+    except Exception as exc:
+        logger.warning("CACHE GET FAILED: %s %s", key, exc)
+        return None
+
+
+def _data(value):
+    return value.data if isinstance(value, CacheEntry) else value
+
+
+def _previous_generation(base_key, cache_key):
+    """Значение прошлого поколения по указателю LAST_KEY или None."""
+    previous_key = _safe_get(LAST_KEY.format(key=base_key))
+    if previous_key is None or previous_key == cache_key:
+        return None
+    return _safe_get(previous_key)
+
+
+# ---------------------------- ДЕКОРАТОР ----------------------------
+
+def cache_response(cache_key_func, group=None, timeout=None,
+                   hard_timeout=None, stale_while_revalidate=True):
+    """
+    group — группа инвалидации из core_cache: её поколение встраивается
+    в ключ, и invalidate_*() сбрасывает все варианты ключа разом.
+    timeout — soft TTL (по умолчанию settings.CACHE_TIME),
+    hard_timeout — сколько ключ живёт в кэше всего
+    (по умолчанию timeout + settings.CACHE_STALE_TIME).
+    CACHE_TIME=0 отключает кэш, как и раньше.
+    """
+    def decorator(view_method):
+        name = view_method.__qualname__
+
+        def compute(view_instance, request, args, kwargs, base_key,
+                    cache_key, soft, hard):
+            _count(name, "rebuild")
             response = view_method(
                 view_instance,
                 request,
@@ -32,14 +174,76 @@ def cache_response(cache_key_func, timeout=None):
                 and hasattr(response, "data")
                 and request.method == "GET"
             ):
-                cache.set(
-                    cache_key,
-                    response.data,
-                    timeout or settings.CACHE_TIME
-                )
+                entry = CacheEntry(response.data, time.time() + soft)
+                try:
+                    cache.set(cache_key, entry, hard)
+                    if cache_key != base_key:
+                        cache.set(LAST_KEY.format(key=base_key), cache_key,
+                                  hard)
+                except Exception as exc:
+                    _count(name, "error")
+                    logger.warning("CACHE SET FAILED: %s %s", cache_key, exc)
 
             return response
 
+        @wraps(view_method)
+        def wrapper(view_instance, request, *args, **kwargs):
+            soft = timeout or settings.CACHE_TIME
+            if not soft:
+                return view_method(view_instance, request, *args, **kwargs)
+            hard = hard_timeout or soft + settings.CACHE_STALE_TIME
+
+            base_key = cache_key = cache_key_func(
+                view_instance,
+                request,
+                *args,
+                **kwargs
+            )
+            if group is not None:
+                try:
+                    cache_key = versioned_key(group, base_key)
+                except Exception as exc:
+                    _count(name, "error")
+                    logger.warning("CACHE GENERATION FAILED: %s %s",
+                                   base_key, exc)
+                    return view_method(view_instance, request,
+                                       *args, **kwargs)
+
+            cached = _safe_get(cache_key)
+
+            if cached is not None and _is_fresh(cached):
+                _count(name, "hit")
+                return Response(_data(cached))
+
+            if cached is None:
+                _count(name, "miss")
+
+            lock_type = acquire_lock(cache_key)
+            if lock_type:
+                try:
+                    return compute(view_instance, request, args, kwargs,
+                                   base_key, cache_key, soft, hard)
+                finally:
+                    release_lock(cache_key, lock_type)
+
+            if stale_while_revalidate:
+                if cached is None and cache_key != base_key:
+                    # поколение сдвинулось — старое лежит под прошлым
+                    cached = _previous_generation(base_key, cache_key)
+                if cached is not None:
+                    # пересчитывает другой воркер — отдаём старое
+                    _count(name, "stale")
+                    return Response(_data(cached))
+
+            waited = wait_for(cache_key)
+            if waited is not None:
+                _count(name, "wait")
+                return Response(_data(waited))
+
+            # держатель лока не успел — считаем сами, без записи в кэш
+            _count(name, "rebuild")
+            return view_method(view_instance, request, *args, **kwargs)
+
         return wrapper
 
     return decorator
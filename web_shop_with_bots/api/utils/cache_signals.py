@@ -13,6 +13,7 @@ DeliveryZone → зоны доставки
 Banner → баннеры
 PromoNews → новости/баннеры
 CityDishList, RestaurantDishList → условия заказа/баннеры
+Discount → скидки (контекст формы заказа в админке)
 Когда что-то меняется — вызывает нужную функцию очистки кэша из core_cache.py, например:
 invalidate_menu_cache()
 invalidate_contacts_cache()
@@ -29,8 +30,15 @@ def invalidate_menu_related_cache(...):
     invalidate_orders_conditions_cache()
     invalidate_banners_cache()
 
+Сами receivers ничего не сбрасывают немедленно: внутри транзакции
+инвалидации копятся в пачку и применяются один раз после коммита
+(см. core_cache.invalidate_groups), поэтому массовая правка даёт одну
+строку "CACHE INVALIDATED" в логе, а не сотни.
+
 То есть после изменения блюда файл говорит примерно так:
-«меню, условия заказа и баннеры могли устареть — удаляем их из кэша»."""
+«меню, условия заказа и баннеры могли устареть — сдвигаем поколение
+их групп, и старые ключи (включая варианты URL с фильтрами) больше
+не читаются»."""
 
 import logging
 
@@ -43,7 +51,8 @@ from api.utils.core_cache import (
     invalidate_delivery_zones_cache,
     invalidate_banners_cache,
     invalidate_promonews_cache,
-    invalidate_orders_conditions_cache
+    invalidate_orders_conditions_cache,
+    invalidate_discounts_cache,
 )
 
 from catalog.models import (Dish, Category, DishCategory,
@@ -52,6 +61,7 @@ from catalog.models import (Dish, Category, DishCategory,
 from delivery_contacts.models import Restaurant, Delivery, DeliveryZone
 from tm_bot.models import OrdersBot
 from promos.models import Banner, PromoNews
+from shop.models import Discount
 
 
 logger = logging.getLogger(__name__)
@@ -73,7 +83,7 @@ def invalidate_menu_related_cache(sender, instance, **kwargs):
     invalidate_orders_conditions_cache()
     invalidate_banners_cache()
 
-    logger.warning(
+    logger.debug(
         "MENU/ORDER CONDITIONS CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -87,7 +97,7 @@ def invalidate_menu_categories_cache(sender, instance, **kwargs):
     """
     invalidate_menu_cache()
 
-    logger.warning(
+    logger.debug(
         "MENU M2M/ORDER CONDITIONS CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -104,7 +114,7 @@ def invalidate_contacts_related_cache(sender, instance, **kwargs):
     invalidate_contacts_cache()
     invalidate_orders_conditions_cache()
 
-    logger.warning(
+    logger.debug(
         "CONTACTS CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -118,7 +128,7 @@ def invalidate_delivery_zones_related_cache(sender, instance, **kwargs):
     """
     invalidate_delivery_zones_cache()
 
-    logger.warning(
+    logger.debug(
         "DELIVERY ZONES CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -132,7 +142,7 @@ def invalidate_banners_related_cache(sender, instance, **kwargs):
     """
     invalidate_banners_cache()
 
-    logger.warning(
+    logger.debug(
         "BANNERS CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -147,7 +157,7 @@ def invalidate_promonews_related_cache(sender, instance, **kwargs):
     invalidate_promonews_cache()
     invalidate_banners_cache()
 
-    logger.warning(
+    logger.debug(
         "PROMONEWS CACHE INVALIDATED: %s %s",
         sender,
         instance
@@ -160,7 +170,7 @@ def invalidate_orders_conditions_lists_cache(sender, instance, **kwargs):
     invalidate_orders_conditions_cache()
     invalidate_banners_cache()
 
-    logger.warning(
+    logger.debug(
         "ORDER CONDITIONS CACHE INVALIDATED BY LIST MODEL: %s %s",
         sender,
         instance
@@ -173,7 +183,7 @@ def invalidate_orders_conditions_lists_m2m_cache(sender, instance, **kwargs):
     invalidate_orders_conditions_cache()
     invalidate_banners_cache()
 
-    logger.warning(
+    logger.debug(
         "ORDER CONDITIONS CACHE INVALIDATED BY LIST M2M: %s %s",
         sender,
         instance
@@ -190,8 +200,22 @@ def invalidate_menu_cache_on_price_change(sender, instance, **kwargs):
     """
     invalidate_menu_cache()
 
-    logger.warning(
+    logger.debug(
         "MENU CACHE INVALIDATED BY PRICE CHANGE: %s %s",
         sender,
         instance,
     )
+
+
+@receiver([post_save, post_delete], sender=Discount)
+def invalidate_discounts_related_cache(sender, instance, **kwargs):
+    """
+    Изменения скидок влияют на форму заказа в админке
+    """
+    invalidate_discounts_cache()
+
+    logger.debug(
+        "DISCOUNTS CACHE INVALIDATED: %s %s",
+        sender,
+        instance,
+    )
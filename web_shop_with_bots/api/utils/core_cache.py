@@ -1,56 +1,206 @@
+"""
+core_cache.py — ключи и инвалидация API-кэша.
+
+Каждая логическая группа (menu, banners, contacts, delivery_zones,
+orders_conditions, promonews, discounts, bots) имеет номер поколения в кэше
+(cache_gen:<group>), и он встраивается во все ключи группы:
+    contacts_delivery:g1718000000123
+    menu_/api/v1/menu/?category=rolls:g1718000000456
+
+Инвалидация группы — один атомарный INCR поколения: все ключи группы,
+включая любые варианты URL с query-параметрами, перестают читаться
+и дотлевают по своему TTL. Ни delete_many по списку, ни cache.keys().
+
+Внутри транзакции (сохранение в админке, массовые actions, загрузка
+цен) инвалидации не выполняются сразу, а собираются в пачку:
+группы дедуплицируются, и после коммита каждая сдвигается один раз
+(transaction.on_commit). Откат транзакции — пачка отбрасывается.
+Сколько инвалидаций схлопнулось — get_invalidation_stats().
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
 from django.core.cache import cache
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
 
 
+MENU_GROUP = "menu"
+BANNERS_GROUP = "banners"
+CONTACTS_GROUP = "contacts"
+DELIVERY_ZONES_GROUP = "delivery_zones"
+ORDERS_CONDITIONS_GROUP = "orders_conditions"
+PROMONEWS_GROUP = "promonews"
+# API скидки не кэширует: группа нужна контексту формы заказа в админке
+DISCOUNTS_GROUP = "discounts"
+# только поколение: по нему процессы пересобирают tm_bot.registry
+BOTS_GROUP = "bots"
+
+GENERATION_KEY = "cache_gen:{group}"
+
 CONTACTS_DELIVERY_CACHE_KEY = "contacts_delivery"
 DELIVERY_ZONES_CACHE_KEY = "delivery_zones"
 PROMONEWS_CACHE_KEY = "promonews"
 BANNERS_CACHE_KEY = "banners"
 TAKEAWAY_CONDITIONS_CACHE_KEY = "create_order_takeaway_conditions"
 DELIVERY_CONDITIONS_CACHE_KEY = "create_order_delivery_conditions"
+# контекст формы заказа в админке (shop.admin_utils), {type} — all/partner
+ORDER_FORM_CACHE_KEY = "admin_order_form:{type}"
+
+
+def get_generation(group):
+    key = GENERATION_KEY.format(group=group)
+    generation = cache.get(key)
+    if generation is None:
+        # стартуем с метки времени, а не с 1: если redis потерял ключ,
+        # поколение не откатится к ещё живым старым ключам
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(group):
+    try:
+        return cache.incr(GENERATION_KEY.format(group=group))
+    except ValueError:
+        return get_generation(group)
+
+
+def versioned_key(group, key):
+    return f"{key}:g{get_generation(group)}"
+
+
+def versioned_key_many(key, *groups):
+    """Ключ, зависящий от нескольких групп: устаревает при сдвиге любой."""
+    return key + "".join(f":g{get_generation(group)}" for group in groups)
+
+
+# ---------------------------- ПАЧКА ИНВАЛИДАЦИЙ ----------------------------
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def record_invalidation_stat(group, event):
+    with _stats_lock:
+        _stats[(group, event)] += 1
+
+
+def get_invalidation_stats():
+    """
+    {group: {'requested': n, 'flushed': n, 'coalesced': n, ...}} на процесс.
+    coalesced — сколько запросов на инвалидацию не дошли до INCR,
+    потому что группа уже была в пачке.
+    """
+    with _stats_lock:
+        result = {}
+        for (group, event), value in _stats.items():
+            result.setdefault(group, {})[event] = value
+    for events in result.values():
+        events['coalesced'] = (events.get('requested', 0)
+                               - events.get('flushed', 0))
+    return result
+
+
+def reset_invalidation_stats():
+    with _stats_lock:
+        _stats.clear()
 
-MENU_CACHE_KEYS = [
-    "menu_/api/v1/menu/",
-]
+
+def _flush_groups(groups):
+    from api.utils.menu_snapshot import schedule_menu_snapshot_rebuild
+
+    for group in groups:
+        bump_generation(group)
+        record_invalidation_stat(group, 'flushed')
+
+    if MENU_GROUP in groups:
+        schedule_menu_snapshot_rebuild()
+
+    logger.warning("CACHE INVALIDATED: %s", ", ".join(sorted(groups)))
+
+
+class _InvalidationBatch:
+    """on_commit-колбэк, копящий группы одной транзакции."""
+
+    def __init__(self):
+        self.groups = set()
+
+    def __call__(self):
+        if getattr(_local, 'batch', None) is self:
+            _local.batch = None
+        _flush_groups(self.groups)
+
+
+def _is_registered(connection, batch):
+    # после отката транзакции (или её savepoint) колбэк пропадает
+    # из run_on_commit — тогда пачку нужно начинать заново
+    return any(entry[1] is batch for entry in connection.run_on_commit)
+
+
+def invalidate_groups(*groups):
+    for group in groups:
+        record_invalidation_stat(group, 'requested')
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _flush_groups(set(groups))
+        return
+
+    batch = getattr(_local, 'batch', None)
+    if batch is None or not _is_registered(connection, batch):
+        batch = _InvalidationBatch()
+        _local.batch = batch
+        transaction.on_commit(batch)
+    batch.groups.update(groups)
 
 
 def invalidate_menu_cache():
-    cache.delete_many(
-        MENU_CACHE_KEYS
-    )
+    invalidate_groups(MENU_GROUP)
 
 
 def invalidate_contacts_cache():
-    cache.delete_many([
-        CONTACTS_DELIVERY_CACHE_KEY,
-        TAKEAWAY_CONDITIONS_CACHE_KEY,
-        DELIVERY_CONDITIONS_CACHE_KEY,
-    ])
+    invalidate_groups(CONTACTS_GROUP, ORDERS_CONDITIONS_GROUP)
 
 
 def invalidate_delivery_zones_cache():
-    cache.delete(DELIVERY_ZONES_CACHE_KEY)
+    invalidate_groups(DELIVERY_ZONES_GROUP)
 
 
 def invalidate_promonews_cache():
-    cache.delete(PROMONEWS_CACHE_KEY)
+    invalidate_groups(PROMONEWS_GROUP)
 
 
 def invalidate_banners_cache():
-    cache.delete(BANNERS_CACHE_KEY)
+    invalidate_groups(BANNERS_GROUP)
+
 
 def invalidate_orders_conditions_cache():
-    cache.delete_many([
-        DELIVERY_CONDITIONS_CACHE_KEY,
-        TAKEAWAY_CONDITIONS_CACHE_KEY,
-    ])
+    invalidate_groups(ORDERS_CONDITIONS_GROUP)
+
+
+def invalidate_discounts_cache():
+    invalidate_groups(DISCOUNTS_GROUP)
+
+
+def invalidate_bots_cache():
+    invalidate_groups(BOTS_GROUP)
+
 
 def invalidate_cache_for_model(model):
     """ Тригерится, когда изменения модели через Actions."""
     from catalog.models import (Dish, Category, DishCategory,
                                 DishCityPrice, DishPartnerPrice)
     from delivery_contacts.models import Restaurant, Delivery, DeliveryZone
-    from tm_bot.models import OrdersBot
+    from tm_bot.models import AdminChatTM, OrdersBot
     from promos.models import Banner, PromoNews
+    from shop.models import Discount
 
     if model in [Dish, Category, DishCategory, DishCityPrice, DishPartnerPrice]:
         invalidate_menu_cache()
@@ -59,6 +209,11 @@ def invalidate_cache_for_model(model):
 
     elif model in [Restaurant, Delivery, OrdersBot]:
         invalidate_contacts_cache()
+        if model == OrdersBot:
+            invalidate_bots_cache()
+
+    elif model == AdminChatTM:
+        invalidate_bots_cache()
 
     elif model == DeliveryZone:
         invalidate_delivery_zones_cache()
@@ -69,5 +224,8 @@ def invalidate_cache_for_model(model):
     elif model == PromoNews:
         invalidate_promonews_cache()
 
+    elif model == Discount:
+        invalidate_discounts_cache()
+
     # CityDishList , RestaurantDishList не описаны,
     # тк нет активации в actions
@@ -0,0 +1,272 @@
+"""
+menu_snapshot.py — готовый (предсериализованный) ответ /api/v1/menu/.
+
+Идея:
+- полный payload {categories, menu_list} собирается ОДИН раз на версию
+  каталога и хранится в кэше уже в виде JSON-байтов;
+- версия каталога — поколение группы MENU_GROUP (core_cache),
+  invalidate_menu_cache() увеличивает его, поэтому старый снапшот просто
+  перестаёт читаться (delete не нужен);
+- после коммита изменений в админке снапшот пересобирается в фоне
+  celery-таской, и запросы отдают готовые байты, не трогая ORM;
+- если снапшота нет (холодный старт / фон не успел) — его строит ровно
+  один запрос под локом, остальные ждут готовый результат.
+
+Фильтрованные запросы (?category=...) идут по старому пути через
+build_menu_payload() + @cache_response.
+
+Снапшот общий для всех запросов и собирается в том числе фоновой
+таской, поэтому меню сериализуется без request: URL картинок всегда
+строятся от MEDIA_URL, кто бы ни собрал снапшот.
+
+CACHE_TIME=0 отключает снапшот, как и остальной кэш: меню собирается
+на каждый запрос. Ошибка кэша (redis недоступен) не роняет /menu/ —
+меню так же собирается из БД.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from api.utils.cache_decorators import acquire_lock, release_lock, wait_for
+from api.utils.core_cache import (MENU_GROUP, get_generation,
+                                  record_invalidation_stat)
+from catalog.models import Dish, DishCategory, DishCityPrice
+
+
+logger = logging.getLogger(__name__)
+
+MENU_SNAPSHOT_KEY = "menu_snapshot"
+MENU_SNAPSHOT_REBUILD_KEY = "menu_snapshot_rebuild_scheduled"
+
+NO_PRIORITY = 999999
+
+
+def menu_queryset():
+    """Queryset блюд меню со всеми prefetch, нужными DishMenuSerializer."""
+    return (
+        Dish.objects
+        .filter(
+            is_active=True,
+            category__is_active=True
+        ).select_related(
+            'units_in_set_uom',
+            'weight_volume_uom',
+        ).prefetch_related(
+            'translations',
+            'category__translations',
+            'units_in_set_uom__translations',
+            'weight_volume_uom__translations',
+            Prefetch(
+                'dishcategory',
+                queryset=DishCategory.objects.select_related('category')
+            ),
+            Prefetch(
+                "city_prices",
+                queryset=DishCityPrice.objects.only(
+                    "dish_id",
+                    "city",
+                    "price",
+                    "discount",
+                    "final_price",
+                ),
+                to_attr="prefetched_city_prices",
+            ),
+        ).order_by('category__priority'))
+
+
+def _category_translations(category):
+    category_translations = {}
+    for tr in category.translations.all():
+        category_translations[tr.language_code] = {
+            k: v for k, v in {
+                'name': getattr(tr, 'name', None),
+                'description': getattr(tr, 'description', None),
+            }.items() if v is not None
+        }
+    return category_translations
+
+
+def build_menu_payload(qs, context=None):
+    """
+    Собирает {categories, menu_list} за один проход по queryset.
+    categories — активные категории по priority, внутри артикулы
+    по DishCategory.dish_priority; menu_list — уникальные блюда
+    в порядке queryset.
+    """
+    from api.serializers import DishMenuSerializer
+
+    categories_map = {}
+    seen_pairs = set()
+    unique_dishes = []
+    seen_ids = set()
+
+    for dish in qs:
+        if dish.id in seen_ids:
+            continue
+        seen_ids.add(dish.id)
+        unique_dishes.append(dish)
+
+        for dc in dish.dishcategory.all():
+            category = dc.category
+
+            if not category.is_active:
+                continue
+
+            slug = category.slug
+            pair_key = (slug, dish.article)
+
+            if pair_key in seen_pairs:
+                continue
+            seen_pairs.add(pair_key)
+
+            if slug not in categories_map:
+                categories_map[slug] = {
+                    'slug': slug,
+                    'translations': _category_translations(category),
+                    'articles': [],
+                    'priority': category.priority,
+                }
+
+            categories_map[slug]['articles'].append((
+                dc.dish_priority if dc.dish_priority is not None else NO_PRIORITY,
+                dish.article,
+            ))
+
+    categories = sorted(
+        categories_map.values(),
+        key=lambda item: item['priority'] if item['priority'] is not None else NO_PRIORITY
+    )
+
+    for category in categories:
+        category['articles'] = [
+            article
+            for _, article in sorted(category['articles'], key=lambda x: x[0])
+        ]
+
+    menu_list = DishMenuSerializer(
+        unique_dishes,
+        many=True,
+        context=context or {}
+    ).data
+
+    return {
+        'categories': categories,
+        'menu_list': menu_list,
+    }
+
+
+# ---------------------------- ВЕРСИЯ КАТАЛОГА ----------------------------
+
+def get_menu_version():
+    return get_generation(MENU_GROUP)
+
+
+def menu_snapshot_key(version=None):
+    if version is None:
+        version = get_menu_version()
+    return f"{MENU_SNAPSHOT_KEY}:g{version}"
+
+
+# ---------------------------- СБОРКА / ЧТЕНИЕ ----------------------------
+
+def render_menu_snapshot():
+    """Собирает меню из БД и возвращает JSON-байты (без записи в кэш)."""
+    return JSONRenderer().render(build_menu_payload(menu_queryset()))
+
+
+def build_menu_snapshot(version=None):
+    """
+    Собирает снапшот для версии каталога и кладёт его в кэш.
+    Версия фиксируется ДО чтения БД: если каталог поменяется во время
+    сборки, снапшот ляжет под старую версию и читаться не будет.
+    """
+    if version is None:
+        version = get_menu_version()
+
+    content = render_menu_snapshot()
+    try:
+        cache.set(
+            menu_snapshot_key(version),
+            content,
+            settings.MENU_SNAPSHOT_TIMEOUT
+        )
+    except Exception as exc:
+        logger.warning("MENU SNAPSHOT NOT STORED: version=%s %s",
+                       version, exc)
+        return content
+    logger.info("MENU SNAPSHOT BUILT: version=%s size=%s",
+                version, len(content))
+    return content
+
+
+def get_menu_snapshot():
+    """
+    Возвращает JSON-байты меню текущей версии.
+    При промахе строит снапшот один держатель лока, остальные ждут
+    его результат (single-flight из cache_decorators), потом строят
+    сами (без записи в кэш).
+    """
+    if not settings.CACHE_TIME:
+        return render_menu_snapshot()
+
+    try:
+        version = get_menu_version()
+        snapshot_key = menu_snapshot_key(version)
+        content = cache.get(snapshot_key)
+    except Exception as exc:
+        logger.warning("MENU SNAPSHOT CACHE FAILED: %s", exc)
+        return render_menu_snapshot()
+
+    if content is not None:
+        return content
+
+    lock_type = acquire_lock(snapshot_key)
+    if lock_type:
+        try:
+            return build_menu_snapshot(version=version)
+        finally:
+            release_lock(snapshot_key, lock_type)
+
+    content = wait_for(snapshot_key)
+    if content is not None:
+        return content
+
+    logger.warning("MENU SNAPSHOT WAIT TIMEOUT: version=%s", version)
+    return render_menu_snapshot()
+
+
+def menu_snapshot_response():
+    return HttpResponse(get_menu_snapshot(),
+                        content_type='application/json')
+
+
+def schedule_menu_snapshot_rebuild():
+    """
+    Пересборка снапшота в фоне после коммита текущей транзакции.
+    С settings.CACHE_INVALIDATION_DEBOUNCE таска откладывается на это
+    окно, а повторные вызовы внутри окна её не дублируют — серия правок
+    в админке даёт одну пересборку (таска собирает актуальную версию).
+    Ошибка брокера не должна ронять сохранение в админке —
+    в худшем случае снапшот соберёт первый запрос.
+    """
+    from api.tasks import rebuild_menu_snapshot_task
+
+    debounce = settings.CACHE_INVALIDATION_DEBOUNCE
+
+    def _dispatch():
+        if debounce and not cache.add(MENU_SNAPSHOT_REBUILD_KEY, 1, debounce):
+            record_invalidation_stat(MENU_GROUP, 'rebuild_debounced')
+            return
+        try:
+            rebuild_menu_snapshot_task.apply_async(countdown=debounce)
+            record_invalidation_stat(MENU_GROUP, 'rebuild_scheduled')
+        except Exception as exc:
+            logger.warning("MENU SNAPSHOT REBUILD NOT SCHEDULED: %s", exc)
+
+    transaction.on_commit(_dispatch)
@@ -5,7 +5,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 from django.db.models import Prefetch
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
@@ -27,7 +27,7 @@ from djoser.views import UserViewSet
 
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
@@ -44,13 +44,22 @@ from api.services import (get_promoc_resp_dict,
 from api.filters import CategoryFilter
 from api.swagger.registry import get_swagger_schema
 from api.utils.cache_decorators import cache_response
-
-from catalog.models import Dish, DishCategory, RestaurantDishList, DishCityPrice
+from api.utils.core_cache import (
+    BANNERS_CACHE_KEY, BANNERS_GROUP,
+    CONTACTS_DELIVERY_CACHE_KEY, CONTACTS_GROUP,
+    DELIVERY_CONDITIONS_CACHE_KEY, DELIVERY_ZONES_CACHE_KEY,
+    DELIVERY_ZONES_GROUP, MENU_GROUP, ORDERS_CONDITIONS_GROUP,
+    PROMONEWS_CACHE_KEY, PROMONEWS_GROUP, TAKEAWAY_CONDITIONS_CACHE_KEY)
+from api.utils.menu_snapshot import (build_menu_payload, menu_queryset,
+                                     menu_snapshot_response)
+
+from catalog.models import Dish, DishCategory, RestaurantDishList
 from catalog.validators import validator_dish_exists_active
 from delivery_contacts.models import Delivery, Restaurant, DeliveryZone
 from delivery_contacts.services import (get_delivery,
                                         get_delivery_cost_zone_by_address,
                                         get_delivery_cost_zone,
+                                        get_delivery_cost_zone_bulk,
                                         )
 from delivery_contacts.utils import (get_google_api_key,
                                      parce_coordinates, get_address_comment)
@@ -60,8 +69,10 @@ from shop.models import Order, OrderDish, Discount, current_cash_disc_status
 from shop.services import (get_base_profile_and_shopping_cart, get_cart,
                            base_profile_first_order, get_cash_discount)
 from shop.validators import validate_user_order_exists
-from tm_bot.models import (get_status_tmbot, OrdersBot, get_bot,
+from tm_bot.models import (OrdersBot, BotOrderInbox,
                            MessengerAccount, MessengerAccountBot)
+from tm_bot.registry import get_bot_by_city, get_bot_by_source_id
+from api.tasks import process_bot_order_inbox_task
 
 from users.models import (BaseProfile, UserAddress,
                           get_or_create_dummy_webacount_and_baseprofile)
@@ -87,7 +98,8 @@ class ContactsDeliveryViewSet(mixins.ListModelMixin,
     permission_classes = [AllowAny,]
     serializer_class = srlz.ContactsDeliverySerializer
 
-    @cache_response(lambda self, request, *args, **kwargs: "contacts_delivery")
+    @cache_response(lambda self, request, *args, **kwargs: CONTACTS_DELIVERY_CACHE_KEY,
+                    group=CONTACTS_GROUP)
     def list(self, request, *args, **kwargs):
         logger.info(f'contacts/ REQUEST: {self.request.data} '
                     f'USER:{self.request.user}')
@@ -146,7 +158,8 @@ class DeliveryZonesViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = srlz.DeliveryZonesSerializer
     permission_classes = [AllowAny,]
 
-    @cache_response(lambda self, request, *args, **kwargs: "delivery_zones")
+    @cache_response(lambda self, request, *args, **kwargs: DELIVERY_ZONES_CACHE_KEY,
+                    group=DELIVERY_ZONES_GROUP)
     def list(self, request, *args, **kwargs):
         # cache_key = "delivery_zones"
         # cached = cache.get(cache_key)
@@ -241,7 +254,8 @@ class PromoNewsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = srlz.PromoNewsSerializer
     permission_classes = [AllowAny,]
 
-    @cache_response(lambda self, request, *args, **kwargs: "promonews")
+    @cache_response(lambda self, request, *args, **kwargs: PROMONEWS_CACHE_KEY,
+                    group=PROMONEWS_GROUP)
     def list(self, request, *args, **kwargs):
         # cache_key = "promonews"
         # cached = cache.get(cache_key)
@@ -359,120 +373,29 @@ class MenuViewSet(mixins.ListModelMixin,
     serializer_class = srlz.DishMenuSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = CategoryFilter
-    queryset = (
-
-        Dish.objects
-        .filter(
-            is_active=True,
-            category__is_active=True
-        ).select_related(
-            'units_in_set_uom',
-            'weight_volume_uom',
-        ).prefetch_related(
-            'translations',
-            'category__translations',
-            'units_in_set_uom__translations',
-            'weight_volume_uom__translations',
-        Prefetch(
-            'dishcategory',
-            queryset=DishCategory.objects.select_related('category')
-        ),
-        Prefetch(
-            "city_prices",
-            queryset=DishCityPrice.objects.only(
-                "dish_id",
-                "city",
-                "price",
-                "discount",
-                "final_price",
-            ),
-            to_attr="prefetched_city_prices",
-        ),
-    ).order_by('category__priority'))
+    queryset = menu_queryset()
 
     http_method_names = ['get',]
 
+    def list(self, request, *args, **kwargs):
+        """
+        Полное меню отдаётся готовым снапшотом (JSON-байты из кэша,
+        без ORM), фильтрованное (?category=...) — собирается по запросу.
+        """
+        if set(request.query_params) & set(self.filterset_class.base_filters):
+            return self._filtered_list(request, *args, **kwargs)
+
+        return menu_snapshot_response()
+
     @cache_response(
         lambda self, request, *args, **kwargs:
-        f"menu_{request.get_full_path()}"
+        f"menu_{request.get_full_path()}",
+        group=MENU_GROUP
     )
-    def list(self, request, *args, **kwargs):
-
+    def _filtered_list(self, request, *args, **kwargs):
         qs = self.filter_queryset(self.get_queryset())
-        context = {'request': request}
-
-        categories_map = {}
-        seen_pairs = set()
-
-        for dish in qs:
-            for dc in dish.dishcategory.all():
-                category = dc.category
-
-                if not category.is_active:
-                    continue
-
-                slug = category.slug
-                pair_key = (slug, dish.article)
-
-                if pair_key in seen_pairs:
-                    continue
-                seen_pairs.add(pair_key)
-
-                if slug not in categories_map:
-                    category_translations = {}
-                    for tr in category.translations.all():
-                        category_translations[tr.language_code] = {
-                            k: v for k, v in {
-                                'name': getattr(tr, 'name', None),
-                                'description': getattr(tr, 'description', None),
-                                'messenger_name': getattr(tr, 'messenger_name', None),
-                            }.items() if v is not None
-                        }
-                        category_translations[tr.language_code].pop('messenger_name', None)
-
-                    categories_map[slug] = {
-                        'slug': slug,
-                        'translations': category_translations,
-                        'articles': [],
-                        'priority': category.priority,
-                    }
-
-                categories_map[slug]['articles'].append({
-                    'article': dish.article,
-                    'dish_priority': dc.dish_priority if dc.dish_priority is not None else 999999
-                })
-
-        categories = list(categories_map.values())
-
-        categories.sort(
-            key=lambda item: item['priority'] if item['priority'] is not None else 999999
-        )
-
-        for category in categories:
-            category['articles'] = [
-                item['article']
-                for item in sorted(category['articles'], key=lambda x: x['dish_priority'])
-            ]
-
-        # menu_list = текущий /menu
-        unique_qs = []
-        seen_ids = set()
-        for dish in qs:
-            if dish.id not in seen_ids:
-                unique_qs.append(dish)
-                seen_ids.add(dish.id)
-
-        menu_list = srlz.DishMenuSerializer(
-            unique_qs,
-            many=True,
-            context=context
-        ).data
-
-        response_data = {
-            'categories': categories,
-            'menu_list': menu_list,
-        }
-        # cache.set(cache_key, response_data, settings.CACHE_TIME)
+        # без request, как и снапшот: URL картинок — от MEDIA_URL
+        response_data = build_menu_payload(qs)
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -739,7 +662,8 @@ class TakeawayOrderViewSet(mixins.CreateModelMixin,
         #     return srlz.BaseOrderSerializer
 
     @cache_response(
-    lambda self, request, *args, **kwargs: "create_order_takeaway_conditions"
+    lambda self, request, *args, **kwargs: TAKEAWAY_CONDITIONS_CACHE_KEY,
+    group=ORDERS_CONDITIONS_GROUP
     )
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -860,7 +784,8 @@ class DeliveryOrderViewSet(mixins.CreateModelMixin,
         #     return srlz.BaseOrderSerializer
 
     @cache_response(
-    lambda self, request, *args, **kwargs: "create_order_delivery_conditions"
+    lambda self, request, *args, **kwargs: DELIVERY_CONDITIONS_CACHE_KEY,
+    group=ORDERS_CONDITIONS_GROUP
     )
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -1195,6 +1120,40 @@ def calculate_delivery(request):
             })
 
 
+class CalculateDeliveryBulkAPIView(APIView):
+    """
+    Пакетный расчёт зоны и стоимости доставки для админки/операторов.
+    POST {"city": "Beograd", "delivery": 1,
+          "points": [{"lat": 44.8, "lon": 20.4, "amount": 2500}, ...]}
+    Все точки проверяются одним проходом по индексу зон города,
+    ответ — в порядке точек запроса.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = srlz.DeliveryCalculateBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        logger.info(f'/calculate_delivery_bulk/ '
+                    f'city: {data["city"]} points: {len(data["points"])} '
+                    f'USER:{request.user}')
+
+        points = [(point['lat'], point['lon'], point['amount'])
+                  for point in data['points']]
+        resolved = get_delivery_cost_zone_bulk(
+            data['city'], data['delivery'], points,
+            free_delivery=data['free_delivery'])
+
+        results = []
+        for delivery_cost, delivery_zone in resolved:
+            results.append({
+                'zone_id': delivery_zone.id if delivery_zone else None,
+                'zone': delivery_zone.name if delivery_zone else None,
+                'cost': delivery_cost,
+            })
+        return Response({'results': results})
+
+
 @method_decorator(staff_member_required, name='dispatch')
 class GetGoogleAPIKeyAPIView(APIView):
     permission_classes = [AllowAny]
@@ -1252,43 +1211,34 @@ def get_dish_price(request):
 @csrf_exempt
 @require_POST
 def save_bot_order(request):
-    if request.method == 'POST':
-        request_body = request.body
-        decoded_string = request_body.decode('utf-8')
-        logger.info(f'/save_bot_order/ REQUEST: {decoded_string}')
-
-        # Получаем данные из POST запроса
-        logger.info(f'/save_bot_order/ REQUEST: {request.POST}')
-
-        bot = get_bot(data=request.POST)
-        id = request.POST.get("id")
-        status = get_status_tmbot(request.POST.get("statusName"))
-        order = Order.objects.filter(source='3',
-                                     city=bot.city,
-                                     source_id=id).first()
-
-        if order:
-            if status is None or status == order.status:
-                logger.info(f'Bot order #{order.source_id}/ '
-                            'status changed in bot, but not in ORM.')
-                return JsonResponse({}, status=200)
-
-            order.status = status
-            order.save()
-            logger.info(f'Bot order #{order.source_id}/ '
-                        f'ORM order #{order.id} '
-                        f'updated status {order.status}.')
-            return JsonResponse({}, status=200)
-
-        context = {'extra_kwargs': {'bot': bot},
-                   'request': request}
-        serializer = srlz.BotOrderSerializer(data=request.POST,
-                                             context=context)
-        serializer.is_valid()
-        return JsonResponse({}, status=201)
-
-    logger.error(f"Bot order #{request} isn't saved. ",
-                 "Request method is not 'POST'")
+    """
+    Вебхук Botobot: новый заказ из бота или смена его статуса.
+    Payload пишется в BotOrderInbox, ответ 202 — сразу; заказ создаёт
+    или обновляет process_bot_order_inbox_task (очередь orders).
+    Повтор того же вебхука новой записи и таски не создаёт.
+    """
+    data = request.POST.dict()
+    logger.info(f'/save_bot_order/ REQUEST: {data}')
+
+    bot = get_bot_by_source_id(data.get("shop[id]"))
+    if bot is None:
+        logger.error(f"Bot order #{data.get('id')} isn't saved: "
+                     f"unknown shop {data.get('shop[id]')}.")
+        return JsonResponse({'error': 'Unknown shop'}, status=400)
+
+    if not data.get("id"):
+        logger.error("Bot order isn't saved: no order id.")
+        return JsonResponse({'error': 'Order ID is not provided'},
+                            status=400)
+
+    event, created = BotOrderInbox.receive(bot, data)
+    if created:
+        transaction.on_commit(
+            lambda: process_bot_order_inbox_task.delay(event.id))
+    else:
+        logger.info(f'Bot order #{event.source_id}: repeated webhook, '
+                    f'event #{event.id} is {event.state}.')
+    return JsonResponse({}, status=202)
 
 
 class TelegramAuthView(APIView):
@@ -1365,7 +1315,7 @@ class TelegramAuthView(APIView):
                 msngr.save()
 
             # Записываем последний логин через бота
-            bot = OrdersBot.objects.filter(city=city, is_active=True).first()
+            bot = get_bot_by_city(city, active_only=True)
             if bot:
                 MessengerAccountBot.objects.filter(
                     messenger_account=msngr,
@@ -1643,7 +1593,8 @@ class BannerViewSet(viewsets.ReadOnlyModelViewSet):
         return True
 
     @get_swagger_schema("banners_list")
-    @cache_response(lambda self, request, *args, **kwargs: "banners")
+    @cache_response(lambda self, request, *args, **kwargs: BANNERS_CACHE_KEY,
+                    group=BANNERS_GROUP)
     def list(self, request, *args, **kwargs):
         banners = list(self.get_queryset())
 
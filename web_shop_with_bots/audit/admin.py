@@ -1,5 +1,12 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
-from .models import AuditLog
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
+from .models import AuditLog, AuditLogArchive
 # from .forms import AuditLogForm
 from rangefilter.filters import (
     DateTimeRangeFilter
@@ -11,6 +18,49 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.admin import SimpleListFilter
 
 
+def _estimate_count(queryset):
+    """
+    Оценка числа строк от планировщика Postgres: без фильтров —
+    pg_class.reltuples, с фильтрами — Plan Rows из EXPLAIN.
+    None — оценки нет (не Postgres, таблица ещё не анализировалась).
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Точный COUNT(*) по журналу — самый медленный запрос changelist'а.
+    Если по оценке строк больше AUDIT_EXACT_COUNT_LIMIT, показываем
+    оценку; меньше — считаем точно, это уже дёшево.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = _estimate_count(self.object_list)
+        if estimate is None or estimate < settings.AUDIT_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
 class ContentTypeFilter(admin.SimpleListFilter):
     title = 'Тип объекта'
     parameter_name = 'target_content_type'
@@ -66,6 +116,9 @@ class AuditLogAdmin(admin.ModelAdmin):
     # form = AuditLogForm
     change_form_template = 'auditlog/change_form.html'
     list_per_page = 15
+    paginator = EstimatedCountPaginator
+    # иначе при фильтре changelist считает ещё и всю таблицу
+    show_full_result_count = False
     list_filter = (('created', DateTimeRangeFilter),
                    ActionFilter, 'status', 'ip_is_routable',
                    'method', 'endpoint', 'is_admin',
@@ -93,3 +146,24 @@ class AuditLogAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(AuditLogArchive)
+class AuditLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created', 'status', 'method', 'endpoint',
+                    'user_id', 'ip', 'short_details')
+    search_fields = ('endpoint', 'ip', 'target_object_id')
+    list_per_page = 15
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter = (('created', DateTimeRangeFilter), 'status', 'method',
+                   'is_admin')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
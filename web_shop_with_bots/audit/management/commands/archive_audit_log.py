@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from audit.models import AuditLog, AuditLogArchive
+from audit.retention import (archive_audit_log, archive_threshold,
+                             purge_audit_archive, purge_threshold)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит записи журнала старше AUDIT_RETENTION_DAYS в архив "
+        "(AuditLogArchive) и удаляет архив старше "
+        "AUDIT_ARCHIVE_RETENTION_DAYS. --dry-run — только посчитать.\n"
+        "Пример: python manage.py archive_audit_log --days 30 "
+        "--batch-size 5000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int,
+                            help="срок хранения в журнале, дней")
+        parser.add_argument("--archive-days", type=int,
+                            help="срок хранения архива, дней (0 — бессрочно)")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--max-batches", type=int)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        archive_before = (now - timedelta(days=options["days"])
+                          if options["days"] is not None
+                          else archive_threshold())
+        if options["archive_days"] is not None:
+            purge_before = (now - timedelta(days=options["archive_days"])
+                            if options["archive_days"] else None)
+        else:
+            purge_before = purge_threshold()
+
+        if options["dry_run"]:
+            to_archive = AuditLog.objects.filter(
+                created__lt=archive_before).count()
+            to_purge = (AuditLogArchive.objects.filter(
+                created__lt=purge_before).count() if purge_before else 0)
+            self.stdout.write(f"  в архив:  {to_archive} "
+                              f"(старше {archive_before:%d.%m.%Y})")
+            self.stdout.write(f"  удалить:  {to_purge}")
+            return
+
+        batch = {"batch_size": options["batch_size"],
+                 "max_batches": options["max_batches"]}
+        moved = archive_audit_log(before=archive_before, **batch)
+        purged = (purge_audit_archive(before=purge_before, **batch)
+                  if purge_before else 0)
+        self.stdout.write(self.style.SUCCESS(
+            f"Перенесено в архив: {moved}, удалено из архива: {purged}"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from audit.writer import get_audit_stats, reset_audit_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Счётчики отложенной записи журнала (audit/writer.py): "
+        "поставлено в очередь, отсеяно sampling'ом, отброшено при "
+        "переполнении очереди, записано, потеряно при ошибке записи.\n"
+        "Пример: python manage.py audit_stats --reset-stats"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset-stats", action="store_true",
+                            help="обнулить счётчики после вывода")
+
+    def handle(self, *args, **options):
+        stats = get_audit_stats()
+        self.stdout.write(f"  в очередь:        {stats['queued']}")
+        self.stdout.write(f"  отсеяно sampling: {stats['sampled_out']}")
+        self.stdout.write(f"  отброшено:        {stats['dropped']}")
+        self.stdout.write(f"  записано:         {stats['written']}")
+        self.stdout.write(f"  потеряно:         {stats['failed']}")
+
+        if options["reset_stats"]:
+            reset_audit_stats()
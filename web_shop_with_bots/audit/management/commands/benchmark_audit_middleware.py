@@ -0,0 +1,109 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+
+from audit.models import AuditLog
+from audit.writer import AuditWriter
+from web_shop_with_bots.middlewares import AuditMiddleware
+
+import audit.writer as writer_module
+
+
+ENDPOINT = "/api/v1/benchmark-audit/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк AuditMiddleware: латентность запроса с синхронной "
+        "записью AuditLog (старый путь) и с отложенной пачечной записью, "
+        "затем время дозаписи очереди. --queue-size меньше --requests "
+        "показывает отбрасывание при переполнении. Записи бенчмарка "
+        "удаляются.\n"
+        "Пример: python manage.py benchmark_audit_middleware "
+        "--requests 2000 --with-user"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--queue-size", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--with-user", action="store_true",
+                            help="запросы от первого пользователя сайта")
+
+    def handle(self, *args, **options):
+        self.user = (get_user_model().objects.first()
+                     if options["with_user"] else None) or AnonymousUser()
+        self.factory = RequestFactory()
+        self.middleware = AuditMiddleware(self._view)
+
+        requests_count = options["requests"]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{requests_count} запросов, "
+            f"{'пользователь' if self.user.is_authenticated else 'аноним'}"))
+
+        try:
+            with override_settings(AUDIT_WRITE_BEHIND=False):
+                self._run("sync", requests_count)
+
+            writer = AuditWriter(queue_size=options["queue_size"],
+                                 batch_size=options["batch_size"],
+                                 flush_interval=1, background=False)
+            original = writer_module._writer
+            writer_module._writer = writer
+            try:
+                with override_settings(AUDIT_WRITE_BEHIND=True):
+                    self._run("write-behind", requests_count)
+                self._drain(writer)
+            finally:
+                writer_module._writer = original
+        finally:
+            AuditLog.objects.filter(endpoint=ENDPOINT).delete()
+
+    def _view(self, request):
+        return JsonResponse({
+            "city": "Beograd",
+            "items": [{"article": f"T{i:03}", "quantity": i, "price": 550}
+                      for i in range(20)],
+        })
+
+    def _request(self, index):
+        request = self.factory.post(
+            f"{ENDPOINT}?city=Beograd",
+            data={"cart": [{"article": "T001", "quantity": index}]},
+            content_type="application/json",
+        )
+        request.user = self.user
+        return request
+
+    def _run(self, label, requests_count):
+        timings = []
+        start = time.perf_counter()
+        for index in range(requests_count):
+            request = self._request(index)
+            begin = time.perf_counter()
+            self.middleware(request)
+            timings.append((time.perf_counter() - begin) * 1000)
+        elapsed = time.perf_counter() - start
+        self._report(label, timings, elapsed)
+
+    def _drain(self, writer):
+        pending = writer.pending()
+        dropped = writer._stats["dropped"]
+        start = time.perf_counter()
+        written = writer.flush()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {'flush':<13} pending={pending:<6} written={written:<6} "
+            f"dropped={dropped:<6} total={elapsed * 1000:8.1f} ms")
+
+    def _report(self, label, timings, elapsed):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"  {label:<13} p50={statistics.median(timings):8.3f} ms  "
+            f"p99={p99:8.3f} ms  {len(timings) / elapsed:8.1f} req/s")
@@ -0,0 +1,37 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0009_alter_auditlog_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(db_index=True)),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('base_profile_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=3, null=True)),
+                ('action', models.CharField(blank=True, max_length=255, null=True)),
+                ('method', models.CharField(blank=True, max_length=10, null=True)),
+                ('endpoint', models.CharField(blank=True, max_length=500, null=True)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('ip_is_routable', models.BooleanField(blank=True, null=True)),
+                ('is_admin', models.BooleanField(blank=True, null=True)),
+                ('target_content_type_id', models.IntegerField(blank=True, null=True)),
+                ('target_object_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('details', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Архив активности',
+                'verbose_name_plural': 'Архив активности',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
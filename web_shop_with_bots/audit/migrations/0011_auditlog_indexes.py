@@ -0,0 +1,32 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # таблица журнала большая: индексы строятся без блокировки записи
+    atomic = False
+
+    dependencies = [
+        ('audit', '0010_auditlogarchive'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['-created', '-id'], name='auditlog_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['endpoint', 'method', 'status', '-created'], name='auditlog_endpoint_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['status', '-created'], name='auditlog_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['action', '-created'], name='auditlog_action_idx'),
+        ),
+    ]
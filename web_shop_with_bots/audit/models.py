@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from users.models import BaseProfile
 from django.contrib.contenttypes.models import ContentType
@@ -8,7 +9,9 @@ User = get_user_model()
 
 
 class AuditLog(models.Model):
-    created = models.DateTimeField(auto_now_add=True)
+    # время запроса, а не записи: журнал пишется пачками с задержкой
+    # (audit/writer.py), поэтому не auto_now_add
+    created = models.DateTimeField(default=timezone.now, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL,
                              null=True, blank=True)
     base_profile = models.ForeignKey(BaseProfile,
@@ -49,3 +52,49 @@ class AuditLog(models.Model):
         verbose_name = 'Активность пользователей'
         verbose_name_plural = 'Активности пользователей'
         ordering = ('-created',)
+        # под сортировку changelist'а (-created, -pk) и его фильтры
+        indexes = [
+            models.Index(fields=['-created', '-id'],
+                         name='auditlog_created_idx'),
+            models.Index(fields=['endpoint', 'method', 'status', '-created'],
+                         name='auditlog_endpoint_idx'),
+            models.Index(fields=['status', '-created'],
+                         name='auditlog_status_idx'),
+            models.Index(fields=['action', '-created'],
+                         name='auditlog_action_idx'),
+        ]
+
+
+class AuditLogArchive(models.Model):
+    """
+    Записи AuditLog старше AUDIT_RETENTION_DAYS (audit/retention.py).
+    id — исходный id записи. Связи хранятся голыми id без внешних
+    ключей: пользователя можно удалить, не трогая архив.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created = models.DateTimeField(db_index=True)
+    user_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    base_profile_id = models.BigIntegerField(null=True, blank=True,
+                                             db_index=True)
+    status = models.CharField(max_length=3, null=True, blank=True)
+    action = models.CharField(max_length=255, null=True, blank=True)
+    method = models.CharField(max_length=10, null=True, blank=True)
+    endpoint = models.CharField(max_length=500, null=True, blank=True)
+    ip = models.GenericIPAddressField(blank=True, null=True)
+    ip_is_routable = models.BooleanField(blank=True, null=True)
+    is_admin = models.BooleanField(blank=True, null=True)
+    target_content_type_id = models.IntegerField(null=True, blank=True)
+    target_object_id = models.CharField(max_length=64, null=True, blank=True)
+    details = models.TextField()
+
+    def short_details(self):
+        return self.details[:300] + ('...' if len(self.details) > 300 else '')
+    short_details.short_description = 'Details (short)'
+
+    def __str__(self):
+        return f'{self.created} - {self.action} by {self.user_id}'
+
+    class Meta:
+        verbose_name = 'Архив активности'
+        verbose_name_plural = 'Архив активности'
+        ordering = ('-created',)
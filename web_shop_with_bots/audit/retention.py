@@ -0,0 +1,92 @@
+"""
+retention.py — срок хранения журнала.
+
+AuditLog растёт бесконечно, а changelist сортирует и считает всю
+таблицу. Записи старше AUDIT_RETENTION_DAYS переносятся в
+AuditLogArchive, архив старше AUDIT_ARCHIVE_RETENTION_DAYS удаляется
+(0 — хранить бессрочно). Переносится пачками по
+AUDIT_ARCHIVE_BATCH_SIZE: каждая пачка — своя короткая транзакция,
+строки берутся с skip_locked, поэтому два одновременных запуска
+не мешают друг другу.
+
+Запуск — manage.py archive_audit_log или периодическая
+audit.tasks.archive_audit_log_task (django-celery-beat).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from audit.models import AuditLog, AuditLogArchive
+
+
+ARCHIVE_FIELDS = (
+    'id', 'created', 'user_id', 'base_profile_id', 'status', 'action',
+    'method', 'endpoint', 'ip', 'ip_is_routable', 'is_admin',
+    'target_content_type_id', 'target_object_id', 'details',
+)
+
+
+def archive_threshold():
+    return timezone.now() - timedelta(days=settings.AUDIT_RETENTION_DAYS)
+
+
+def purge_threshold():
+    days = settings.AUDIT_ARCHIVE_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days) if days else None
+
+
+def archive_audit_log(before=None, batch_size=None, max_batches=None):
+    """
+    Переносит записи AuditLog старше before в архив.
+    Возвращает число перенесённых записей.
+    """
+    before = before or archive_threshold()
+    batch_size = batch_size or settings.AUDIT_ARCHIVE_BATCH_SIZE
+
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                AuditLog.objects
+                .filter(created__lt=before)
+                .order_by('created', 'id')
+                .select_for_update(skip_locked=True)
+                .values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            AuditLogArchive.objects.bulk_create(
+                [AuditLogArchive(**row) for row in rows])
+            AuditLog.objects.filter(
+                id__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+        batches += 1
+    return moved
+
+
+def purge_audit_archive(before=None, batch_size=None, max_batches=None):
+    """
+    Удаляет архив старше before (по умолчанию — по
+    AUDIT_ARCHIVE_RETENTION_DAYS). Возвращает число удалённых записей.
+    """
+    before = before or purge_threshold()
+    if before is None:
+        return 0
+    batch_size = batch_size or settings.AUDIT_ARCHIVE_BATCH_SIZE
+
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(AuditLogArchive.objects
+                   .filter(created__lt=before)
+                   .order_by('created')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += AuditLogArchive.objects.filter(id__in=ids).delete()[0]
+        batches += 1
+    return deleted
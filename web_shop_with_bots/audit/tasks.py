@@ -0,0 +1,23 @@
+import logging
+
+from celery import shared_task
+
+from audit.retention import archive_audit_log, purge_audit_archive
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    queue="orders",
+    bind=True)
+def archive_audit_log_task(self, max_batches=50):
+    """
+    Переносит старые записи журнала в архив и чистит архив по сроку
+    хранения. Запускается периодически через django-celery-beat;
+    max_batches ограничивает один запуск — остаток перенесёт следующий.
+    """
+    moved = archive_audit_log(max_batches=max_batches)
+    purged = purge_audit_archive(max_batches=max_batches)
+    if moved or purged:
+        logger.info(f"Audit log: archived {moved}, purged {purged}.")
+    return moved, purged
@@ -0,0 +1,180 @@
+"""
+Тесты отложенной записи журнала (audit/writer.py):
+
+- внутри транзакции AuditMiddleware пишет AuditLog сразу, как раньше;
+- вне транзакции запись ждёт в очереди и пишется пачкой, details
+  собирается при записи, base_profile добирается одним запросом;
+- переполненная очередь отбрасывает записи и считает их;
+- AUDIT_SAMPLING — по самому длинному префиксу, ошибки пишутся всегда.
+
+AuditRetentionTests — перенос старых записей в AuditLogArchive
+(audit/retention.py), чистка архива, оценка числа строк в changelist.
+"""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from audit.admin import EstimatedCountPaginator
+from audit.models import AuditLog, AuditLogArchive
+from audit.retention import archive_audit_log, purge_audit_archive
+from audit.writer import (AuditEntry, AuditWriter, get_audit_stats,
+                          reset_audit_stats, sample_rate)
+from tm_bot.models import OrdersBot
+from users.models import BaseProfile
+
+
+User = get_user_model()
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                      "LOCATION": "audit-tests"}}
+
+
+@override_settings(CACHES=LOCMEM)
+class AuditWriterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.writer = AuditWriter(queue_size=3, batch_size=2,
+                                  flush_interval=1, background=False)
+        patcher = patch("audit.writer._writer", self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _entry(self, **fields):
+        fields.setdefault("action", "Request")
+        fields.setdefault("status", 200)
+        fields.setdefault("endpoint", "/api/v1/test/")
+        fields.setdefault("method", "GET")
+        return AuditEntry(details="ok", **fields)
+
+    def _write_behind(self):
+        # TestCase держит транзакцию — в ней писатель пишет сразу
+        return patch("audit.writer._in_transaction", return_value=False)
+
+    def test_request_in_transaction_is_written_immediately(self):
+        response = self.client.get("/api/v1/audit-missing/?city=Beograd")
+
+        self.assertEqual(response.status_code, 404)
+        log = AuditLog.objects.get(endpoint="/api/v1/audit-missing/")
+        self.assertEqual(log.action, "Error")
+        self.assertIn("city: Beograd", log.details)
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_request_is_queued_and_flushed_in_batches(self):
+        with self._write_behind():
+            self.client.get("/api/v1/audit-missing/?city=Beograd")
+            self.client.get("/api/v1/audit-missing/?city=NoviSad")
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(self.writer.pending(), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.writer.flush(), 2)
+
+        details = AuditLog.objects.values_list("details", flat=True)
+        self.assertEqual(sorted("NoviSad" in d for d in details),
+                         [False, True])
+        self.assertEqual(get_audit_stats()["written"], 2)
+
+    def test_base_profile_is_resolved_on_flush(self):
+        OrdersBot.objects.create(msngr_type="tm", name="Test bot",
+                                 city="Beograd", source_id="test-source",
+                                 admin_id="123456")
+        user = User.objects.create_user(
+            email="audit@test.ru", password="12345678aA!",
+            first_name="Петя", last_name="Петин", phone="+79055969160",
+            web_language="en", city="Beograd")
+        profile = BaseProfile.objects.get(web_account=user)
+
+        self.writer.put(self._entry(user=user))
+        self.writer.put(self._entry())
+        self.writer.flush()
+
+        self.assertEqual(
+            set(AuditLog.objects.values_list("user_id", "base_profile_id")),
+            {(None, None), (user.id, profile.id)})
+
+    def test_full_queue_drops_entries(self):
+        reset_audit_stats()
+        accepted = [self.writer.put(self._entry()) for _ in range(5)]
+
+        self.assertEqual(accepted, [True, True, True, False, False])
+        self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        stats = get_audit_stats()
+        self.assertEqual((stats["queued"], stats["dropped"]), (3, 2))
+
+    @override_settings(AUDIT_SAMPLING={"/api/v1/": 0, "/api/v1/orders/": 1})
+    def test_sampling_by_longest_prefix(self):
+        self.assertEqual(sample_rate("/api/v1/menu/"), 0)
+        self.assertEqual(sample_rate("/api/v1/orders/5/"), 1)
+        self.assertEqual(sample_rate("/admin/"), 1.0)
+
+    @override_settings(AUDIT_SAMPLING={"/api/v1/": 0})
+    def test_errors_are_not_sampled_out(self):
+        self.client.get("/api/v1/audit-missing/")
+
+        self.assertEqual(AuditLog.objects.filter(action="Error").count(), 1)
+
+
+class AuditRetentionTests(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        self.old = [
+            AuditLog.objects.create(created=now - timedelta(days=days),
+                                    action="Request", status=200,
+                                    endpoint="/api/v1/test/",
+                                    details=f"{days} days")
+            for days in (400, 200, 100)
+        ]
+        self.fresh = AuditLog.objects.create(action="Request", status=200,
+                                             details="today")
+
+    @override_settings(AUDIT_RETENTION_DAYS=90)
+    def test_old_entries_are_moved_to_archive(self):
+        moved = archive_audit_log(batch_size=2)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(list(AuditLog.objects.all()), [self.fresh])
+        archived = AuditLogArchive.objects.get(id=self.old[0].id)
+        self.assertEqual(archived.details, "400 days")
+        self.assertEqual(archived.endpoint, "/api/v1/test/")
+        self.assertEqual(archived.created, self.old[0].created)
+
+    @override_settings(AUDIT_RETENTION_DAYS=90)
+    def test_max_batches_limits_one_run(self):
+        self.assertEqual(archive_audit_log(batch_size=2, max_batches=1), 2)
+        # самые старые уходят первыми
+        self.assertEqual(
+            set(AuditLogArchive.objects.values_list("id", flat=True)),
+            {self.old[0].id, self.old[1].id})
+
+    @override_settings(AUDIT_RETENTION_DAYS=90,
+                       AUDIT_ARCHIVE_RETENTION_DAYS=365)
+    def test_archive_is_purged_after_its_retention(self):
+        archive_audit_log()
+
+        self.assertEqual(purge_audit_archive(), 1)
+        self.assertFalse(AuditLogArchive.objects.filter(
+            id=self.old[0].id).exists())
+
+        with override_settings(AUDIT_ARCHIVE_RETENTION_DAYS=0):
+            self.assertEqual(purge_audit_archive(), 0)
+
+    @override_settings(AUDIT_EXACT_COUNT_LIMIT=1000)
+    def test_changelist_count_uses_estimate_for_large_tables(self):
+        queryset = AuditLog.objects.all()
+
+        with patch("audit.admin._estimate_count", return_value=10 ** 6), \
+                self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(queryset, 15).count,
+                             10 ** 6)
+
+        with patch("audit.admin._estimate_count", return_value=12):
+            self.assertEqual(EstimatedCountPaginator(queryset, 15).count, 4)
@@ -0,0 +1,304 @@
+"""
+writer.py — отложенная пачечная запись AuditLog.
+
+AuditMiddleware делал AuditLog.objects.create на каждый запрос:
+INSERT, запрос base_profile пользователя и форматирование тела и
+ответа в JSON с отступами — всё это входило в латентность ответа.
+Здесь:
+
+- middleware собирает AuditEntry — сырые данные записи; details
+  форматируется лениво, уже при записи;
+- запись кладётся в ограниченную очередь процесса, фоновый поток
+  раз в AUDIT_FLUSH_INTERVAL секунд (или как только накопилось
+  AUDIT_BATCH_SIZE записей) пишет пачку одним bulk_create,
+  base_profile пользователей пачки добирается одним запросом;
+- очередь на AUDIT_QUEUE_SIZE записей: если БД не успевает, новые
+  записи отбрасываются и считаются (dropped) — запрос не ждёт;
+- AUDIT_SAMPLING — доля успешных запросов, попадающих в журнал,
+  по префиксу пути; ошибки пишутся всегда;
+- внутри незакоммиченной транзакции (ATOMIC_REQUESTS, TestCase)
+  запись идёт синхронно, как раньше: соединение фонового потока не
+  видит незакоммиченных пользователей и объектов, на которые она
+  ссылается; AUDIT_WRITE_BEHIND=False — синхронно всегда.
+
+Счётчики (queued / sampled_out / dropped / written / failed) копятся
+в процессе и сбрасываются в кэш после каждой записи пачки
+(utils/stats.py) — см.
+get_audit_stats и manage.py audit_stats. При выходе процесса очередь
+дописывается (atexit); после fork поток и очередь заводятся заново.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import (DatabaseError, close_old_connections, connection,
+                       transaction)
+from django.utils import timezone
+
+from audit.models import AuditLog
+from users.models import BaseProfile
+from utils.stats import BatchedCounter
+
+
+logger = logging.getLogger(__name__)
+
+AUDIT_STATS_KEY = 'audit_stats:{event}'
+AUDIT_EVENTS = ('queued', 'sampled_out', 'dropped', 'written', 'failed')
+
+
+class AuditEntry:
+    """
+    Запись журнала до сохранения. details — строка или функция без
+    аргументов, которая её соберёт.
+    """
+
+    def __init__(self, details, user=None, **fields):
+        fields.setdefault('created', timezone.now())
+        self.user = user
+        self.user_id = user.pk if user is not None else None
+        self.details = details
+        self.fields = fields
+
+    def render_details(self):
+        return self.details() if callable(self.details) else self.details
+
+    def create(self):
+        """Синхронная запись — старый путь."""
+        base_profile = (getattr(self.user, 'base_profile', None)
+                        if self.user is not None else None)
+        return AuditLog.objects.create(
+            user=self.user,
+            base_profile=base_profile,
+            details=self.render_details(),
+            **self.fields,
+        )
+
+    def to_model(self, base_profile_id=None):
+        return AuditLog(
+            user_id=self.user_id,
+            base_profile_id=base_profile_id,
+            details=self.render_details(),
+            **self.fields,
+        )
+
+
+# ------------------------------ СЧЁТЧИКИ ------------------------------
+
+_stats = BatchedCounter(AUDIT_STATS_KEY, AUDIT_EVENTS)
+
+
+def get_audit_stats():
+    return _stats.get()
+
+
+def reset_audit_stats():
+    _stats.reset()
+
+
+# ------------------------------ SAMPLING ------------------------------
+
+def sample_rate(path):
+    """Доля из AUDIT_SAMPLING по самому длинному совпавшему префиксу."""
+    rate = 1.0
+    matched = ''
+    for prefix, prefix_rate in settings.AUDIT_SAMPLING.items():
+        if path.startswith(prefix) and len(prefix) > len(matched):
+            matched, rate = prefix, prefix_rate
+    return rate
+
+
+def is_sampled(path):
+    rate = sample_rate(path)
+    if rate >= 1:
+        return True
+    if rate > 0 and random.random() < rate:
+        return True
+    get_audit_writer().count('sampled_out')
+    return False
+
+
+# ------------------------------- ПИСАТЕЛЬ ------------------------------
+
+class AuditWriter:
+    """
+    Очередь записей и фоновый поток, который пишет их пачками.
+    background=False — без потока: пачки пишет только flush()
+    (тесты, бенчмарк).
+    """
+
+    def __init__(self, queue_size, batch_size, flush_interval,
+                 background=True):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = Counter()
+        self._thread = None
+        self._pid = None
+
+    def count(self, event, amount=1):
+        with self._stats_lock:
+            self._stats[event] += amount
+
+    def put(self, entry):
+        """Ставит запись в очередь; False — очередь полна, запись отброшена."""
+        if self.background:
+            self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.count('dropped')
+            return False
+        self.count('queued')
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Пишет всё, что накопилось в очереди. Возвращает число записей."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    break
+                written += self._write(batch)
+        self._push_stats()
+        return written
+
+    def close(self):
+        self._wakeup.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"AuditWriter: не удалось дописать журнал: {e}")
+
+    # --- фоновый поток ---
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # fork: очередь родителя досталась копией, её пишет родитель
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._stats = Counter()
+            self._thread = threading.Thread(
+                target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                logger.error(f"AuditWriter: ошибка записи журнала: {e}")
+            finally:
+                close_old_connections()
+
+    # --- запись пачки ---
+
+    def _take(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, entries):
+        user_ids = {entry.user_id for entry in entries if entry.user_id}
+        profiles = dict(
+            BaseProfile.objects
+            .filter(web_account_id__in=user_ids)
+            .values_list('web_account_id', 'id')
+        ) if user_ids else {}
+
+        logs = []
+        for entry in entries:
+            try:
+                logs.append(entry.to_model(profiles.get(entry.user_id)))
+            except Exception as e:
+                self.count('failed')
+                logger.error(f"AuditWriter: не удалось собрать запись: {e}")
+
+        try:
+            AuditLog.objects.bulk_create(logs)
+            self.count('written', len(logs))
+            return len(logs)
+        except DatabaseError as e:
+            logger.warning(f"AuditWriter: пачка не записалась ({e}), "
+                           f"пишем по одной")
+
+        # одна битая запись (например, пользователь удалён, пока она
+        # ждала в очереди) не должна терять всю пачку
+        written = 0
+        for log in logs:
+            try:
+                with transaction.atomic():
+                    log.save()
+                written += 1
+            except DatabaseError as e:
+                self.count('failed')
+                logger.error(f"AuditWriter: запись журнала потеряна: {e}")
+        self.count('written', written)
+        return written
+
+    def _push_stats(self):
+        with self._stats_lock:
+            stats, self._stats = self._stats, Counter()
+        if stats['dropped']:
+            logger.warning(f"AuditWriter: очередь полна, отброшено "
+                           f"{stats['dropped']} записей журнала")
+        _stats.push(stats)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    queue_size=settings.AUDIT_QUEUE_SIZE,
+                    batch_size=settings.AUDIT_BATCH_SIZE,
+                    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def submit(entry):
+    """Пишет запись журнала — отложенно или, если нельзя, сразу."""
+    if not settings.AUDIT_WRITE_BEHIND or _in_transaction():
+        return entry.create()
+    get_audit_writer().put(entry)
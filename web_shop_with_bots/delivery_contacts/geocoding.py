@@ -0,0 +1,290 @@
+"""
+geocoding.py — кэш геокодирования Google для receive_responce_from_google.
+
+Запрос адреса проходит уровни по очереди:
+1. redis (django cache) — горячий уровень, GEOCODE_CACHE_TIMEOUT;
+2. таблица GeocodeCacheEntry — холодный уровень, GEOCODE_DB_TIMEOUT,
+   переживает сброс redis; попадание сюда прогревает redis;
+3. Google Geocoding API — только при промахе обоих уровней.
+
+Ключ — нормализованная пара (адрес, город): адрес дополняется городом
+так же, как для запроса в Google (check_address_contains_city),
+приводится к нижнему регистру, пробелы и запятые схлопываются.
+"Knez Mihailova 5" и " knez  mihailova 5 ,Beograd" — один ключ.
+
+Ошибки redis и БД не ломают геокодирование: уровень пропускается,
+запрос идёт на следующий (в худшем случае — в Google).
+
+Кэшируются только OK и ZERO_RESULTS (ZERO_RESULTS — с коротким
+GEOCODE_NEGATIVE_TIMEOUT: адрес могли опечатать, а могли и не знать
+в Google). Лимиты, отказ в доступе и сетевые ошибки не кэшируются.
+
+Запросы в Google идут через один requests.Session на процесс
+(пул соединений, keep-alive) с таймаутами GOOGLE_GEOCODING_TIMEOUT.
+Транспорт подменяется через set_geocoder()/use_geocoder() —
+в тестах это StubGeocoder без сети.
+
+Счётчики (get_geocode_stats) общие для всех процессов: hot_hit,
+cold_hit, miss, google_call, error и производные hit_rate,
+google_calls_saved; копятся в процессе и сбрасываются в кэш пачкой
+(utils/stats.py).
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from utils.stats import BatchedCounter
+
+from .models import GeocodeCacheEntry
+from .utils import check_address_contains_city
+
+
+logger = logging.getLogger(__name__)
+
+
+GOOGLE_GEOCODE_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+
+GEOCODE_CACHE_KEY = 'geocode:{key}'
+GEOCODE_STATS_KEY = 'geocode_stats:{event}'
+GEOCODE_EVENTS = ('hot_hit', 'cold_hit', 'miss', 'google_call', 'error')
+
+NEGATIVE_STATUSES = ('ZERO_RESULTS',)
+CACHEABLE_STATUSES = ('OK',) + NEGATIVE_STATUSES
+
+
+# ------------------------------ ТРАНСПОРТ ------------------------------
+
+class GoogleGeocoder:
+    """Запросы к Google Geocoding API через общий пул соединений."""
+
+    def __init__(self, api_key=None, timeout=None, pool_size=10):
+        self.api_key = api_key or settings.GOOGLE_API_KEY
+        self.timeout = timeout or settings.GOOGLE_GEOCODING_TIMEOUT
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1,
+                                                   pool_maxsize=pool_size))
+
+    def geocode(self, address, city):
+        params = {
+            'key': self.api_key,
+            'address': address,
+            'region': 'rs',
+        }
+        # Добавляем компонентную фильтрацию, если город указан
+        if city:
+            params['components'] = f'locality:{city}|country:rs'
+
+        response = self.session.get(GOOGLE_GEOCODE_URL, params=params,
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class StubGeocoder:
+    """
+    Локальная заглушка вместо Google для тестов и разработки без ключа.
+    responses — {адрес запроса: ответ}; неизвестный адрес -> default
+    (по умолчанию ZERO_RESULTS). Все вызовы копятся в calls.
+    """
+
+    def __init__(self, responses=None, default=None):
+        self.responses = responses or {}
+        self.default = default or {'status': 'ZERO_RESULTS', 'results': []}
+        self.calls = []
+
+    def geocode(self, address, city):
+        self.calls.append((address, city))
+        return self.responses.get(address, self.default)
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = import_string(settings.GEOCODER_CLASS)()
+    return _geocoder
+
+
+def set_geocoder(geocoder):
+    """Подменяет транспорт, возвращает прежний (None — вернуть дефолтный)."""
+    global _geocoder
+    with _geocoder_lock:
+        previous, _geocoder = _geocoder, geocoder
+    return previous
+
+
+@contextmanager
+def use_geocoder(geocoder):
+    previous = set_geocoder(geocoder)
+    try:
+        yield geocoder
+    finally:
+        set_geocoder(previous)
+
+
+# ------------------------------- КЛЮЧИ --------------------------------
+
+def normalize_geocode_query(address, city):
+    """(нормализованный адрес с городом, город) — основа ключа кэша."""
+    normalized = check_address_contains_city(address, city).lower()
+    normalized = re.sub(r'\s*,\s*', ', ', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized).strip(' ,.')
+    return normalized, city or ''
+
+
+def _hash(normalized, city):
+    return hashlib.sha256(f'{city}|{normalized}'.encode()).hexdigest()
+
+
+def geocode_key(address, city):
+    return _hash(*normalize_geocode_query(address, city))
+
+
+# ------------------------------ СЧЁТЧИКИ ------------------------------
+
+_stats = BatchedCounter(GEOCODE_STATS_KEY, GEOCODE_EVENTS)
+
+
+def _record(event):
+    _stats.count(event)
+
+
+def get_geocode_stats():
+    stats = _stats.get()
+    hits = stats['hot_hit'] + stats['cold_hit']
+    lookups = hits + stats['miss']
+    stats['hit_rate'] = round(hits / lookups, 4) if lookups else None
+    stats['google_calls_saved'] = hits
+    return stats
+
+
+def reset_geocode_stats():
+    _stats.reset()
+
+
+# ------------------------------- УРОВНИ -------------------------------
+
+def _ttl(status):
+    if status in NEGATIVE_STATUSES:
+        return settings.GEOCODE_NEGATIVE_TIMEOUT, settings.GEOCODE_NEGATIVE_TIMEOUT
+    return settings.GEOCODE_CACHE_TIMEOUT, settings.GEOCODE_DB_TIMEOUT
+
+
+def _compact(data):
+    # из ответа используется только первый результат
+    return {'status': data['status'], 'results': data.get('results', [])[:1]}
+
+
+def _hot_get(key):
+    try:
+        return cache.get(GEOCODE_CACHE_KEY.format(key=key))
+    except Exception as e:
+        logger.error(f"geocode cache: ошибка чтения из redis: {e}")
+        return None
+
+
+def _hot_set(key, data, timeout):
+    try:
+        cache.set(GEOCODE_CACHE_KEY.format(key=key), data, timeout)
+    except Exception as e:
+        logger.error(f"geocode cache: ошибка записи в redis: {e}")
+
+
+def _cold_get(key):
+    try:
+        entry = (GeocodeCacheEntry.objects
+                 .filter(key=key, expires_at__gt=timezone.now())
+                 .first())
+    except DatabaseError as e:
+        logger.error(f"geocode cache: ошибка чтения из БД: {e}")
+        return None
+    return entry
+
+
+def _store(key, normalized, city, data):
+    status = data.get('status')
+    if status not in CACHEABLE_STATUSES:
+        return
+
+    hot_ttl, cold_ttl = _ttl(status)
+    compact = _compact(data)
+    _hot_set(key, compact, hot_ttl)
+
+    try:
+        # savepoint: сбой записи кэша не должен ронять внешнюю транзакцию
+        with transaction.atomic():
+            GeocodeCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    'address': normalized[:400],
+                    'city': city,
+                    'status': status,
+                    'response': compact,
+                    'expires_at': timezone.now() + timedelta(seconds=cold_ttl),
+                })
+    except DatabaseError as e:
+        logger.error(f"geocode cache: ошибка записи в БД: {e}")
+
+
+def geocode(address, city):
+    """
+    Ответ Google Geocoding (dict со status/results) для адреса
+    или None, если Google недоступен — как receive_responce_from_google.
+    """
+    normalized, city_key = normalize_geocode_query(address, city)
+    key = _hash(normalized, city_key)
+
+    data = _hot_get(key)
+    if data is not None:
+        _record('hot_hit')
+        logger.debug(f"geocode: redis hit '{address}', '{city}'")
+        return data
+
+    entry = _cold_get(key)
+    if entry is not None:
+        _record('cold_hit')
+        hot_ttl, _ = _ttl(entry.status)
+        remaining = int((entry.expires_at - timezone.now()).total_seconds())
+        _hot_set(key, entry.response, max(1, min(hot_ttl, remaining)))
+        logger.debug(f"geocode: db hit '{address}', '{city}'")
+        return entry.response
+
+    _record('miss')
+    final_address = check_address_contains_city(address, city)
+    logger.debug(f"Отправка запроса к Google API: '{final_address}', город '{city}'")
+
+    try:
+        data = get_geocoder().geocode(final_address, city)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        _record('error')
+        logger.error(f"Ошибка при запросе к API Google Maps: {e}")
+        return None
+    _record('google_call')
+
+    logger.debug(f"Получен ответ от Google API: статус '{data.get('status')}', response: {data}")
+    _store(key, normalized, city_key, data)
+    return data
+
+
+def clear_expired_geocode_entries():
+    deleted, _ = (GeocodeCacheEntry.objects
+                  .filter(expires_at__lte=timezone.now())
+                  .delete())
+    return deleted
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from delivery_contacts.models import DeliveryZone
+from delivery_contacts.utils import _get_delivery_zone
+from delivery_contacts.zone_index import (clear_zone_indexes,
+                                          find_delivery_zone,
+                                          find_delivery_zones)
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк определения зоны доставки по координатам: старый перебор "
+        "(запрос зон города + polygon.contains по каждой) против индекса "
+        "zone_index. Точки — случайные в пределах extent зон города.\n"
+        "Пример: python manage.py benchmark_delivery_zones --city Beograd --points 2000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--city", default="Beograd")
+        parser.add_argument("--points", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        city = options["city"]
+        zones = [z for z in DeliveryZone.objects.filter(city=city)
+                 if z.polygon is not None]
+        if not zones:
+            self.stdout.write(self.style.ERROR(f"Нет зон с полигонами: {city}"))
+            return
+
+        xmin = min(z.polygon.extent[0] for z in zones)
+        ymin = min(z.polygon.extent[1] for z in zones)
+        xmax = max(z.polygon.extent[2] for z in zones)
+        ymax = max(z.polygon.extent[3] for z in zones)
+
+        rnd = random.Random(options["seed"])
+        points = [(rnd.uniform(ymin, ymax), rnd.uniform(xmin, xmax))
+                  for _ in range(options["points"])]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{city}: зон {len(zones)}, точек {len(points)}"))
+
+        start = time.perf_counter()
+        legacy = [
+            _get_delivery_zone(DeliveryZone.objects.filter(city=city), lat, lon)
+            for lat, lon in points
+        ]
+        legacy_time = time.perf_counter() - start
+
+        clear_zone_indexes()
+        start = time.perf_counter()
+        find_delivery_zone(city, *points[0])
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [find_delivery_zone(city, lat, lon) for lat, lon in points]
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk = find_delivery_zones(city, points)
+        bulk_time = time.perf_counter() - start
+
+        mismatches = sum(
+            1 for old, new, batch in zip(legacy, indexed, bulk)
+            if not (getattr(old, "pk", None) == getattr(new, "pk", None)
+                    == getattr(batch, "pk", None))
+        )
+
+        self.stdout.write(
+            f"  legacy: {len(points) / legacy_time:10.0f} lookups/s")
+        self.stdout.write(
+            f"  index:  {len(points) / index_time:10.0f} lookups/s "
+            f"(сборка индекса {build_time * 1000:.1f} ms)")
+        self.stdout.write(
+            f"  bulk:   {len(points) / bulk_time:10.0f} lookups/s")
+        self.stdout.write(
+            f"  ускорение: x{legacy_time / index_time:.1f}, "
+            f"расхождений: {mismatches}")
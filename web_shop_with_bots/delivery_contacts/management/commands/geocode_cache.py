@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from delivery_contacts.geocoding import (clear_expired_geocode_entries,
+                                         get_geocode_stats,
+                                         reset_geocode_stats)
+from delivery_contacts.models import GeocodeCacheEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Кэш геокодирования: статистика попаданий (redis/БД/Google) "
+        "и очистка просроченных записей GeocodeCacheEntry.\n"
+        "Пример для cron: python manage.py geocode_cache --clear-expired"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear-expired", action="store_true",
+                            help="удалить просроченные записи из БД")
+        parser.add_argument("--reset-stats", action="store_true",
+                            help="обнулить счётчики после вывода")
+
+    def handle(self, *args, **options):
+        if options["clear_expired"]:
+            deleted = clear_expired_geocode_entries()
+            self.stdout.write(
+                self.style.SUCCESS(f"Удалено просроченных записей: {deleted}"))
+
+        stats = get_geocode_stats()
+        self.stdout.write(self.style.MIGRATE_HEADING("Кэш геокодирования"))
+        self.stdout.write(f"  записей в БД:     "
+                          f"{GeocodeCacheEntry.objects.count()}")
+        self.stdout.write(f"  redis hit:        {stats['hot_hit']}")
+        self.stdout.write(f"  db hit:           {stats['cold_hit']}")
+        self.stdout.write(f"  miss:             {stats['miss']}")
+        self.stdout.write(f"  запросов Google:  {stats['google_call']}")
+        self.stdout.write(f"  ошибок Google:    {stats['error']}")
+        hit_rate = stats['hit_rate']
+        self.stdout.write(
+            f"  hit rate:         "
+            f"{'-' if hit_rate is None else f'{hit_rate:.1%}'}")
+        self.stdout.write(f"  сэкономлено вызовов Google: "
+                          f"{stats['google_calls_saved']}")
+
+        if options["reset_stats"]:
+            reset_geocode_stats()
@@ -0,0 +1,30 @@
+# Generated by Django 4.0 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_contacts', '0027_alter_delivery_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='ключ')),
+                ('address', models.CharField(max_length=400, verbose_name='нормализованный адрес')),
+                ('city', models.CharField(blank=True, max_length=40, verbose_name='город')),
+                ('status', models.CharField(max_length=30, verbose_name='статус Google')),
+                ('response', models.JSONField(verbose_name='ответ Google')),
+                ('created', models.DateTimeField(auto_now=True, verbose_name='получен')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='действует до')),
+            ],
+            options={
+                'verbose_name': 'кэш геокодирования',
+                'verbose_name_plural': 'кэш геокодирования',
+            },
+        ),
+    ]
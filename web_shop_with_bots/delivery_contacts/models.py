@@ -414,3 +414,47 @@ class Courier(models.Model):
     class Meta:
         verbose_name = 'курьер'
         verbose_name_plural = 'курьеры'
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    Холодный уровень кэша геокодирования (delivery_contacts/geocoding.py):
+    ответ Google по нормализованному (адрес, город). Горячий уровень —
+    redis, сюда идём при его промахе.
+    """
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='ключ',
+    )
+    address = models.CharField(
+        max_length=400,
+        verbose_name='нормализованный адрес',
+    )
+    city = models.CharField(
+        max_length=40,
+        blank=True,
+        verbose_name='город',
+    )
+    status = models.CharField(
+        max_length=30,
+        verbose_name='статус Google',
+    )
+    response = models.JSONField(
+        verbose_name='ответ Google',
+    )
+    created = models.DateTimeField(
+        auto_now=True,
+        verbose_name='получен',
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='действует до',
+    )
+
+    class Meta:
+        verbose_name = 'кэш геокодирования'
+        verbose_name_plural = 'кэш геокодирования'
+
+    def __str__(self):
+        return f'{self.status}: {self.address}'
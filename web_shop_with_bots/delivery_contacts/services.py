@@ -4,8 +4,9 @@ from django.conf import settings
 
 from delivery_contacts.models import Delivery, DeliveryZone
 
-from .utils import (_get_delivery_zone, get_delivery_cost,
+from .utils import (get_delivery_cost,
                     google_validate_address_and_get_coordinates)
+from .zone_index import find_delivery_zone, find_delivery_zones
 
 
 import logging
@@ -32,10 +33,9 @@ def get_delivery_zone(city, lat=None, lon=None):
     """
     Функция возвращает зону доставки по адресу или координатам.
     """
-    all_delivery_zones = DeliveryZone.objects.filter(city=city)
-    # delivery_zones = all_delivery_zones.exclude(
-    #                                     name__in=['уточнить', 'по запросу'])
-    delivery_zone = _get_delivery_zone(all_delivery_zones, lat, lon)
+    # индекс зон города в памяти процесса (zone_index.py),
+    # без запроса к БД и перебора всех полигонов
+    delivery_zone = find_delivery_zone(city, lat, lon)
     if delivery_zone is None:
         delivery_zone = get_cached_delivery_zone_utochnit()
         # return all_delivery_zones.filter(name='уточнить').first()
@@ -62,6 +62,41 @@ def get_delivery_cost_zone(city, amount, delivery,
     return delivery_cost, delivery_zone
 
 
+def get_delivery_cost_zone_bulk(city, delivery, points, free_delivery=False):
+    """
+    Пакетный вариант get_delivery_cost_zone для списка точек
+    [(lat, lon, amount), ...]: все точки проверяются одним проходом
+    по индексу зон города.
+    Возвращает [(delivery_cost, delivery_zone), ...] в том же порядке;
+    если стоимость для точки посчитать нельзя — delivery_cost = None.
+    """
+    zones = find_delivery_zones(city, [(lat, lon) for lat, lon, _ in points])
+    utochnit = None
+
+    result = []
+    for (lat, lon, amount), delivery_zone in zip(points, zones):
+        if delivery_zone is None:
+            if utochnit is None:
+                utochnit = get_cached_delivery_zone_utochnit()
+            delivery_zone = utochnit
+
+        if delivery_zone is None:
+            delivery_cost = None
+        elif free_delivery:
+            delivery_cost = Decimal(0)
+        else:
+            try:
+                delivery_cost = get_delivery_cost(amount, delivery,
+                                                  delivery_zone)
+            except (TypeError, ArithmeticError):
+                # 'по запросу' без стоимости, пустая сумма заказа
+                delivery_cost = None
+
+        result.append((delivery_cost, delivery_zone))
+
+    return result
+
+
 def get_delivery_cost_zone_by_address(city, amount, delivery,
                                       address):
     """
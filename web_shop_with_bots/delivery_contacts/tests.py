@@ -0,0 +1,287 @@
+"""
+Тесты индекса зон доставки (delivery_contacts/zone_index.py).
+
+Проверяют:
+- что индекс находит ту же зону, что и старый перебор _get_delivery_zone,
+  включая пересечение зон (побеждает бо́льший id);
+- точка вне всех зон -> None, get_delivery_zone отдаёт "уточнить";
+- индекс пересобирается после изменения зон (сдвиг поколения
+  delivery_zones), без ручного сброса; без redis поиск работает;
+- пакетный поиск (find_delivery_zones, get_delivery_cost_zone_bulk)
+  даёт те же зоны и стоимости, что и поточечный.
+
+И кэша геокодирования (delivery_contacts/geocoding.py) — на заглушке
+StubGeocoder вместо Google, в том числе при недоступном redis.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from delivery_contacts.geocoding import (StubGeocoder, geocode_key,
+                                         get_geocode_stats,
+                                         reset_geocode_stats, set_geocoder)
+from delivery_contacts.models import Delivery, DeliveryZone, GeocodeCacheEntry
+from delivery_contacts.services import (get_delivery_cost_zone,
+                                        get_delivery_cost_zone_bulk,
+                                        get_delivery_zone)
+from delivery_contacts.utils import (
+    _get_delivery_zone,
+    google_validate_address_and_get_coordinates,
+)
+from delivery_contacts.zone_index import (clear_zone_indexes,
+                                          find_delivery_zone,
+                                          find_delivery_zones)
+
+
+def square(x0, y0, size):
+    return MultiPolygon(Polygon((
+        (x0, y0), (x0 + size, y0), (x0 + size, y0 + size),
+        (x0, y0 + size), (x0, y0),
+    )))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-zone-index",
+        }
+    },
+)
+class DeliveryZoneIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_zone_indexes()
+
+        # инвалидация зон применяется после коммита — выполняем её сразу,
+        # чтобы пачка setUp не поглотила инвалидации самого теста
+        with self.captureOnCommitCallbacks(execute=True):
+            self.utochnit = DeliveryZone.objects.create(name="уточнить")
+            self.delivery = Delivery.objects.create(
+                city="Beograd", type="delivery", is_active=True,
+                default_delivery_cost=Decimal("500.00"),
+            )
+            # lon 20.0..20.2, lat 44.0..44.2
+            self.center = DeliveryZone.objects.create(
+                city="Beograd", name="center",
+                polygon=square(20.0, 44.0, 0.2),
+                delivery_cost=Decimal("200.00"),
+            )
+            # пересекается с center в углу lon 20.1..20.2, lat 44.1..44.2
+            self.north = DeliveryZone.objects.create(
+                city="Beograd", name="north",
+                polygon=square(20.1, 44.1, 0.2),
+                delivery_cost=Decimal("400.00"),
+            )
+
+    def tearDown(self):
+        cache.clear()
+        clear_zone_indexes()
+
+    def _legacy(self, lat, lon):
+        return _get_delivery_zone(
+            DeliveryZone.objects.filter(city="Beograd"), lat, lon)
+
+    def test_lookup_matches_legacy_loop(self):
+        points = [
+            (44.05, 20.05),   # только center
+            (44.25, 20.25),   # только north
+            (44.15, 20.15),   # пересечение
+            (45.00, 21.00),   # вне зон
+        ]
+        for lat, lon in points:
+            with self.subTest(lat=lat, lon=lon):
+                self.assertEqual(find_delivery_zone("Beograd", lat, lon),
+                                 self._legacy(lat, lon))
+
+    def test_overlap_resolves_to_highest_id(self):
+        self.assertEqual(find_delivery_zone("Beograd", 44.15, 20.15),
+                         self.north)
+
+    def test_outside_point_falls_back_to_utochnit(self):
+        self.assertEqual(get_delivery_zone("Beograd", 45.0, 21.0),
+                         self.utochnit)
+
+    def test_warm_lookup_does_not_query_db(self):
+        find_delivery_zone("Beograd", 44.05, 20.05)
+
+        with self.assertNumQueries(0):
+            zone = find_delivery_zone("Beograd", 44.05, 20.05)
+
+        self.assertEqual(zone, self.center)
+
+    def test_lookup_survives_cache_errors(self):
+        with patch("delivery_contacts.zone_index.get_generation",
+                   side_effect=ConnectionError("redis down")):
+            # индекса ещё нет — собирается из БД
+            cold = find_delivery_zone("Beograd", 44.05, 20.05)
+        find_delivery_zone("Beograd", 44.05, 20.05)
+        with patch("delivery_contacts.zone_index.get_generation",
+                   side_effect=ConnectionError("redis down")), \
+                self.assertNumQueries(0):
+            # последний собранный индекс
+            warm = find_delivery_zone("Beograd", 44.05, 20.05)
+
+        self.assertEqual((cold, warm), (self.center, self.center))
+
+    def test_index_rebuilt_after_zone_change(self):
+        self.assertIsNone(find_delivery_zone("Beograd", 45.05, 21.05))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DeliveryZone.objects.create(
+                city="Beograd", name="far",
+                polygon=square(21.0, 45.0, 0.1),
+            )
+
+        self.assertEqual(find_delivery_zone("Beograd", 45.05, 21.05).name,
+                         "far")
+
+    def test_bulk_lookup_matches_single_lookups(self):
+        points = [
+            (44.05, 20.05),
+            (44.25, 20.25),
+            (44.15, 20.15),
+            (45.00, 21.00),
+            (None, None),
+        ]
+
+        self.assertEqual(
+            find_delivery_zones("Beograd", points),
+            [find_delivery_zone("Beograd", lat, lon) for lat, lon in points])
+
+    def test_bulk_cost_matches_get_delivery_cost_zone(self):
+        points = [
+            (44.05, 20.05, Decimal("1000")),
+            (44.15, 20.15, Decimal("1000")),
+            (45.00, 21.00, Decimal("1000")),
+        ]
+
+        get_delivery_zone("Beograd", 45.0, 21.0)   # прогрев "уточнить"
+        clear_zone_indexes()
+
+        # один запрос на всю пачку — зоны города для индекса
+        with self.assertNumQueries(1):
+            bulk = get_delivery_cost_zone_bulk("Beograd", self.delivery,
+                                               points)
+
+        self.assertEqual(bulk, [
+            get_delivery_cost_zone("Beograd", amount, self.delivery, lat, lon)
+            for lat, lon, amount in points
+        ])
+        self.assertEqual(bulk[2], (Decimal("500.00"), self.utochnit))
+
+
+GOOGLE_OK = {
+    "status": "OK",
+    "results": [
+        {"geometry": {"location": {"lat": 44.81, "lng": 20.46},
+                      "location_type": "ROOFTOP"}},
+        {"geometry": {"location": {"lat": 0, "lng": 0},
+                      "location_type": "APPROXIMATE"}},
+    ],
+}
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-geocode-cache",
+        }
+    },
+)
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_geocode_stats()
+        self.google = StubGeocoder({
+            "Knez Mihailova 5, Beograd": GOOGLE_OK,
+            "Kneza Milosa 1, Beograd": {"status": "OVER_QUERY_LIMIT"},
+        })
+        self.addCleanup(set_geocoder, set_geocoder(self.google))
+
+    def tearDown(self):
+        cache.clear()
+
+    def _coords(self, address):
+        return google_validate_address_and_get_coordinates(address, "Beograd")
+
+    def test_repeat_address_is_served_from_redis(self):
+        self.assertEqual(self._coords("Knez Mihailova 5"), (44.81, 20.46))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._coords("Knez Mihailova 5"), (44.81, 20.46))
+
+        self.assertEqual(len(self.google.calls), 1)
+        stats = get_geocode_stats()
+        self.assertEqual(stats["hot_hit"], 1)
+        self.assertEqual(stats["google_calls_saved"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_normalized_variants_share_one_entry(self):
+        self._coords("Knez Mihailova 5")
+        self._coords("  knez   MIHAILOVA 5 ,Beograd ")
+
+        self.assertEqual(len(self.google.calls), 1)
+        self.assertEqual(
+            geocode_key("Knez Mihailova 5", "Beograd"),
+            geocode_key("  knez   MIHAILOVA 5 ,Beograd ", "Beograd"))
+
+    def test_db_tier_survives_redis_flush(self):
+        self._coords("Knez Mihailova 5")
+        cache.clear()
+
+        self.assertEqual(self._coords("Knez Mihailova 5"), (44.81, 20.46))
+
+        self.assertEqual(len(self.google.calls), 1)
+        self.assertEqual(get_geocode_stats()["cold_hit"], 1)
+        # в БД хранится только первый результат
+        entry = GeocodeCacheEntry.objects.get()
+        self.assertEqual(len(entry.response["results"]), 1)
+
+    def test_redis_errors_fall_through_to_db(self):
+        with patch("delivery_contacts.geocoding.cache") as broken:
+            broken.get.side_effect = ConnectionError("redis down")
+            broken.set.side_effect = ConnectionError("redis down")
+            for _ in range(2):
+                self.assertEqual(self._coords("Knez Mihailova 5"),
+                                 (44.81, 20.46))
+
+        self.assertEqual(len(self.google.calls), 1)
+        self.assertEqual(get_geocode_stats()["cold_hit"], 1)
+
+    def test_expired_db_entry_goes_to_google(self):
+        self._coords("Knez Mihailova 5")
+        cache.clear()
+        GeocodeCacheEntry.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+
+        self._coords("Knez Mihailova 5")
+
+        self.assertEqual(len(self.google.calls), 2)
+
+    def test_zero_results_is_cached_negatively(self):
+        for _ in range(2):
+            with self.assertRaises(ValidationError):
+                self._coords("Nepostojeca 999")
+
+        self.assertEqual(len(self.google.calls), 1)
+        entry = GeocodeCacheEntry.objects.get()
+        self.assertEqual(entry.status, "ZERO_RESULTS")
+        self.assertLess(entry.expires_at,
+                        timezone.now() + timedelta(days=1))
+
+    def test_quota_errors_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValidationError):
+                self._coords("Kneza Milosa 1")
+
+        self.assertEqual(len(self.google.calls), 2)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
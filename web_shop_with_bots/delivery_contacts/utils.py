@@ -1,12 +1,10 @@
 from datetime import datetime
 from decimal import Decimal
 
-import requests
 from django.conf import settings
 from django.core.exceptions import ValidationError
 import re
 
-from web_shop_with_bots.settings import GOOGLE_API_KEY
 
 import logging
 # Создаем логгер
@@ -14,38 +12,15 @@ logger = logging.getLogger(__name__)
 
 
 def receive_responce_from_google(address, city):
+    """
+    Ответ Google Geocoding для адреса. Идёт через кэш geocoding.py:
+    redis, затем таблица GeocodeCacheEntry, и только при промахе —
+    запрос в Google через общую requests.Session с таймаутами.
+    """
     logger.debug(f"Запрос координат для адреса: '{address}', город: '{city}'")
+    from .geocoding import geocode
 
-    final_address = check_address_contains_city(address, city)
-    logger.debug(f"Итоговый адрес для запроса: '{final_address}'")
-
-    # Базовые параметры
-    params = {
-        'key': GOOGLE_API_KEY,
-        'address': final_address,
-        'region': 'rs',
-    }
-
-    # Добавляем компонентную фильтрацию, если город указан
-    if city:
-        # Формат для компонентной фильтрации: "component:value|component:value"
-        # Для города используем тип "locality"
-        params['components'] = f'locality:{city}|country:rs'
-
-    base_url = 'https://maps.googleapis.com/maps/api/geocode/json?'
-    logger.debug(f"Отправка запроса к Google API с параметрами: {params}")
-
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        logger.debug(f"Получен ответ от Google API: статус '{data.get('status')}', response: {data}")
-        return data
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при запросе к API Google Maps: {e}")
-        return None
+    return geocode(address, city)
 
 
 def google_validate_address_and_get_coordinates(address, city=None):
@@ -0,0 +1,140 @@
+"""
+zone_index.py — индекс зон доставки в памяти процесса.
+
+Вместо запроса всех DeliveryZone города и polygon.contains по каждой
+на каждый расчёт доставки:
+- зоны города грузятся один раз и хранятся с подготовленной геометрией
+  (GEOS prepared geometry — contains без повторного разбора полигона);
+- перед contains точка отсекается по bounding box зоны (простые
+  сравнения float), до GEOS доходят только кандидаты;
+- индекс помнит поколение группы delivery_zones (api/utils/core_cache):
+  изменение зон в админке сдвигает поколение через существующий сигнал
+  invalidate_delivery_zones_cache, и каждый процесс пересобирает
+  индекс при следующем обращении;
+- если поколение не прочитать (redis недоступен), отдаётся последний
+  собранный индекс города, а без него — индекс из БД без сохранения.
+
+Зон в городе десятки, поэтому R-tree не нужен — линейного прохода
+по bbox хватает.
+
+Семантика совпадает со старым _get_delivery_zone: при пересечении
+зон побеждает зона с бо́льшим id (старый цикл не прерывался и
+возвращал последнюю подходящую в порядке ordering=('id',)).
+"""
+
+import logging
+import threading
+
+import numpy as np
+from django.contrib.gis.geos import Point
+
+from api.utils.core_cache import DELIVERY_ZONES_GROUP, get_generation
+from delivery_contacts.models import DeliveryZone
+
+
+logger = logging.getLogger(__name__)
+
+
+class CityZoneIndex:
+    """Зоны одного города: (bbox, prepared geometry, зона) по убыванию id."""
+
+    def __init__(self, zones):
+        self.entries = []
+        for zone in sorted(zones, key=lambda z: z.id, reverse=True):
+            if zone.polygon is None:
+                continue
+            self.entries.append((zone.polygon.extent,
+                                 zone.polygon.prepared,
+                                 zone))
+        # (xmin, ymin, xmax, ymax) зон в том же порядке, что и entries
+        self.bounds = np.array([entry[0] for entry in self.entries],
+                               dtype=float).reshape(-1, 4)
+        # prepared geometry строит внутренний индекс лениво — не трогаем
+        # одну и ту же геометрию из нескольких потоков одновременно
+        self._lock = threading.Lock()
+
+    def candidates(self, lat, lon):
+        for (xmin, ymin, xmax, ymax), prepared, zone in self.entries:
+            if xmin <= lon <= xmax and ymin <= lat <= ymax:
+                yield prepared, zone
+
+    def lookup(self, lat, lon):
+        point = None
+        with self._lock:
+            for prepared, zone in self.candidates(lat, lon):
+                if point is None:
+                    point = Point(lon, lat)
+                if prepared.contains(point):
+                    return zone
+        return None
+
+    def lookup_many(self, points):
+        """
+        Зоны для списка точек [(lat, lon), ...] в том же порядке.
+        Точка без координат или вне всех зон -> None.
+        """
+        result = [None] * len(points)
+        if not points or not self.entries:
+            return result
+
+        coords = np.array(
+            [(np.nan, np.nan) if lat is None or lon is None
+             else (float(lon), float(lat)) for lat, lon in points],
+            dtype=float)
+        lon, lat = coords[:, :1], coords[:, 1:]
+        xmin, ymin, xmax, ymax = self.bounds.T
+        # точки x зоны; NaN во всех сравнениях даёт False
+        inside_bbox = ((xmin <= lon) & (lon <= xmax)
+                       & (ymin <= lat) & (lat <= ymax))
+
+        with self._lock:
+            for i in np.flatnonzero(inside_bbox.any(axis=1)):
+                point = Point(coords[i, 0], coords[i, 1])
+                # столбцы идут по убыванию id — первая подходящая и есть
+                # та, что вернул бы старый цикл
+                for j in np.flatnonzero(inside_bbox[i]):
+                    prepared, zone = self.entries[j][1:]
+                    if prepared.contains(point):
+                        result[i] = zone
+                        break
+        return result
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_city_zone_index(city):
+    cached = _indexes.get(city)
+    try:
+        generation = get_generation(DELIVERY_ZONES_GROUP)
+    except Exception as e:
+        logger.warning(f"zone index: поколение зон недоступно: {e}")
+        if cached is not None:
+            return cached[1]
+        return CityZoneIndex(DeliveryZone.objects.filter(city=city))
+
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    index = CityZoneIndex(DeliveryZone.objects.filter(city=city))
+    with _indexes_lock:
+        _indexes[city] = (generation, index)
+    return index
+
+
+def clear_zone_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def find_delivery_zone(city, lat=None, lon=None):
+    """Зона города, содержащая точку, или None."""
+    if lat is None or lon is None:
+        return None
+    return get_city_zone_index(city).lookup(float(lat), float(lon))
+
+
+def find_delivery_zones(city, points):
+    """Зоны города для списка точек [(lat, lon), ...] (None — вне зон)."""
+    return get_city_zone_index(city).lookup_many(points)
@@ -11,3 +11,8 @@ class BotOrderSaveError(Exception):
 class BotMessageSendError(Exception):
     """Исключение для ошибки отправки сообщения в боте."""
     pass
+
+
+class ApiCircuitOpenError(BotMessageSendError):
+    """Запрос не отправлен: API бота недоступно, circuit breaker открыт."""
+    pass
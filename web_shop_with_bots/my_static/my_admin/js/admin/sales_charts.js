@@ -1,8 +1,10 @@
 document.addEventListener('DOMContentLoaded', function () {
     let displayMode = 'sales';  // Изначально отображаем суммы продаж
+    const rangeSelect = document.getElementById('salesRange');
 
     const fetchDataAndRenderChart = () => {
-        fetch('/admin/sales-data/')
+        const days = rangeSelect ? rangeSelect.value : 30;
+        fetch(`/admin/sales-data/?days=${days}`)
             .then(response => response.json())
             .then(data => {
                 const totalSalesData = data.total_sales;
@@ -109,5 +111,9 @@ document.addEventListener('DOMContentLoaded', function () {
         fetchDataAndRenderChart();
     });
 
+    if (rangeSelect) {
+        rangeSelect.addEventListener('change', fetchDataAndRenderChart);
+    }
+
     fetchDataAndRenderChart();
 });
@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from promos.sender import BroadcastSender, Recipient, build_broadcast_payload
+from tm_bot.fake_telegram import FakeTelegramServer
+from tm_bot.services import classify_telegram_response
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк рассылки на фейковом Telegram: старый последовательный "
+        "цикл (requests.post + sleep 0.05) против BroadcastSender "
+        "(потоки, token bucket, 429 -> пауза). Без БД, получатели "
+        "синтетические.\n"
+        "Пример: python manage.py benchmark_broadcast --recipients 2000 "
+        "--telegram-delay 0.05 --rate 25 --workers 8 --flood-every 500"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipients", type=int, default=1000)
+        parser.add_argument("--legacy-recipients", type=int, default=200,
+                            help="сколько отправить старым циклом "
+                                 "(он медленный, 0 — пропустить)")
+        parser.add_argument("--telegram-delay", type=float, default=0.05)
+        parser.add_argument("--rate", type=float, default=25,
+                            help="сообщений/с, 0 — без ограничения")
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--flood-every", type=int, default=0,
+                            help="каждый N-й ответ — 429")
+        parser.add_argument("--retry-after", type=int, default=1)
+
+    def handle(self, *args, **options):
+        message = build_broadcast_payload(
+            None, None, "Benchmark <b>broadcast</b>", None, True)
+
+        server = FakeTelegramServer(delay=options["telegram_delay"],
+                                    flood_every=options["flood_every"],
+                                    retry_after=options["retry_after"])
+        with server, override_settings(TELEGRAM_API_URL=server.url):
+            legacy_n = options["legacy_recipients"]
+            if legacy_n:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    "Последовательно (старый цикл)"))
+                start = time.perf_counter()
+                stats = self._legacy(server.url, message, legacy_n)
+                self._report(legacy_n, time.perf_counter() - start, stats)
+
+            n = options["recipients"]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"BroadcastSender: workers={options['workers']} "
+                f"rate={options['rate'] or '∞'}/с"))
+            recipients = [Recipient(i, str(100000 + i)) for i in range(n)]
+            start = time.perf_counter()
+            with BroadcastSender("TOKEN", message,
+                                 rate=options["rate"] or 0,
+                                 workers=options["workers"]) as sender:
+                results = sender.send_many(recipients)
+            self._report(n, time.perf_counter() - start,
+                         Counter(r.status for r in results),
+                         retries=sum(r.attempts - 1 for r in results))
+
+    def _legacy(self, url, message, n):
+        method, payload = message
+        stats = Counter()
+        for i in range(n):
+            response = requests.post(
+                f"{url}/botTOKEN/{method}",
+                json=dict(payload, chat_id=str(100000 + i)),
+                timeout=(5, 30),
+            )
+            status, _ = classify_telegram_response(response.json())
+            stats[status] += 1
+            time.sleep(0.05)
+        return stats
+
+    def _report(self, n, elapsed, stats, retries=None):
+        line = (f"  n={n:<6} {elapsed:8.2f} s  "
+                f"{n / elapsed:8.1f} msg/s  {dict(stats)}")
+        if retries is not None:
+            line += f"  retries={retries}"
+        self.stdout.write(line)
@@ -0,0 +1,115 @@
+import json
+import time
+import tracemalloc
+from io import BytesIO
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font
+
+from promos.tasks import (BROADCAST_STATS, DETAIL_HEADERS,
+                          build_broadcast_report_file)
+
+
+def _response(i):
+    # ответ Telegram на sendMessage — примерно такого размера
+    return {"ok": True, "result": {
+        "message_id": i, "date": 1760000000,
+        "chat": {"id": 300000 + i, "first_name": "Имя", "username": f"user{i}",
+                 "type": "private"},
+        "from": {"id": 1, "is_bot": True, "first_name": "Bot",
+                 "username": "test_bot"},
+        "text": "Скидка 20% на все роллы до конца недели! " * 3,
+    }}
+
+
+def _row(i, full_response):
+    blocked = i % 10 == 0
+    response = ({"ok": False, "error_code": 403,
+                 "description": "Forbidden: bot was blocked by the user"}
+                if blocked else _response(i))
+    return {
+        "messenger_account_id": i,
+        "username": f"user{i}",
+        "msngr_id": str(300000 + i),
+        "tm_chat_id": str(300000 + i),
+        "city": "Beograd",
+        "bot_id": 1,
+        "bot_name": "OrdersBot tm #1, Beograd",
+        "status": "bot was blocked" if blocked else "ok",
+        "error_code": 403 if blocked else None,
+        "description": response.get("description"),
+        "tg_can_write_before": None,
+        "tg_can_write_after": not blocked,
+        "last_error_code_after": "403_bot_blocked" if blocked else None,
+        # раньше в отчёт шёл ответ на каждую отправку,
+        # теперь — только на неуспешные
+        "response_json": (json.dumps(response, ensure_ascii=False)
+                          if full_response or blocked else None),
+    }
+
+
+def _legacy_report(rows):
+    """Прежний путь: все строки в списке, обычная книга, стиль на каждую ячейку."""
+    detail_rows = list(rows)
+    wb = Workbook()
+    ws = wb.create_sheet("details")
+    ws.append(DETAIL_HEADERS)
+    for row in detail_rows:
+        ws.append([row.get(h) for h in DETAIL_HEADERS])
+    for row in ws.iter_rows(min_row=2):
+        for cell in row:
+            cell.alignment = Alignment(vertical="top", wrap_text=True)
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    ws.auto_filter.ref = ws.dimensions
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getbuffer().nbytes
+
+
+def _streaming_report(rows):
+    broadcast = SimpleNamespace(id=0, title="benchmark", sent_at=None,
+                                total_recipients=0, processed_count=0,
+                                delivered_count=0, status="done")
+    _, report = build_broadcast_report_file(
+        broadcast, None, "Beograd", {status: 0 for status in BROADCAST_STATS},
+        rows)
+    with report:
+        report.seek(0, 2)
+        return report.tell()
+
+
+class Command(BaseCommand):
+    help = (
+        "Память и время сборки отчёта рассылки: прежний (строки в памяти, "
+        "обычная книга openpyxl) против потокового (write-only книга, "
+        "строки из итератора). Данные синтетические, без БД.\n"
+        "Пример: python manage.py benchmark_broadcast_report --recipients 50000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipients", type=int, default=50000)
+        parser.add_argument("--skip-legacy", action="store_true")
+
+    def handle(self, *args, **options):
+        n = options["recipients"]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{n} получателей"))
+
+        if not options["skip_legacy"]:
+            self._measure("legacy", _legacy_report,
+                          (_row(i, True) for i in range(n)))
+        self._measure("streaming", _streaming_report,
+                      (_row(i, False) for i in range(n)))
+
+    def _measure(self, label, build, rows):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = build(rows)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"  {label:<10} peak={peak / 2 ** 20:8.1f} MB  "
+            f"time={elapsed:7.2f} s  file={size / 2 ** 20:6.1f} MB")
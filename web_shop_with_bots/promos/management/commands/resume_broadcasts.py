@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from promos.models import BroadcastDelivery, PromoBroadcast
+from promos.tasks import get_stalled_broadcasts, send_broadcast_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Продолжает рассылки, застрявшие в статусе 'Отправляется' "
+        "(воркер упал или был перезапущен): отправка идёт только тем, "
+        "кому ещё не отправляли.\n"
+        "Без аргументов — все рассылки без активности дольше "
+        "BROADCAST_LEASE; можно указать id.\n"
+        "Пример: python manage.py resume_broadcasts 15 16"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["ids"]:
+            broadcasts = PromoBroadcast.objects.filter(
+                id__in=options["ids"], status=PromoBroadcast.Status.SENDING)
+            missing = set(options["ids"]) - {b.id for b in broadcasts}
+            if missing:
+                raise CommandError(
+                    f"Не в статусе 'Отправляется': {sorted(missing)}")
+        else:
+            broadcasts = get_stalled_broadcasts()
+
+        for broadcast in broadcasts:
+            left = (BroadcastDelivery.objects
+                    .filter(broadcast=broadcast)
+                    .exclude(state=BroadcastDelivery.DONE)
+                    .count())
+            self.stdout.write(
+                f"#{broadcast.id} {broadcast.title}: "
+                f"обработано {broadcast.processed_count} "
+                f"из {broadcast.total_recipients}, осталось {left}")
+            if options["dry_run"]:
+                continue
+
+            # воркеров будет BROADCAST_SHARDS, как при обычном старте
+            send_broadcast_task.delay(broadcast.id, resume=True)
@@ -0,0 +1,41 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tm_bot', '0028_adminordernotification'),
+        ('promos', '0031_alter_banner_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('pending', 'ожидает'), ('sending', 'отправляется'), ('done', 'обработан')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('status', models.CharField(blank=True, max_length=30, null=True, verbose_name='Результат отправки')),
+                ('error_code', models.CharField(blank=True, max_length=50, null=True, verbose_name='Код ошибки')),
+                ('description', models.CharField(blank=True, max_length=255, null=True, verbose_name='Описание ошибки')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Ответ Telegram')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('tg_can_write_before', models.BooleanField(blank=True, null=True, verbose_name='Бот мог писать до отправки')),
+                ('leased_at', models.DateTimeField(blank=True, null=True, verbose_name='Взят в отправку')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработан')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='promos.promobroadcast', verbose_name='Рассылка')),
+                ('messenger_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_deliveries', to='tm_bot.messengeraccount', verbose_name='Telegram аккаунт')),
+            ],
+            options={
+                'verbose_name': 'Получатель рассылки',
+                'verbose_name_plural': 'Получатели рассылки',
+                'unique_together': {('broadcast', 'messenger_account')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='broadcastdelivery',
+            index=models.Index(fields=['broadcast', 'state'], name='broadcast_delivery_state_idx'),
+        ),
+    ]
@@ -1,11 +1,13 @@
 import os
+from datetime import timedelta
 from io import BytesIO
 
 import random
 import string
 
 from django.conf import settings
-from django.db import models, IntegrityError
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
@@ -403,6 +405,118 @@ class PromoBroadcast(models.Model):
     admin_photo.allow_tags = True
 
 
+class BroadcastDelivery(models.Model):
+    """
+    Получатель рассылки и результат отправки ему.
+
+    Строки создаются при старте рассылки (PENDING) и закрываются пачками
+    по мере отправки (DONE) — это чекпоинт: после падения воркера рассылка
+    продолжается с невыполненных строк, а не с начала.
+    Пачки берутся через claim_batch (SELECT ... FOR UPDATE SKIP LOCKED),
+    поэтому одну рассылку могут параллельно отправлять несколько воркеров.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    DONE = "done"
+    STATE_CHOICES = [
+        (PENDING, "ожидает"),
+        (SENDING, "отправляется"),
+        (DONE, "обработан"),
+    ]
+
+    broadcast = models.ForeignKey(
+        PromoBroadcast,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name="Рассылка",
+    )
+    messenger_account = models.ForeignKey(
+        MessengerAccount,
+        on_delete=models.CASCADE,
+        related_name="broadcast_deliveries",
+        verbose_name="Telegram аккаунт",
+    )
+    state = models.CharField(
+        "Состояние",
+        max_length=10,
+        choices=STATE_CHOICES,
+        default=PENDING,
+    )
+    status = models.CharField(
+        "Результат отправки",
+        max_length=30,
+        blank=True, null=True,
+    )
+    error_code = models.CharField(
+        "Код ошибки",
+        max_length=50,
+        blank=True, null=True,
+    )
+    description = models.CharField(
+        "Описание ошибки",
+        max_length=255,
+        blank=True, null=True,
+    )
+    # ответ Telegram храним только для неуспешных отправок
+    response = models.JSONField(
+        "Ответ Telegram",
+        blank=True, null=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        "Попыток",
+        default=0,
+    )
+    tg_can_write_before = models.BooleanField(
+        "Бот мог писать до отправки",
+        blank=True, null=True,
+    )
+    leased_at = models.DateTimeField(
+        "Взят в отправку",
+        blank=True, null=True,
+    )
+    processed_at = models.DateTimeField(
+        "Обработан",
+        blank=True, null=True,
+    )
+
+    class Meta:
+        unique_together = ("broadcast", "messenger_account")
+        indexes = [
+            models.Index(fields=["broadcast", "state"],
+                         name="broadcast_delivery_state_idx"),
+        ]
+        verbose_name = "Получатель рассылки"
+        verbose_name_plural = "Получатели рассылки"
+
+    def __str__(self):
+        return f"{self.broadcast_id} → {self.messenger_account_id}: {self.state}"
+
+    @classmethod
+    def claim_batch(cls, broadcast_id, size):
+        """
+        Берёт в отправку до size получателей: ожидающих и тех,
+        чья пачка зависла дольше BROADCAST_LEASE (воркер умер посреди
+        отправки). Возвращает id строк в порядке id.
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.BROADCAST_LEASE)
+        with transaction.atomic():
+            ids = list(
+                cls.objects
+                .select_for_update(skip_locked=True)
+                .filter(broadcast_id=broadcast_id)
+                .filter(Q(state=cls.PENDING)
+                        | Q(state=cls.SENDING, leased_at__lt=stale))
+                .order_by("id")
+                .values_list("id", flat=True)[:size]
+            )
+            if ids:
+                cls.objects.filter(id__in=ids).update(state=cls.SENDING,
+                                                      leased_at=now)
+        return ids
+
+
 class Campaign(models.Model):
     """Модель для рекламных компаний."""
     name = models.CharField(
@@ -0,0 +1,250 @@
+"""
+sender.py — параллельная отправка рассылки в Telegram для send_broadcast_task.
+
+Раньше рассылка шла строго последовательно: запрос в Telegram,
+sleep(0.05), два запроса к MessengerAccountBot на каждого получателя,
+ретраи через sleep(2 ** attempt) посреди цикла. Здесь:
+
+- сообщения отправляют BROADCAST_WORKERS потоков через общий
+  TelegramClient (пул соединений, keep-alive, circuit breaker);
+- общий темп задаёт TokenBucket (BROADCAST_RATE сообщений/с на бота —
+  лимит Telegram ~30/с), в один чат — не чаще раза в секунду (ChatThrottle);
+- 429 с retry_after ставит на паузу весь bucket: лимит у Telegram общий
+  для бота, остальные потоки тоже ждут, а не ловят 429 дальше;
+- 5xx и сетевые ошибки ретраятся с backoff только в своём потоке;
+- запись результатов в MessengerAccountBot — пачкой
+  (tmbs.bulk_update_mab_send_results), это делает таска.
+
+Модуль не ходит в БД: получатели — Recipient(key, chat_id),
+результат — SendResult. Это позволяет гонять его на фейковом
+Telegram (manage.py benchmark_broadcast) без данных.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+
+from exceptions import BotMessageSendError
+from tm_bot.services import classify_telegram_response
+from tm_bot.telegram_client import get_telegram_client
+
+
+logger = logging.getLogger("promos")
+
+
+# статусы, после которых повторять отправку бессмысленно
+FINAL_STATUSES = ("ok", "bot was blocked", "chat not found",
+                  "user is deactivated", "invalid chat")
+RETRYABLE_STATUSES = ("temporary error",)
+
+
+# ------------------------------- ЛИМИТЫ --------------------------------
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket: rate токенов в секунду,
+    не больше capacity подряд. rate=None — без ограничения.
+    pause(seconds) обнуляет запас и запрещает выдачу до истечения паузы.
+    """
+
+    def __init__(self, rate, capacity=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return self._wait_pause()
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+    def _wait_pause(self):
+        while True:
+            with self._lock:
+                wait = self.paused_until - self._clock()
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            now = self._clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0
+            self._updated = now
+
+
+class ChatThrottle:
+    """Не чаще одного сообщения в interval секунд в один чат."""
+
+    def __init__(self, interval=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self._next = {}
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def wait(self, chat_id):
+        with self._lock:
+            now = self._clock()
+            allowed = self._next.get(chat_id, now)
+            self._next[chat_id] = max(now, allowed) + self.interval
+        if allowed > now:
+            self._sleep(allowed - now)
+
+
+# ------------------------------ ОТПРАВКА -------------------------------
+
+@dataclass
+class Recipient:
+    key: int                      # id MessengerAccount
+    chat_id: Optional[str]
+
+
+@dataclass
+class SendResult:
+    key: int
+    status: str
+    db_error_code: Optional[str] = None
+    data: dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+def build_broadcast_payload(photo_url, caption, text_only, keyboard,
+                            disable_link_preview):
+    """
+    (метод Bot API, payload без chat_id) — как в send_user_photo_via_bot /
+    send_message_telegram. None — отправлять нечего (пустой текст без фото).
+    """
+    if photo_url:
+        payload = {"photo": photo_url}
+        if caption:
+            payload["caption"] = caption
+            payload["parse_mode"] = "HTML"
+        if disable_link_preview:
+            payload["disable_web_page_preview"] = True
+        if keyboard:
+            payload["reply_markup"] = keyboard.model_dump(mode="json")
+        return "sendPhoto", payload
+
+    if not text_only:
+        return None
+
+    payload = {
+        "text": text_only,
+        "parse_mode": "HTML",  # для summernote
+        "disable_web_page_preview": disable_link_preview,
+    }
+    if keyboard:
+        payload["reply_markup"] = keyboard.model_dump(
+            mode="json", exclude_unset=True, exclude_none=True)
+    return "sendMessage", payload
+
+
+class BroadcastSender:
+    """
+    Отправка одного сообщения рассылки списку получателей.
+    message — результат build_broadcast_payload.
+
+        with BroadcastSender(bot_token, message) as sender:
+            results = sender.send_many(recipients)
+    """
+
+    def __init__(self, bot_token, message, *, rate=None, workers=None,
+                 max_attempts=None, client=None,
+                 bucket=None, chat_throttle=None, sleep=time.sleep):
+        self.bot_token = bot_token
+        self.message = message
+        self.workers = workers or settings.BROADCAST_WORKERS
+        self.max_attempts = max_attempts or settings.BROADCAST_MAX_ATTEMPTS
+        self.bucket = bucket or TokenBucket(
+            settings.BROADCAST_RATE if rate is None else rate)
+        self.chat_throttle = chat_throttle or ChatThrottle()
+        self._sleep = sleep
+
+        # повторы и 429 рассылка обрабатывает сама (retry=False)
+        self.client = client or get_telegram_client()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix="broadcast")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def send_many(self, recipients):
+        """Результаты в порядке recipients."""
+        return list(self._pool.map(self.send_one, recipients))
+
+    def send_one(self, recipient: Recipient) -> SendResult:
+        if not recipient.chat_id:
+            return SendResult(recipient.key, "invalid chat", "no_chat_id",
+                              {"detail": "no chat_id"})
+        if self.message is None:
+            return SendResult(recipient.key, "ok")
+
+        method, payload = self.message
+        payload = dict(payload, chat_id=recipient.chat_id)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self.chat_throttle.wait(recipient.chat_id)
+            self.bucket.acquire()
+
+            status, db_error_code, data = self._post(method, payload)
+
+            if status in FINAL_STATUSES or attempt >= self.max_attempts:
+                break
+
+            if status == "rate limited":
+                retry_after = (data.get("parameters") or {}).get("retry_after")
+                logger.warning("Broadcast: 429, pause %s s.", retry_after)
+                self.bucket.pause(retry_after or 1)
+                continue
+
+            if status in RETRYABLE_STATUSES:
+                self._sleep(2 ** (attempt - 1))
+                continue
+            break
+
+        return SendResult(recipient.key, status, db_error_code, data, attempt)
+
+    def _post(self, method, payload):
+        try:
+            data = self.client.call(self.bot_token, method, payload,
+                                    retry=False)
+        except BotMessageSendError as e:
+            logger.warning("Broadcast: request to %s failed: %s",
+                           payload.get("chat_id"), e)
+            return "temporary error", "request_exception", {"exception": str(e)}
+
+        status, db_error_code = classify_telegram_response(data)
+        return status, db_error_code, data
@@ -2,25 +2,29 @@ from celery import shared_task
 from django.utils import timezone
 from django.conf import settings
 
-from promos.models import PromoBroadcast
+from promos.models import BroadcastDelivery, PromoBroadcast
+from promos.sender import (BroadcastSender, Recipient,
+                           build_broadcast_payload)
 from tm_bot.models import MessengerAccount, MessengerAccountBot
 from tm_bot.services import (send_message_telegram,
-                             send_user_message_via_bot,
                              send_user_photo_via_bot,
-                             build_keyboard_for_broadcast)
+                             build_keyboard_for_broadcast,
+                             bulk_update_mab_send_results,
+                             mab_send_result_fields)
 from tm_bot.text_assemble_and_edition import clean_html_for_telegram
-import time
 from urllib.parse import urljoin
 from django.db import close_old_connections
 from collections import Counter
+from datetime import timedelta
 import json
 from django.db import transaction
 from django.db.utils import InterfaceError, OperationalError
-from django.db.models import Q
+from django.db.models import Count, F, Q
 from django.db import transaction
-from io import BytesIO
-from django.core.files.base import ContentFile
+import tempfile
+from django.core.files import File
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 from openpyxl.utils import get_column_letter
 
@@ -84,6 +88,52 @@ def get_broadcast_photo_url(broadcast: PromoBroadcast) -> str | None:
     return urljoin(base, url)
 
 
+DETAIL_HEADERS = [
+    "messenger_account_id",
+    "username",
+    "msngr_id",
+    "tm_chat_id",
+    "city",
+    "bot_id",
+    "bot_name",
+    "status",
+    "error_code",
+    "description",
+    "tg_can_write_before",
+    "tg_can_write_after",
+    "last_error_code_after",
+    "response_json",
+]
+
+# ширины колонок details
+DETAIL_WIDTHS = {
+    "A": 18,  # messenger_account_id
+    "B": 20,  # username
+    "C": 16,  # msngr_id
+    "D": 16,  # tm_chat_id
+    "E": 14,  # city
+    "F": 10,  # bot_id
+    "G": 18,  # bot_name
+    "H": 20,  # status
+    "I": 12,  # error_code
+    "J": 40,  # description
+    "K": 16,  # tg_can_write_before
+    "L": 16,  # tg_can_write_after
+    "M": 22,  # last_error_code_after
+    "N": 80,  # response_json
+}
+
+
+def _bold_row(ws, values):
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(vertical="top", wrap_text=True)
+        row.append(cell)
+    return row
+
+
 def build_broadcast_report_file(
     broadcast,
     bot,
@@ -95,15 +145,23 @@ def build_broadcast_report_file(
     delivered_count=None,
     final_status=None,
 ):
-    wb = Workbook()
+    """
+    XLSX-отчёт по рассылке. Книга в write-only режиме openpyxl:
+    строки detail_rows (итератор, см. iter_broadcast_detail_rows)
+    пишутся сразу во временный файл, память не растёт с числом
+    получателей. Возвращает (имя файла, File) — после сохранения
+    в FileField файл нужно закрыть.
+    """
+    wb = Workbook(write_only=True)
 
     processed_count = processed_count if processed_count is not None else broadcast.processed_count
     delivered_count = delivered_count if delivered_count is not None else broadcast.delivered_count
     final_status = final_status if final_status is not None else broadcast.status
 
     # ---------------- Sheet 1: summary ----------------
-    ws1 = wb.active
-    ws1.title = "summary"
+    ws1 = wb.create_sheet("summary")
+    ws1.column_dimensions["A"].width = 24
+    ws1.column_dimensions["B"].width = 40
 
     summary_rows = [
         ["broadcast_id", broadcast.id],
@@ -118,86 +176,38 @@ def build_broadcast_report_file(
         ["delivered_count", delivered_count],
     ]
 
-    for row in summary_rows:
+    ws1.append(_bold_row(ws1, summary_rows[0]))
+    for row in summary_rows[1:]:
         ws1.append(row)
 
     ws1.append([])
-    ws1.append(["metric", "value"])
+    ws1.append(_bold_row(ws1, ["metric", "value"]))
 
     for key, value in counter.items():
         ws1.append([key, value])
 
-    # стили для summary
-    for cell in ws1[1]:
-        cell.font = Font(bold=True)
-    if ws1.max_row >= len(summary_rows) + 2:
-        for cell in ws1[len(summary_rows) + 2]:
-            cell.font = Font(bold=True)
-
-    ws1.column_dimensions["A"].width = 24
-    ws1.column_dimensions["B"].width = 40
-
     # ---------------- Sheet 2: details ----------------
     ws2 = wb.create_sheet("details")
-    headers = [
-        "messenger_account_id",
-        "username",
-        "msngr_id",
-        "tm_chat_id",
-        "city",
-        "bot_id",
-        "bot_name",
-        "status",
-        "error_code",
-        "description",
-        "tg_can_write_before",
-        "tg_can_write_after",
-        "last_error_code_after",
-        "response_json",
-    ]
-    ws2.append(headers)
+    for col, width in DETAIL_WIDTHS.items():
+        ws2.column_dimensions[col].width = width
+    ws2.freeze_panes = "A2"
 
+    ws2.append(_bold_row(ws2, DETAIL_HEADERS))
+    rows_count = 0
     for row in detail_rows:
-        ws2.append([row.get(h) for h in headers])
-
-    # стили для details
-    for cell in ws2[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(vertical="top", wrap_text=True)
-
-    for row in ws2.iter_rows(min_row=2):
-        for cell in row:
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-
-    # ширины колонок
-    widths = {
-        "A": 18,  # messenger_account_id
-        "B": 20,  # username
-        "C": 16,  # msngr_id
-        "D": 16,  # tm_chat_id
-        "E": 14,  # city
-        "F": 10,  # bot_id
-        "G": 18,  # bot_name
-        "H": 20,  # status
-        "I": 12,  # error_code
-        "J": 40,  # description
-        "K": 16,  # tg_can_write_before
-        "L": 16,  # tg_can_write_after
-        "M": 22,  # last_error_code_after
-        "N": 80,  # response_json
-    }
-    for col, width in widths.items():
-        ws2.column_dimensions[col].width = width
+        ws2.append([row.get(h) for h in DETAIL_HEADERS])
+        rows_count += 1
 
-    ws2.freeze_panes = "A2"
-    ws2.auto_filter.ref = ws2.dimensions
+    last_column = get_column_letter(len(DETAIL_HEADERS))
+    ws2.auto_filter.ref = f"A1:{last_column}{rows_count + 1}"
 
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    # временный файл удаляется при закрытии
+    report = tempfile.TemporaryFile(suffix=".xlsx")
+    wb.save(report)
+    report.seek(0)
 
     filename = f"broadcast_{broadcast.id}_report.xlsx"
-    return filename, ContentFile(buffer.read())
+    return filename, File(report, name=filename)
 
 
 @shared_task(
@@ -287,46 +297,107 @@ def send_broadcast_test_task_singleflow(broadcast_id: int):
     return f"Sent test message ID {broadcast_id}."
 
 
+# начальные нули — чтобы в итогах были все статусы, даже нулевые
+BROADCAST_STATS = (
+    "ok",
+    "bot was blocked",
+    "chat not found",
+    "user is deactivated",
+    "invalid chat",
+    "rate limited",
+    "temporary error",
+    "error",
+    "exception",
+)
+
+
 @shared_task(
     queue="broadcast",
     bind=True)
-def send_broadcast_task(self, broadcast_id: int):
+def send_broadcast_task(self, broadcast_id: int, resume: bool = False):
+    """
+    Старт рассылки: фиксирует получателей в BroadcastDelivery
+    и отправляет их пачками (см. _run_broadcast_shard).
+    Если BROADCAST_SHARDS > 1 — остальные воркеры очереди broadcast
+    подключаются через send_broadcast_shard_task.
+
+    resume=True для рассылки в статусе SENDING (воркер умер, рестарт):
+    получатели не пересчитываются, отправка продолжается с тех,
+    кому ещё не отправляли.
+    """
+    shards = max(1, settings.BROADCAST_SHARDS)
 
     # 1) короткая транзакция только для "замка", чтобы не запустилось несколько воркеров
     with transaction.atomic():
         broadcast = PromoBroadcast.objects.select_for_update().get(pk=broadcast_id)
 
         if broadcast.status == PromoBroadcast.Status.SENDING:
-            logger.warning("Broadcast %s ALREADY SENDING", broadcast.id)
-            return "already sending"
+            if not resume:
+                logger.warning("Broadcast %s ALREADY SENDING", broadcast.id)
+                return "already sending"
+            logger.warning("Broadcast %s RESUMED", broadcast.id)
 
-        if broadcast.status == PromoBroadcast.Status.DONE:
+        elif broadcast.status == PromoBroadcast.Status.DONE:
             logger.warning("Broadcast %s ALREADY DONE", broadcast.id)
             return "already done"
 
-        broadcast.status = PromoBroadcast.Status.SENDING
-        broadcast.sent_at = timezone.now()
-        broadcast.processed_count = 0
-        broadcast.delivered_count = 0
-        broadcast.results_json = {}
-        broadcast.save(update_fields=["status","sent_at","processed_count","delivered_count","results_json"])
+        else:
+            broadcast.status = PromoBroadcast.Status.SENDING
+            broadcast.sent_at = timezone.now()
+            broadcast.processed_count = 0
+            broadcast.delivered_count = 0
+            broadcast.results_json = {}
+            broadcast.save(update_fields=["status","sent_at","processed_count","delivered_count","results_json"])
+            resume = False
 
-    # close_old_connections()
-    broadcast, bot, bot_token, city = get_broadcast_bot_token_city(broadcast_id)
+    if not resume or not BroadcastDelivery.objects.filter(
+            broadcast_id=broadcast_id).exists():
+        # рассылка, зависшая до появления BroadcastDelivery, — с начала
+        _create_broadcast_deliveries(broadcast)
 
-    # картинка (может быть None)
-    photo_url = get_broadcast_photo_url(broadcast)
+    # остальные шарды — на другие воркеры, первый отправляет этот
+    for _ in range(shards - 1):
+        send_broadcast_shard_task.delay(broadcast_id, shards)
 
-    # текст сообщения
-    # очищаем HTML форматирование в сообщении
-    cleaned_message = clean_html_for_telegram(broadcast.body)
-    # обрезаем кол-во символов под стандарт и если есть фото
-    caption, text_only = crop_text_if_photo(cleaned_message,
-                                            photo_url,
-                                            broadcast)
+    return _run_broadcast_shard(broadcast_id, shards)
+
+
+@shared_task(
+    queue="broadcast",
+    bind=True)
+def send_broadcast_shard_task(self, broadcast_id: int, shards: int = 1):
+    """Дополнительный воркер для уже запущенной рассылки."""
+    return _run_broadcast_shard(broadcast_id, shards)
+
+
+def get_stalled_broadcasts():
+    """
+    Рассылки в SENDING, у которых дольше BROADCAST_LEASE никто
+    не брал и не закрывал пачки — воркер умер или был перезапущен.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.BROADCAST_LEASE)
+    active = BroadcastDelivery.objects.filter(
+        Q(leased_at__gte=stale) | Q(processed_at__gte=stale))
+    return (PromoBroadcast.objects
+            .filter(status=PromoBroadcast.Status.SENDING, sent_at__lt=stale)
+            .exclude(id__in=active.values("broadcast_id")))
 
-    # клавиатура (может быть None)
-    keyboard = build_keyboard_for_broadcast(broadcast)
+
+@shared_task(
+    queue="broadcast")
+def resume_stalled_broadcasts_task():
+    """Периодическая (django-celery-beat) проверка зависших рассылок."""
+    ids = list(get_stalled_broadcasts().values_list("id", flat=True))
+    for broadcast_id in ids:
+        logger.warning("Broadcast %s stalled, resuming.", broadcast_id)
+        send_broadcast_task.delay(broadcast_id, resume=True)
+    return ids
+
+
+def _create_broadcast_deliveries(broadcast):
+    """Фиксирует список получателей рассылки (строки PENDING)."""
+    bot = broadcast.bot
+    city = getattr(bot, "city", None)
 
     # фильтруем подписчиков по городу и мессенджеру
     # отбрасываем аккаунты, где бот подходит, но у него стоит False,
@@ -347,190 +418,187 @@ def send_broadcast_task(self, broadcast_id: int):
         .distinct()
     )
 
-    ids = list(qs.values_list("id", flat=True))
-    total = len(ids)
-    broadcast.total_recipients = total
-    broadcast.status = PromoBroadcast.Status.SENDING
-    broadcast.sent_at = timezone.now()
-    broadcast.processed_count = 0
-    broadcast.delivered_count = 0
-    broadcast.results_json = {}
-    broadcast.save(update_fields=["total_recipients", "status", "sent_at",
-                                  "processed_count", "delivered_count",
-                                  "results_json"])
-
-    stats = Counter({
-        "ok": 0,
-        "bot was blocked": 0,
-        "chat not found": 0,
-        "user is deactivated": 0,
-        "invalid chat": 0,
-        "rate limited": 0,
-        "temporary error": 0,
-        "error": 0,
-        "exception": 0,
-    })
-    processed = 0
+    ids = list(qs.order_by("id").values_list("id", flat=True))
+
+    # повторный запуск после ошибки — список собирается заново
+    BroadcastDelivery.objects.filter(broadcast=broadcast).delete()
+    BroadcastDelivery.objects.bulk_create(
+        [BroadcastDelivery(broadcast=broadcast, messenger_account_id=account_id)
+         for account_id in ids],
+        batch_size=2000,
+    )
+
+    PromoBroadcast.objects.filter(id=broadcast.id).update(total_recipients=len(ids))
+    logger.warning("Broadcast %s: %s recipients.", broadcast.id, len(ids))
+
+
+def _run_broadcast_shard(broadcast_id: int, shards: int = 1):
+    """
+    Отправка пачками по SAVE_EVERY, пока есть невзятые получатели.
+    После каждой пачки — чекпоинт в одной транзакции: строки
+    BroadcastDelivery закрываются, счётчики рассылки увеличиваются.
+    Умер воркер посреди пачки — её строки через BROADCAST_LEASE
+    возьмёт resume или другой шард (эти получатели могут получить
+    сообщение повторно, остальные — нет).
+    """
+    broadcast, bot, bot_token, city = get_broadcast_bot_token_city(broadcast_id)
+
+    # картинка (может быть None)
+    photo_url = get_broadcast_photo_url(broadcast)
+
+    # текст сообщения
+    # очищаем HTML форматирование в сообщении
+    cleaned_message = clean_html_for_telegram(broadcast.body)
+    # обрезаем кол-во символов под стандарт и если есть фото
+    caption, text_only = crop_text_if_photo(cleaned_message,
+                                            photo_url,
+                                            broadcast)
+
+    # клавиатура (может быть None)
+    keyboard = build_keyboard_for_broadcast(broadcast)
+
+    message = build_broadcast_payload(photo_url, caption, text_only, keyboard,
+                                      broadcast.disable_link_preview)
+
+    # лимит Telegram общий на бота — делим его между шардами
+    rate = settings.BROADCAST_RATE / max(1, shards)
+
+    with BroadcastSender(bot_token, message, rate=rate) as sender:
+        while True:
+            delivery_ids = BroadcastDelivery.claim_batch(broadcast_id, SAVE_EVERY)
+            if not delivery_ids:
+                break
+
+            deliveries = list(
+                BroadcastDelivery.objects
+                .filter(id__in=delivery_ids)
+                .select_related("messenger_account")
+                .order_by("id"))
+            # состояние связок до отправки — одним запросом на пачку
+            can_write_before = dict(
+                MessengerAccountBot.objects
+                .filter(bot=bot, messenger_account_id__in=[
+                    d.messenger_account_id for d in deliveries])
+                .values_list("messenger_account_id", "tg_can_write"))
+
+            results = sender.send_many([
+                Recipient(d.messenger_account_id,
+                          d.messenger_account.tm_chat_id
+                          or d.messenger_account.msngr_id)
+                for d in deliveries
+            ])
+
+            try:
+                _save_broadcast_checkpoint(broadcast, bot, deliveries,
+                                           results, can_write_before)
+            except (InterfaceError, OperationalError):
+                # строки останутся SENDING и уйдут повторно после BROADCAST_LEASE
+                logger.warning("Broadcast %s: DB error while saving progress.",
+                               broadcast.id)
+                close_old_connections()
+
+    return _finish_broadcast_if_complete(broadcast_id)
+
+
+def _save_broadcast_checkpoint(broadcast, bot, deliveries, results,
+                               can_write_before):
+    now = timezone.now()
     delivered = 0
-    # завести список строк отчёта
-    detail_rows = []
-
-    for offset in range(0, total, SAVE_EVERY):
-        batch_ids = ids[offset: offset + SAVE_EVERY]
-
-        # Важно: берём объекты отдельным запросом, курсор не живёт "вечно"
-        accounts = MessengerAccount.objects.filter(id__in=batch_ids).order_by("id")
-
-        for acc in accounts:
-            final_status = None
-
-            for attempt in range(3):  # до 3 попыток отправки
-                try:
-
-                    mab_before = MessengerAccountBot.objects.filter(
-                        messenger_account=acc,
-                        bot=bot,
-                    ).first()
-
-                    if photo_url:
-                        status, data = send_user_photo_via_bot(
-                            messenger_account=acc,
-                            bot=bot,
-                            bot_token=bot_token,
-                            photo_url=photo_url,
-                            caption=caption,
-                            keyboard=keyboard,
-                            disable_link_preview=broadcast.disable_link_preview,
-                            parse_mode="HTML" if caption else None,
-                        )
-                    else:
-                        if not text_only:
-                            status, data = "ok", {}
-                        else:
-                            status, data = send_user_message_via_bot(
-                                messenger_account=acc,
-                                bot=bot,
-                                message=text_only,
-                                bot_token=bot_token,
-                                keyboard=keyboard,
-                                disable_link_preview=broadcast.disable_link_preview,
-                                parse_mode="HTML",
-                            )
-                    mab_after = MessengerAccountBot.objects.filter(
-                        messenger_account=acc,
-                        bot=bot,
-                    ).first()
-
-                    # делаем запись о результате каждой отправки
-                    detail_rows.append({
-                        "messenger_account_id": acc.id,
-                        "username": acc.msngr_username,
-                        "msngr_id": acc.msngr_id,
-                        "tm_chat_id": acc.tm_chat_id,
-                        "city": acc.city,
-                        "bot_id": bot.id if bot else None,
-                        "bot_name": str(bot) if bot else None,
-                        "status": status,
-                        "error_code": data.get("error_code") if isinstance(data, dict) else None,
-                        "description": data.get("description") if isinstance(data, dict) else None,
-                        "response_json": json.dumps(data, ensure_ascii=False) if isinstance(data, dict) else str(data),
-                        "tg_can_write_before": mab_before.tg_can_write if mab_before else None,
-                        "tg_can_write_after": mab_after.tg_can_write if mab_after else None,
-                        "last_error_code_after": mab_after.last_error_code if mab_after else None,
-                    })
-                    logger.warning("Broadcast debug: user=%s status=%s data=%s",
-                                   acc.id, status, data)
-
-                    final_status = status
-
-                    if status == "ok":
-                        delivered += 1
-                        break
-
-                    if status in ["bot was blocked", "chat not found",
-                                  "invalid chat", "user is deactivated"]:
-                        break
-
-                    logger.warning(
-                        "Broadcast: unexpected status '%s' for user %s via bot %s.",
-                        status,
-                        acc.id,
-                        bot.id,
-                    )
-                    break
-
-                except Exception:
-                    final_status = "exception"
-                    if attempt < 2:
-                        time.sleep(2 ** attempt)
-                        continue
-
-                    logger.exception(
-                        "Broadcast: fatal error for user %s via bot %s.",
-                        acc.id,
-                        bot.id,
-                    )
-                    break
-
-            if final_status is None:
-                final_status = "exception"
-
-            # ✅ защита: если прилетел неожиданный статус — считаем как error
-            if final_status not in stats:
-                logger.warning(
-                    "Broadcast: unknown status '%s' for user %s (count as error).",
-                    final_status, acc.id
-                )
-                final_status = "error"
-
-            stats[final_status] += 1
-            processed += 1
-
-            # лучше логгером, а не print (print в docker иногда режется)
-            logger.warning("Broadcast progress: tried=%s delivered=%s",
-                           processed, delivered)
-            time.sleep(0.05)
-
-        # ✅ Сохраняем прогресс ОДИН РАЗ после батча (это безопаснее)
-        try:
-            PromoBroadcast.objects.filter(id=broadcast.id).update(
-                processed_count=processed,
-                delivered_count=delivered,
-                results_json=dict(stats),
+
+    for delivery, result in zip(deliveries, results):
+        data = result.data or {}
+        delivery.state = BroadcastDelivery.DONE
+        delivery.status = result.status
+        delivery.error_code = result.db_error_code
+        delivery.description = (data.get("description") or "")[:255] or None
+        delivery.response = None if result.status == "ok" else data
+        delivery.attempts = result.attempts
+        delivery.tg_can_write_before = can_write_before.get(
+            delivery.messenger_account_id)
+        delivery.processed_at = now
+        delivered += result.status == "ok"
+
+        logger.debug("Broadcast debug: user=%s status=%s attempts=%s data=%s",
+                     delivery.messenger_account_id, result.status,
+                     result.attempts, data)
+
+    with transaction.atomic():
+        BroadcastDelivery.objects.bulk_update(deliveries, [
+            "state", "status", "error_code", "description", "response",
+            "attempts", "tg_can_write_before", "processed_at",
+        ])
+        bulk_update_mab_send_results(
+            bot, [(r.key, r.status, r.db_error_code) for r in results])
+        PromoBroadcast.objects.filter(id=broadcast.id).update(
+            processed_count=F("processed_count") + len(deliveries),
+            delivered_count=F("delivered_count") + delivered,
+        )
+
+    # лучше логгером, а не print (print в docker иногда режется)
+    logger.warning("Broadcast %s progress: +%s tried, +%s delivered",
+                   broadcast.id, len(deliveries), delivered)
+
+
+def get_broadcast_stats(broadcast_id: int) -> Counter:
+    """Итоги рассылки по статусам — из BroadcastDelivery."""
+    stats = Counter({status: 0 for status in BROADCAST_STATS})
+    rows = (BroadcastDelivery.objects
+            .filter(broadcast_id=broadcast_id, state=BroadcastDelivery.DONE)
+            .values_list("status")
+            .annotate(count=Count("id")))
+    for status, count in rows:
+        # ✅ защита: если прилетел неожиданный статус — считаем как error
+        if status not in stats:
+            logger.warning(
+                "Broadcast %s: unknown status '%s' x%s (count as error).",
+                broadcast_id, status, count
             )
-        except (InterfaceError, OperationalError):
-            logger.warning("Broadcast %s: DB error while saving progress.",
-                           broadcast.id)
+            status = "error"
+        stats[status] += count
+    return stats
 
-    PromoBroadcast.objects.filter(id=broadcast.id).update(
+
+def _finish_broadcast_if_complete(broadcast_id: int):
+    """
+    Закрывает рассылку, когда обработаны все получатели:
+    итоги, отчёт, сообщение в админский чат. Из нескольких шардов
+    это делает ровно один — тот, чей UPDATE перевёл статус в DONE.
+    """
+    if BroadcastDelivery.objects.filter(broadcast_id=broadcast_id).exclude(
+            state=BroadcastDelivery.DONE).exists():
+        return "shard finished"
+
+    stats = get_broadcast_stats(broadcast_id)
+    processed = sum(stats.values())
+    delivered = stats["ok"]
+
+    finished = PromoBroadcast.objects.filter(
+        id=broadcast_id, status=PromoBroadcast.Status.SENDING,
+    ).update(
         processed_count=processed,
         delivered_count=delivered,
         results_json=dict(stats),
         status=PromoBroadcast.Status.DONE,
     )
-    logger.warning("Broadcast %s summary: %s", broadcast.id, dict(stats))
+    if not finished:
+        return "already done"
 
-    broadcast.refresh_from_db(fields=[
-        "status",
-        "processed_count",
-        "delivered_count",
-        "results_json",
-        "total_recipients",
-        "sent_at",
-    ])
+    broadcast, bot, bot_token, city = get_broadcast_bot_token_city(broadcast_id)
+    logger.warning("Broadcast %s summary: %s", broadcast.id, dict(stats))
 
     filename, content = build_broadcast_report_file(
         broadcast=broadcast,
         bot=bot,
         city=city,
         counter=stats,
-        detail_rows=detail_rows,
+        detail_rows=iter_broadcast_detail_rows(broadcast, bot),
         processed_count=processed,
         delivered_count=delivered,
         final_status=PromoBroadcast.Status.DONE,
     )
 
-    broadcast.report_file.save(filename, content, save=False)
+    with content:
+        broadcast.report_file.save(filename, content, save=False)
     broadcast.save(update_fields=["report_file"])
 
     _send_broadcast_summary_to_admin(broadcast, bot, dict(stats),
@@ -538,6 +606,38 @@ def send_broadcast_task(self, broadcast_id: int):
     return delivered
 
 
+def iter_broadcast_detail_rows(broadcast, bot):
+    """Строки листа details отчёта — по одной на получателя."""
+    deliveries = (
+        BroadcastDelivery.objects
+        .filter(broadcast=broadcast)
+        .select_related("messenger_account")
+        .order_by("messenger_account_id")
+    )
+    for delivery in deliveries.iterator(chunk_size=2000):
+        acc = delivery.messenger_account
+        before = delivery.tg_can_write_before
+        after = mab_send_result_fields(delivery.status, delivery.error_code,
+                                       None)
+        yield {
+            "messenger_account_id": acc.id,
+            "username": acc.msngr_username,
+            "msngr_id": acc.msngr_id,
+            "tm_chat_id": acc.tm_chat_id,
+            "city": acc.city,
+            "bot_id": bot.id if bot else None,
+            "bot_name": str(bot) if bot else None,
+            "status": delivery.status,
+            "error_code": (delivery.response or {}).get("error_code"),
+            "description": delivery.description,
+            "response_json": (json.dumps(delivery.response, ensure_ascii=False)
+                              if delivery.response else None),
+            "tg_can_write_before": before,
+            "tg_can_write_after": after.get("tg_can_write", before),
+            "last_error_code_after": after["last_error_code"],
+        }
+
+
 def get_broadcast_bot_token_city(broadcast_id: int):
     broadcast = PromoBroadcast.objects.get(pk=broadcast_id)
     bot = broadcast.bot
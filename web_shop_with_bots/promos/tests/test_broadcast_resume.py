@@ -0,0 +1,150 @@
+"""
+Тесты чекпоинтов рассылки (BroadcastDelivery):
+- полная рассылка закрывает всех получателей и считает итоги по таблице;
+- resume после падения воркера шлёт только необработанным;
+- без resume идущая рассылка повторно не стартует;
+- XLSX-отчёт собирается из BroadcastDelivery;
+- зависшая пачка (SENDING дольше BROADCAST_LEASE) берётся снова.
+
+Telegram — локальный FakeTelegramServer.
+"""
+
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from promos.models import BroadcastDelivery, PromoBroadcast
+from promos.tasks import (_create_broadcast_deliveries, get_stalled_broadcasts,
+                          send_broadcast_task)
+from tm_bot.fake_telegram import FakeTelegramServer
+from tm_bot.models import MessengerAccount, MessengerAccountBot, OrdersBot
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT,
+                   TELEGRAM_AUTH_BOTS={"Beograd": "TOKEN"},
+                   BROADCAST_RATE=0, BROADCAST_SHARDS=1, CHAT_ID=None)
+class BroadcastResumeTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.bot = OrdersBot.objects.create(
+            msngr_type="tm", name="test bot", city="Beograd",
+            link="https://t.me/test_bot",
+            frontend_link="https://t.me/test_bot")
+        self.accounts = [
+            MessengerAccount.objects.create(
+                msngr_type="tm", msngr_id=f"20000{i}",
+                tm_chat_id=f"20000{i}", city="Beograd")
+            for i in range(5)
+        ]
+        self.broadcast = PromoBroadcast.objects.create(
+            title="Акция", body="<b>Скидка</b>", bot=self.bot)
+
+        self.server = FakeTelegramServer(blocked_chats=["200004"]).start()
+        self.addCleanup(self.server.stop)
+        patcher = override_settings(TELEGRAM_API_URL=self.server.url)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _sent_chats(self):
+        return sorted(payload["chat_id"] for _, payload in self.server.requests)
+
+    def test_full_broadcast(self):
+        send_broadcast_task.apply(args=[self.broadcast.id])
+
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, PromoBroadcast.Status.DONE)
+        self.assertEqual(self.broadcast.total_recipients, 5)
+        self.assertEqual(self.broadcast.processed_count, 5)
+        self.assertEqual(self.broadcast.delivered_count, 4)
+        self.assertEqual(self.broadcast.results_json["bot was blocked"], 1)
+        self.assertTrue(self.broadcast.report_file)
+
+        self.assertFalse(BroadcastDelivery.objects.exclude(
+            state=BroadcastDelivery.DONE).exists())
+        blocked = MessengerAccountBot.objects.get(
+            bot=self.bot, messenger_account=self.accounts[4])
+        self.assertFalse(blocked.tg_can_write)
+
+    def test_report_is_built_from_deliveries(self):
+        send_broadcast_task.apply(args=[self.broadcast.id])
+
+        self.broadcast.refresh_from_db()
+        with self.broadcast.report_file.open("rb") as report:
+            wb = load_workbook(report, read_only=True)
+            rows = list(wb["details"].values)
+
+        self.assertEqual(rows[0][0], "messenger_account_id")
+        self.assertEqual(len(rows), 6)
+        by_account = {row[0]: row for row in rows[1:]}
+        blocked = by_account[self.accounts[4].id]
+        self.assertEqual(blocked[7], "bot was blocked")
+        self.assertFalse(blocked[11])        # tg_can_write_after
+        self.assertIn("blocked", blocked[13])  # response_json
+        self.assertIsNone(by_account[self.accounts[0].id][13])
+
+    def test_resume_sends_only_to_unprocessed(self):
+        # воркер упал после первой пачки: 2 получателя уже обработаны
+        PromoBroadcast.objects.filter(id=self.broadcast.id).update(
+            status=PromoBroadcast.Status.SENDING, sent_at=timezone.now(),
+            processed_count=2, delivered_count=2)
+        _create_broadcast_deliveries(self.broadcast)
+        done = BroadcastDelivery.objects.filter(
+            messenger_account__in=self.accounts[:2])
+        done.update(state=BroadcastDelivery.DONE, status="ok")
+
+        result = send_broadcast_task.apply(args=[self.broadcast.id],
+                                           kwargs={"resume": True})
+
+        self.assertEqual(self._sent_chats(), ["200002", "200003", "200004"])
+        self.assertEqual(result.get(), 4)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, PromoBroadcast.Status.DONE)
+        self.assertEqual(self.broadcast.processed_count, 5)
+        self.assertEqual(self.broadcast.delivered_count, 4)
+
+    def test_running_broadcast_is_not_restarted(self):
+        PromoBroadcast.objects.filter(id=self.broadcast.id).update(
+            status=PromoBroadcast.Status.SENDING)
+
+        result = send_broadcast_task.apply(args=[self.broadcast.id])
+
+        self.assertEqual(result.get(), "already sending")
+        self.assertEqual(self.server.requests, [])
+
+    @override_settings(BROADCAST_LEASE=60)
+    def test_stale_batch_is_claimed_again(self):
+        _create_broadcast_deliveries(self.broadcast)
+        first = BroadcastDelivery.claim_batch(self.broadcast.id, 2)
+        self.assertEqual(len(first), 2)
+
+        # пачка только что взята — её не отдают второй раз
+        second = BroadcastDelivery.claim_batch(self.broadcast.id, 5)
+        self.assertEqual(len(set(first) & set(second)), 0)
+
+        BroadcastDelivery.objects.filter(id__in=first).update(
+            leased_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(
+            sorted(BroadcastDelivery.claim_batch(self.broadcast.id, 5)),
+            sorted(first))
+
+    @override_settings(BROADCAST_LEASE=60)
+    def test_stalled_broadcasts(self):
+        PromoBroadcast.objects.filter(id=self.broadcast.id).update(
+            status=PromoBroadcast.Status.SENDING,
+            sent_at=timezone.now() - timedelta(minutes=10))
+        _create_broadcast_deliveries(self.broadcast)
+        self.assertEqual(list(get_stalled_broadcasts()), [self.broadcast])
+
+        BroadcastDelivery.claim_batch(self.broadcast.id, 1)
+        self.assertEqual(list(get_stalled_broadcasts()), [])
@@ -0,0 +1,131 @@
+"""
+Тесты параллельной отправки рассылки (promos.sender) и пакетной
+записи результатов в MessengerAccountBot.
+
+Telegram — локальный FakeTelegramServer (tm_bot.fake_telegram).
+"""
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from promos.sender import (BroadcastSender, ChatThrottle, Recipient,
+                           TokenBucket, build_broadcast_payload)
+from tm_bot.fake_telegram import FakeTelegramServer
+from tm_bot.models import MessengerAccount, MessengerAccountBot, OrdersBot
+from tm_bot.services import bulk_update_mab_send_results
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_rate_is_limited(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, capacity=1, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [0.1, 0.1])
+
+    def test_pause_blocks_until_retry_after(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, capacity=1, clock=clock, sleep=clock.sleep)
+
+        bucket.pause(3)
+        bucket.acquire()
+
+        self.assertGreaterEqual(clock.now, 3)
+
+    def test_same_chat_waits_interval(self):
+        clock = FakeClock()
+        throttle = ChatThrottle(1.0, clock=clock, sleep=clock.sleep)
+
+        throttle.wait("1")
+        throttle.wait("2")
+        throttle.wait("1")
+
+        self.assertEqual(clock.sleeps, [1.0])
+
+
+class BroadcastSenderTests(SimpleTestCase):
+    message = build_broadcast_payload(None, None, "Привет", None, False)
+
+    def _send(self, server, recipients, **kwargs):
+        with override_settings(TELEGRAM_API_URL=server.url):
+            with BroadcastSender("TOKEN", self.message, rate=0, workers=4,
+                                 max_attempts=3, sleep=lambda s: None,
+                                 **kwargs) as sender:
+                return sender.send_many(recipients)
+
+    def test_results_keep_recipient_order(self):
+        recipients = [Recipient(i, str(1000 + i)) for i in range(20)]
+        with FakeTelegramServer(blocked_chats=["1005"]) as server:
+            results = self._send(server, recipients)
+
+        self.assertEqual([r.key for r in results], list(range(20)))
+        self.assertEqual(results[5].status, "bot was blocked")
+        self.assertEqual(results[5].db_error_code, "403_bot_blocked")
+        self.assertEqual(sum(r.status == "ok" for r in results), 19)
+        self.assertEqual(len(server.requests), 20)
+        self.assertEqual(server.requests[0][0], "sendMessage")
+
+    def test_rate_limited_is_retried_after_pause(self):
+        with FakeTelegramServer(flood_first=1, retry_after=0) as server:
+            results = self._send(server, [Recipient(1, "1001")])
+
+        self.assertEqual(results[0].status, "ok")
+        self.assertEqual(results[0].attempts, 2)
+
+    def test_no_chat_id_is_not_sent(self):
+        with FakeTelegramServer() as server:
+            results = self._send(server, [Recipient(1, None)])
+
+        self.assertEqual(results[0].status, "invalid chat")
+        self.assertEqual(server.requests, [])
+
+
+class BulkUpdateMabTests(TestCase):
+    def setUp(self):
+        self.bot = OrdersBot.objects.create(
+            msngr_type="tm", name="test bot", city="Beograd",
+            link="https://t.me/test_bot",
+            frontend_link="https://t.me/test_bot")
+        self.accounts = [
+            MessengerAccount.objects.create(msngr_type="tm",
+                                            msngr_id=f"10000{i}")
+            for i in range(3)
+        ]
+        # у первого связка уже есть
+        MessengerAccountBot.objects.create(
+            messenger_account=self.accounts[0], bot=self.bot,
+            tg_can_write=False, last_error_code="403_bot_blocked")
+
+    def test_results_are_written_in_batch(self):
+        ok, blocked, temporary = self.accounts
+
+        with self.assertNumQueries(4):
+            bulk_update_mab_send_results(self.bot, [
+                (ok.id, "ok", None),
+                (blocked.id, "bot was blocked", "403_bot_blocked"),
+                (temporary.id, "temporary error", "502_telegram_server_error"),
+            ])
+
+        links = {mab.messenger_account_id: mab
+                 for mab in MessengerAccountBot.objects.filter(bot=self.bot)}
+        self.assertTrue(links[ok.id].tg_can_write)
+        self.assertIsNone(links[ok.id].last_error_code)
+        self.assertIsNotNone(links[ok.id].last_success_at)
+        self.assertFalse(links[blocked.id].tg_can_write)
+        self.assertIsNone(links[temporary.id].tg_can_write)
+        self.assertEqual(links[temporary.id].last_error_code,
+                         "502_telegram_server_error")
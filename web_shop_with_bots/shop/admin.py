@@ -1,17 +1,20 @@
-from api.admin_views import AdminReportView, AdminXlsReportView
+from api.admin_views import (AdminReportView, AdminXlsReportView,
+                             AdminXlsReportDownloadView,
+                             AdminXlsReportJobsView)
 from django.contrib import admin
 from django.utils.html import format_html
 from utils.utils import active_actions
 import shop.admin_filters as admin_filters
 import shop.reports.excel as xls_reports
+from shop.reports.jobs import visible_report_jobs
 import shop.admin_utils as admin_utils
 import shop.forms as shop_forms
 
 from shop.models import (Dish, Order, OrderDish, Discount,
                          OrderGlovoProxy, OrderWoltProxy,
                          OrderSmokeProxy, OrderNeTaDverProxy,
-                         OrderSealTeaProxy)
-from tm_bot.services import (send_message_new_order_admin_user,
+                         OrderSealTeaProxy, ReportJob)
+from tm_bot.services import (schedule_new_order_admin_notification,
                              send_messages_order_status_update_user_bot)
 from django import forms
 
@@ -23,11 +26,13 @@ from django.contrib.admin.views.main import ChangeList
 from django.urls import reverse, path
 from django.shortcuts import redirect
 from django.conf import settings
+from django.db import transaction
 from users.models import user_add_new_order_data
 from utils.admin_permissions import has_restaurant_admin_permissions
 from utils.admin_audit_mixin import ValidationLoggingMixin
 
 import logging
+from contextlib import nullcontext
 logger = logging.getLogger(__name__)
 
 
@@ -42,6 +47,45 @@ class DiscountAdmin(admin.ModelAdmin):
     list_filter = ('is_active',)
 
 
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    """Фоновые выгрузки заказов в Excel: статус, процент, файл."""
+    list_display = ['id', 'filename', 'report_type', 'restaurant',
+                    'status', 'progress_display', 'created_by',
+                    'created_at', 'expires_at', 'download_link']
+    list_filter = ('status', 'report_type')
+    list_select_related = ('restaurant', 'created_by')
+    readonly_fields = ('report_type', 'date_from', 'date_to', 'restaurant',
+                       'status', 'progress_display', 'rows_total',
+                       'download_link', 'error', 'created_by', 'created_at',
+                       'started_at', 'finished_at', 'expires_at')
+    exclude = ('file', 'filename', 'progress')
+
+    def get_queryset(self, request):
+        return visible_report_jobs(request.user).select_related(
+            'restaurant', 'created_by')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress_display(self, obj):
+        return format_html(
+            '<progress max="100" value="{}"></progress> {}%',
+            obj.progress, obj.progress)
+    progress_display.short_description = 'Прогресс'
+
+    def download_link(self, obj):
+        if obj.status != ReportJob.Status.DONE:
+            return '—'
+        return format_html(
+            '<a href="{}">Скачать</a>',
+            reverse('admin:shop_order_xls_report_download', args=[obj.pk]))
+    download_link.short_description = 'Файл'
+
+
 class OrderDishInline(admin.TabularInline):
     """Вложенная админка OrderDish для добавления товаров в заказ (создания записей OrderDish)
     сразу в админке заказа (через объект Order)."""
@@ -373,6 +417,10 @@ class OrderAdmin(ValidationLoggingMixin, admin.ModelAdmin):
         custom_urls = [
             path('report/', AdminReportView.as_view(), name='shop_order_report'),
             path('xls_report/', AdminXlsReportView.as_view(), name='shop_order_xls_report'),
+            path('xls_report/jobs/', AdminXlsReportJobsView.as_view(),
+                 name='shop_order_xls_report_jobs'),
+            path('xls_report/jobs/<int:pk>/download/', AdminXlsReportDownloadView.as_view(),
+                 name='shop_order_xls_report_download'),
             path('<path:object_id>/change/', self.change_view, name='order_change'),
         ]
         return custom_urls + urls
@@ -392,8 +440,14 @@ class OrderAdmin(ValidationLoggingMixin, admin.ModelAdmin):
 
             extra_context = admin_utils.get_changelist_extra_context(request, extra_context)
 
-            response = super(OrderAdmin, self).changelist_view(
-                request, extra_context=extra_context)
+            # массовая правка статусов (list_editable) — одной транзакцией:
+            # смены статусов копятся в пачку и после коммита уходят одной
+            # таской send_order_status_updates_task, а не таской на заказ
+            atomic = (transaction.atomic() if request.method == 'POST'
+                      else nullcontext())
+            with atomic:
+                response = super(OrderAdmin, self).changelist_view(
+                    request, extra_context=extra_context)
             response["Cache-Control"] = "no-store, no-cache, must-revalidate"
             response["Pragma"] = "no-cache"
             return response
@@ -468,7 +522,7 @@ class OrderAdmin(ValidationLoggingMixin, admin.ModelAdmin):
             self.save_formset(request, form, formset, change=change)
         if not change:
             if form.instance.source not in settings.PARTNERS_LIST:
-                send_message_new_order_admin_user(form.instance)
+                schedule_new_order_admin_notification(form.instance)
             if form.instance.user:
                 user_add_new_order_data(form.instance)
 
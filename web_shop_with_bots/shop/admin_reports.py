@@ -1,5 +1,4 @@
 from django.conf import settings
-from decimal import Decimal
 from datetime import datetime, timedelta
 from django.utils import timezone
 from openpyxl import Workbook
@@ -9,201 +8,6 @@ from shop.models import Order
 from django.conf import settings
 
 
-def get_report_data(orders_list):
-    #Разбираем заказы по типам для дальнейшего анализа
-    delivery_orders = []
-    takeaway_orders = []
-    partners_orders = []
-    restaurant_orders = []
-    for order in orders_list:
-        if order.delivery.type == 'delivery':
-            delivery_orders.append(order)
-        if order.delivery.type == 'restaurant':
-            takeaway_orders.append(order)
-            restaurant_orders.append(order)
-        elif order.delivery.type == 'takeaway':
-            takeaway_orders.append(order)
-            if order.source in settings.PARTNERS_LIST:
-                partners_orders.append(order)
-
-    # Calculate the total discounted amount and total receipts
-    total_amount = sum(order.final_amount_with_shipping for order in orders_list)
-    total_qty = orders_list.count()
-    total_discounts_amount = sum(order.discount_amount for order in orders_list)
-    total_receipts = sum(order.invoice for order in orders_list)
-
-    total_nocash = (sum(order.final_amount_with_shipping for order in orders_list if order.source != 'P2-2' and order.payment_type == 'cash' and order.invoice is False))
-                    # + sum(order.final_amount_with_shipping for order in partners_orders if order.source == 'P2-2'))    # не та дверь платит налом без чека
-    total_gotovina = sum(order.final_amount_with_shipping for order in orders_list if order.payment_type == 'cash' and order.invoice is True)
-    _takeaway_gotovina = sum(order.final_amount_with_shipping for order in takeaway_orders if order.payment_type == 'cash' and order.invoice is True)
-    # Calculate total takeaways
-    takeaway_nocash = (sum(order.final_amount_with_shipping for order in takeaway_orders if order.source != 'P2-2' and order.payment_type == 'cash' and order.invoice is False))
-                      # + sum(order.final_amount_with_shipping for order in partners_orders if order.source == 'P2-2'))    # не та дверь платит налом без чека
-    takeaway_gotovina = total_gotovina
-    takeaway_card = sum(order.final_amount_with_shipping for order in takeaway_orders if order.payment_type in ['card', 'card_on_delivery'])
-
-    # Prepare partners data
-    SOURCE_DICT = dict(settings.SOURCE_TYPES)
-    partners = {}
-    for order in partners_orders:
-        partner_name = SOURCE_DICT[order.source]
-        if partner_name in partners:
-            partners[partner_name] += order.final_amount_with_shipping
-        else:
-            partners[partner_name] = order.final_amount_with_shipping
-    if 'Не та дверь' in partners:
-        partners['Ne_ta_dver'] = partners.pop('Не та дверь')
-
-    restaurant_am = sum(order.final_amount_with_shipping for order in restaurant_orders)
-
-    total_smoke = partners.get('Smoke', Decimal('0'))
-    total_ne_ta = partners.get('Ne_ta_dver', Decimal('0'))
-    total_curiers_show = sum(order.final_amount_with_shipping for order in delivery_orders if order.payment_type == 'cash')
-    total_curiers = sum(order.final_amount_with_shipping for order in delivery_orders if order.payment_type == 'cash' and order.invoice is True)
-    total_terminal = total_amount - total_nocash - total_smoke - total_ne_ta
-
-    curiers = get_couriers_data(delivery_orders)
-
-    total_cash = get_cash_report_total(curiers, takeaway_nocash, _takeaway_gotovina)
-    drugo_bezgotovinsko = get_bezgotovinsko_report_total(curiers, partners)
-
-    report = {
-        'total_amount': f"{total_amount:.2f} ({total_qty} зак.)",
-        'takeaway_nocash': float(takeaway_nocash),
-        'takeaway_gotovina': float(takeaway_gotovina),
-        'takeaway_card': takeaway_card,
-        'total_curiers': total_curiers_show,
-        'total_terminal': total_terminal,
-        #'total_receipts': total_receipts,
-        'partners': partners,
-        'restaurant_am': restaurant_am,
-        'couriers': curiers,
-        'total_cash': total_cash,
-        'drugo_bezgotovinsko': drugo_bezgotovinsko,
-        'total_discounts_amount': total_discounts_amount,
-    }
-
-    return report
-
-
-def get_couriers_data(delivery_orders):
-    """
-    Get courier-related data aggregated by restaurant.
-    couriers = {
-        'courier_name': [Decimal('0') - сумма доставок для оплаты курьеру,   0
-                         Bool - есть ли "уточнить",                         1
-                         Decimal('0') - сумма заказов безнал,                2
-                         Decimal('0') - сумма заказов нал,                  3
-                         Decimal('0') - сумма заказов безнал + нал,          4
-                         Decimal('0') - сумма заказов карта (безготовинско), 5
-                         Decimal('0') - сумма минимальной оплаты за выход], 6
-        'total_cash': Dec,
-        'total_bezgotovinsko': Dec,
-        }
-    """
-
-    if not delivery_orders:
-        return {'Нет курьеров': [0, False, 0, 0, 0, 0, 0]}
-
-    couriers = {}
-    # накапливаем уникальные дни, когда курьер выходил (по заказам)
-    courier_days = {}  # {courier_name: set(dates)}
-
-    for order in delivery_orders:
-        courier_name = order.courier if order.courier else 'Unknown'
-        unclarified = False
-
-        # учитываем рабочие дни курьера, чтобы добавить коректно мин за выход
-        courier_days = couriers_working_days(order, courier_name, courier_days)
-
-        if order.delivery_zone.delivery_cost != float(0):
-            delivery_cost = order.delivery_zone.delivery_cost
-        elif order.delivery_zone.name == 'уточнить':
-            delivery_cost = order.delivery_cost
-            unclarified = True
-        elif order.delivery_zone.name == 'по запросу':
-            delivery_cost = order.delivery_cost
-
-        if courier_name in couriers:
-            couriers[courier_name][0] -= delivery_cost
-        else:
-            couriers[courier_name] = [
-                Decimal('0'),  # 0: сумма выплат курьеру (минусуем как расходы)
-                False,         # 1: был "уточнить"
-                Decimal('0'),  # 2: безнал (cash без чека у вас это "nocash")
-                Decimal('0'),  # 3: нал с чеком
-                Decimal('0'),  # 4: суммарно (2+3)
-                Decimal('0'),  # 5: карта (bezgotovinsko)
-                Decimal('0'),  # 6: итоговая минималка за все дни
-            ]
-            if order.courier:
-                couriers[courier_name][6] = order.courier.min_payout
-
-            couriers[courier_name][0] = 0 - delivery_cost
-        couriers[courier_name][1] = unclarified
-
-        if order.payment_type == 'cash' and order.invoice is False:
-            couriers[courier_name][2] += order.final_amount_with_shipping
-            couriers[courier_name][4] += order.final_amount_with_shipping  # доб в тотал нал + безнал
-        elif order.payment_type == 'cash' and order.invoice is True:
-            couriers[courier_name][3] += order.final_amount_with_shipping
-            couriers[courier_name][4] += order.final_amount_with_shipping  # доб в тотал нал + безнал
-        elif order.payment_type in ['card', 'card_on_delivery']:
-            couriers[courier_name][5] += order.final_amount_with_shipping
-
-    # в данных по курьерам корректируем мин оплату за выход по дням,
-    # и добавляем ключи 'total_cash', 'total_bezgotovinsko'
-    couriers = get_correct_min_payout_and_totals(couriers, courier_days)
-
-    # total_cash = Decimal('0')
-    # total_bezgotovinsko = Decimal('0')
-
-    # # к стоимостям доставок добавляем оплату минимальную за выход
-    # for courier_name, results in couriers.items():
-    #     day_count = len(courier_days.get(courier_name, set()))
-    #     daily_min = results[6]  # ставка за 1 день (Decimal)
-    #     results[6] = (daily_min * day_count) if daily_min else Decimal('0')
-
-    #     # к расходам на курьера добавляем общую сумму минималок за период
-    #     results[0] -= results[6]
-
-    #     total_cash += results[0]      # выплаты курьеру (расход)
-    #     total_cash += results[4]      # наличные выручки (nocash+gotovina)
-    #     total_bezgotovinsko += results[5]  # карта
-
-    # couriers.update({'total_cash': total_cash,
-    #                  'total_bezgotovinsko': total_bezgotovinsko})
-
-    return couriers
-
-
-def get_cash_report_total(curiers, takeaway_nocash, takeaway_gotovina):
-    total_cash = Decimal('0')
-
-    # суммируем курьеров
-    if 'total_cash' in curiers:
-        total_cash += curiers['total_cash']
-    # прибавляем безнал, gotovina
-    total_cash += takeaway_nocash
-    total_cash += takeaway_gotovina
-
-    return total_cash
-
-
-def get_bezgotovinsko_report_total(curiers, partners):
-    drugo_bezgotovinsko = Decimal('0')
-
-    # суммируем курьеров
-    if 'total_bezgotovinsko' in curiers:
-        drugo_bezgotovinsko += curiers['total_bezgotovinsko']
-    # прибавляем партнеров
-    for partner, total_value in partners.items():
-        if partner in ['Glovo', 'Wolt']:
-            drugo_bezgotovinsko += total_value
-
-    return drugo_bezgotovinsko
-
-
 #--------------------EXCELL-------------------------
 
 
@@ -486,46 +290,3 @@ def export_orders_to_excel(modeladmin, request, queryset):
 
 export_orders_to_excel.short_description = (
     "Сохранить отчет по продажам в Excel.")
-
-
-def couriers_working_days(order, courier_name, courier_days):
-    # берём адекватную дату для подсчёта "рабочего дня" и добавляем в список раочих дней
-    working_date = None
-    if getattr(order, 'execution_date', None):
-        working_date = order.execution_date
-    elif getattr(order, 'delivery_time', None):
-        working_date = order.delivery_time.date()
-    else:
-        working_date = order.created.astimezone(None).date()
-
-    if courier_name not in courier_days:
-        courier_days[courier_name] = set()
-    courier_days[courier_name].add(working_date)
-
-    return courier_days
-
-
-def get_correct_min_payout_and_totals(couriers, courier_days):
-    """ Итоговая оплата курьерам корректируется на кол-во мин оплат за выходы.
-    Добавляются ключи 'total_cash', 'total_bezgotovinsko'
-    - итого нала и безнала по всем курьерам."""
-    total_cash = Decimal('0')
-    total_bezgotovinsko = Decimal('0')
-
-    # к стоимостям доставок добавляем оплату минимальную за выход
-    for courier_name, results in couriers.items():
-        day_count = len(courier_days.get(courier_name, set()))
-        daily_min = results[6]  # ставка за 1 день (Decimal)
-        results[6] = (daily_min * day_count) if daily_min else Decimal('0')
-
-        # к расходам на курьера добавляем общую сумму минималок за период
-        results[0] -= results[6]
-
-        total_cash += results[0]      # выплаты курьеру (расход)
-        total_cash += results[4]      # наличные выручки (nocash+gotovina)
-        total_bezgotovinsko += results[5]  # карта
-
-    couriers.update({'total_cash': total_cash,
-                     'total_bezgotovinsko': total_bezgotovinsko})
-
-    return couriers
@@ -3,6 +3,7 @@
 
 from collections import defaultdict
 from shop.models import Order, Discount
+from shop.reports.ledger import get_day_report
 from shop.reports.summary import get_report_data
 from delivery_contacts.models import DeliveryZone
 from delivery_contacts.utils import get_google_api_key
@@ -11,7 +12,12 @@ from django.conf import settings
 from catalog.models import (Category, DishCategory,
                             Dish, DishCityPrice, DishPartnerPrice)
 import re
-from django.utils.html import format_html
+from django.core.cache import cache
+from django.utils.html import format_html, json_script
+from django.utils.safestring import mark_safe
+from api.utils.core_cache import (MENU_GROUP, DELIVERY_ZONES_GROUP,
+                                  DISCOUNTS_GROUP, ORDER_FORM_CACHE_KEY,
+                                  versioned_key_many)
 from shop.utils import get_flag
 from decimal import Decimal, ROUND_HALF_UP
 
@@ -85,8 +91,9 @@ def get_menu_data():
                 category_name = translation.name
                 break
 
-        if not category_name and category.translations.exists():
-            category_name = category.translations.first().name
+        # fallback по уже загруженным переводам, без exists()/first()
+        if not category_name and category.translations.all():
+            category_name = category.translations.all()[0].name
 
         if not category_name:
             category_name = f"Категория {category.id}"
@@ -140,8 +147,8 @@ def get_menu_data():
                 dish_name = translation.short_name
                 break
 
-        if not dish_name and dish.translations.exists():
-            dish_name = dish.translations.first().short_name
+        if not dish_name and dish.translations.all():
+            dish_name = dish.translations.all()[0].short_name
 
         if not dish_name:
             dish_name = f"Блюдо {dish.article}"
@@ -209,15 +216,55 @@ def get_discounts():
     return discounts
 
 
+def _order_form_groups(type):
+    if type == 'partner':
+        return (MENU_GROUP, DISCOUNTS_GROUP)
+    return (MENU_GROUP, DELIVERY_ZONES_GROUP, DISCOUNTS_GROUP)
+
+
+def build_order_form_data(type=None):
+    """
+    Данные формы заказа, уже сериализованные в <script type="application/json">
+    (как фильтр json_script): {'categories': '<script ...>', ...}.
+    """
+    categories, dishes = get_menu_data()
+    data = {
+        "categories": categories,
+        "dishes": dishes,
+        "discounts": get_discounts(),
+    }
+    if type != 'partner':
+        data["delivery_zones"] = get_delivery_zones()
+
+    return {name: str(json_script(value, f"{name}-data"))
+            for name, value in data.items()}
+
+
+def get_order_form_data(type=None):
+    """
+    Данные формы заказа из кэша. Ключ версионирован поколениями групп
+    menu, delivery_zones и discounts: правка блюда, цены, зоны или скидки
+    (сигналы cache_signals, actions) сдвигает поколение, и следующий
+    запрос собирает данные заново.
+    """
+    key = versioned_key_many(ORDER_FORM_CACHE_KEY.format(type=type or 'all'),
+                             *_order_form_groups(type))
+    data = cache.get(key)
+    if data is None:
+        data = build_order_form_data(type)
+        cache.set(key, data, settings.ORDER_FORM_CACHE_TIMEOUT)
+
+    return {name: mark_safe(script) for name, script in data.items()}
+
+
 def get_addchange_extra_context(request, extra_context, type=None, source=None):
     """ Формирует extra_conext в форму создания заказа.
-        Пробрасывает GOOGLE_API_KEY, menu, delivery_zones."""
-    extra_context["categories"], extra_context["dishes"] = get_menu_data()
-    extra_context["discounts"] = get_discounts()
+        Пробрасывает GOOGLE_API_KEY и order_form_data — готовые
+        json-скрипты меню, скидок и зон доставки (из кэша)."""
+    extra_context["order_form_data"] = get_order_form_data(type)
 
     if type != 'partner':
         extra_context["GOOGLE_API_KEY"] = get_google_api_key()
-        extra_context["delivery_zones"] = get_delivery_zones()
 
     return extra_context
 
@@ -249,15 +296,17 @@ def get_changelist_extra_context(request, extra_context, source=None):
         filters['restaurant'] = restaurant
         title = f"Заказы ресторана: {restaurant.city}/{restaurant.address}"
 
-        today_orders = Order.objects.filter(
-                    **filters
-                ).exclude(
-                    status='CND'
-                ).select_related(
-                    'delivery',
-                    'delivery_zone',
-                    'courier')
-        extra_context.update(get_report_data(today_orders))
+        if settings.ORDER_TOTALS_LEDGER:
+            # итоги дня ведутся сигналами заказа — одна выборка строк
+            extra_context.update(
+                get_day_report(restaurant, today, source=source))
+        else:
+            today_orders = Order.objects.filter(
+                        **filters
+                    ).exclude(
+                        status='CND'
+                    )
+            extra_context.update(get_report_data(today_orders))
 
     extra_context['title'] = title
 
@@ -0,0 +1,301 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from delivery_contacts.models import Courier, Delivery, DeliveryZone, Restaurant
+from shop.models import Order
+from shop.reports.summary import get_reports_data
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк сводного отчета суперадмина (AdminReportView) на "
+        "синтетических заказах за период: старый путь (заказы в Python, "
+        "exists() и отчет на каждый город/ресторан) против агрегатов "
+        "get_reports_data. Сверяет суммы. Всё откатывается.\n"
+        "Пример: python manage.py benchmark_report_data --days 365 "
+        "--per-day 60"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--per-day", type=int, default=60,
+                            help="заказов в день на ресторан")
+
+    def handle(self, *args, **options):
+        restaurants = list(Restaurant.objects.all())
+        deliveries = {(d.city, d.type): d for d in Delivery.objects.all()}
+        zones = list(DeliveryZone.objects.all())
+        couriers = list(Courier.objects.all())
+        if not (restaurants and zones and couriers) or not all(
+                (r.city, t) in deliveries for r in restaurants
+                for t in ('delivery', 'takeaway')):
+            raise CommandError(
+                "Нужны рестораны, доставка и самовывоз в их городах, "
+                "зоны доставки и курьеры.")
+
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                count = self._create_orders(restaurants, deliveries, zones,
+                                            couriers, options)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{count} заказов за {options['days']} дн. "
+                    f"({time.perf_counter() - start:.1f} s на создание)"))
+
+                end = timezone.localdate() + timedelta(days=1)
+                orders = Order.objects.filter(
+                    execution_date__gte=end - timedelta(days=options["days"]),
+                    execution_date__lt=end,
+                    restaurant__in=restaurants,
+                ).exclude(status='CND')
+
+                legacy = self._measure("legacy", lambda: _legacy_restaurant_data(
+                    orders, restaurants))
+                current = self._measure("aggregate", lambda: get_reports_data(
+                    orders, group_by=('city', 'restaurant')))
+                self._compare(legacy, current)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _create_orders(self, restaurants, deliveries, zones, couriers,
+                       options):
+        today = timezone.localdate()
+        sources = ['4', '3', '1'] + list(settings.PARTNERS_LIST)
+        payments = ['cash', 'card', 'card_on_delivery']
+        orders = []
+        for restaurant in restaurants:
+            city_couriers = [c for c in couriers
+                             if c.city == restaurant.city] or [None]
+            for day in range(options["days"]):
+                execution_date = today - timedelta(days=day)
+                for number in range(options["per_day"]):
+                    delivery_type = random.choice(
+                        ['delivery', 'delivery', 'takeaway'])
+                    is_delivery = delivery_type == 'delivery'
+                    orders.append(Order(
+                        order_number=100000 + number,
+                        restaurant=restaurant,
+                        city=restaurant.city,
+                        execution_date=execution_date,
+                        status='CFD',
+                        delivery=deliveries[(restaurant.city, delivery_type)],
+                        delivery_zone=random.choice(zones) if is_delivery else None,
+                        delivery_cost=Decimal(random.choice([0, 300, 450])),
+                        courier=(random.choice(city_couriers + [None])
+                                 if is_delivery else None),
+                        source=('4' if is_delivery
+                                else random.choice(sources)),
+                        payment_type=random.choice(payments),
+                        invoice=random.random() < 0.7,
+                        final_amount_with_shipping=Decimal(
+                            random.randint(800, 6000)),
+                        discount_amount=Decimal(random.choice([0, 0, 100])),
+                    ))
+        Order.objects.bulk_create(orders, batch_size=5000)
+        return len(orders)
+
+    def _measure(self, label, func):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"  {label:<10} {elapsed * 1000:10.1f} ms  "
+                          f"запросов: {len(queries)}")
+        return result
+
+    def _compare(self, legacy, current):
+        mismatches = 0
+        for key, old in legacy.items():
+            new = current.get(key)
+            if new is None or _numbers(old) != _numbers(new):
+                mismatches += 1
+                self.stdout.write(self.style.ERROR(f"  расхождение: {key}"))
+        if len(legacy) != len(current):
+            mismatches += 1
+            self.stdout.write(self.style.ERROR(
+                f"  групп: {len(legacy)} против {len(current)}"))
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(
+                f"  суммы совпадают ({len(legacy)} ресторанов)"))
+
+
+def _numbers(report):
+    # флаг «уточнить» старый код брал у последнего заказа курьера,
+    # новый — «был ли хоть один»; сверяем только суммы
+    report = dict(report)
+    report['couriers'] = {
+        name: (value if not isinstance(value, list)
+               else [item for index, item in enumerate(value) if index != 1])
+        for name, value in report['couriers'].items()
+    }
+    return report
+
+
+# ---------------------- старый путь (до агрегатов) ----------------------
+
+def _legacy_restaurant_data(orders, restaurants):
+    orders = orders.select_related('delivery', 'delivery_zone', 'courier',
+                                   'restaurant')
+    result = {}
+    for city_code in {r.city for r in restaurants}:
+        city_orders = orders.filter(city=city_code)
+        if not city_orders.exists():
+            continue
+        for restaurant in Restaurant.objects.filter(city=city_code,
+                                                    id__in=[r.id for r in restaurants]):
+            restaurant_orders = city_orders.filter(restaurant=restaurant)
+            if not restaurant_orders.exists():
+                continue
+            result[(city_code, restaurant.id)] = _legacy_report_data(
+                restaurant_orders)
+    return result
+
+
+def _legacy_report_data(orders_list):
+    delivery_orders = []
+    takeaway_orders = []
+    partners_orders = []
+    restaurant_orders = []
+    for order in orders_list:
+        if order.delivery.type == 'delivery':
+            delivery_orders.append(order)
+        elif order.delivery.type == 'restaurant':
+            takeaway_orders.append(order)
+            restaurant_orders.append(order)
+        elif order.delivery.type == 'takeaway':
+            takeaway_orders.append(order)
+            if order.source in settings.PARTNERS_LIST:
+                partners_orders.append(order)
+
+    def amount(orders, condition=lambda order: True):
+        return sum(order.final_amount_with_shipping
+                   for order in orders if condition(order))
+
+    def nocash(order):
+        return (order.source != 'P2-2' and order.payment_type == 'cash'
+                and order.invoice is False)
+
+    def gotovina(order):
+        return order.payment_type == 'cash' and order.invoice is True
+
+    total_amount = amount(orders_list)
+    total_qty = orders_list.count()
+    total_discounts_amount = sum(order.discount_amount for order in orders_list)
+    total_nocash = amount(orders_list, nocash)
+    total_gotovina = amount(orders_list, gotovina)
+    takeaway_gotovina_for_cash = amount(takeaway_orders, gotovina)
+    takeaway_nocash = amount(takeaway_orders, nocash)
+    takeaway_card = amount(takeaway_orders, lambda order: order.payment_type
+                           in ['card', 'card_on_delivery'])
+    restaurant_am = amount(restaurant_orders)
+
+    source_dict = dict(settings.SOURCE_TYPES)
+    partners = {}
+    for order in partners_orders:
+        partner_name = source_dict[order.source]
+        partners[partner_name] = (partners.get(partner_name, Decimal('0'))
+                                  + order.final_amount_with_shipping)
+    if 'Не та дверь' in partners:
+        partners['Ne_ta_dver'] = partners.pop('Не та дверь')
+
+    total_curiers = amount(delivery_orders,
+                           lambda order: order.payment_type == 'cash')
+    total_terminal = (total_amount - total_nocash
+                      - partners.get('Smoke', Decimal('0'))
+                      - partners.get('Ne_ta_dver', Decimal('0')))
+
+    couriers = _legacy_couriers_data(delivery_orders)
+    total_cash = (couriers.get('total_cash', Decimal('0'))
+                  + takeaway_nocash + takeaway_gotovina_for_cash)
+    drugo_bezgotovinsko = couriers.get('total_bezgotovinsko', Decimal('0'))
+    for partner, total_value in partners.items():
+        if partner in ['Glovo', 'Wolt']:
+            drugo_bezgotovinsko += total_value
+
+    return {
+        'total_amount': f"{total_amount:.2f} ({total_qty} зак.)",
+        'takeaway_nocash': float(takeaway_nocash),
+        'takeaway_gotovina': float(total_gotovina),
+        'takeaway_card': takeaway_card,
+        'restaurant_am': restaurant_am,
+        'total_curiers': total_curiers,
+        'total_terminal': total_terminal,
+        'partners': partners,
+        'couriers': couriers,
+        'total_cash': total_cash,
+        'drugo_bezgotovinsko': drugo_bezgotovinsko,
+        'total_discounts_amount': total_discounts_amount,
+    }
+
+
+def _legacy_couriers_data(delivery_orders):
+    if not delivery_orders:
+        return {'Нет курьеров': [0, False, 0, 0, 0, 0, 0]}
+
+    couriers = {}
+    courier_days = {}
+    for order in delivery_orders:
+        courier_name = order.courier if order.courier else 'Unknown'
+        if order.execution_date:
+            working_date = order.execution_date
+        elif order.delivery_time:
+            working_date = order.delivery_time.date()
+        else:
+            working_date = order.created.astimezone(None).date()
+        courier_days.setdefault(courier_name, set()).add(working_date)
+
+        unclarified = False
+        zone = order.delivery_zone
+        if zone.delivery_cost != float(0):
+            delivery_cost = zone.delivery_cost
+        elif zone.name == 'уточнить':
+            delivery_cost = order.delivery_cost
+            unclarified = True
+        elif zone.name == 'по запросу':
+            delivery_cost = order.delivery_cost
+        else:
+            delivery_cost = Decimal('0')
+
+        if courier_name not in couriers:
+            couriers[courier_name] = [Decimal('0'), False, Decimal('0'),
+                                      Decimal('0'), Decimal('0'),
+                                      Decimal('0'), Decimal('0')]
+            if order.courier:
+                couriers[courier_name][6] = order.courier.min_payout
+        couriers[courier_name][0] -= delivery_cost
+        couriers[courier_name][1] = unclarified
+
+        if order.payment_type == 'cash' and order.invoice is False:
+            couriers[courier_name][2] += order.final_amount_with_shipping
+            couriers[courier_name][4] += order.final_amount_with_shipping
+        elif order.payment_type == 'cash' and order.invoice is True:
+            couriers[courier_name][3] += order.final_amount_with_shipping
+            couriers[courier_name][4] += order.final_amount_with_shipping
+        elif order.payment_type in ['card', 'card_on_delivery']:
+            couriers[courier_name][5] += order.final_amount_with_shipping
+
+    total_cash = Decimal('0')
+    total_bezgotovinsko = Decimal('0')
+    for courier_name, results in couriers.items():
+        daily_min = results[6]
+        day_count = len(courier_days[courier_name])
+        results[6] = (daily_min * day_count) if daily_min else Decimal('0')
+        results[0] -= results[6]
+        total_cash += results[0] + results[4]
+        total_bezgotovinsko += results[5]
+    couriers.update({'total_cash': total_cash,
+                     'total_bezgotovinsko': total_bezgotovinsko})
+    return couriers
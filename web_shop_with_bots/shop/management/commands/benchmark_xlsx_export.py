@@ -0,0 +1,152 @@
+import io
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import Workbook
+
+from catalog.models import Dish
+from delivery_contacts.models import Delivery, Restaurant
+from shop.models import Order, OrderDish
+from shop.reports.excel import REPORT_FULL, write_orders_report
+from shop.reports.periods import get_range_period_from_params
+from shop.reports.querysets import get_filtered_orders_qs
+from shop.reports.rows import (build_full_order_row, build_full_orders_headers,
+                               build_order_item_row, build_order_items_headers)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк полного Excel-отчета (заказы + товары) на синтетических "
+        "заказах: старый путь (Workbook в памяти, querysets целиком, "
+        "xlsx в bytes) против потокового write_orders_report (iterator, "
+        "write_only, временный файл). Пиковая память — tracemalloc. "
+        "Всё откатывается.\n"
+        "Пример: python manage.py benchmark_xlsx_export --items 100000 "
+        "--per-order 5"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100000,
+                            help="товаров заказов всего")
+        parser.add_argument("--per-order", type=int, default=5)
+        parser.add_argument("--days", type=int, default=30)
+
+    def handle(self, *args, **options):
+        restaurant = Restaurant.objects.first()
+        delivery = Delivery.objects.filter(type='takeaway').first()
+        if restaurant is None or delivery is None:
+            raise CommandError("Нужны ресторан и самовывоз.")
+
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                orders, items = self._create_orders(restaurant, delivery,
+                                                    options)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{orders} заказов, {items} товаров "
+                    f"({time.perf_counter() - start:.1f} s на создание)"))
+
+                today = timezone.localdate()
+                period = get_range_period_from_params({
+                    'execution_date__range__gte': (
+                        today - timedelta(days=options["days"])
+                    ).strftime('%d.%m.%Y'),
+                    'execution_date__range__lte': today.strftime('%d.%m.%Y'),
+                })
+
+                self._measure("legacy", lambda: _legacy_export(period))
+                self._measure("streaming", lambda: _streaming_export(period))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _create_orders(self, restaurant, delivery, options):
+        today = timezone.localdate()
+        per_order = options["per_order"]
+        order_count = options["items"] // per_order
+        dishes = list(Dish.objects.values_list('pk', flat=True)[:per_order])
+        if len(dishes) < per_order:
+            dishes = [None] * per_order
+
+        orders = Order.objects.bulk_create([
+            Order(
+                order_number=200000 + number,
+                restaurant=restaurant,
+                city=restaurant.city,
+                execution_date=today - timedelta(
+                    days=number % options["days"]),
+                status='CFD',
+                delivery=delivery,
+                source='4',
+                payment_type='cash',
+                amount=Decimal(random.randint(800, 6000)),
+                final_amount_with_shipping=Decimal(random.randint(800, 6000)),
+                recipient_name='Бенчмарк',
+            )
+            for number in range(order_count)
+        ], batch_size=5000)
+        OrderDish.objects.bulk_create([
+            OrderDish(order=order, order_number=order.pk, dish_id=dish,
+                      quantity=2, unit_price=Decimal('500'),
+                      unit_amount=Decimal('1000'))
+            for order in orders
+            for dish in dishes
+        ], batch_size=10000)
+        return len(orders), len(orders) * per_order
+
+    def _measure(self, label, func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write(f"  {label:<10} {elapsed:8.1f} s  "
+                          f"пик памяти {peak / 2 ** 20:8.1f} MiB  "
+                          f"файл {size / 2 ** 20:6.1f} MiB")
+
+
+def _streaming_export(period):
+    with tempfile.TemporaryFile() as fileobj:
+        write_orders_report(fileobj, REPORT_FULL, period, None)
+        return fileobj.tell()
+
+
+# старый путь: всё в памяти, xlsx собирается в bytes
+
+def _legacy_export(period):
+    start_date, start_pref, end_date, end_pref = period
+    orders = list(get_filtered_orders_qs(start_date, start_pref,
+                                         end_date, end_pref, None))
+    items = list(
+        OrderDish.objects.filter(order__in=[order.pk for order in orders])
+        .select_related('order', 'dish', 'order__user', 'order__delivery',
+                        'order__delivery_zone', 'order__restaurant',
+                        'order__courier', 'order__discount',
+                        'order__msngr_account')
+        .order_by('order__execution_date', 'order__order_number', 'id'))
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(build_full_orders_headers())
+    for order in orders:
+        ws.append(build_full_order_row(order))
+    ws = wb.create_sheet('Order_items')
+    ws.append(build_order_items_headers())
+    for item in items:
+        ws.append(build_order_item_row(item))
+
+    content = io.BytesIO()
+    wb.save(content)
+    return content.tell()
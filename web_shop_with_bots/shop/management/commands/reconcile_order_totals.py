@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from delivery_contacts.models import Restaurant
+from shop.reports.ledger import diff_order_totals, rebuild_order_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет итоги дня (OrderDayTotals) с заказами за последние "
+        "--days дней и печатает расхождения. --fix — пересобрать итоги "
+        "периода по заказам.\n"
+        "Пример: python manage.py reconcile_order_totals --days 7 --fix"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=1,
+                            help="сколько последних дней, включая сегодня")
+        parser.add_argument("--date-from", type=date.fromisoformat,
+                            help="начало периода, YYYY-MM-DD")
+        parser.add_argument("--date-to", type=date.fromisoformat,
+                            help="конец периода, YYYY-MM-DD")
+        parser.add_argument("--restaurant", type=int, help="id ресторана")
+        parser.add_argument("--fix", action="store_true")
+
+    def handle(self, *args, **options):
+        date_to = options["date_to"] or timezone.now().date()
+        date_from = (options["date_from"]
+                     or date_to - timedelta(days=options["days"] - 1))
+        restaurant = (Restaurant.objects.get(pk=options["restaurant"])
+                      if options["restaurant"] else None)
+
+        diffs = diff_order_totals(date_from, date_to, restaurant)
+        for key, field, stored, actual in diffs:
+            self.stdout.write(self.style.ERROR(
+                f"  {key}: {field} в итогах {stored}, по заказам {actual}"))
+        self.stdout.write(
+            f"{date_from:%d.%m.%Y}–{date_to:%d.%m.%Y}: "
+            f"расхождений {len(diffs)}")
+
+        if options["fix"] and diffs:
+            rows = rebuild_order_totals(date_from, date_to, restaurant)
+            self.stdout.write(self.style.SUCCESS(
+                f"Итоги пересобраны: {rows} строк"))
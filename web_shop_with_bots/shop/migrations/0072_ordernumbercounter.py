@@ -0,0 +1,32 @@
+# Generated by Django 4.0 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_contacts', '0027_alter_delivery_options_and_more'),
+        ('shop', '0071_alter_cartdish_amount_alter_order_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('execution_date', models.DateField(verbose_name='Дата выполнения')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Последний номер')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_counters', to='delivery_contacts.restaurant', verbose_name='точка')),
+            ],
+            options={
+                'verbose_name': 'счётчик номеров заказов',
+                'verbose_name_plural': 'счётчики номеров заказов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ordernumbercounter',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'execution_date'), name='unique_order_counter_restaurant_date'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_contacts', '0028_geocodecacheentry'),
+        ('shop', '0072_ordernumbercounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDayTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('execution_date', models.DateField(verbose_name='Дата выполнения')),
+                ('source', models.CharField(choices=[('P1-1', 'Glovo'), ('P1-2', 'Wolt'), ('P2-1', 'Smoke'), ('P2-2', 'Не та дверь'), ('P3-1', 'Seal Tea'), ('1', 'внутренний'), ('3', 'TM_Bot'), ('4', 'сайт')], max_length=20, verbose_name='источник заказа')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='сумма заказов')),
+                ('total_discounts_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='сумма скидок')),
+                ('total_nocash', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='нал без чека')),
+                ('total_gotovina', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='нал с чеком')),
+                ('takeaway_nocash', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='самовывоз: нал без чека')),
+                ('takeaway_gotovina_for_cash', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='самовывоз: нал с чеком')),
+                ('takeaway_card', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='самовывоз: карта')),
+                ('restaurant_am', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='в ресторане')),
+                ('total_curiers', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='доставка: нал')),
+                ('pickup_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='самовывоз без ресторана (партнеры)')),
+                ('courier_nocash', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='курьер: нал без чека')),
+                ('courier_gotovina', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='курьер: нал с чеком')),
+                ('courier_card', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='курьер: карта')),
+                ('courier_delivery_costs', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='курьер: доставки к оплате')),
+                ('total_qty', models.IntegerField(default=0, verbose_name='заказов')),
+                ('pickup_qty', models.IntegerField(default=0, verbose_name='заказов самовывоза')),
+                ('delivery_qty', models.IntegerField(default=0, verbose_name='доставок')),
+                ('unclarified_qty', models.IntegerField(default=0, verbose_name='доставок «уточнить»')),
+                ('courier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='delivery_contacts.courier', verbose_name='Курьер')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_contacts.restaurant', verbose_name='точка')),
+            ],
+            options={
+                'verbose_name': 'итоги заказов за день',
+                'verbose_name_plural': 'итоги заказов за день',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderdaytotals',
+            index=models.Index(fields=['restaurant', 'execution_date'], name='order_day_totals_idx'),
+        ),
+    ]
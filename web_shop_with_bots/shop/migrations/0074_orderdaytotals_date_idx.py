@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0073_orderdaytotals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderdaytotals',
+            index=models.Index(fields=['execution_date', 'source'], name='order_day_totals_date_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.0 on 2026-10-18 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import shop.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('delivery_contacts', '0028_geocodecacheentry'),
+        ('shop', '0074_orderdaytotals_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('SHORT', 'Краткий'), ('LARGE', 'Полный')], max_length=10, verbose_name='Тип отчета')),
+                ('date_from', models.DateField(blank=True, null=True, verbose_name='Период с')),
+                ('date_to', models.DateField(blank=True, null=True, verbose_name='Период по')),
+                ('dedupe_key', models.CharField(editable=False, max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Формируется'), ('done', 'Готов'), ('error', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Прогресс, %')),
+                ('rows_total', models.PositiveIntegerField(default=0, verbose_name='Строк всего')),
+                ('file', models.FileField(blank=True, max_length=255, upload_to=shop.models.report_job_upload_to, verbose_name='Файл')),
+                ('filename', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начат')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Готов')),
+                ('expires_at', models.DateTimeField(verbose_name='Удалить после')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Запросил')),
+                ('restaurant', models.ForeignKey(blank=True, help_text='Пусто — все рестораны.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_contacts.restaurant', verbose_name='точка')),
+            ],
+            options={
+                'verbose_name': 'выгрузка заказов в Excel',
+                'verbose_name_plural': 'выгрузки заказов в Excel',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['dedupe_key', 'status'], name='report_job_dedupe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['expires_at'], name='report_job_expires_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('dedupe_key',), name='unique_active_report_job'),
+        ),
+    ]
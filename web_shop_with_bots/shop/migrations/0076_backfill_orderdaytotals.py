@@ -0,0 +1,45 @@
+# Generated by Django 4.0 on 2026-10-18 16:00
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+# график продаж на главной показывает до 365 дней
+BACKFILL_DAYS = 365
+
+
+def backfill_order_totals(apps, schema_editor):
+    """
+    Итоги дня по уже существующим заказам: сигналы ведут OrderDayTotals
+    только с этого деплоя, а шапка списка заказов и график продаж читают
+    их сразу. Как rebuild_order_totals, но на исторических моделях.
+    """
+    from shop.reports.ledger import KEY_FIELDS, LEDGER_AGGREGATES
+
+    Order = apps.get_model('shop', 'Order')
+    OrderDayTotals = apps.get_model('shop', 'OrderDayTotals')
+
+    date_from = timezone.now().date() - timedelta(days=BACKFILL_DAYS)
+    OrderDayTotals.objects.filter(execution_date__gte=date_from).delete()
+    rows = (Order.objects
+            .filter(execution_date__gte=date_from, restaurant__isnull=False)
+            .exclude(status='CND')
+            .order_by()
+            .values(*KEY_FIELDS)
+            .annotate(**{field: aggregate()
+                         for field, aggregate in LEDGER_AGGREGATES.items()}))
+    OrderDayTotals.objects.bulk_create(
+        [OrderDayTotals(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0075_reportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
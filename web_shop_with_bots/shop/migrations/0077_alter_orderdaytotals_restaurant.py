@@ -0,0 +1,56 @@
+# Generated by Django 4.0 on 2026-10-18 17:00
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+BACKFILL_DAYS = 365
+
+
+def backfill_orders_without_restaurant(apps, schema_editor):
+    """Итоги заказов без ресторана — 0076 их пропустила."""
+    from shop.reports.ledger import KEY_FIELDS, LEDGER_AGGREGATES
+
+    Order = apps.get_model('shop', 'Order')
+    OrderDayTotals = apps.get_model('shop', 'OrderDayTotals')
+
+    date_from = timezone.now().date() - timedelta(days=BACKFILL_DAYS)
+    OrderDayTotals.objects.filter(execution_date__gte=date_from,
+                                  restaurant__isnull=True).delete()
+    rows = (Order.objects
+            .filter(execution_date__gte=date_from, restaurant__isnull=True)
+            .exclude(status='CND')
+            .order_by()
+            .values(*KEY_FIELDS)
+            .annotate(**{field: aggregate()
+                         for field, aggregate in LEDGER_AGGREGATES.items()}))
+    OrderDayTotals.objects.bulk_create(
+        [OrderDayTotals(**row) for row in rows], batch_size=1000)
+
+
+def drop_orders_without_restaurant(apps, schema_editor):
+    OrderDayTotals = apps.get_model('shop', 'OrderDayTotals')
+    OrderDayTotals.objects.filter(restaurant__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_contacts', '0028_geocodecacheentry'),
+        ('shop', '0076_backfill_orderdaytotals'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop,
+                             drop_orders_without_restaurant),
+        migrations.AlterField(
+            model_name='orderdaytotals',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_contacts.restaurant', verbose_name='точка'),
+        ),
+        migrations.RunPython(backfill_orders_without_restaurant,
+                             migrations.RunPython.noop),
+    ]
@@ -4,8 +4,8 @@ from django.contrib.auth import get_user_model
 
 from django.core.validators import (MaxValueValidator,
                                     MinValueValidator)
-from django.db import models
-from django.db.models import Sum, F
+from django.db import IntegrityError, models, transaction
+from django.db.models import Sum, F, prefetch_related_objects
 from phonenumber_field.modelfields import PhoneNumberField
 from catalog.models import Dish, DishCityPrice, DishPartnerPrice
 from delivery_contacts.models import (Delivery, DeliveryZone,
@@ -26,6 +26,7 @@ from django.urls import reverse
 User = get_user_model()
 
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -476,6 +477,9 @@ class Order(models.Model):
                             self.recipient_address)
 
         is_admin_mode = kwargs.pop('is_admin_mode', False)
+        # блюда нового заказа (OrderDish.build_for_order) — если переданы,
+        # итоги считаются до INSERT и заказ сохраняется один раз
+        orderdishes = kwargs.pop('orderdishes', None)
 
         self.execution_date, new_order_num = get_execution_date(self.pk,
                                                                 self.execution_date,
@@ -484,9 +488,8 @@ class Order(models.Model):
 
         if self.pk is None:  # Если объект новый
 
-            self.order_number = get_next_item_id(Order, 'order_number',
-                                                 self.restaurant,
-                                                 self.execution_date)
+            self.order_number = OrderNumberCounter.next_number(
+                self.restaurant, self.execution_date)
 
             self.is_first_order = get_first_order_true(self)
 
@@ -495,14 +498,22 @@ class Order(models.Model):
             self.language = (settings.DEDEFAULT_CREATE_LANGUAGE
                              if self.language is None else self.language)
 
+            if orderdishes:
+                self.calculate_totals(orderdishes, is_admin_mode)
+
             super(Order, self).save(*args, **kwargs)
+
+            if orderdishes:
+                for orderdish in orderdishes:
+                    orderdish.order = self
+                    orderdish.order_number = self.pk
+                OrderDish.objects.bulk_create(orderdishes)
             return
 
         # Если объект уже существует, выполнить рассчеты и другие действия
         if new_order_num:
-            self.order_number = get_next_item_id(Order, 'order_number',
-                                                 self.restaurant,
-                                                 self.execution_date)
+            self.order_number = OrderNumberCounter.next_number(
+                self.restaurant, self.execution_date)
 
         self.calculate_amount_with_shipping()
 
@@ -518,6 +529,20 @@ class Order(models.Model):
         # далее есть сигнал на сохранение актуальной корзины пользователя,
         # если есть, в completed
 
+    def calculate_totals(self, orderdishes, is_admin_mode=False):
+        """
+        Итоги заказа по блюдам в памяти — те же расчёты, что делает save
+        существующего заказа после каждого OrderDish, но без запросов
+        на сумму и кол-во.
+        """
+        self.amount = sum((orderdish.unit_amount for orderdish in orderdishes),
+                          Decimal("0.00"))
+        self.items_qty = sum(orderdish.quantity for orderdish in orderdishes)
+
+        self.calculate_amount_with_shipping()
+        self.calculate_discontinued_amount(is_admin_mode)
+        self.final_amount_with_shipping = self.discounted_amount
+
     def get_restaurant(self, city, restaurant, delivery_type,
                        recipient_address=None):
         """
@@ -569,6 +594,306 @@ class Order(models.Model):
         return SOURCE_DICT[self.source]
 
 
+class OrderNumberCounter(models.Model):
+    """
+    Последний выданный номер заказа на (ресторан, дата выполнения).
+
+    Номер выдаётся под блокировкой строки счётчика (SELECT ... FOR UPDATE):
+    вместо MAX(order_number) по всем заказам дня — чтение и запись одной
+    строки, и два одновременных заказа не получат один номер.
+    Блокировка держится до конца транзакции, в которой создаётся заказ,
+    поэтому при откате номер не теряется (нумерация без дыр).
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        verbose_name='точка',
+        related_name='order_counters',
+    )
+    execution_date = models.DateField(
+        'Дата выполнения',
+    )
+    last_number = models.PositiveIntegerField(
+        'Последний номер',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счётчик номеров заказов'
+        verbose_name_plural = 'счётчики номеров заказов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['restaurant', 'execution_date'],
+                name='unique_order_counter_restaurant_date'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.restaurant_id}/{self.execution_date}: {self.last_number}'
+
+    @classmethod
+    def next_number(cls, restaurant, execution_date):
+        if restaurant is None or execution_date is None:
+            # без ресторана/даты уникальность номера не ограничена
+            return get_next_item_id(Order, 'order_number',
+                                    restaurant, execution_date)
+
+        with transaction.atomic():
+            counter = (cls.objects
+                       .select_for_update()
+                       .filter(restaurant=restaurant,
+                               execution_date=execution_date)
+                       .first())
+            if counter is None:
+                counter = cls._create_counter(restaurant, execution_date)
+
+            counter.last_number += 1
+            counter.save(update_fields=['last_number'])
+
+        return counter.last_number
+
+    @classmethod
+    def _create_counter(cls, restaurant, execution_date):
+        # первый заказ дня: продолжаем нумерацию уже существующих заказов
+        # (заказы до появления счётчика, перенос даты выполнения)
+        last_number = get_next_item_id(Order, 'order_number',
+                                       restaurant, execution_date) - 1
+        try:
+            with transaction.atomic():
+                return cls.objects.create(restaurant=restaurant,
+                                          execution_date=execution_date,
+                                          last_number=last_number)
+        except IntegrityError:
+            # параллельный заказ создал счётчик первым — ждём его строку
+            return (cls.objects
+                    .select_for_update()
+                    .get(restaurant=restaurant,
+                         execution_date=execution_date))
+
+
+class OrderDayTotals(models.Model):
+    """
+    Накопительные итоги заказов дня для шапки списка заказов.
+
+    Строка — (ресторан, дата выполнения, источник, курьер); суммы
+    разложены по тем же корзинам, что и сводный отчет
+    (shop/reports/summary.py). Сохранение и удаление заказа применяет
+    к строкам разницу «было/стало» (shop/reports/ledger.py), поэтому
+    шапка читает несколько строк вместо пересчета всех заказов дня.
+    Строк с одним ключом может быть несколько — читатель их суммирует.
+    Заказы без ресторана копятся в строках с restaurant=NULL.
+    Сверка и пересборка — manage.py reconcile_order_totals.
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        verbose_name='точка',
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    execution_date = models.DateField(
+        'Дата выполнения',
+    )
+    source = models.CharField(
+        'источник заказа',
+        max_length=20,
+        choices=settings.SOURCE_TYPES,
+    )
+    courier = models.ForeignKey(
+        Courier,
+        on_delete=models.SET_NULL,
+        verbose_name='Курьер',
+        related_name='+',
+        blank=True, null=True,
+    )
+    total_amount = models.DecimalField(
+        'сумма заказов', max_digits=12, decimal_places=2, default=0,
+    )
+    total_discounts_amount = models.DecimalField(
+        'сумма скидок', max_digits=12, decimal_places=2, default=0,
+    )
+    total_nocash = models.DecimalField(
+        'нал без чека', max_digits=12, decimal_places=2, default=0,
+    )
+    total_gotovina = models.DecimalField(
+        'нал с чеком', max_digits=12, decimal_places=2, default=0,
+    )
+    takeaway_nocash = models.DecimalField(
+        'самовывоз: нал без чека', max_digits=12, decimal_places=2, default=0,
+    )
+    takeaway_gotovina_for_cash = models.DecimalField(
+        'самовывоз: нал с чеком', max_digits=12, decimal_places=2, default=0,
+    )
+    takeaway_card = models.DecimalField(
+        'самовывоз: карта', max_digits=12, decimal_places=2, default=0,
+    )
+    restaurant_am = models.DecimalField(
+        'в ресторане', max_digits=12, decimal_places=2, default=0,
+    )
+    total_curiers = models.DecimalField(
+        'доставка: нал', max_digits=12, decimal_places=2, default=0,
+    )
+    pickup_amount = models.DecimalField(
+        'самовывоз без ресторана (партнеры)', max_digits=12, decimal_places=2, default=0,
+    )
+    courier_nocash = models.DecimalField(
+        'курьер: нал без чека', max_digits=12, decimal_places=2, default=0,
+    )
+    courier_gotovina = models.DecimalField(
+        'курьер: нал с чеком', max_digits=12, decimal_places=2, default=0,
+    )
+    courier_card = models.DecimalField(
+        'курьер: карта', max_digits=12, decimal_places=2, default=0,
+    )
+    courier_delivery_costs = models.DecimalField(
+        'курьер: доставки к оплате', max_digits=12, decimal_places=2, default=0,
+    )
+    total_qty = models.IntegerField('заказов', default=0)
+    pickup_qty = models.IntegerField('заказов самовывоза', default=0)
+    delivery_qty = models.IntegerField('доставок', default=0)
+    unclarified_qty = models.IntegerField('доставок «уточнить»', default=0)
+
+    class Meta:
+        verbose_name = 'итоги заказов за день'
+        verbose_name_plural = 'итоги заказов за день'
+        indexes = [
+            models.Index(fields=['restaurant', 'execution_date'],
+                         name='order_day_totals_idx'),
+            # продажи по дням всех ресторанов (shop/reports/sales.py)
+            models.Index(fields=['execution_date', 'source'],
+                         name='order_day_totals_date_idx'),
+        ]
+
+    def __str__(self):
+        return (f'{self.restaurant_id}/{self.execution_date}/'
+                f'{self.source}: {self.total_qty}')
+
+
+def report_job_upload_to(instance, filename):
+    # uuid в пути: ссылку на MEDIA не подобрать
+    return f'{settings.XLSX_REPORTS_DIR}/{uuid.uuid4().hex}/{filename}'
+
+
+class ReportJob(models.Model):
+    """
+    Фоновая выгрузка заказов в Excel (shop/reports/jobs.py).
+
+    Задача shop.tasks.build_report_job_task на очереди reports пишет
+    файл в MEDIA и обновляет progress; страница отчета и список
+    выгрузок в админке показывают процент и ссылку на файл. Одинаковые
+    запросы (тип, период, ресторан) получают одну и ту же выгрузку —
+    dedupe_key. После expires_at выгрузку и файл удаляет
+    shop.tasks.cleanup_report_jobs_task.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Формируется'
+        DONE = 'done', 'Готов'
+        ERROR = 'error', 'Ошибка'
+
+    ACTIVE_STATUSES = (Status.PENDING, Status.RUNNING)
+
+    REPORT_TYPES = (
+        ('SHORT', 'Краткий'),
+        ('LARGE', 'Полный'),
+    )
+
+    report_type = models.CharField(
+        'Тип отчета',
+        max_length=10,
+        choices=REPORT_TYPES,
+    )
+    date_from = models.DateField(
+        'Период с',
+        blank=True, null=True,
+    )
+    date_to = models.DateField(
+        'Период по',
+        blank=True, null=True,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        verbose_name='точка',
+        related_name='+',
+        blank=True, null=True,
+        help_text='Пусто — все рестораны.',
+    )
+    dedupe_key = models.CharField(
+        max_length=64,
+        editable=False,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    progress = models.PositiveSmallIntegerField(
+        'Прогресс, %',
+        default=0,
+    )
+    rows_total = models.PositiveIntegerField(
+        'Строк всего',
+        default=0,
+    )
+    file = models.FileField(
+        'Файл',
+        upload_to=report_job_upload_to,
+        max_length=255,
+        blank=True,
+    )
+    filename = models.CharField(
+        'Имя файла',
+        max_length=255,
+        blank=True,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        verbose_name='Запросил',
+        related_name='+',
+        blank=True, null=True,
+    )
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+    started_at = models.DateTimeField('Начат', blank=True, null=True)
+    finished_at = models.DateTimeField('Готов', blank=True, null=True)
+    expires_at = models.DateTimeField('Удалить после')
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'выгрузка заказов в Excel'
+        verbose_name_plural = 'выгрузки заказов в Excel'
+        constraints = [
+            # одна активная выгрузка на ключ — гонка двух кликов
+            # заканчивается IntegrityError, второй получает первую
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_report_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['dedupe_key', 'status'],
+                         name='report_job_dedupe_idx'),
+            models.Index(fields=['expires_at'],
+                         name='report_job_expires_idx'),
+        ]
+
+    def __str__(self):
+        return self.filename or f'{self.get_report_type_display()} #{self.pk}'
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
 class OrderWoltProxy(Order):
     objects = models.Manager()
 
@@ -729,26 +1054,68 @@ class OrderDish(models.Model):
             "discount",
         ])
 
+    @staticmethod
+    def build_for_order(order, items):
+        """
+        Несохранённые OrderDish для заказа из [{'dish': Dish, 'quantity': n}]
+        с рассчитанными ценами. Цены всех блюд подтягиваются разом.
+        """
+        prefetch_dish_prices(items)
+
+        orderdishes = []
+        for item in items:
+            dish = item['dish']
+            unit_price = dish.resolve_price(order.city, order.source)
+            orderdishes.append(OrderDish(
+                order=order,
+                dish=dish,
+                quantity=item['quantity'],
+                dish_article=dish.pk,
+                order_number=order.pk,
+                unit_price=unit_price,
+                unit_amount=(
+                    Decimal(unit_price) * Decimal(item['quantity'])
+                ).quantize(Decimal("0.01")),
+            ))
+        return orderdishes
+
     @staticmethod
     def create_orderdishes_from_cartdishes(order,
                                            cartdishes=None,
                                            no_cart_cartdishes=None):
+        """
+        Блюда в уже сохранённый заказ: один bulk_create и один пересчёт
+        заказа вместо save заказа на каждое блюдо.
+        """
         if cartdishes:
-            for cartdish in cartdishes:
+            items = [{'dish': cartdish.dish, 'quantity': cartdish.quantity}
+                     for cartdish in cartdishes]
+        elif no_cart_cartdishes:
+            items = no_cart_cartdishes
+        else:
+            return
 
-                OrderDish.objects.create(
-                    order=order,
-                    dish=cartdish.dish,
-                    quantity=cartdish.quantity
-                )
+        orderdishes = OrderDish.build_for_order(order, items)
+        OrderDish.objects.bulk_create(orderdishes)
 
-        elif no_cart_cartdishes:
-            for cartdish in no_cart_cartdishes:
-                OrderDish.objects.create(
-                    order=order,
-                    dish=cartdish['dish'],
-                    quantity=cartdish['quantity']
-                )
+        total_amount = OrderDish.objects.filter(
+            order=order
+        ).aggregate(
+            ta=Sum("unit_amount")
+        )["ta"]
+
+        order.amount = total_amount if total_amount is not None else Decimal("0.00")
+        order.save(update_fields=[
+            "delivery_cost",
+            "items_qty",
+            "amount",
+            "amount_with_shipping",
+            "promocode_disc_amount",
+            "discount_amount",
+            "discount",
+            "discounted_amount",
+            "final_amount_with_shipping",
+        ])
 
 
 class Discount(models.Model):
@@ -822,11 +1189,22 @@ class Discount(models.Model):
             return self.discount_am
 
 
+def prefetch_dish_prices(items):
+    """
+    Цены сайта и партнёров для всех блюд [{'dish': Dish, ...}] —
+    по запросу на связь вместо запросов на каждое блюдо в resolve_price.
+    """
+    prefetch_related_objects([item['dish'] for item in items],
+                             'city_prices', 'partner_prices')
+
+
 def get_amount(cart=None, items=None, city=None, source=None):
     if cart:
         return cart.amount
 
     if items:
+        if city:
+            prefetch_dish_prices(items)
         amount = Decimal(0)
         for item in items:
             dish = item['dish']
@@ -1,6 +1,24 @@
+"""
+excel.py — выгрузка заказов в Excel (краткий и полный отчет).
+
+Память не растет с периодом:
+- заказы и товары читаются .iterator(chunk_size=...) — в Postgres это
+  серверный курсор, в памяти одна пачка;
+- книга openpyxl write_only пишет строки во временные файлы листов;
+- готовый xlsx собирается во временный файл на диске и отдается
+  FileResponse (StreamingHttpResponse) кусками, а не одним bytes.
+
+Большие периоды формируются в фоне (ReportJob, shop/reports/jobs.py):
+тот же write_orders_report, но в задаче на очереди reports.
+"""
+
+import tempfile
 from datetime import datetime
 
-from django.http import HttpResponse
+from django.contrib import messages
+from django.http import FileResponse
+from django.shortcuts import redirect
+from django.urls import reverse
 from django.utils import timezone
 from openpyxl import Workbook
 
@@ -16,12 +34,22 @@ from .rows import (
 )
 
 
-def create_excel_response(filename):
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+XLSX_CONTENT_TYPE = (
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+)
+
+REPORT_SHORT = 'SHORT'
+REPORT_FULL = 'LARGE'
+
+ORDERS_CHUNK_SIZE = 2000
+ORDER_ITEMS_CHUNK_SIZE = 5000
+
+
+def create_excel_response(fileobj, filename):
+    """Отдает готовый файл кусками; временный файл закроется по отдаче."""
+    fileobj.seek(0)
+    return FileResponse(fileobj, as_attachment=True, filename=filename,
+                        content_type=XLSX_CONTENT_TYPE)
 
 
 def write_sheet_with_rows(workbook, title, first_row, headers, rows):
@@ -33,61 +61,117 @@ def write_sheet_with_rows(workbook, title, first_row, headers, rows):
     return ws
 
 
-def export_full_orders_to_excel(modeladmin, request, queryset):
-    start_date, start_pref, end_date, end_pref = get_range_period(request)
+def get_report_file_data(period, report_type):
+    """(имя файла, название листа, первая строка) для периода."""
+    start_date, _, end_date, _ = period
     current_date = datetime.now(timezone.utc).strftime('%d-%m-%Y')
-
-    filename, ws_title, first_row = get_file_data(
-        start_date,
-        end_date,
-        current_date,
-        'LARGE',
-    )
-
-    response = create_excel_response(filename)
-    admin = request.user
+    return get_file_data(start_date, end_date, current_date, report_type)
+
+
+def _counted(rows, progress, step=1000):
+    # progress(n) — сколько строк листа уже записано
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        if progress is not None and count % step == 0:
+            progress(count)
+        yield row
+    if progress is not None:
+        progress(count)
+
+
+def write_orders_report(fileobj, report_type, period, admin, progress=None):
+    """
+    Пишет отчет в fileobj (xlsx). period — результат get_range_period,
+    admin — пользователь, по ресторану которого фильтруются заказы.
+    progress(sheet, rows) вызывается по мере записи листов.
+    """
+    start_date, start_pref, end_date, end_pref = period
+    _, ws_title, first_row = get_report_file_data(period, report_type)
+
+    def sheet_progress(sheet):
+        if progress is None:
+            return None
+        return lambda rows: progress(sheet, rows)
 
     orders_qs = get_filtered_orders_qs(
-        start_date,
-        start_pref,
-        end_date,
-        end_pref,
-        admin,
-    )
-    orderdishes_qs = get_filtered_orderdishes_qs(
-        start_date,
-        start_pref,
-        end_date,
-        end_pref,
-        admin,
-    )
+        start_date, start_pref, end_date, end_pref, admin)
 
     wb = Workbook(write_only=True)
 
-    write_sheet_with_rows(
-        workbook=wb,
-        title=ws_title[:31],
-        first_row=first_row,
-        headers=build_full_orders_headers(),
-        rows=(
-            build_full_order_row(order)
-            for order in orders_qs.iterator(chunk_size=500)
-        ),
-    )
-
-    write_sheet_with_rows(
-        workbook=wb,
-        title='Order_items',
-        first_row=first_row,
-        headers=build_order_items_headers(),
-        rows=(
-            build_order_item_row(item)
-            for item in orderdishes_qs.iterator(chunk_size=1000)
-        ),
-    )
-
-    wb.save(response)
-    return response
+    if report_type == REPORT_FULL:
+        orderdishes_qs = get_filtered_orderdishes_qs(
+            start_date, start_pref, end_date, end_pref, admin)
+        write_sheet_with_rows(
+            workbook=wb,
+            title=ws_title[:31],
+            first_row=first_row,
+            headers=build_full_orders_headers(),
+            rows=_counted(
+                (build_full_order_row(order)
+                 for order in orders_qs.iterator(chunk_size=ORDERS_CHUNK_SIZE)),
+                sheet_progress('orders')),
+        )
+        write_sheet_with_rows(
+            workbook=wb,
+            title='Order_items',
+            first_row=first_row,
+            headers=build_order_items_headers(),
+            rows=_counted(
+                (build_order_item_row(item)
+                 for item in orderdishes_qs.iterator(
+                     chunk_size=ORDER_ITEMS_CHUNK_SIZE)),
+                sheet_progress('order_items')),
+        )
+    else:
+        write_sheet_with_rows(
+            workbook=wb,
+            title=ws_title[:31],
+            first_row=first_row,
+            headers=build_short_orders_headers(),
+            rows=_counted(
+                (build_short_order_row(order)
+                 for order in orders_qs.iterator(chunk_size=ORDERS_CHUNK_SIZE)),
+                sheet_progress('orders')),
+        )
+
+    wb.save(fileobj)
+
+
+def stream_orders_report(request, report_type):
+    period = get_range_period(request)
+    filename, _, _ = get_report_file_data(period, report_type)
+
+    fileobj = tempfile.TemporaryFile()
+    try:
+        write_orders_report(fileobj, report_type, period, request.user)
+    except BaseException:
+        fileobj.close()
+        raise
+    return create_excel_response(fileobj, filename)
+
+
+def export_orders_report(request, report_type, background=False):
+    """
+    Небольшой период — файл сразу в ответе. Большой (jobs.is_large_period)
+    или background=True — фоновая выгрузка ReportJob и возврат на
+    страницу отчета, где видны процент и ссылка на файл.
+    """
+    from .jobs import is_large_period, start_report_job
+
+    period = get_range_period(request)
+    if not background and not is_large_period(period):
+        return stream_orders_report(request, report_type)
+
+    job, created = start_report_job(request.user, report_type, period)
+    if created:
+        messages.info(request, f'Отчет «{job.filename}» формируется в фоне.')
+    else:
+        messages.info(request, f'Такой отчет уже запрошен: «{job.filename}».')
+    return redirect(reverse('admin:shop_order_xls_report'))
+
+
+def export_full_orders_to_excel(modeladmin, request, queryset):
+    return export_orders_report(request, REPORT_FULL)
 
 
 export_full_orders_to_excel.short_description = (
@@ -96,41 +180,7 @@ export_full_orders_to_excel.short_description = (
 
 
 def export_orders_to_excel(modeladmin, request, queryset):
-    start_date, start_pref, end_date, end_pref = get_range_period(request)
-    current_date = datetime.now(timezone.utc).strftime('%d-%m-%Y')
-
-    filename, ws_title, first_row = get_file_data(
-        start_date,
-        end_date,
-        current_date,
-        'SHORT',
-    )
-
-    response = create_excel_response(filename)
-    admin = request.user
-    orders_qs = get_filtered_orders_qs(
-        start_date,
-        start_pref,
-        end_date,
-        end_pref,
-        admin,
-    )
-
-    wb = Workbook(write_only=True)
-
-    write_sheet_with_rows(
-        workbook=wb,
-        title=ws_title[:31],
-        first_row=first_row,
-        headers=build_short_orders_headers(),
-        rows=(
-            build_short_order_row(order)
-            for order in orders_qs.iterator(chunk_size=500)
-        ),
-    )
-
-    wb.save(response)
-    return response
+    return export_orders_report(request, REPORT_SHORT)
 
 
 export_orders_to_excel.short_description = (
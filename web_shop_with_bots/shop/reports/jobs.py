@@ -0,0 +1,246 @@
+"""
+jobs.py — фоновые выгрузки заказов в Excel (ReportJob).
+
+Страница отчета и выгрузки из списка заказов не строят большой файл
+в запросе админа: start_report_job создает ReportJob, а
+shop.tasks.build_report_job_task (очередь reports) пишет тот же
+потоковый отчет (excel.write_orders_report) во временный файл,
+сохраняет его в MEDIA и по ходу записи обновляет progress.
+
+Дедупликация: ключ — тип отчета, даты периода и ресторан, по которому
+фильтруются заказы. Пока выгрузка с таким ключом в очереди или
+формируется, повторный запрос получает ее же (частичный unique-индекс
+ловит гонку двух кликов); готовую выгрузку отдают повторно
+REPORT_JOB_REUSE_MINUTES минут.
+
+Аренда: выгрузка, которая REPORT_JOB_LEASE_MINUTES минут висит в очереди
+(сообщение потеряно) или формируется (воркер упал), помечается ошибкой —
+fail_stale_report_jobs. Так она не держит ключ дедупликации, и повторный
+запрос ставит новую выгрузку.
+
+Выгрузку видят суперпользователь и админы с тем же рестораном
+(у них одинаковый набор заказов). Через REPORT_JOB_TTL_HOURS выгрузку
+и файл удаляет shop.tasks.cleanup_report_jobs_task.
+"""
+
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from shop.models import ReportJob
+
+from .excel import REPORT_FULL, get_report_file_data, write_orders_report
+from .querysets import get_filtered_orderdishes_qs, get_filtered_orders_qs
+
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def period_dates(period):
+    """(date_from, date_to) включительно для результата get_range_period."""
+    start_date, _, end_date, end_pref = period
+    date_from = _as_date(start_date)
+    date_to = _as_date(end_date)
+    if date_to is not None and end_pref == 'lt':
+        date_to -= timedelta(days=1)
+    return date_from, date_to
+
+
+def job_period(job):
+    """Период выгрузки в виде get_range_period."""
+    return (job.date_from, 'gte' if job.date_from else None,
+            job.date_to, 'lte' if job.date_to else None)
+
+
+def is_large_period(period):
+    """Без начала или длиннее XLSX_SYNC_MAX_DAYS дней — только в фоне."""
+    date_from, date_to = period_dates(period)
+    if date_from is None:
+        return True
+    date_to = date_to or timezone.localdate()
+    return (date_to - date_from).days >= settings.XLSX_SYNC_MAX_DAYS
+
+
+def _restaurant_id(user):
+    return getattr(user, 'restaurant_id', None)
+
+
+def report_job_key(report_type, date_from, date_to, restaurant_id):
+    raw = f'{report_type}:{date_from}:{date_to}:{restaurant_id}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def visible_report_jobs(user):
+    jobs = ReportJob.objects.all()
+    if not user.is_superuser:
+        jobs = jobs.filter(restaurant_id=_restaurant_id(user))
+    return jobs
+
+
+def fail_stale_report_jobs(now=None, **filters):
+    """
+    Помечает ошибкой выгрузки, застрявшие в очереди или в работе дольше
+    REPORT_JOB_LEASE_MINUTES. -> сколько помечено.
+    """
+    now = now or timezone.now()
+    lease_from = now - timedelta(minutes=settings.REPORT_JOB_LEASE_MINUTES)
+    stale = ReportJob.objects.filter(
+        Q(status=ReportJob.Status.PENDING, created_at__lt=lease_from)
+        | Q(status=ReportJob.Status.RUNNING, started_at__lt=lease_from),
+        **filters)
+    return stale.update(
+        status=ReportJob.Status.ERROR,
+        error=(f'Выгрузка не завершилась за '
+               f'{settings.REPORT_JOB_LEASE_MINUTES} мин.'),
+        finished_at=now)
+
+
+def _reusable_job(key):
+    fail_stale_report_jobs(dedupe_key=key)
+    reuse_from = timezone.now() - timedelta(
+        minutes=settings.REPORT_JOB_REUSE_MINUTES)
+    active = ReportJob.objects.filter(
+        dedupe_key=key, status__in=ReportJob.ACTIVE_STATUSES).first()
+    if active is not None:
+        return active
+    return (ReportJob.objects
+            .filter(dedupe_key=key, status=ReportJob.Status.DONE,
+                    finished_at__gte=reuse_from)
+            .order_by('-finished_at')
+            .first())
+
+
+def start_report_job(user, report_type, period):
+    """
+    Ставит выгрузку в очередь или возвращает уже запрошенную такую же.
+    -> (job, created)
+    """
+    from shop.tasks import build_report_job_task
+
+    date_from, date_to = period_dates(period)
+    restaurant_id = _restaurant_id(user)
+    key = report_job_key(report_type, date_from, date_to, restaurant_id)
+
+    job = _reusable_job(key)
+    if job is not None:
+        return job, False
+
+    filename, _, _ = get_report_file_data(period, report_type)
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                report_type=report_type,
+                date_from=date_from,
+                date_to=date_to,
+                restaurant_id=restaurant_id,
+                dedupe_key=key,
+                filename=filename,
+                created_by=user,
+                expires_at=timezone.now() + timedelta(
+                    hours=settings.REPORT_JOB_TTL_HOURS),
+            )
+    except IntegrityError:
+        # такую же выгрузку только что поставил другой запрос
+        return _reusable_job(key), False
+
+    transaction.on_commit(lambda: build_report_job_task.delay(job.pk))
+    return job, True
+
+
+def _count_rows(job):
+    start_date, start_pref, end_date, end_pref = job_period(job)
+    orders = get_filtered_orders_qs(
+        start_date, start_pref, end_date, end_pref, job).order_by().count()
+    items = 0
+    if job.report_type == REPORT_FULL:
+        items = get_filtered_orderdishes_qs(
+            start_date, start_pref, end_date, end_pref, job
+        ).order_by().count()
+    return orders, items
+
+
+def _progress_callback(job, orders_total):
+    # обновляем строку только при смене процента — не чаще 100 раз
+    last = [0]
+
+    def progress(sheet, rows):
+        done = rows + (orders_total if sheet == 'order_items' else 0)
+        percent = min(99, done * 100 // max(job.rows_total, 1))
+        if percent > last[0]:
+            last[0] = percent
+            ReportJob.objects.filter(pk=job.pk).update(progress=percent)
+
+    return progress
+
+
+def run_report_job(job_id):
+    """Формирует файл выгрузки; job — фильтр по ресторану для querysets."""
+    claimed = ReportJob.objects.filter(
+        pk=job_id, status=ReportJob.Status.PENDING,
+    ).update(status=ReportJob.Status.RUNNING, started_at=timezone.now())
+    if not claimed:
+        # уже взята другим воркером, готова или удалена
+        return None
+
+    job = ReportJob.objects.select_related('restaurant').get(pk=job_id)
+    try:
+        orders_total, items_total = _count_rows(job)
+        job.rows_total = orders_total + items_total
+        ReportJob.objects.filter(pk=job.pk).update(rows_total=job.rows_total)
+
+        with tempfile.TemporaryFile() as fileobj:
+            write_orders_report(fileobj, job.report_type, job_period(job),
+                                job,
+                                progress=_progress_callback(job, orders_total))
+            fileobj.seek(0)
+            job.file.save(job.filename, File(fileobj), save=False)
+    except Exception as e:
+        logger.exception(f"Report job {job_id} failed")
+        ReportJob.objects.filter(
+            pk=job_id, status=ReportJob.Status.RUNNING).update(
+            status=ReportJob.Status.ERROR, error=str(e),
+            finished_at=timezone.now())
+        return None
+
+    finished_at = timezone.now()
+    # аренда истекла — выгрузка уже помечена ошибкой, файл не отдаем
+    finished = ReportJob.objects.filter(
+        pk=job_id, status=ReportJob.Status.RUNNING,
+    ).update(
+        status=ReportJob.Status.DONE,
+        progress=100,
+        file=job.file.name,
+        finished_at=finished_at,
+        expires_at=finished_at + timedelta(
+            hours=settings.REPORT_JOB_TTL_HOURS),
+    )
+    if not finished:
+        job.file.delete(save=False)
+        return None
+    return job.file.name
+
+
+def delete_expired_report_jobs(now=None):
+    """Удаляет просроченные выгрузки с файлами. -> сколько удалено."""
+    now = now or timezone.now()
+    deleted = 0
+    for job in ReportJob.objects.filter(expires_at__lt=now).iterator():
+        # файл удаляет сигнал post_delete (shop/signals.py)
+        job.delete()
+        deleted += 1
+    return deleted
@@ -0,0 +1,324 @@
+"""
+ledger.py — накопительные итоги заказов дня (OrderDayTotals).
+
+Шапка списка заказов (get_changelist_extra_context) показывает сводный
+отчет по сегодняшним заказам ресторана и раньше пересчитывала его по
+всем заказам дня на каждое обновление страницы. Теперь:
+
+- вклад заказа в итоги — order_contribution(): ключ (ресторан, дата,
+  источник, курьер) и суммы по корзинам отчета;
+- pre_save запоминает вклад заказа из БД, post_save/post_delete
+  применяют к строкам OrderDayTotals разницу «было/стало» через
+  F()-обновления (shop/signals.py);
+- get_day_report() читает строки дня одним запросом и собирает
+  тот же отчет, что get_report_data();
+- график продаж на главной (shop/reports/sales.py) суммирует строки
+  по дням и источникам.
+
+QuerySet.update() и bulk_create сигналов не шлют, тариф зоны доставки
+берется на момент сохранения заказа — такие расхождения находит
+и исправляет manage.py reconcile_order_totals (diff_order_totals,
+rebuild_order_totals), а ночью — shop.tasks.rebuild_order_totals_task.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from shop.models import Order, OrderDayTotals
+from shop.reports.summary import (CARD, CARD_PAYMENTS, COURIER_DELIVERY_COST,
+                                  DELIVERY, GOTOVINA, NOCASH, RESTAURANT,
+                                  TAKEAWAY, UNCLARIFIED, ZERO, _amount,
+                                  _build_report, _courier_sort_key,
+                                  _order_totals)
+
+
+KEY_FIELDS = ('restaurant_id', 'execution_date', 'source', 'courier_id')
+
+PICKUP = Q(delivery__type='takeaway')
+COURIER_NOCASH = Q(payment_type='cash', invoice=False)
+
+# поле итогов -> агрегат по заказам (для сверки и пересборки)
+LEDGER_AGGREGATES = {
+    'total_amount': lambda: _amount(),
+    'total_qty': lambda: Count('id'),
+    'total_discounts_amount': lambda: Coalesce(Sum('discount_amount'), ZERO),
+    'total_nocash': lambda: _amount(NOCASH),
+    'total_gotovina': lambda: _amount(GOTOVINA),
+    'takeaway_nocash': lambda: _amount(TAKEAWAY & NOCASH),
+    'takeaway_gotovina_for_cash': lambda: _amount(TAKEAWAY & GOTOVINA),
+    'takeaway_card': lambda: _amount(TAKEAWAY & CARD),
+    'restaurant_am': lambda: _amount(RESTAURANT),
+    'total_curiers': lambda: _amount(DELIVERY & Q(payment_type='cash')),
+    'pickup_amount': lambda: _amount(PICKUP),
+    'pickup_qty': lambda: Count('id', filter=PICKUP),
+    'courier_nocash': lambda: _amount(DELIVERY & COURIER_NOCASH),
+    'courier_gotovina': lambda: _amount(DELIVERY & GOTOVINA),
+    'courier_card': lambda: _amount(DELIVERY & CARD),
+    'courier_delivery_costs': lambda: Coalesce(
+        Sum(COURIER_DELIVERY_COST, filter=DELIVERY), ZERO),
+    'delivery_qty': lambda: Count('id', filter=DELIVERY),
+    'unclarified_qty': lambda: Count('id', filter=DELIVERY & UNCLARIFIED),
+}
+LEDGER_FIELDS = tuple(LEDGER_AGGREGATES)
+
+# поля заказа, от которых зависит его вклад
+STATE_FIELDS = (
+    'restaurant_id', 'execution_date', 'source', 'courier_id', 'status',
+    'payment_type', 'invoice', 'final_amount_with_shipping',
+    'discount_amount', 'delivery_cost', 'delivery__type',
+    'delivery_zone__delivery_cost', 'delivery_zone__name',
+)
+
+
+# ---------------------------- ВКЛАД ЗАКАЗА ----------------------------
+
+def stored_order_state(pk):
+    """Состояние заказа в БД (до сохранения) или None."""
+    if pk is None:
+        return None
+    return Order.objects.filter(pk=pk).values(*STATE_FIELDS).first()
+
+
+def order_state(order):
+    """Состояние заказа-объекта в том же виде, что stored_order_state."""
+    zone = order.delivery_zone if order.delivery_zone_id else None
+    return {
+        'restaurant_id': order.restaurant_id,
+        'execution_date': order.execution_date,
+        'source': order.source,
+        'courier_id': order.courier_id,
+        'status': order.status,
+        'payment_type': order.payment_type,
+        'invoice': order.invoice,
+        'final_amount_with_shipping': order.final_amount_with_shipping,
+        'discount_amount': order.discount_amount,
+        'delivery_cost': order.delivery_cost,
+        'delivery__type': (order.delivery.type if order.delivery_id
+                           else None),
+        'delivery_zone__delivery_cost': zone.delivery_cost if zone else None,
+        'delivery_zone__name': zone.name if zone else None,
+    }
+
+
+def _courier_delivery_cost(state):
+    # как COURIER_DELIVERY_COST в summary.py
+    zone_cost = state['delivery_zone__delivery_cost']
+    if zone_cost:
+        return Decimal(zone_cost)
+    if state['delivery_zone__name'] in ('уточнить', 'по запросу'):
+        return Decimal(state['delivery_cost'] or 0)
+    return Decimal('0')
+
+
+def order_contribution(state):
+    """
+    (ключ строки итогов, {поле: значение}) или None, если заказ
+    в итоги не входит (отменен или без даты). Заказы без ресторана
+    идут в строки с restaurant=NULL — их видит график продаж по всем
+    ресторанам, как и при подсчете по заказам.
+    """
+    if (state is None or state['status'] == 'CND'
+            or state['execution_date'] is None):
+        return None
+
+    amount = Decimal(state['final_amount_with_shipping'] or 0)
+    delivery_type = state['delivery__type']
+    payment_type = state['payment_type']
+    invoice = state['invoice']
+
+    is_delivery = delivery_type == 'delivery'
+    is_takeaway = delivery_type in ('restaurant', 'takeaway')
+    nocash = (payment_type == 'cash' and invoice is False
+              and state['source'] != 'P2-2')
+    gotovina = payment_type == 'cash' and invoice is True
+    card = payment_type in CARD_PAYMENTS
+
+    values = {
+        'total_amount': amount,
+        'total_qty': 1,
+        'total_discounts_amount': Decimal(state['discount_amount'] or 0),
+        'total_nocash': amount if nocash else 0,
+        'total_gotovina': amount if gotovina else 0,
+        'takeaway_nocash': amount if is_takeaway and nocash else 0,
+        'takeaway_gotovina_for_cash': amount if is_takeaway and gotovina else 0,
+        'takeaway_card': amount if is_takeaway and card else 0,
+        'restaurant_am': amount if delivery_type == 'restaurant' else 0,
+        'total_curiers': amount if is_delivery and payment_type == 'cash' else 0,
+        'pickup_amount': amount if delivery_type == 'takeaway' else 0,
+        'pickup_qty': int(delivery_type == 'takeaway'),
+    }
+    if is_delivery:
+        unclarified = (not state['delivery_zone__delivery_cost']
+                       and state['delivery_zone__name'] == 'уточнить')
+        values.update({
+            'courier_nocash': (amount if payment_type == 'cash'
+                               and invoice is False else 0),
+            'courier_gotovina': amount if gotovina else 0,
+            'courier_card': amount if card else 0,
+            'courier_delivery_costs': _courier_delivery_cost(state),
+            'delivery_qty': 1,
+            'unclarified_qty': int(unclarified),
+        })
+
+    key = tuple(state[field] for field in KEY_FIELDS)
+    return key, values
+
+
+def _apply(key, values, sign):
+    values = {field: value for field, value in values.items() if value}
+    if not values:
+        return
+    lookup = dict(zip(KEY_FIELDS, key))
+    # строк с ключом может быть несколько — разница идет в одну из них
+    first_row = OrderDayTotals.objects.filter(**lookup).values('pk')[:1]
+    updated = OrderDayTotals.objects.filter(pk=Subquery(first_row)).update(
+        **{field: F(field) + sign * value for field, value in values.items()})
+    if not updated:
+        # параллельная вставка даст вторую строку с тем же ключом —
+        # читатель их суммирует
+        OrderDayTotals.objects.create(
+            **lookup, **{field: sign * value
+                         for field, value in values.items()})
+
+
+def apply_order_change(old_state, new_state):
+    """Применяет к итогам разницу между старым и новым вкладом заказа."""
+    old = order_contribution(old_state)
+    new = order_contribution(new_state)
+    if old == new:
+        return
+
+    with transaction.atomic():
+        if old and new and old[0] == new[0]:
+            delta = {field: new[1].get(field, 0) - old[1].get(field, 0)
+                     for field in LEDGER_FIELDS}
+            _apply(new[0], delta, 1)
+            return
+        if old:
+            _apply(old[0], old[1], -1)
+        if new:
+            _apply(new[0], new[1], 1)
+
+
+# ------------------------------ ЧТЕНИЕ ------------------------------
+
+def get_day_report(restaurant, execution_date, source=None):
+    """
+    Сводный отчет за день по итогам OrderDayTotals — то же, что
+    get_report_data() по неотмененным заказам дня. Один запрос.
+    """
+    rows = OrderDayTotals.objects.filter(restaurant=restaurant,
+                                         execution_date=execution_date)
+    if source:
+        rows = rows.filter(source=source)
+    rows = rows.values('source', 'courier_id', 'courier__name',
+                       'courier__city', 'courier__min_payout',
+                       *LEDGER_FIELDS)
+
+    totals = {field: 0 for field in _order_totals()}
+    partners = {source: index
+                for index, source in enumerate(settings.PARTNERS_LIST)}
+    couriers = {}
+    for row in rows:
+        for field in totals:
+            if field in row:
+                totals[field] += row[field]
+        if row['source'] in partners:
+            index = partners[row['source']]
+            totals[f'partner_{index}'] += row['pickup_amount']
+            totals[f'partner_{index}_qty'] += row['pickup_qty']
+        if row['delivery_qty']:
+            courier = couriers.setdefault(row['courier_id'], {
+                'courier_id': row['courier_id'],
+                'courier__name': row['courier__name'],
+                'courier__city': row['courier__city'],
+                'courier__min_payout': row['courier__min_payout'],
+                'nocash': 0, 'gotovina': 0, 'card': 0,
+                'delivery_costs': 0, 'unclarified': 0,
+                # итоги одного дня — один рабочий день курьера
+                'working_days': 1,
+            })
+            courier['nocash'] += row['courier_nocash']
+            courier['gotovina'] += row['courier_gotovina']
+            courier['card'] += row['courier_card']
+            courier['delivery_costs'] += row['courier_delivery_costs']
+            courier['unclarified'] += row['unclarified_qty']
+
+    return _build_report(totals,
+                         sorted(couriers.values(), key=_courier_sort_key))
+
+
+# ------------------------- СВЕРКА И ПЕРЕСБОРКА -------------------------
+
+def _orders_in_range(date_from, date_to, restaurant=None):
+    orders = Order.objects.filter(execution_date__gte=date_from,
+                                  execution_date__lte=date_to,
+                                  ).exclude(status='CND')
+    if restaurant is not None:
+        orders = orders.filter(restaurant=restaurant)
+    return orders
+
+
+def _ledger_in_range(date_from, date_to, restaurant=None):
+    rows = OrderDayTotals.objects.filter(execution_date__gte=date_from,
+                                         execution_date__lte=date_to)
+    if restaurant is not None:
+        rows = rows.filter(restaurant=restaurant)
+    return rows
+
+
+def compute_order_totals(date_from, date_to, restaurant=None):
+    """Итоги, посчитанные заново по заказам: {ключ: {поле: значение}}."""
+    rows = (_orders_in_range(date_from, date_to, restaurant)
+            .order_by()
+            .values(*KEY_FIELDS)
+            .annotate(**{field: aggregate()
+                         for field, aggregate in LEDGER_AGGREGATES.items()}))
+    return {tuple(row[field] for field in KEY_FIELDS):
+            {field: row[field] for field in LEDGER_FIELDS}
+            for row in rows}
+
+
+def stored_order_totals(date_from, date_to, restaurant=None):
+    """Итоги из OrderDayTotals (строки с одним ключом сложены)."""
+    rows = (_ledger_in_range(date_from, date_to, restaurant)
+            .order_by()
+            .values(*KEY_FIELDS)
+            .annotate(**{f'sum_{field}': Sum(field)
+                         for field in LEDGER_FIELDS}))
+    return {tuple(row[field] for field in KEY_FIELDS):
+            {field: row[f'sum_{field}'] for field in LEDGER_FIELDS}
+            for row in rows}
+
+
+def diff_order_totals(date_from, date_to, restaurant=None):
+    """
+    Расхождения итогов с заказами: [(ключ, поле, в итогах, по заказам)].
+    Нулевые строки итогов без заказов расхождением не считаются.
+    """
+    actual = compute_order_totals(date_from, date_to, restaurant)
+    stored = stored_order_totals(date_from, date_to, restaurant)
+    diffs = []
+    for key in sorted(set(actual) | set(stored), key=str):
+        for field in LEDGER_FIELDS:
+            have = stored.get(key, {}).get(field) or 0
+            want = actual.get(key, {}).get(field) or 0
+            if have != want:
+                diffs.append((key, field, have, want))
+    return diffs
+
+
+def rebuild_order_totals(date_from, date_to, restaurant=None):
+    """Пересобирает итоги за период по заказам. Возвращает число строк."""
+    with transaction.atomic():
+        _ledger_in_range(date_from, date_to, restaurant).delete()
+        actual = compute_order_totals(date_from, date_to, restaurant)
+        OrderDayTotals.objects.bulk_create([
+            OrderDayTotals(**dict(zip(KEY_FIELDS, key)), **values)
+            for key, values in actual.items()
+        ])
+    return len(actual)
@@ -11,25 +11,30 @@ def get_range_period(request):
     - execution_date__range__gte / execution_date__range__lte
     - quick filter order_period = yesterday/today/tomorrow/future
     """
+    return get_range_period_from_params(request.GET)
+
+
+def get_range_period_from_params(params):
+    """То же по словарю GET-параметров (для фоновой выгрузки)."""
     start_date = end_date = None
     start_pref = end_pref = None
 
-    start_date_data = request.GET.get('execution_date__gte')
+    start_date_data = params.get('execution_date__gte')
     if start_date_data is not None:
         start_date = datetime.strptime(start_date_data, '%Y-%m-%d %H:%M:%S%z')
         start_pref = 'gte'
     else:
-        start_date_data = request.GET.get('execution_date__range__gte')
+        start_date_data = params.get('execution_date__range__gte')
         if start_date_data is not None:
             start_date = datetime.strptime(start_date_data, '%d.%m.%Y')
             start_pref = 'gte'
 
-    end_date_data = request.GET.get('execution_date__lt')
+    end_date_data = params.get('execution_date__lt')
     if end_date_data is not None:
         end_date = datetime.strptime(end_date_data, '%Y-%m-%d %H:%M:%S%z')
         end_pref = 'lt'
     else:
-        end_date_data = request.GET.get('execution_date__range__lte')
+        end_date_data = params.get('execution_date__range__lte')
         if end_date_data is not None:
             end_date = (
                 datetime.strptime(end_date_data, '%d.%m.%Y')
@@ -39,7 +44,7 @@ def get_range_period(request):
             end_pref = 'lte'
 
     if start_date is None and end_date is None:
-        order_period = request.GET.get('order_period')
+        order_period = params.get('order_period')
         today = timezone.localdate()
 
         if order_period == 'yesterday':
@@ -70,15 +75,15 @@ def get_range_period(request):
 
 def get_file_data(start_date, end_date, current_date, report_type):
     if start_date is not None and end_date is not None:
-        start_date_str = datetime.strftime(start_date, '%d.%m.%Y')
-        end_date_str = datetime.strftime(end_date, '%d.%m.%Y')
+        start_date_str = start_date.strftime('%d.%m.%Y')
+        end_date_str = end_date.strftime('%d.%m.%Y')
         filename = (
             f"{report_type}_orders_{start_date_str}-{end_date_str}_crtd_at_{current_date}.xlsx"
         )
         ws_title = f"Orders_{start_date_str}-{end_date_str}"
         first_row = f"Период заказов: {start_date_str} - {end_date_str}"
     elif start_date is not None and end_date is None:
-        start_date_str = datetime.strftime(start_date, '%d.%m.%Y')
+        start_date_str = start_date.strftime('%d.%m.%Y')
         filename = f"{report_type}_orders_from_{start_date_str}_crtd_at_{current_date}.xlsx"
         ws_title = f"Orders_from_{start_date_str}"
         first_row = f"Период заказов: с {start_date_str}"
@@ -42,16 +42,11 @@ def get_filtered_orderdishes_qs(start_date, start_pref, end_date, end_pref, admi
         from django.db.models import Q
         filter_q &= Q(order__restaurant=admin.restaurant)
 
+    # строка товара (build_order_item_row) берет только заказ и тип
+    # доставки; артикул — dish_id, без JOIN блюда
     return OrderDish.objects.filter(filter_q).select_related(
         'order',
-        'dish',
-        'order__user',
         'order__delivery',
-        'order__delivery_zone',
-        'order__restaurant',
-        'order__courier',
-        'order__discount',
-        'order__msngr_account',
     # ).prefetch_related(
     #     Prefetch('dish__translations'),
     ).order_by('order__execution_date', 'order__order_number', 'id')
@@ -49,6 +49,13 @@ class AdminXlsReportForm(forms.Form):
         input_formats=['%Y-%m-%d'],
     )
 
+    background = forms.BooleanField(
+        label='Сформировать в фоне',
+        required=False,
+        help_text=('Файл появится в списке выгрузок ниже. Периоды длиннее '
+                   'месяца и без начала формируются в фоне всегда.'),
+    )
+
     def clean(self):
         cleaned = super().clean()
         date_from = cleaned.get('date_from')
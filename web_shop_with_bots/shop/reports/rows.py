@@ -170,7 +170,6 @@ def build_order_items_headers():
 
 def build_order_item_row(item):
     order = item.order
-    dish = item.dish
     created_local = get_local_dt(order.created)
 
     return [
@@ -185,9 +184,9 @@ def build_order_item_row(item):
         order.status,
         order.delivery.type if order.delivery is not None else '',
         order.payment_type or '',
-        # getattr(dish, 'id', ''),
-        getattr(dish, 'article', ''),
-        # get_dish_name_ru(dish),
+        # pk блюда — его артикул
+        item.dish_id if item.dish_id is not None else '',
+        # get_dish_name_ru(item.dish),
         item.quantity,
         item.unit_price,
         item.unit_amount,
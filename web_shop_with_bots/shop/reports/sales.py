@@ -0,0 +1,97 @@
+"""
+sales.py — продажи по дням для графика на главной странице админки
+(api/admin_views.sales_data).
+
+Суммы и число заказов (всего, с сайта, из бота) по дням берутся одним
+запросом из итогов дня OrderDayTotals (shop/reports/ledger.py): строки
+уже сгруппированы по (дата, ресторан, источник), поэтому и 365 дней —
+это несколько тысяч строк, а не все заказы за год. Без итогов
+(ORDER_TOTALS_LEDGER=False) — тот же один запрос по заказам.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from shop.models import Order, OrderDayTotals
+from shop.reports.summary import ZERO
+
+
+SALES_RANGES = (30, 90, 365)
+
+SITE_SOURCE = '4'
+BOT_SOURCE = '3'
+
+SALES_SERIES = {
+    'total_sales': None,
+    'site_sales': SITE_SOURCE,
+    'bot_sales': BOT_SOURCE,
+}
+ORDERS_SERIES = {
+    'total_orders': None,
+    'site_orders': SITE_SOURCE,
+    'bot_orders': BOT_SOURCE,
+}
+
+
+def _source_filter(source):
+    return Q(source=source) if source else None
+
+
+def _ledger_rows(date_from, restaurant):
+    rows = OrderDayTotals.objects.filter(execution_date__gte=date_from)
+    if restaurant is not None:
+        rows = rows.filter(restaurant=restaurant)
+    aggregates = {}
+    for name, source in SALES_SERIES.items():
+        aggregates[name] = Coalesce(
+            Sum('total_amount', filter=_source_filter(source)), ZERO)
+    for name, source in ORDERS_SERIES.items():
+        aggregates[name] = Coalesce(
+            Sum('total_qty', filter=_source_filter(source)), 0)
+    return rows.values('execution_date').annotate(**aggregates)
+
+
+def _order_rows(date_from, restaurant):
+    orders = Order.objects.filter(
+        execution_date__gte=date_from).exclude(status='CND')
+    if restaurant is not None:
+        orders = orders.filter(restaurant=restaurant)
+    aggregates = {}
+    for name, source in SALES_SERIES.items():
+        aggregates[name] = Coalesce(
+            Sum('final_amount_with_shipping', filter=_source_filter(source)),
+            ZERO)
+    for name, source in ORDERS_SERIES.items():
+        aggregates[name] = Count('id', filter=_source_filter(source))
+    return orders.values('execution_date').annotate(**aggregates)
+
+
+def get_daily_sales(days=30, restaurant=None):
+    """
+    {'total_sales': [{'day': date, 'total': x}, ...],
+     'total_orders': [{'day': date, 'total_orders': n}, ...], ...}
+    за days дней до сегодня включительно; дни без заказов — нули.
+    """
+    today = timezone.now().date()
+    date_from = today - timedelta(days=days)
+    date_range = [date_from + timedelta(days=i) for i in range(days + 1)]
+
+    rows_func = (_ledger_rows if settings.ORDER_TOTALS_LEDGER
+                 else _order_rows)
+    by_day = {row['execution_date']: row
+              for row in rows_func(date_from, restaurant).order_by()}
+
+    data = {}
+    for name in SALES_SERIES:
+        data[name] = [{'day': day, 'total': by_day[day][name]
+                       if day in by_day else 0}
+                      for day in date_range]
+    for name in ORDERS_SERIES:
+        data[name] = [{'day': day, 'total_orders': by_day[day][name]
+                       if day in by_day else 0}
+                      for day in date_range]
+    return data
@@ -1,115 +1,198 @@
+"""
+summary.py — сводный отчет по заказам (страница заказов, отчет
+суперадмина).
+
+Все суммы считаются в БД: один агрегат с условными Sum(..., filter=Q)
+по заказам и один — по курьерам, оба с группировкой по переданным
+полям (например, город и ресторан). Заказы в Python не грузятся.
+"""
+
+import datetime
 from decimal import Decimal
 
 from django.conf import settings
+from django.db.models import (Case, Count, DecimalField, IntegerField, Max,
+                              Q, Sum, Value, When)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
 
+from delivery_contacts.models import Courier
 
-def get_report_data(orders_list):
-    # Разбираем заказы по типам для дальнейшего анализа
-    delivery_orders = []
-    takeaway_orders = []
-    partners_orders = []
-    restaurant_orders = []
-    for order in orders_list:
-        if order.delivery.type == 'delivery':
-            delivery_orders.append(order)
-
-        elif order.delivery.type == 'restaurant':
-            takeaway_orders.append(order)
-            restaurant_orders.append(order)
-        elif order.delivery.type == 'takeaway':
-            takeaway_orders.append(order)
-            if order.source in settings.PARTNERS_LIST:
-                partners_orders.append(order)
-
-    total_amount = sum(order.final_amount_with_shipping for order in orders_list)
-    total_qty = orders_list.count()
-    total_discounts_amount = sum(order.discount_amount for order in orders_list)
-
-    total_nocash = (
-        sum(
-            order.final_amount_with_shipping
-            for order in orders_list
-            if order.source != 'P2-2'
-            and order.payment_type == 'cash'
-            and order.invoice is False
-        )
-    )
-    total_gotovina = sum(
-        order.final_amount_with_shipping
-        for order in orders_list
-        if order.payment_type == 'cash' and order.invoice is True
-    )
-    takeaway_gotovina_for_cash_total = sum(
-        order.final_amount_with_shipping
-        for order in takeaway_orders
-        if order.payment_type == 'cash' and order.invoice is True
-    )
-    takeaway_nocash = (
-        sum(
-            order.final_amount_with_shipping
-            for order in takeaway_orders
-            if order.source != 'P2-2'
-            and order.payment_type == 'cash'
-            and order.invoice is False
-        )
-    )
-    takeaway_gotovina = total_gotovina
-    takeaway_card = sum(
-        order.final_amount_with_shipping
-        for order in takeaway_orders
-        if order.payment_type in ['card', 'card_on_delivery']
-    )
 
-    restaurant_am = sum(
-        order.final_amount_with_shipping
-        for order in restaurant_orders
-    )
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=MONEY)
 
-    source_dict = dict(settings.SOURCE_TYPES)
-    partners = {}
-    for order in partners_orders:
-        partner_name = source_dict[order.source]
-        partners[partner_name] = (
-            partners.get(partner_name, Decimal('0'))
-            + order.final_amount_with_shipping
-        )
-    if 'Не та дверь' in partners:
-        partners['Ne_ta_dver'] = partners.pop('Не та дверь')
+CARD_PAYMENTS = ['card', 'card_on_delivery']
+
+DELIVERY = Q(delivery__type='delivery')
+RESTAURANT = Q(delivery__type='restaurant')
+TAKEAWAY = Q(delivery__type__in=['restaurant', 'takeaway'])
+# наличные без чека; «Не та дверь» платит налом без чека, но это не наш нал
+NOCASH = Q(payment_type='cash', invoice=False) & ~Q(source='P2-2')
+GOTOVINA = Q(payment_type='cash', invoice=True)
+CARD = Q(payment_type__in=CARD_PAYMENTS)
+
+
+def _amount(condition=None):
+    return Coalesce(
+        Sum('final_amount_with_shipping', filter=condition), ZERO)
+
+
+def _partner_condition(source):
+    return Q(delivery__type='takeaway', source=source)
+
+
+def _order_totals():
+    totals = {
+        'total_amount': _amount(),
+        'total_qty': Count('id'),
+        'total_discounts_amount': Coalesce(Sum('discount_amount'), ZERO),
+        'total_nocash': _amount(NOCASH),
+        'total_gotovina': _amount(GOTOVINA),
+        'takeaway_nocash': _amount(TAKEAWAY & NOCASH),
+        'takeaway_gotovina_for_cash': _amount(TAKEAWAY & GOTOVINA),
+        'takeaway_card': _amount(TAKEAWAY & CARD),
+        'restaurant_am': _amount(RESTAURANT),
+        'total_curiers': _amount(DELIVERY & Q(payment_type='cash')),
+    }
+    for index, source in enumerate(settings.PARTNERS_LIST):
+        totals[f'partner_{index}'] = _amount(_partner_condition(source))
+        totals[f'partner_{index}_qty'] = Count(
+            'id', filter=_partner_condition(source))
+    return totals
+
+
+# Стоимость доставки для оплаты курьеру: тариф зоны, а для зон
+# «уточнить» и «по запросу» с нулевым тарифом — стоимость из заказа.
+ZONE_COST = (Q(delivery_zone__delivery_cost__gt=0)
+             | Q(delivery_zone__delivery_cost__lt=0))
+UNCLARIFIED = ~ZONE_COST & Q(delivery_zone__name='уточнить')
+COURIER_DELIVERY_COST = Case(
+    When(ZONE_COST, then='delivery_zone__delivery_cost'),
+    When(~ZONE_COST & Q(delivery_zone__name__in=['уточнить', 'по запросу']),
+         then=Coalesce('delivery_cost', ZERO)),
+    default=ZERO,
+    output_field=MONEY,
+)
+
+# Рабочий день курьера: дата выполнения, иначе дата выдачи (в UTC,
+# как .date() у datetime из БД), иначе дата создания (по времени
+# сервера — TIME_ZONE).
+WORKING_DATE = Coalesce(
+    'execution_date',
+    TruncDate('delivery_time', tzinfo=datetime.timezone.utc),
+    TruncDate('created', tzinfo=timezone.get_default_timezone()),
+)
+
+
+def _courier_totals():
+    return {
+        'nocash': _amount(Q(payment_type='cash', invoice=False)),
+        'gotovina': _amount(GOTOVINA),
+        'card': _amount(CARD),
+        'delivery_costs': Coalesce(Sum(COURIER_DELIVERY_COST), ZERO),
+        'unclarified': Max(Case(When(UNCLARIFIED, then=Value(1)),
+                                default=Value(0),
+                                output_field=IntegerField())),
+        'working_days': Count(WORKING_DATE, distinct=True),
+    }
+
+
+def _rows(orders, group_by, values, totals):
+    orders = orders.order_by()
+    if not group_by and not values:
+        return [orders.aggregate(**totals)]
+    return list(orders.values(*group_by, *values).annotate(**totals))
+
+
+def get_reports_data(orders_list, group_by=()):
+    """
+    Сводные отчеты по группам заказов: {значения group_by: отчет}.
+    Без group_by — один отчет по ключу (). Групп без заказов в
+    результате нет. Два запроса к БД на любое число групп.
+    """
+    group_by = tuple(group_by)
+    totals = {
+        tuple(row[field] for field in group_by): row
+        for row in _rows(orders_list, group_by, (), _order_totals())
+        if row['total_qty']
+    }
+
+    couriers = {}
+    courier_rows = _rows(
+        orders_list.filter(DELIVERY), group_by,
+        ('courier_id', 'courier__name', 'courier__city',
+         'courier__min_payout'),
+        _courier_totals())
+    for row in sorted(courier_rows, key=_courier_sort_key):
+        key = tuple(row[field] for field in group_by)
+        couriers.setdefault(key, []).append(row)
+
+    return {
+        key: _build_report(row, couriers.get(key, []))
+        for key, row in totals.items()
+    }
 
+
+def get_report_data(orders_list):
+    """Сводный отчет по всем заказам orders_list."""
+    report = get_reports_data(orders_list).get(())
+    if report is None:
+        report = _build_report(
+            {field: 0 for field in _order_totals()}, [])
+    return report
+
+
+def _build_report(row, courier_rows):
+    partners = get_partners_data(row)
+    couriers = get_couriers_data(courier_rows)
     total_smoke = partners.get('Smoke', Decimal('0'))
     total_ne_ta = partners.get('Ne_ta_dver', Decimal('0'))
-    total_curiers_show = sum(
-        order.final_amount_with_shipping
-        for order in delivery_orders
-        if order.payment_type == 'cash'
-    )
-    total_terminal = total_amount - total_nocash - total_smoke - total_ne_ta
+    total_amount = row['total_amount']
+    total_terminal = (total_amount - row['total_nocash']
+                      - total_smoke - total_ne_ta)
 
-    couriers = get_couriers_data(delivery_orders)
     total_cash = get_cash_report_total(
         couriers,
-        takeaway_nocash,
-        takeaway_gotovina_for_cash_total,
+        row['takeaway_nocash'],
+        row['takeaway_gotovina_for_cash'],
     )
     drugo_bezgotovinsko = get_bezgotovinsko_report_total(couriers, partners)
 
     return {
-        'total_amount': f"{total_amount:.2f} ({total_qty} зак.)",
-        'takeaway_nocash': float(takeaway_nocash),
-        'takeaway_gotovina': float(takeaway_gotovina),
-        'takeaway_card': takeaway_card,
-        'restaurant_am': restaurant_am,
-        'total_curiers': total_curiers_show,
+        'total_amount': f"{total_amount:.2f} ({row['total_qty']} зак.)",
+        'takeaway_nocash': float(row['takeaway_nocash']),
+        'takeaway_gotovina': float(row['total_gotovina']),
+        'takeaway_card': row['takeaway_card'],
+        'restaurant_am': row['restaurant_am'],
+        'total_curiers': row['total_curiers'],
         'total_terminal': total_terminal,
         'partners': partners,
         'couriers': couriers,
         'total_cash': total_cash,
         'drugo_bezgotovinsko': drugo_bezgotovinsko,
-        'total_discounts_amount': total_discounts_amount,
+        'total_discounts_amount': row['total_discounts_amount'],
     }
 
 
-def get_couriers_data(delivery_orders):
+def get_partners_data(row):
+    """Суммы партнерских заказов самовывоза: {имя партнера: сумма}."""
+    source_dict = dict(settings.SOURCE_TYPES)
+    partners = {}
+    for index, source in enumerate(settings.PARTNERS_LIST):
+        if row[f'partner_{index}_qty']:
+            partners[source_dict[source]] = row[f'partner_{index}']
+    if 'Не та дверь' in partners:
+        partners['Ne_ta_dver'] = partners.pop('Не та дверь')
+    return partners
+
+
+def _courier_sort_key(row):
+    # курьеры по имени, заказы без курьера — в конце
+    return (row['courier_id'] is None, row['courier__name'] or '')
+
+
+def get_couriers_data(courier_rows):
     """
     couriers = {
         'courier_name': [
@@ -124,58 +207,38 @@ def get_couriers_data(delivery_orders):
         'total_cash': Dec,
         'total_bezgotovinsko': Dec,
     }
+    Ключ курьера — объект Courier (в шаблоне выводится str),
+    для заказов без курьера — 'Unknown'.
     """
-    if not delivery_orders:
+    if not courier_rows:
         return {'Нет курьеров': [0, False, 0, 0, 0, 0, 0]}
 
     couriers = {}
     courier_days = {}
-
-    for order in delivery_orders:
-        courier_name = order.courier if order.courier else 'Unknown'
-        unclarified = False
-        courier_days = couriers_working_days(order, courier_name, courier_days)
-
-        if order.delivery_zone.delivery_cost != float(0):
-            delivery_cost = order.delivery_zone.delivery_cost
-        elif order.delivery_zone.name == 'уточнить':
-            delivery_cost = order.delivery_cost
-            unclarified = True
-        elif order.delivery_zone.name == 'по запросу':
-            delivery_cost = order.delivery_cost
-        else:
-            delivery_cost = Decimal('0')
-
-        if courier_name in couriers:
-            couriers[courier_name][0] -= delivery_cost
-        else:
-            couriers[courier_name] = [
-                Decimal('0'),
-                False,
-                Decimal('0'),
-                Decimal('0'),
-                Decimal('0'),
-                Decimal('0'),
-                Decimal('0'),
-            ]
-            if order.courier:
-                couriers[courier_name][6] = order.courier.min_payout
-            couriers[courier_name][0] = Decimal('0') - delivery_cost
-
-        couriers[courier_name][1] = unclarified
-
-        if order.payment_type == 'cash' and order.invoice is False:
-            couriers[courier_name][2] += order.final_amount_with_shipping
-            couriers[courier_name][4] += order.final_amount_with_shipping
-        elif order.payment_type == 'cash' and order.invoice is True:
-            couriers[courier_name][3] += order.final_amount_with_shipping
-            couriers[courier_name][4] += order.final_amount_with_shipping
-        elif order.payment_type in ['card', 'card_on_delivery']:
-            couriers[courier_name][5] += order.final_amount_with_shipping
+    for row in courier_rows:
+        courier_name = _courier_key(row)
+        couriers[courier_name] = [
+            Decimal('0') - row['delivery_costs'],
+            bool(row['unclarified']),
+            row['nocash'],
+            row['gotovina'],
+            row['nocash'] + row['gotovina'],
+            row['card'],
+            row['courier__min_payout'] or Decimal('0'),
+        ]
+        courier_days[courier_name] = row['working_days']
 
     return get_correct_min_payout_and_totals(couriers, courier_days)
 
 
+def _courier_key(row):
+    if row['courier_id'] is None:
+        return 'Unknown'
+    return Courier(id=row['courier_id'], name=row['courier__name'],
+                   city=row['courier__city'],
+                   min_payout=row['courier__min_payout'])
+
+
 def get_cash_report_total(curiers, takeaway_nocash, takeaway_gotovina):
     total_cash = Decimal('0')
     if 'total_cash' in curiers:
@@ -195,27 +258,15 @@ def get_bezgotovinsko_report_total(curiers, partners):
     return drugo_bezgotovinsko
 
 
-def couriers_working_days(order, courier_name, courier_days):
-    working_date = None
-    if getattr(order, 'execution_date', None):
-        working_date = order.execution_date
-    elif getattr(order, 'delivery_time', None):
-        working_date = order.delivery_time.date()
-    else:
-        working_date = order.created.astimezone(None).date()
-
-    if courier_name not in courier_days:
-        courier_days[courier_name] = set()
-    courier_days[courier_name].add(working_date)
-    return courier_days
-
-
 def get_correct_min_payout_and_totals(couriers, courier_days):
+    """
+    courier_days — {курьер: число рабочих дней за период}.
+    """
     total_cash = Decimal('0')
     total_bezgotovinsko = Decimal('0')
 
     for courier_name, results in couriers.items():
-        day_count = len(courier_days.get(courier_name, set()))
+        day_count = courier_days.get(courier_name, 0)
         daily_min = results[6]
         results[6] = (daily_min * day_count) if daily_min else Decimal('0')
         results[0] -= results[6]
@@ -1,9 +1,14 @@
 
 from django.conf import settings
-from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.db.models.signals import (m2m_changed, post_save, post_delete,
+                                      pre_save)
 from django.dispatch import receiver
 
-from shop.models import Order, OrderDish
+from shop.models import (Order, OrderDish, OrderWoltProxy, OrderGlovoProxy,
+                         OrderSmokeProxy, OrderNeTaDverProxy,
+                         OrderSealTeaProxy, ReportJob)
+from shop.reports.ledger import (apply_order_change, order_state,
+                                 stored_order_state)
 from shop.services import find_uncomplited_cart_to_complete
 
 
@@ -31,3 +36,41 @@ def base_profile_minus_order(sender, instance, **kwargs):
         if instance.is_first_order:
             instance.user.first_web_order = False
         instance.user.save(update_fields=['orders_qty', 'first_web_order'])
+
+
+# ------------------ ИТОГИ ДНЯ (OrderDayTotals) ------------------
+# прокси партнеров шлют сигналы со своим sender — подписываемся на все
+
+ORDER_MODELS = (Order, OrderWoltProxy, OrderGlovoProxy, OrderSmokeProxy,
+                OrderNeTaDverProxy, OrderSealTeaProxy)
+
+
+def remember_order_totals_state(sender, instance, raw=False, **kwargs):
+    """Запоминает вклад заказа в итоги дня до сохранения."""
+    if not raw:
+        instance._totals_state = stored_order_state(instance.pk)
+
+
+def update_order_totals(sender, instance, raw=False, **kwargs):
+    """Применяет к итогам дня разницу «было/стало»."""
+    if raw:
+        return
+    old_state = instance.__dict__.pop('_totals_state', None)
+    apply_order_change(old_state, order_state(instance))
+
+
+def remove_order_totals(sender, instance, **kwargs):
+    apply_order_change(order_state(instance), None)
+
+
+for order_model in ORDER_MODELS:
+    pre_save.connect(remember_order_totals_state, sender=order_model)
+    post_save.connect(update_order_totals, sender=order_model)
+    post_delete.connect(remove_order_totals, sender=order_model)
+
+
+@receiver(post_delete, sender=ReportJob)
+def delete_report_job_file(sender, instance, **kwargs):
+    """Файл выгрузки удаляется вместе с ней (в т.ч. массово из админки)."""
+    if instance.file:
+        instance.file.delete(save=False)
@@ -0,0 +1,66 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from shop.reports.jobs import (delete_expired_report_jobs,
+                              fail_stale_report_jobs, run_report_job)
+from shop.reports.ledger import diff_order_totals, rebuild_order_totals
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    queue="orders",
+    bind=True)
+def rebuild_order_totals_task(self, days=None):
+    """
+    Ночная досборка итогов дня (OrderDayTotals) за последние
+    ORDER_TOTALS_BACKFILL_DAYS дней по вчерашний: правки заказов через
+    QuerySet.update(), bulk_create, смена тарифа зоны. Запускается через
+    django-celery-beat; пересобирает только период с расхождениями.
+    """
+    days = days or settings.ORDER_TOTALS_BACKFILL_DAYS
+    date_to = timezone.now().date() - timedelta(days=1)
+    date_from = date_to - timedelta(days=days - 1)
+
+    diffs = diff_order_totals(date_from, date_to)
+    if not diffs:
+        return 0
+    rows = rebuild_order_totals(date_from, date_to)
+    logger.warning(f"Order totals {date_from}..{date_to}: "
+                   f"{len(diffs)} differences, rebuilt {rows} rows.")
+    return rows
+
+
+@shared_task(
+    queue="reports",
+    bind=True)
+def build_report_job_task(self, job_id):
+    """
+    Фоновая выгрузка заказов в Excel (ReportJob): тот же потоковый
+    отчет, что и в админке, но в файл MEDIA с процентом готовности.
+    Отдельная очередь reports — длинные выгрузки не задерживают заказы.
+    """
+    return run_report_job(job_id)
+
+
+@shared_task(
+    queue="reports",
+    bind=True)
+def cleanup_report_jobs_task(self):
+    """
+    Удаляет выгрузки с истекшим сроком (REPORT_JOB_TTL_HOURS) вместе
+    с файлами и помечает ошибкой зависшие дольше
+    REPORT_JOB_LEASE_MINUTES. Запускается периодически через
+    django-celery-beat.
+    """
+    stale = fail_stale_report_jobs()
+    if stale:
+        logger.warning(f"Report jobs cleanup: {stale} stale jobs failed.")
+    deleted = delete_expired_report_jobs()
+    if deleted:
+        logger.info(f"Report jobs cleanup: deleted {deleted}.")
+    return deleted
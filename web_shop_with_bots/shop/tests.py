@@ -0,0 +1,589 @@
+"""
+Тесты нумерации заказов (OrderNumberCounter).
+
+Проверяют:
+- номера идут подряд в рамках (ресторан, дата выполнения);
+- счётчик, созданный поверх уже существующих заказов, продолжает
+  их нумерацию (сверка с MAX(order_number));
+- параллельные заказы в разных потоках получают разные номера
+  без IntegrityError по unique_order_number_created.
+
+TransactionTestCase: потокам нужны настоящие коммиты и свои соединения.
+
+ReportSummaryTests — сводный отчет (shop/reports/summary.py) считается
+агрегатами в БД: суммы на известном наборе заказов и число запросов.
+
+OrderDayTotalsTests — итоги дня (OrderDayTotals) после пересборки дают
+тот же отчет и те же продажи по дням, что и пересчет по заказам, и не
+расходятся с заказами после создания, отмены и удаления заказа;
+миграция 0076 заполняет итоги по заказам, созданным до деплоя;
+заказы без ресторана входят в продажи по всем ресторанам.
+
+XlsxExportTests — Excel-отчет пишется потоково (write_only, временный
+файл, FileResponse) и содержит все заказы и товары периода.
+
+ReportJobTests — фоновая выгрузка (ReportJob): одинаковые запросы
+получают одну выгрузку, задача пишет файл в MEDIA и доводит процент до
+100, просроченные выгрузки удаляются вместе с файлом, зависшие дольше
+аренды помечаются ошибкой и не держат повторный запрос.
+
+OrderFormContextCacheTests — данные формы заказа в админке (меню, зоны,
+скидки) берутся из версионированного кэша и пересобираются после
+правки скидки.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import FileResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from delivery_contacts.geocoding import StubGeocoder, set_geocoder
+from delivery_contacts.models import Courier, Delivery, DeliveryZone, Restaurant
+from shop.admin_utils import build_order_form_data, get_order_form_data
+from shop.models import (Discount, Order, OrderDish, OrderNumberCounter,
+                         ReportJob)
+from shop.reports.excel import (REPORT_FULL, REPORT_SHORT,
+                                stream_orders_report, write_orders_report)
+from shop.reports.jobs import (delete_expired_report_jobs,
+                               fail_stale_report_jobs, run_report_job,
+                               start_report_job)
+from shop.reports.ledger import (diff_order_totals, get_day_report,
+                                 rebuild_order_totals)
+from shop.reports.periods import get_range_period_from_params
+from shop.reports.sales import get_daily_sales
+from shop.reports.summary import get_report_data, get_reports_data
+from tm_bot.models import OrdersBot
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+GOOGLE_OK = {
+    "status": "OK",
+    "results": [
+        {"geometry": {"location": {"lat": 44.81, "lng": 20.46},
+                      "location_type": "ROOFTOP"}},
+    ],
+}
+
+
+class OrderNumberCounterTests(TransactionTestCase):
+    def setUp(self):
+        # Restaurant.save геокодирует адрес — без сети
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+
+        self.restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        self.delivery = Delivery.objects.create(
+            type='takeaway',
+            city='Beograd',
+            is_active=True,
+        )
+
+    def _create_order(self):
+        return Order.objects.create(
+            restaurant=self.restaurant,
+            delivery=self.delivery,
+            source='3',
+        )
+
+    def test_numbers_are_sequential_per_day(self):
+        first = self._create_order()
+        second = self._create_order()
+
+        self.assertEqual((first.order_number, second.order_number), (1, 2))
+        counter = OrderNumberCounter.objects.get(
+            restaurant=self.restaurant, execution_date=first.execution_date)
+        self.assertEqual(counter.last_number, 2)
+
+    def test_new_counter_continues_existing_orders(self):
+        self._create_order()
+        self._create_order()
+        # заказы, созданные до появления счётчика
+        OrderNumberCounter.objects.all().delete()
+
+        self.assertEqual(self._create_order().order_number, 3)
+
+    def test_other_day_starts_from_one(self):
+        self._create_order()
+
+        self.assertEqual(
+            OrderNumberCounter.next_number(self.restaurant, date(2030, 1, 1)),
+            1)
+
+    def test_parallel_orders_get_unique_numbers(self):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        numbers, errors = [], []
+        lock = threading.Lock()
+
+        def create():
+            try:
+                barrier.wait()
+                order = self._create_order()
+                with lock:
+                    numbers.append(order.order_number)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(numbers), list(range(1, workers + 1)))
+
+
+class ReportOrdersMixin:
+    """Семь заказов дня на все корзины сводного отчета."""
+
+    def setUp(self):
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        self.restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        delivery, takeaway, restaurant = (
+            Delivery.objects.create(type=delivery_type, city='Beograd',
+                                    is_active=True)
+            for delivery_type in ('delivery', 'takeaway', 'restaurant'))
+        self.takeaway = takeaway
+        center = DeliveryZone.objects.create(name='центр', city='Beograd',
+                                             delivery_cost=Decimal('300'))
+        utochnit = DeliveryZone.objects.create(name='уточнить')
+        self.courier = Courier.objects.create(name='Marko', city='Beograd',
+                                              min_payout=Decimal('1000'))
+
+        orders = [
+            dict(delivery=delivery, delivery_zone=center,
+                 courier=self.courier, payment_type='cash', invoice=False,
+                 final_amount_with_shipping=2000, discount_amount=100),
+            dict(delivery=delivery, delivery_zone=utochnit,
+                 courier=self.courier, payment_type='card',
+                 final_amount_with_shipping=1500, delivery_cost=400),
+            dict(delivery=delivery, delivery_zone=center,
+                 payment_type='cash', invoice=True,
+                 final_amount_with_shipping=1000),
+            dict(delivery=takeaway, source='P1-1', payment_type='card',
+                 final_amount_with_shipping=3000),
+            dict(delivery=takeaway, source='P2-2', payment_type='cash',
+                 invoice=False, final_amount_with_shipping=800),
+            dict(delivery=takeaway, payment_type='cash', invoice=True,
+                 final_amount_with_shipping=1200),
+            dict(delivery=restaurant, source='1', payment_type='cash',
+                 invoice=False, final_amount_with_shipping=500),
+        ]
+        Order.objects.bulk_create([
+            Order(order_number=number, restaurant=self.restaurant,
+                  city='Beograd', execution_date=date.today(),
+                  status='CFD', **fields)
+            for number, fields in enumerate(orders, start=1)
+        ])
+
+
+class ReportSummaryTests(ReportOrdersMixin, TestCase):
+
+    def test_totals(self):
+        report = get_report_data(Order.objects.all())
+
+        self.assertEqual(report['total_amount'], '10000.00 (7 зак.)')
+        self.assertEqual(report['total_discounts_amount'], Decimal('100'))
+        self.assertEqual(report['takeaway_nocash'], 500.0)
+        self.assertEqual(report['takeaway_gotovina'], 2200.0)
+        self.assertEqual(report['takeaway_card'], Decimal('3000'))
+        self.assertEqual(report['restaurant_am'], Decimal('500'))
+        self.assertEqual(report['total_curiers'], Decimal('3000'))
+        self.assertEqual(report['total_terminal'], Decimal('6700'))
+        self.assertEqual(report['partners'],
+                         {'Glovo': Decimal('3000'),
+                          'Ne_ta_dver': Decimal('800')})
+        self.assertEqual(report['total_cash'], Decimal('2700'))
+        self.assertEqual(report['drugo_bezgotovinsko'], Decimal('4500'))
+
+    def test_couriers(self):
+        couriers = get_report_data(Order.objects.all())['couriers']
+
+        # доставки 300 + 400 («уточнить») и минималка за один день
+        self.assertEqual(couriers[self.courier],
+                         [Decimal('-1700'), True, Decimal('2000'),
+                          Decimal('0'), Decimal('2000'), Decimal('1500'),
+                          Decimal('1000')])
+        self.assertEqual(couriers['Unknown'],
+                         [Decimal('-300'), False, Decimal('0'),
+                          Decimal('1000'), Decimal('1000'), Decimal('0'),
+                          Decimal('0')])
+        self.assertEqual(couriers['total_cash'], Decimal('1000'))
+        self.assertEqual(couriers['total_bezgotovinsko'], Decimal('1500'))
+
+    def test_groups_are_computed_in_two_queries(self):
+        with self.assertNumQueries(2):
+            reports = get_reports_data(Order.objects.all(),
+                                       group_by=('city', 'restaurant'))
+
+        self.assertEqual(list(reports), [('Beograd', self.restaurant.id)])
+        self.assertEqual(reports[('Beograd', self.restaurant.id)],
+                         get_report_data(Order.objects.all()))
+
+    def test_empty_report(self):
+        report = get_report_data(Order.objects.filter(city='NoviSad'))
+
+        self.assertEqual(report['total_amount'], '0.00 (0 зак.)')
+        self.assertEqual(report['partners'], {})
+        self.assertEqual(report['couriers'],
+                         {'Нет курьеров': [0, False, 0, 0, 0, 0, 0]})
+
+
+class OrderDayTotalsTests(ReportOrdersMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        self.period = (self.today - timedelta(days=1),
+                       self.today + timedelta(days=1))
+
+    def test_rebuilt_totals_give_the_same_report(self):
+        # bulk_create сигналов не шлет — итогов еще нет
+        self.assertTrue(diff_order_totals(*self.period))
+
+        rebuild_order_totals(*self.period)
+
+        self.assertEqual(diff_order_totals(*self.period), [])
+        with self.assertNumQueries(1):
+            report = get_day_report(self.restaurant, self.today)
+        self.assertEqual(report, get_report_data(Order.objects.all()))
+
+    def test_migration_backfills_existing_orders(self):
+        migration = import_module(
+            'shop.migrations.0076_backfill_orderdaytotals')
+
+        migration.backfill_order_totals(apps, None)
+
+        self.assertEqual(diff_order_totals(*self.period), [])
+        self.assertEqual(get_day_report(self.restaurant, self.today),
+                         get_report_data(Order.objects.all()))
+
+    def test_report_for_one_source(self):
+        rebuild_order_totals(*self.period)
+
+        self.assertEqual(
+            get_day_report(self.restaurant, self.today, source='P1-1'),
+            get_report_data(Order.objects.filter(source='P1-1')))
+
+    def test_daily_sales_are_read_in_one_query(self):
+        rebuild_order_totals(*self.period)
+
+        with self.assertNumQueries(1):
+            sales = get_daily_sales(90, self.restaurant)
+        with override_settings(ORDER_TOTALS_LEDGER=False):
+            self.assertEqual(get_daily_sales(90, self.restaurant), sales)
+
+        self.assertEqual(len(sales['total_sales']), 91)
+        totals = {item['day']: item['total'] for item in sales['total_sales']}
+        self.assertEqual(totals[self.today], Decimal('10000'))
+        self.assertEqual(
+            sum(item['total_orders'] for item in sales['bot_orders']), 0)
+
+    def test_orders_without_restaurant_are_in_all_restaurants_sales(self):
+        Order.objects.bulk_create([
+            Order(order_number=8, city='Beograd', execution_date=self.today,
+                  status='CFD', delivery=self.takeaway, payment_type='cash',
+                  invoice=True, final_amount_with_shipping=700)
+        ])
+        rebuild_order_totals(*self.period)
+        self.assertEqual(diff_order_totals(*self.period), [])
+
+        sales = get_daily_sales(30)
+        with override_settings(ORDER_TOTALS_LEDGER=False):
+            self.assertEqual(get_daily_sales(30), sales)
+        totals = {item['day']: item['total'] for item in sales['total_sales']}
+        self.assertEqual(totals[self.today], Decimal('10700'))
+
+    def test_order_changes_are_applied_incrementally(self):
+        rebuild_order_totals(*self.period)
+
+        order = Order.objects.create(restaurant=self.restaurant,
+                                     delivery=self.takeaway, source='3')
+        day_orders = Order.objects.filter(
+            execution_date=order.execution_date).exclude(status='CND')
+        self.assertEqual(diff_order_totals(*self.period), [])
+        self.assertEqual(
+            get_day_report(self.restaurant, order.execution_date),
+            get_report_data(day_orders))
+
+        order.status = 'CND'
+        order.save()
+        self.assertEqual(diff_order_totals(*self.period), [])
+
+        order.status = 'CFD'
+        order.save()
+        order.delete()
+        self.assertEqual(diff_order_totals(*self.period), [])
+        self.assertEqual(
+            get_day_report(self.restaurant, order.execution_date),
+            get_report_data(day_orders))
+
+
+class XlsxExportTests(ReportOrdersMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # bulk_create: OrderDish.save требует блюдо с ценой, отчету
+        # достаточно строк товаров
+        OrderDish.objects.bulk_create([
+            OrderDish(order=order, order_number=order.pk, quantity=2,
+                      unit_price=Decimal('500'), unit_amount=Decimal('1000'))
+            for order in Order.objects.filter(delivery=self.takeaway)
+        ])
+        today = date.today().strftime('%d.%m.%Y')
+        self.params = {'execution_date__range__gte': today,
+                       'execution_date__range__lte': today}
+
+    def _read(self, report_type):
+        progress = []
+        with tempfile.TemporaryFile() as fileobj:
+            write_orders_report(
+                fileobj, report_type,
+                get_range_period_from_params(self.params), None,
+                progress=lambda sheet, rows: progress.append((sheet, rows)))
+            fileobj.seek(0)
+            workbook = load_workbook(fileobj, read_only=True)
+            sheets = {ws.title: list(ws.values) for ws in workbook}
+        return sheets, progress
+
+    def test_full_report_has_orders_and_items(self):
+        sheets, progress = self._read(REPORT_FULL)
+
+        orders = next(iter(sheets.values()))
+        # первая строка — период, вторая — заголовки
+        self.assertEqual(len(orders) - 2, 7)
+        self.assertEqual(len(sheets['Order_items']) - 2, 3)
+        self.assertEqual(progress, [('orders', 7), ('order_items', 3)])
+
+    def test_report_is_streamed_from_a_file(self):
+        admin = get_user_model().objects.create_user(
+            email="xlsx@test.ru", password="12345678aA!",
+            first_name="Петя", last_name="Петин", phone="+79055969161",
+            web_language="ru", city="Beograd",
+            is_active=True, is_staff=True, is_superuser=True)
+        request = RequestFactory().get('/', self.params)
+        request.user = admin
+
+        response = stream_orders_report(request, REPORT_SHORT)
+
+        self.assertIsInstance(response, FileResponse)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content))
+        response.close()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ReportJobTests(ReportOrdersMixin, TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        OrderDish.objects.bulk_create([
+            OrderDish(order=order, order_number=order.pk, quantity=1,
+                      unit_price=Decimal('500'), unit_amount=Decimal('500'))
+            for order in Order.objects.filter(delivery=self.takeaway)
+        ])
+        self.admin = get_user_model().objects.create_user(
+            email="report-job@test.ru", password="12345678aA!",
+            first_name="Петя", last_name="Петин", phone="+79055969162",
+            web_language="ru", city="Beograd",
+            is_active=True, is_staff=True, is_superuser=True)
+        today = date.today()
+        self.period = (today, 'gte', today, 'lte')
+
+    def _start(self, report_type=REPORT_FULL):
+        with mock.patch('shop.tasks.build_report_job_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                job, created = start_report_job(self.admin, report_type,
+                                                self.period)
+        return job, created, delay
+
+    def test_identical_requests_share_one_job(self):
+        job, created, delay = self._start()
+        same, same_created, same_delay = self._start()
+        short, _, _ = self._start(REPORT_SHORT)
+
+        self.assertTrue(created)
+        delay.assert_called_once_with(job.pk)
+        self.assertEqual((same.pk, same_created), (job.pk, False))
+        same_delay.assert_not_called()
+        self.assertNotEqual(short.pk, job.pk)
+
+    def test_job_writes_file_with_progress(self):
+        job, _, _ = self._start()
+
+        run_report_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.rows_total, 7 + 3)
+        with job.file.open('rb') as fileobj:
+            workbook = load_workbook(fileobj, read_only=True)
+            # первая строка — период, вторая — заголовки
+            self.assertEqual([len(list(ws.values)) - 2 for ws in workbook],
+                             [7, 3])
+        # готовая выгрузка отдается на такой же запрос, пока свежая
+        self.assertEqual(self._start()[:2], (job, False))
+
+    def test_expired_jobs_are_deleted_with_files(self):
+        job, _, _ = self._start(REPORT_SHORT)
+        run_report_job(job.pk)
+        job.refresh_from_db()
+        path = job.file.path
+
+        self.assertEqual(delete_expired_report_jobs(), 0)
+        self.assertEqual(
+            delete_expired_report_jobs(job.expires_at + timedelta(seconds=1)),
+            1)
+        self.assertFalse(ReportJob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_stale_jobs_are_failed_after_lease(self):
+        running, _, _ = self._start()
+        pending, _, _ = self._start(REPORT_SHORT)
+        long_ago = timezone.now() - timedelta(
+            minutes=settings.REPORT_JOB_LEASE_MINUTES + 1)
+        ReportJob.objects.filter(pk=running.pk).update(
+            status=ReportJob.Status.RUNNING, started_at=long_ago)
+
+        self.assertEqual(fail_stale_report_jobs(), 1)
+        self.assertEqual(
+            fail_stale_report_jobs(timezone.now() + timedelta(
+                minutes=settings.REPORT_JOB_LEASE_MINUTES + 1)),
+            1)
+        self.assertEqual(
+            list(ReportJob.objects.order_by('pk')
+                 .values_list('status', flat=True)),
+            [ReportJob.Status.ERROR, ReportJob.Status.ERROR])
+        # помеченную ошибкой выгрузку воркер уже не берет
+        self.assertIsNone(run_report_job(pending.pk))
+
+    def test_stale_job_does_not_block_new_request(self):
+        job, _, _ = self._start()
+        ReportJob.objects.filter(pk=job.pk).update(
+            created_at=timezone.now() - timedelta(
+                minutes=settings.REPORT_JOB_LEASE_MINUTES + 1))
+
+        new_job, created, delay = self._start()
+
+        self.assertTrue(created)
+        self.assertNotEqual(new_job.pk, job.pk)
+        delay.assert_called_once_with(new_job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.ERROR)
+
+
+@override_settings(CACHES={"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "order-form-tests"}})
+class OrderFormContextCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+
+        restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        delivery = Delivery.objects.create(type='takeaway', city='Beograd',
+                                           is_active=True)
+        DeliveryZone.objects.create(name='zone1', city='Beograd',
+                                    delivery_cost=Decimal('300'))
+        self.discount = Discount.objects.create(
+            type=2, title_rus='самовывоз', discount_perc=Decimal('10'),
+            is_active=True, valid_from=timezone.now(),
+            valid_to=timezone.now() + timedelta(days=30))
+        self.order = Order.objects.create(restaurant=restaurant,
+                                          delivery=delivery, source='4')
+
+        OrdersBot.objects.create(msngr_type="tm", name="Test bot",
+                                 city="Beograd", source_id="test-source",
+                                 admin_id="123456")
+        admin = get_user_model().objects.create_user(
+            email="order-form@test.ru", password="12345678aA!",
+            first_name="Петя", last_name="Петин", phone="+79055969160",
+            web_language="ru", city="Beograd",
+            is_active=True, is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        self.url = self.order.get_admin_url()
+
+    def _get_change_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_form_data_is_read_from_cache(self):
+        data = get_order_form_data('all')
+
+        self.assertEqual(set(data), {'categories', 'dishes', 'discounts',
+                                     'delivery_zones'})
+        self.assertIn('id="discounts-data"', data['discounts'])
+        self.assertIn('самовывоз', data['discounts'])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_order_form_data('all'), data)
+        self.assertNotIn('delivery_zones', get_order_form_data('partner'))
+
+    def test_change_view_skips_form_queries_when_cached(self):
+        self._get_change_view()
+        # правка скидки сдвигает поколение discounts после коммита
+        self.discount.title_rus = 'самовывоз -15%'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.discount.save()
+
+        with CaptureQueriesContext(connection) as build_queries:
+            build_order_form_data('all')
+        cold_response, cold = self._get_change_view()
+        warm_response, warm = self._get_change_view()
+
+        self.assertContains(cold_response, 'самовывоз -15%')
+        self.assertContains(warm_response, 'id="dishes-data"')
+        self.assertGreater(len(build_queries), 0)
+        self.assertEqual(cold - warm, len(build_queries))
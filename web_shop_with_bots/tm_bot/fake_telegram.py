@@ -0,0 +1,115 @@
+"""
+Локальный фейковый Bot API для бенчмарков и тестов отправки.
+
+    with FakeTelegramServer(delay=0.05, flood_every=100) as server:
+        with override_settings(TELEGRAM_API_URL=server.url):
+            ...
+
+- delay — задержка ответа, сек (имитирует сеть + Telegram);
+- flood_every — каждый N-й запрос отвечает 429 с retry_after;
+- flood_first — первые N запросов отвечают 429;
+- error_first — первые N запросов отвечают 502;
+- blocked_chats — chat_id, для которых 403 "bot was blocked by the user".
+
+Все запросы копятся в server.requests: (метод, payload),
+число открытых клиентами соединений — server.connections.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTelegramServer:
+    def __init__(self, delay=0.0, flood_every=0, flood_first=0,
+                 error_first=0, retry_after=1, blocked_chats=()):
+        self.delay = delay
+        self.flood_every = flood_every
+        self.flood_first = flood_first
+        self.error_first = error_first
+        self.retry_after = retry_after
+        self.blocked_chats = {str(chat_id) for chat_id in blocked_chats}
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                           self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, method, payload):
+        """(http-код, тело ответа) на запрос."""
+        with self._lock:
+            self.requests.append((method, payload))
+            number = len(self.requests)
+
+        if number <= self.error_first:
+            return 502, {"ok": False, "error_code": 502,
+                         "description": "Bad Gateway"}
+
+        if (number <= self.flood_first
+                or self.flood_every and number % self.flood_every == 0):
+            return 429, {"ok": False, "error_code": 429,
+                         "description": "Too Many Requests: retry later",
+                         "parameters": {"retry_after": self.retry_after}}
+
+        if str(payload.get("chat_id")) in self.blocked_chats:
+            return 403, {"ok": False, "error_code": 403,
+                         "description": "Forbidden: bot was blocked by the user"}
+
+        return 200, {"ok": True, "result": {"message_id": number}}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                method = self.path.rsplit("/", 1)[-1]
+
+                if fake.delay:
+                    time.sleep(fake.delay)
+                code, data = fake.respond(method, payload)
+
+                body = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
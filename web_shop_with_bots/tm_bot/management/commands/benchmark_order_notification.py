@@ -0,0 +1,99 @@
+import statistics
+import time
+from datetime import date
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+import tm_bot.services as tmbs
+from api.serializers import TakeawayOrderWriteSerializer
+from catalog.models import Dish
+from delivery_contacts.models import Delivery, Restaurant
+from tm_bot.fake_telegram import FakeTelegramServer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк оформления заказа: сообщение админам внутри запроса "
+        "(старый путь, tmbs.send_message_new_order_admin_user) против "
+        "celery-таски после коммита. Telegram — локальный сервер "
+        "с задержкой --telegram-delay, заказы откатываются.\n"
+        "Пример: python manage.py benchmark_order_notification --runs 50 "
+        "--telegram-delay 0.3"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=30)
+        parser.add_argument("--dishes", type=int, default=3)
+        parser.add_argument("--telegram-delay", type=float, default=0.3,
+                            help="задержка ответа Telegram, сек")
+
+    def handle(self, *args, **options):
+        restaurant = Restaurant.objects.filter(is_active=True).first()
+        delivery = Delivery.objects.filter(type="takeaway",
+                                           is_active=True).first()
+        dishes = list(Dish.objects.filter(is_active=True)[:options["dishes"]])
+        if not (restaurant and delivery and dishes):
+            raise CommandError(
+                "Нужны активные ресторан, самовывоз и блюда в БД.")
+
+        self.validated_data = {
+            "city": restaurant.city,
+            "restaurant": restaurant,
+            "delivery": delivery,
+            "recipient_name": "Benchmark",
+            "recipient_phone": "+381600000000",
+            "source": "4",
+            "execution_date": date(2099, 1, 1),
+        }
+        self.dishes = dishes
+
+        runs = options["runs"]
+        with FakeTelegramServer(delay=options["telegram_delay"]) as server, \
+                override_settings(TELEGRAM_API_URL=server.url):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"Telegram отвечает за {options['telegram_delay']} с"))
+            self._report("in request", [
+                self._timed(legacy=True) for _ in range(runs)])
+            self._report("after commit", [
+                self._timed(legacy=False) for _ in range(runs)])
+
+    def _create(self, legacy):
+        serializer = TakeawayOrderWriteSerializer()
+        serializer._validated_data = dict(
+            self.validated_data,
+            orderdishes=[{"dish": dish, "quantity": 1}
+                         for dish in self.dishes])
+        if not legacy:
+            return serializer._create_order_with_dishes()
+        # старый путь: отправка в Telegram внутри транзакции заказа
+        with patch.object(tmbs, "schedule_new_order_admin_notification",
+                          tmbs.send_message_new_order_admin_user):
+            return serializer._create_order_with_dishes()
+
+    def _timed(self, legacy):
+        # заказ откатывается: on_commit не срабатывает, таска не ставится,
+        # замеряется ровно то, что ждёт клиент
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                self._create(legacy)
+                elapsed = (time.perf_counter() - start) * 1000
+                raise _Rollback
+        except _Rollback:
+            return elapsed
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"  {label:<14} n={len(timings):<5} "
+            f"p50={statistics.median(timings):8.2f} ms  "
+            f"p99={p99:8.2f} ms  max={timings[-1]:8.2f} ms"
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from tm_bot.telegram_client import get_client_stats, reset_client_stats
+
+
+CLIENTS = ("telegram", "botobot")
+
+
+class Command(BaseCommand):
+    help = (
+        "Метрики клиентов API ботов (Telegram, Botobot): запросы, ошибки, "
+        "повторы, отказы circuit breaker'а, средняя латентность.\n"
+        "Пример: python manage.py bot_api_stats --reset-stats"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset-stats", action="store_true",
+                            help="обнулить счётчики после вывода")
+
+    def handle(self, *args, **options):
+        for name in CLIENTS:
+            stats = get_client_stats(name)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  запросов:         {stats['request']}")
+            self.stdout.write(f"  ошибок:           {stats['error']}")
+            self.stdout.write(f"  повторов:         {stats['retry']}")
+            self.stdout.write(f"  circuit open:     {stats['circuit_open']}")
+            avg = stats['avg_latency_ms']
+            self.stdout.write(
+                f"  средняя латентность: {'-' if avg is None else f'{avg} ms'}")
+            error_rate = stats['error_rate']
+            self.stdout.write(
+                f"  error rate:       "
+                f"{'-' if error_rate is None else f'{error_rate:.1%}'}")
+
+            if options["reset_stats"]:
+                reset_client_stats(name)
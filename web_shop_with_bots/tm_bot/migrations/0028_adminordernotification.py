@@ -0,0 +1,35 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0072_ordernumbercounter'),
+        ('tm_bot', '0027_alter_ordersbot_admin_id_alter_ordersbot_msngr_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminOrderNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('new_order', 'новый заказ')], default='new_order', max_length=20, verbose_name='Вид')),
+                ('status', models.CharField(choices=[('pending', 'ожидает отправки'), ('sending', 'отправляется'), ('sent', 'отправлено'), ('failed', 'ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('message_id', models.CharField(blank=True, max_length=50, null=True, verbose_name='Номер сообщения в чате')),
+                ('error', models.CharField(blank=True, max_length=255, null=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='admin_notifications', to='shop.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Уведомление админов о заказе',
+                'verbose_name_plural': 'Уведомления админов о заказах',
+                'unique_together': {('order', 'kind')},
+            },
+        ),
+    ]
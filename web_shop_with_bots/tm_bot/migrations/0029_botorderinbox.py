@@ -0,0 +1,42 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0072_ordernumbercounter'),
+        ('tm_bot', '0028_adminordernotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotOrderInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(default='3', max_length=10, verbose_name='Источник')),
+                ('city', models.CharField(max_length=40, verbose_name='Город')),
+                ('source_id', models.CharField(max_length=100, verbose_name='ID заказа в боте')),
+                ('payload', models.JSONField(verbose_name='Данные вебхука')),
+                ('payload_hash', models.CharField(max_length=64)),
+                ('state', models.CharField(choices=[('pending', 'ожидает обработки'), ('done', 'обработано'), ('failed', 'ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Состояние')),
+                ('result', models.CharField(blank=True, choices=[('created', 'создан заказ'), ('status', 'изменён статус'), ('unchanged', 'без изменений')], max_length=10, null=True, verbose_name='Результат')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.CharField(blank=True, max_length=255, null=True, verbose_name='Последняя ошибка')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+                ('bot', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='tm_bot.ordersbot', verbose_name='Бот')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Входящий заказ бота',
+                'verbose_name_plural': 'Входящие заказы бота',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='botorderinbox',
+            constraint=models.UniqueConstraint(fields=('source', 'city', 'source_id', 'payload_hash'), name='bot_order_inbox_dedup'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+def number_events(apps, schema_editor):
+    BotOrderInbox = apps.get_model('tm_bot', 'BotOrderInbox')
+    counters = {}
+    events = []
+    for event in BotOrderInbox.objects.order_by('id'):
+        key = (event.source, event.city, event.source_id)
+        counters[key] = counters.get(key, 0) + 1
+        event.sequence = counters[key]
+        events.append(event)
+    BotOrderInbox.objects.bulk_update(events, ['sequence'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tm_bot', '0029_botorderinbox'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='botorderinbox',
+            name='bot_order_inbox_dedup',
+        ),
+        migrations.AddField(
+            model_name='botorderinbox',
+            name='sequence',
+            field=models.PositiveIntegerField(default=1, verbose_name='Номер события заказа'),
+        ),
+        migrations.RunPython(number_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='botorderinbox',
+            constraint=models.UniqueConstraint(fields=('source', 'city', 'source_id', 'sequence'), name='bot_order_inbox_sequence'),
+        ),
+    ]
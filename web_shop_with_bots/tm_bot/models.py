@@ -1,7 +1,7 @@
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
@@ -16,7 +16,10 @@ from delivery_contacts.services import (
     get_delivery_cost_zone
 )
 from django import forms
+from datetime import timedelta
 from decimal import Decimal
+import hashlib
+import json
 from django.db.models import Sum
 
 import requests
@@ -339,7 +342,9 @@ class MessengerAccount(models.Model):
         Для бота города city проставляет tg_can_write=True и last_login,
         остальным — tg_can_write=None.
         """
-        bots = OrdersBot.objects.filter(is_active=True)
+        from tm_bot.registry import get_active_bots
+
+        bots = get_active_bots()
         MessengerAccountBot.objects.bulk_create([
             MessengerAccountBot(
                 messenger_account=self,
@@ -410,6 +415,292 @@ class MessengerAccountBot(models.Model):
         return f"{self.messenger_account} ↔ {self.bot}"
 
 
+class AdminOrderNotification(models.Model):
+    """
+    Уведомление админского чата о заказе (tm_bot.tasks).
+    Одна запись на (заказ, вид): по ней таска понимает, что сообщение
+    уже ушло, и не шлёт его повторно при ретрае/повторной постановке;
+    здесь же видно, дошло ли уведомление.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'ожидает отправки'),
+        (SENDING, 'отправляется'),
+        (SENT, 'отправлено'),
+        (FAILED, 'ошибка'),
+    ]
+
+    NEW_ORDER = 'new_order'
+    KIND_CHOICES = [
+        (NEW_ORDER, 'новый заказ'),
+    ]
+
+    # через сколько секунд "отправляется" считается зависшим
+    # (воркер умер посреди отправки) и запись можно взять снова
+    SENDING_LEASE = 120
+
+    order = models.ForeignKey(
+        'shop.Order',
+        on_delete=models.CASCADE,
+        related_name='admin_notifications',
+        verbose_name='Заказ',
+    )
+    kind = models.CharField(
+        'Вид',
+        max_length=20,
+        choices=KIND_CHOICES,
+        default=NEW_ORDER,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0,
+    )
+    message_id = models.CharField(
+        'Номер сообщения в чате',
+        max_length=50,
+        null=True,
+        blank=True,
+    )
+    error = models.CharField(
+        'Последняя ошибка',
+        max_length=255,
+        null=True,
+        blank=True,
+    )
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True,
+    )
+    updated = models.DateTimeField(
+        'Обновлено',
+        auto_now=True,
+    )
+    sent_at = models.DateTimeField(
+        'Отправлено',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        unique_together = ('order', 'kind')
+        verbose_name = 'Уведомление админов о заказе'
+        verbose_name_plural = 'Уведомления админов о заказах'
+
+    def __str__(self):
+        return f"{self.order_id}/{self.kind}: {self.status}"
+
+    @classmethod
+    def claim(cls, order_id, kind=NEW_ORDER):
+        """
+        Атомарно берёт уведомление в отправку. Возвращает запись
+        или None, если оно уже отправлено / отправляется другим воркером.
+        """
+        now = timezone.now()
+        cls.objects.get_or_create(order_id=order_id, kind=kind)
+        claimed = (
+            cls.objects
+            .filter(order_id=order_id, kind=kind)
+            .filter(models.Q(status__in=[cls.PENDING, cls.FAILED])
+                    | models.Q(status=cls.SENDING,
+                               updated__lt=now - timedelta(
+                                   seconds=cls.SENDING_LEASE)))
+            .update(status=cls.SENDING,
+                    attempts=models.F('attempts') + 1,
+                    updated=now)
+        )
+        if not claimed:
+            return None
+        return cls.objects.get(order_id=order_id, kind=kind)
+
+    def mark_sent(self, message_id=None):
+        self.status = self.SENT
+        self.message_id = message_id
+        self.error = None
+        self.sent_at = timezone.now()
+        self.save(update_fields=['status', 'message_id', 'error',
+                                 'sent_at', 'updated'])
+
+    def mark_failed(self, error):
+        self.status = self.FAILED
+        self.error = str(error)[:255]
+        self.save(update_fields=['status', 'error', 'updated'])
+
+
+class BotOrderInbox(models.Model):
+    """
+    Входящий вебхук Botobot (/save_bot_order/): новый заказ или смена
+    его статуса. Вебхук только пишет сюда payload и отвечает 202,
+    заказ создаёт/обновляет api.tasks.process_bot_order_inbox_task.
+
+    Повтор того же вебхука (Botobot ретраит медленные ответы) не даёт
+    второй записи: payload совпадает с последним событием заказа и
+    пришёл в пределах BOT_ORDER_INBOX_DEDUP_WINDOW. Смена статуса
+    A→B→A даёт три события. sequence — номер события заказа, уникален
+    в (source, city, source_id): параллельные ретраи не дублируются.
+    События одного заказа обрабатываются по порядку поступления.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (PENDING, 'ожидает обработки'),
+        (DONE, 'обработано'),
+        (FAILED, 'ошибка'),
+    ]
+
+    CREATED = 'created'
+    STATUS_CHANGED = 'status'
+    UNCHANGED = 'unchanged'
+    RESULT_CHOICES = [
+        (CREATED, 'создан заказ'),
+        (STATUS_CHANGED, 'изменён статус'),
+        (UNCHANGED, 'без изменений'),
+    ]
+
+    source = models.CharField(
+        'Источник',
+        max_length=10,
+        default='3',
+    )
+    city = models.CharField(
+        'Город',
+        max_length=40,
+    )
+    source_id = models.CharField(
+        'ID заказа в боте',
+        max_length=100,
+    )
+    bot = models.ForeignKey(
+        OrdersBot,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Бот',
+    )
+    payload = models.JSONField(
+        'Данные вебхука',
+    )
+    payload_hash = models.CharField(
+        max_length=64,
+    )
+    sequence = models.PositiveIntegerField(
+        'Номер события заказа',
+        default=1,
+    )
+    state = models.CharField(
+        'Состояние',
+        max_length=10,
+        choices=STATE_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    result = models.CharField(
+        'Результат',
+        max_length=10,
+        choices=RESULT_CHOICES,
+        null=True,
+        blank=True,
+    )
+    order = models.ForeignKey(
+        'shop.Order',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Заказ',
+        null=True,
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0,
+    )
+    error = models.CharField(
+        'Последняя ошибка',
+        max_length=255,
+        null=True,
+        blank=True,
+    )
+    received_at = models.DateTimeField(
+        'Получено',
+        auto_now_add=True,
+    )
+    processed_at = models.DateTimeField(
+        'Обработано',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'city', 'source_id', 'sequence'],
+                name='bot_order_inbox_sequence'),
+        ]
+        verbose_name = 'Входящий заказ бота'
+        verbose_name_plural = 'Входящие заказы бота'
+
+    def __str__(self):
+        return f"{self.city}/{self.source_id}: {self.state}"
+
+    @staticmethod
+    def get_payload_hash(payload):
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def receive(cls, bot, payload, source='3', attempts=3):
+        """(запись, создана ли) — повтор того же вебхука не создаёт новую."""
+        key = {'source': source,
+               'city': bot.city,
+               'source_id': str(payload.get('id'))}
+        payload_hash = cls.get_payload_hash(payload)
+        for _ in range(attempts):
+            last = (cls.objects.filter(**key)
+                    .order_by('-sequence').first())
+            if last is not None and last.payload_hash == payload_hash \
+                    and last.received_at >= timezone.now() - timedelta(
+                        seconds=settings.BOT_ORDER_INBOX_DEDUP_WINDOW):
+                return last, False
+            try:
+                # номер занят параллельным вебхуком — перечитываем
+                with transaction.atomic():
+                    return cls.objects.create(
+                        **key,
+                        bot=bot,
+                        payload=payload,
+                        payload_hash=payload_hash,
+                        sequence=last.sequence + 1 if last else 1,
+                    ), True
+            except IntegrityError:
+                continue
+        raise IntegrityError(
+            f"Bot order #{key['source_id']}: event sequence is busy.")
+
+    def mark_done(self, result, order=None):
+        self.state = self.DONE
+        self.result = result
+        self.order = order
+        self.error = None
+        self.processed_at = timezone.now()
+        self.save(update_fields=['state', 'result', 'order', 'error',
+                                 'attempts', 'processed_at'])
+
+    def mark_failed(self, error):
+        self.state = self.FAILED
+        self.error = str(error)[:255]
+        self.processed_at = timezone.now()
+        self.save(update_fields=['state', 'error', 'attempts',
+                                 'processed_at'])
+
+
 def msgr_account_unique(value):
     if value:
         ma = MessengerAccount.objects.filter(msngr_username=value).first()
@@ -0,0 +1,135 @@
+"""
+registry.py — справочник ботов заказов и админ-чатов в памяти процесса.
+
+OrdersBot и AdminChatTM — десяток строк, которые меняются раз в месяцы,
+а читались запросом на каждое сообщение: get_chat_id_by_order,
+get_bot_id_by_city, get_candidate_bots_for_user, TelegramAuthView,
+BaseOrderSerializer._attach_bot_if_any — 2–4 запроса на создание
+заказа и смену статуса. Здесь:
+
+- обе таблицы грузятся целиком одним снимком (два запроса)
+  и раскладываются по id, городу и ресторану;
+- снимок помнит поколение группы bots (api/utils/core_cache):
+  сигналы OrdersBot / AdminChatTM (tm_bot/signals.py) сдвигают его
+  после коммита, и каждый процесс пересобирает снимок при следующем
+  обращении; свой процесс сбрасывает снимок сразу же в сигнале;
+- снимок, собранный внутри savepoint, не переживает выход из него:
+  после отката там могли остаться незакоммиченные боты (так же
+  откатывается каждый TestCase);
+- снимок, собранный во внешней транзакции без savepoint (например,
+  сохранение в админке), не кэшируется вовсе: отличить его от снимка
+  вне транзакции нечем, а откат поколение не сдвигает.
+
+Город у OrdersBot уникален. У AdminChatTM — нет: при нескольких
+чатах города берётся чат с наименьшим id (старый .first() при
+ordering=['city'] порядок среди них не задавал).
+
+Объекты из снимка общие для потоков — их не меняют и не сохраняют.
+"""
+
+import threading
+
+from django.db import transaction
+
+from api.utils.core_cache import BOTS_GROUP, get_generation
+from tm_bot.models import AdminChatTM, OrdersBot
+
+
+class BotRegistry:
+    """Снимок OrdersBot и AdminChatTM."""
+
+    def __init__(self, bots, admin_chats):
+        self.bots_by_id = {}
+        self.bots_by_city = {}
+        self.bots_by_source_id = {}
+        for bot in sorted(bots, key=lambda b: b.id):
+            self.bots_by_id[bot.id] = bot
+            self.bots_by_city.setdefault(bot.city, bot)
+            if bot.source_id:
+                self.bots_by_source_id[bot.source_id] = bot
+
+        self.chats_by_restaurant = {}
+        self.chats_by_city = {}
+        for chat in sorted(admin_chats, key=lambda c: c.id):
+            self.chats_by_restaurant.setdefault(chat.restaurant_id, chat)
+            self.chats_by_city.setdefault(chat.city, chat)
+
+    @classmethod
+    def load(cls):
+        return cls(list(OrdersBot.objects.all()),
+                   list(AdminChatTM.objects.all()))
+
+    def active_bots(self):
+        return [bot for bot in self.bots_by_id.values() if bot.is_active]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _savepoint_scope():
+    """
+    () — вне транзакции, savepoint'ы — внутри; None — внешняя
+    транзакция без savepoint, снимок из неё кэшировать нельзя.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return ()
+    return tuple(connection.savepoint_ids) or None
+
+
+def get_bot_registry() -> BotRegistry:
+    generation = get_generation(BOTS_GROUP)
+    scope = _savepoint_scope()
+
+    cached = _registry
+    if cached is not None and cached[0] == generation and scope is not None \
+            and scope[:len(cached[1])] == cached[1]:
+        return cached[2]
+
+    registry = BotRegistry.load()
+    if scope is not None:
+        _set_registry((generation, scope, registry))
+    return registry
+
+
+def _set_registry(value):
+    global _registry
+    with _registry_lock:
+        _registry = value
+
+
+def clear_bot_registry():
+    _set_registry(None)
+
+
+def get_bot_by_id(bot_id):
+    """OrdersBot по id или None."""
+    return get_bot_registry().bots_by_id.get(bot_id)
+
+
+def get_bot_by_city(city, active_only=False):
+    """OrdersBot города или None."""
+    bot = get_bot_registry().bots_by_city.get(city)
+    if bot is not None and active_only and not bot.is_active:
+        return None
+    return bot
+
+
+def get_bot_by_source_id(source_id):
+    """OrdersBot по ID магазина на платформе Botobot или None."""
+    return get_bot_registry().bots_by_source_id.get(source_id)
+
+
+def get_active_bots():
+    return get_bot_registry().active_bots()
+
+
+def get_admin_chat_by_restaurant(restaurant_id):
+    """AdminChatTM ресторана или None."""
+    return get_bot_registry().chats_by_restaurant.get(restaurant_id)
+
+
+def get_admin_chat_by_city(city):
+    """AdminChatTM города или None."""
+    return get_bot_registry().chats_by_city.get(city)
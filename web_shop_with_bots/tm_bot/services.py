@@ -3,18 +3,20 @@ from django.conf import settings
 
 from django.utils import timezone
 from exceptions import BotMessageSendError
-import requests
 from typing import Optional, Union, Dict, Any, List
 
-from tm_bot.models import (OrdersBot, AdminChatTM, MessengerAccount,
-                           MessengerAccountBot)
+from tm_bot.models import (OrdersBot, AdminOrderNotification,
+                           MessengerAccount, MessengerAccountBot)
 import tm_bot.text_assemble_and_edition as ta
 import tm_bot.handlers.custom_keyboards as custom_kb
-from django.db import close_old_connections
+import tm_bot.registry as registry
+from tm_bot.telegram_client import get_botobot_client, get_telegram_client
+from django.db import close_old_connections, transaction
 from django.db.utils import InterfaceError, OperationalError
 
 
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +24,10 @@ logger = logging.getLogger(__name__)
 KeyboardType = Union[types.ReplyKeyboardMarkup, types.InlineKeyboardMarkup]
 
 # ----------------------------   HELPERS ---------------------------------
+# боты и админ-чаты берутся из снимка в памяти процесса (tm_bot/registry.py)
+
 def get_chat_id_by_order(order):
-    admin_chat = AdminChatTM.objects.filter(
-                                    restaurant=order.restaurant).first()
+    admin_chat = registry.get_admin_chat_by_restaurant(order.restaurant_id)
     if admin_chat:
         return admin_chat.chat_id
     else:
@@ -32,7 +35,7 @@ def get_chat_id_by_order(order):
 
 
 def get_admin_chat_id_by_city(city):
-    admin_chat = AdminChatTM.objects.filter(city=city).first()
+    admin_chat = registry.get_admin_chat_by_city(city)
     if admin_chat:
         return admin_chat.chat_id
     else:
@@ -40,8 +43,7 @@ def get_admin_chat_id_by_city(city):
 
 
 def get_chat_id_by_bot(bot):
-    admin_chat = AdminChatTM.objects.filter(
-                                    city=bot.city).first()
+    admin_chat = registry.get_admin_chat_by_city(bot.city)
     if admin_chat:
         return admin_chat.chat_id
     else:
@@ -49,7 +51,7 @@ def get_chat_id_by_bot(bot):
 
 
 def get_bot_id_by_city(city):
-    bot = OrdersBot.objects.filter(city=city).first()
+    bot = registry.get_bot_by_city(city)
     if not bot:
         logger.warning(
                 "No OrdersBot found for city=%s", city
@@ -91,10 +93,10 @@ def get_candidate_bots_for_user(
 
     # 1. Бот города заказа
     if order_city:
-        try:
-            bot_order_city = OrdersBot.objects.get(city=order_city)
+        bot_order_city = registry.get_bot_by_city(order_city)
+        if bot_order_city:
             candidates.append(bot_order_city)
-        except OrdersBot.DoesNotExist:
+        else:
             logger.warning(
                 "No OrdersBot found for order_city=%s", order_city
             )
@@ -102,10 +104,10 @@ def get_candidate_bots_for_user(
     # 2. Бот основного города клиента
     user_city = messenger_account.city
     if user_city and user_city != order_city:
-        try:
-            bot_user_city = OrdersBot.objects.get(city=user_city)
+        bot_user_city = registry.get_bot_by_city(user_city)
+        if bot_user_city:
             candidates.append(bot_user_city)
-        except OrdersBot.DoesNotExist:
+        else:
             logger.warning(
                 "No OrdersBot found for user_city=%s", user_city
             )
@@ -165,6 +167,36 @@ def classify_telegram_response(data: dict) -> tuple[str, str | None]:
     return "error", f"{error_code}_unknown" if error_code else "unknown_error"
 
 
+# статусы, после которых бот больше не может писать пользователю
+MAB_BLOCKING_STATUSES = {"bot was blocked", "chat not found", "user is deactivated"}
+
+
+def mab_send_result_fields(status: str,
+                           db_error_code: str | None,
+                           now) -> dict:
+    """ Поля MessengerAccountBot, которые меняет результат отправки."""
+    if status == "ok":
+        return {
+            "tg_can_write": True,
+            "last_success_at": now,
+            "last_error_at": None,
+            "last_error_code": None,
+        }
+
+    if status in MAB_BLOCKING_STATUSES:
+        return {
+            "tg_can_write": False,
+            "last_error_at": now,
+            "last_error_code": db_error_code,
+        }
+
+    # временные / непонятные ошибки: статус связи не меняем
+    return {
+        "last_error_at": now,
+        "last_error_code": db_error_code or status,
+    }
+
+
 def update_mab_send_result(
     messenger_account: MessengerAccount,
     bot: OrdersBot,
@@ -177,47 +209,72 @@ def update_mab_send_result(
             messenger_account=messenger_account,
             bot=bot,
         )
-        now = timezone.now()
-
-        if status == "ok":
-            mab.tg_can_write = True
-            mab.last_success_at = now
-            mab.last_error_at = None
-            mab.last_error_code = None
-            mab.save(update_fields=[
-                "tg_can_write",
-                "last_success_at",
-                "last_error_at",
-                "last_error_code",
-            ])
-            return
-
-        if status in {"bot was blocked", "chat not found", "user is deactivated"}:
-            mab.tg_can_write = False
-            mab.last_error_at = now
-            mab.last_error_code = db_error_code
-            mab.save(update_fields=[
-                "tg_can_write",
-                "last_error_at",
-                "last_error_code",
-            ])
-            return
-
-        # временные / непонятные ошибки: статус связи не меняем
-        mab.last_error_at = now
-        mab.last_error_code = db_error_code or status
-        mab.save(update_fields=[
-            "last_error_at",
-            "last_error_code",
-        ])
+        fields = mab_send_result_fields(status, db_error_code,
+                                        timezone.now())
+        for field, value in fields.items():
+            setattr(mab, field, value)
+        mab.save(update_fields=list(fields))
 
     except (InterfaceError, OperationalError) as e:
         logger.warning(
             "DB error while updating MessengerAccountBot for user=%s bot=%s: %s",
             messenger_account.id, bot.id, e
         )
+
+
+def bulk_update_mab_send_results(
+    bot: OrdersBot,
+    results: List[tuple],
+) -> None:
+    """ То же, что update_mab_send_result, для пачки отправок рассылки.
+        results — [(messenger_account_id, status, db_error_code)].
+        Недостающие связки создаются одним bulk_create, обновления
+        группируются по итоговым значениям полей: пара запросов
+        на пачку вместо двух на каждого получателя."""
+    if not results:
+        return
+    now = timezone.now()
+
+    groups = {}
+    for account_id, status, db_error_code in results:
+        fields = mab_send_result_fields(status, db_error_code, now)
+        groups.setdefault(tuple(fields.items()), []).append(account_id)
+
+    try:
+        MessengerAccountBot.objects.bulk_create(
+            [MessengerAccountBot(messenger_account_id=account_id, bot=bot)
+             for account_id, _, _ in results],
+            ignore_conflicts=True,
+        )
+        for fields, account_ids in groups.items():
+            MessengerAccountBot.objects.filter(
+                bot=bot,
+                messenger_account_id__in=account_ids,
+            ).update(**dict(fields))
+
+    except (InterfaceError, OperationalError) as e:
+        logger.warning(
+            "DB error while bulk updating MessengerAccountBot for bot=%s: %s",
+            bot.id, e
+        )
+
 # ---------------------------- UNITED SEND MESSAGES ---------------------------------
 
+def schedule_new_order_admin_notification(order):
+    """ Уведомление админского чата о новом заказе — celery-таской
+        на очереди notifications после коммита транзакции заказа,
+        чтобы оформление не ждало Telegram.
+        Запись AdminOrderNotification создаётся в той же транзакции:
+        по ней видно, ушло ли сообщение, и таска не шлёт его дважды."""
+    from tm_bot.tasks import send_new_order_admin_notification_task
+
+    AdminOrderNotification.objects.get_or_create(
+        order=order, kind=AdminOrderNotification.NEW_ORDER)
+    transaction.on_commit(
+        lambda order_id=order.pk:
+            send_new_order_admin_notification_task.delay(order_id))
+
+
 def send_message_new_order_admin_user(order):
     """ Отправка сообщения телеграм-ботом в:
         Админский чат о новом заказе. (последовательно)
@@ -228,6 +285,23 @@ def send_message_new_order_admin_user(order):
     # send_message_new_order_to_user_other_city(order)
 
 
+class _OrderStatusUpdateBatch:
+    """on_commit-колбэк, копящий смены статусов одной транзакции."""
+
+    def __init__(self):
+        self.updates = {}
+
+    def __call__(self):
+        from tm_bot.tasks import send_order_status_updates_task
+
+        if getattr(_status_local, 'batch', None) is self:
+            _status_local.batch = None
+        send_order_status_updates_task.delay(list(self.updates.items()))
+
+
+_status_local = threading.local()
+
+
 def send_messages_order_status_update_user_bot(new_status, order):
     """ Отправка сообщений телеграм-ботом
         Botobot для учета в их системе, если заказ из бота и
@@ -237,34 +311,33 @@ def send_messages_order_status_update_user_bot(new_status, order):
         +
 
         Пользователю о смене статуса.
+
+        В запросе ничего не отправляется: смены статусов одной транзакции
+        (сохранение заказа в админке, массовая правка статусов
+        в changelist) копятся в пачку и после коммита уходят одной
+        таской send_order_status_updates_task. Откат — пачка отбрасывается.
         """
-    from tm_bot.tasks import send_order_status_update_task
-
-    if order.source == '3':
-        if settings.SEND_BOTOBOT_UPDATES:
-            # отправить в botobot инфу об изменении статуса
-            # он сам уведомляет клиента
-            logger.info('Botobot status update trigered.\n'
-                         'Order: %s', order)
-            send_request_order_status_update(new_status,
-                                             int(order.source_id),
-                                             order.orders_bot)
-        else:
-            # Если ботобот отключен, то МЫ отправляем сообщение о смене статуса.
-            # Мы не проверяем наличие order.user.messenger_account тут,
-            # т.к. предполагается что заказ пришел из бота,
-            # но в таске это проверяется еще раз все равно
-            logger.info('Send status update task is trigered.\n'
-                         'Order: %s', order)
-            send_order_status_update_task.delay(new_status, order.id)
-
-    elif order.source == '4':
-        # Мы проверяем наличие order.user.messenger_account.msngr_type='tm',
-        # т.к. user вообще может быть незарег, не тригерим холостую таску.
-        ma = get_client_messenger_account_by_order(order)
-        if ma:
-            # отправить сообщение клиенту об изменении статуса
-            send_order_status_update_task.delay(new_status, order.id)
+    from tm_bot.tasks import send_order_status_updates_task
+
+    # остальные источники (сайт без бота, партнёры) не уведомляем;
+    # есть ли у клиента заказа с сайта телеграм, проверит таска
+    if order.source not in ('3', '4'):
+        return
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        send_order_status_updates_task.delay([(order.id, new_status)])
+        return
+
+    batch = getattr(_status_local, 'batch', None)
+    # после отката транзакции колбэк пропадает из run_on_commit
+    if batch is None or not any(entry[1] is batch
+                                for entry in connection.run_on_commit):
+        batch = _OrderStatusUpdateBatch()
+        _status_local.batch = batch
+        transaction.on_commit(batch)
+    logger.debug('Order status update is queued: %s -> %s.', order, new_status)
+    batch.updates[order.id] = new_status
 
 
 # def send_messages_order_status_update_user(new_status, order):
@@ -407,14 +480,12 @@ def check_telegram_subscription(bot_token: str,
     False -> пользователь запретил / заблокировал
     None  -> другая ошибка (сетевые проблемы и т.п.)
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    resp = requests.post(url, json={
-        "chat_id": user_id,
-        "text": text
-    })
     try:
-        data = resp.json()
-    except Exception:
+        data = get_telegram_client().call(bot_token, "sendMessage", {
+            "chat_id": user_id,
+            "text": text
+        })
+    except BotMessageSendError:
         return None
 
     status, _ = classify_telegram_response(data)
@@ -647,8 +718,6 @@ def send_user_photo_via_bot(
         chat_id = test_chat_id
 
     # 2. Собираем payload
-    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-
     payload: dict = {
         "chat_id": chat_id,
         "photo": photo_url,
@@ -665,8 +734,7 @@ def send_user_photo_via_bot(
 
     # 3. Отправляем запрос
     try:
-        resp = requests.post(url, json=payload, timeout=10)
-        data = resp.json()
+        data = get_telegram_client().call(bot_token, "sendPhoto", payload)
         status, db_error_code = classify_telegram_response(data)
 
     except Exception as e:
@@ -731,7 +799,6 @@ def send_message_telegram(chat_id, message, bot_token,
                           parse_mode: str = "MarkdownV2"):
     """ Базовая функция для отправки сообщения в телеграм."""
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": message,
@@ -745,50 +812,48 @@ def send_message_telegram(chat_id, message, bot_token,
         payload["reply_markup"] = dumped
     logger.info("Sending telegram message to %s", chat_id)
     try:
-        response = requests.post(
-                url,
-                json=payload,
-                timeout=(5, 30),
-            )
-        data = response.json()
-    except Exception as e:
+        data = get_telegram_client().call(bot_token, "sendMessage", payload)
+    except BotMessageSendError as e:
         logger.error(f"Telegram send error: {e}")
-        raise BotMessageSendError(f"Telegram request failed: {e}")
+        raise
 
     status, _ = classify_telegram_response(data)
     return status, data
 
 # ---------------------------- BOTOBOT ---------------------------------
 
+BOTOBOT_ORDER_STATUSES = {
+    'WCO': 10,
+    'CFD': 20,
+    'OND': 70,
+    'DLD': 90,
+    'CND': 30,
+}
+
+
 def send_request_order_status_update(new_status, order_id, bot):
-    """ Функция для отправки уведомления в botobot о смене статуса у заказа."""
+    """ Функция для отправки уведомления в botobot о смене статуса у заказа.
+        True — Botobot принял статус."""
     # token = settings.BOTOBOT_API_KEY
     token = bot.api_key
-    url = f"https://www.botobot.ru/api/v1/updateOrderStatus/{token}"
-
-    if new_status == 'WCO':
-        status = 10
-    elif new_status == "CFD":
-        status = 20
-    elif new_status == "OND":
-        status = 70
-    elif new_status == "DLD":
-        status = 90
-    elif new_status == "CND":
-        status = 30
-
-    payload = {"id": order_id,
-               "status": status}
+
+    status = BOTOBOT_ORDER_STATUSES.get(new_status)
+    if status is None:
+        logger.info(f"TM order {order_id}: status {new_status} "
+                    f"is not sent to Botobot.")
+        return False
+
     try:
-        # Отправка POST-запроса
-        response = requests.post(url, data=payload)
-        response_data = response.json()
+        # Отправка POST-запроса через общий пул соединений
+        status_code, response_data = get_botobot_client().update_order_status(
+            token, order_id, status)
         reply_status = response_data.get('status')
         # Обработка ответа
-        if response.status_code == 200 and reply_status == 'success':
+        if status_code == 200 and reply_status == 'success':
             logger.info(f"TM order {order_id} "
                         f"status updated to {new_status} "
                         f"(status: {reply_status}).")
+            return True
         else:
             error_message = response_data.get('message',
                                               'No error message provided')
@@ -796,7 +861,8 @@ def send_request_order_status_update(new_status, order_id, bot):
                          f"{new_status} "
                          f"(status: {reply_status}): {error_message}")
 
-    except requests.RequestException as e:
+    except BotMessageSendError as e:
         # Логирование ошибки запроса
         logger.error(f"Sending request failed for order {order_id} "
                      f"with status {new_status} (status: {str(e)}")
+    return False
@@ -1,11 +1,21 @@
 from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import Permission, ContentType
 from django.dispatch import receiver
+
+from api.utils.core_cache import invalidate_bots_cache
 from .models import AdminChatTM, OrdersBot
+from .registry import clear_bot_registry
+
+
+def _invalidate_bot_registry():
+    # свой процесс — сразу, остальные — по поколению после коммита
+    clear_bot_registry()
+    invalidate_bots_cache()
 
 
 @receiver(post_save, sender=AdminChatTM)
 def create_admin_chat_permissions(sender, instance, created, **kwargs):
+    _invalidate_bot_registry()
     if created:
         content_type = ContentType.objects.get_for_model(AdminChatTM)
 
@@ -19,6 +29,7 @@ def create_admin_chat_permissions(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=AdminChatTM)
 def delete_admin_chat_permissions(sender, instance, **kwargs):
+    _invalidate_bot_registry()
     # Удаляем пермишены, связанные с этим объектом
     Permission.objects.filter(
         codename=f'change_adminchat_{instance.restaurant_id}').delete()
@@ -26,6 +37,7 @@ def delete_admin_chat_permissions(sender, instance, **kwargs):
 
 @receiver(post_save, sender=OrdersBot)
 def create_orders_bot_permissions(sender, instance, created, **kwargs):
+    _invalidate_bot_registry()
     if created:
         content_type = ContentType.objects.get_for_model(AdminChatTM)
 
@@ -39,6 +51,7 @@ def create_orders_bot_permissions(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=OrdersBot)
 def delete_orders_bot_permissions(sender, instance, **kwargs):
+    _invalidate_bot_registry()
     # Удаляем пермишены, связанные с этим объектом
     Permission.objects.filter(
         codename=f'change_ordersbot_{instance.city}').delete()
@@ -3,11 +3,15 @@ from celery import shared_task
 from django.db import transaction
 from django.conf import settings
 from shop.models import Order
-from tm_bot.models import MessengerAccount, OrdersBot
+from exceptions import BotMessageSendError
+from tm_bot.models import AdminOrderNotification, MessengerAccount, OrdersBot
 from tm_bot.services import (send_status_update_message_to_client,
+                             send_message_new_order_to_admin,
+                             send_request_order_status_update,
                              send_user_message_via_bot,
                              get_bot_id_by_city)
 from tm_bot.text_assemble_and_edition import escape_markdown
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,6 +44,65 @@ def send_order_status_update_task(self, status: str, order_id: int):
     return "ok"
 
 
+@shared_task(
+        queue="notifications",
+        bind=True)
+def send_order_status_updates_task(self, updates):
+    """
+    Смены статусов одного сохранения в админке (в т.ч. массовой правки
+    в changelist): updates — [(order_id, status), ...].
+
+    Заказы грузятся одним запросом. Botobot (заказы из бота при
+    SEND_BOTOBOT_UPDATES) вызывается параллельно в ORDER_STATUS_WORKERS
+    потоков через общий пул соединений — в потоках только HTTP, без БД.
+    Сообщения клиентам идут по очереди; упавшие переотправляются
+    отдельной send_order_status_update_task с её ретраями.
+    """
+    statuses = dict(updates)
+    orders = (Order.objects
+              .select_related("orders_bot", "msngr_account",
+                              "user__messenger_account")
+              .in_bulk(list(statuses)))
+
+    botobot, clients = [], []
+    for order_id, status in statuses.items():
+        order = orders.get(order_id)
+        if order is None:
+            logger.debug('Order is not found. Order id: %s', order_id)
+        elif order.source == '3' and settings.SEND_BOTOBOT_UPDATES:
+            if order.orders_bot is None:
+                logger.error('Order %s has no orders_bot for Botobot.', order)
+                continue
+            botobot.append((status, int(order.source_id), order.orders_bot))
+        else:
+            clients.append((status, order))
+
+    botobot_sent = 0
+    if botobot:
+        workers = min(settings.ORDER_STATUS_WORKERS, len(botobot))
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix="botobot") as pool:
+            botobot_sent = sum(pool.map(
+                lambda args: send_request_order_status_update(*args),
+                botobot))
+
+    retried = 0
+    for status, order in clients:
+        try:
+            send_status_update_message_to_client(status=status, order=order)
+        except Exception as exc:
+            logger.warning('Status update for order %s failed, retry '
+                           'in a separate task: %s', order.id, exc)
+            send_order_status_update_task.delay(status, order.id)
+            retried += 1
+
+    logger.info('Order status updates: %s orders, botobot %s/%s, '
+                'clients %s (retried %s).', len(statuses), botobot_sent,
+                len(botobot), len(clients), retried)
+    return {"botobot": botobot_sent, "clients": len(clients),
+            "retried": retried}
+
+
 @shared_task(
         queue="notifications",
         bind=True,
@@ -72,3 +135,54 @@ def send_link_confirmation_message(self, msngr_account_id, city):
         raise self.retry(exc=exc)
 
     return "ok"
+
+
+# ошибки Telegram, после которых есть смысл повторить отправку
+RETRYABLE_TELEGRAM_STATUSES = ("rate limited", "temporary error")
+
+
+@shared_task(
+        queue="notifications",
+        bind=True,
+        max_retries=5,
+        default_retry_delay=10)
+def send_new_order_admin_notification_task(self, order_id: int):
+    """
+    Сообщение в админский чат о новом заказе (ставится после коммита
+    заказа, см. tmbs.schedule_new_order_admin_notification).
+    AdminOrderNotification.claim не даёт отправить дважды: повторная
+    постановка или ретрай после успешной отправки ничего не шлют.
+    """
+    notification = AdminOrderNotification.claim(order_id)
+    if notification is None:
+        return f"Order {order_id}: admin notification already sent."
+
+    try:
+        order = Order.objects.select_related(
+            "restaurant", "delivery", "delivery_zone", "user",
+        ).get(pk=order_id)
+    except Order.DoesNotExist:
+        notification.mark_failed("order does not exist")
+        return f"Order {order_id} does not exist."
+
+    try:
+        status, data = send_message_new_order_to_admin(order)
+    except BotMessageSendError as exc:
+        notification.mark_failed(exc)
+        raise self.retry(exc=exc)
+
+    if status == "ok":
+        message_id = str(data["result"]["message_id"])
+        notification.mark_sent(message_id)
+        Order.objects.filter(pk=order_id).update(admin_tm_msg_id=message_id)
+        return "ok"
+
+    notification.mark_failed(f"{status}: {data.get('description')}")
+    if status in RETRYABLE_TELEGRAM_STATUSES:
+        retry_after = (data.get("parameters") or {}).get("retry_after")
+        raise self.retry(exc=BotMessageSendError(status),
+                         countdown=retry_after or self.default_retry_delay)
+
+    logger.error("New order admin notification failed. Order: %s, %s",
+                 order_id, data)
+    return status
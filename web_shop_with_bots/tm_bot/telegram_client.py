@@ -0,0 +1,321 @@
+"""
+telegram_client.py — общий HTTP-клиент API ботов: Telegram Bot API
+(TelegramClient) и Botobot (BotobotClient).
+
+Раньше каждая отправка делала голый requests.post — новое TCP+TLS
+соединение на сообщение, а местами без таймаута. Здесь:
+
+- один requests.Session на процесс и API (пул BOT_API_POOL_SIZE,
+  keep-alive); клиенты берутся через get_telegram_client() /
+  get_botobot_client();
+- таймауты (connect, read) — TELEGRAM_TIMEOUT / BOTOBOT_TIMEOUT;
+- повторы с full jitter (BOT_API_MAX_RETRIES, BOT_API_RETRY_BACKOFF):
+  при 5xx, 429 с коротким retry_after (до BOT_API_MAX_RETRY_AFTER) и
+  если соединение не установилось. Read timeout и обрыв соединения
+  после отправки повторяются только для idempotent-запросов:
+  sendMessage мог дойти, а ключа идемпотентности у Telegram нет;
+- circuit breaker на токен бота: после BOT_API_CIRCUIT_THRESHOLD
+  ошибок подряд запросы с этим токеном BOT_API_CIRCUIT_COOLDOWN секунд
+  сразу падают ApiCircuitOpenError, потом пропускается один пробный;
+- метрики, общие для процессов (get_client_stats): запросы, ошибки,
+  повторы, отказы breaker'а, суммарная латентность; копятся в процессе
+  и сбрасываются в кэш пачкой (utils/stats.py).
+
+Ошибки транспорта — BotMessageSendError (ApiCircuitOpenError — его
+подкласс), как и раньше в send_message_telegram.
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from exceptions import ApiCircuitOpenError, BotMessageSendError
+from utils.stats import BatchedCounter
+
+
+logger = logging.getLogger(__name__)
+
+
+CLIENT_STATS_KEY = 'bot_api_stats:{name}:{event}'
+CLIENT_EVENTS = ('request', 'error', 'retry', 'circuit_open', 'latency_ms')
+
+
+# ------------------------------ СЧЁТЧИКИ ------------------------------
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _counter(name):
+    counter = _stats.get(name)
+    if counter is None:
+        with _stats_lock:
+            counter = _stats.get(name)
+            if counter is None:
+                counter = _stats[name] = BatchedCounter(
+                    CLIENT_STATS_KEY.format(name=name, event='{event}'),
+                    CLIENT_EVENTS)
+    return counter
+
+
+def _record(name, event, amount=1):
+    _counter(name).count(event, amount)
+
+
+def get_client_stats(name):
+    stats = _counter(name).get()
+    requests_count = stats['request']
+    stats['avg_latency_ms'] = (round(stats['latency_ms'] / requests_count, 1)
+                               if requests_count else None)
+    stats['error_rate'] = (round(stats['error'] / requests_count, 4)
+                           if requests_count else None)
+    return stats
+
+
+def reset_client_stats(name):
+    _counter(name).reset()
+
+
+def _not_sent(e):
+    """Соединение не установилось — запрос до сервера точно не дошёл."""
+    if isinstance(e, requests.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], 'reason', None) if e.args else None
+    return (isinstance(e, requests.ConnectionError)
+            and isinstance(reason, ConnectTimeoutError))
+
+
+# --------------------------- CIRCUIT BREAKER ---------------------------
+
+class CircuitBreaker:
+    """Состояние на процесс, ключ — токен бота."""
+
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._failures = {}
+        self._opened_at = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        with self._lock:
+            opened_at = self._opened_at.get(key)
+            if opened_at is None:
+                return True
+            if self._clock() - opened_at < self.cooldown:
+                return False
+            # half-open: пропускаем один пробный запрос,
+            # остальные ждут его результата ещё cooldown
+            self._opened_at[key] = self._clock()
+            return True
+
+    def success(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+
+    def failure(self, key):
+        with self._lock:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            if failures >= self.threshold:
+                self._opened_at[key] = self._clock()
+            return failures
+
+    def is_open(self, key):
+        with self._lock:
+            return key in self._opened_at
+
+
+# ------------------------------- КЛИЕНТЫ ------------------------------
+
+class ApiClient:
+    """POST-запросы к одному API через пул соединений."""
+
+    name = 'api'
+
+    def __init__(self, base_url=None, timeout=None, max_retries=None,
+                 backoff=None, breaker=None, pool_size=None,
+                 sleep=time.sleep):
+        self._base_url = base_url
+        self._timeout = timeout
+        self.max_retries = (settings.BOT_API_MAX_RETRIES
+                            if max_retries is None else max_retries)
+        self.backoff = (settings.BOT_API_RETRY_BACKOFF
+                        if backoff is None else backoff)
+        self.breaker = breaker or CircuitBreaker(
+            settings.BOT_API_CIRCUIT_THRESHOLD,
+            settings.BOT_API_CIRCUIT_COOLDOWN)
+        self._sleep = sleep
+
+        pool_size = pool_size or settings.BOT_API_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    def _jitter(self, attempt):
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def request(self, key, path, *, json=None, data=None,
+                idempotent=False, retry=True):
+        """
+        requests.Response или BotMessageSendError.
+        key — ключ circuit breaker'а (токен бота).
+        retry=False — без повторов: вызывающий сам решает, что делать
+        с 429/5xx (так работает рассылка со своим rate limit).
+        """
+        if not self.breaker.allow(key):
+            _record(self.name, 'circuit_open')
+            raise ApiCircuitOpenError(f"{self.name}: circuit open")
+
+        max_retries = self.max_retries if retry else 0
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            _record(self.name, 'request')
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=json, data=data,
+                                             timeout=self.timeout)
+            except requests.RequestException as e:
+                _record(self.name, 'latency_ms',
+                        int((time.perf_counter() - start) * 1000))
+                _record(self.name, 'error')
+                self.breaker.failure(key)
+                # до сервера не дошли — повторять безопасно; read timeout
+                # и обрыв после отправки — только для idempotent-запросов
+                retryable = _not_sent(e) or idempotent and isinstance(
+                    e, (requests.ConnectionError, requests.Timeout))
+                if retryable and attempt < max_retries:
+                    attempt += 1
+                    _record(self.name, 'retry')
+                    self._sleep(self._jitter(attempt))
+                    continue
+                raise BotMessageSendError(f"{self.name} request failed: {e}")
+
+            _record(self.name, 'latency_ms',
+                    int((time.perf_counter() - start) * 1000))
+
+            if response.status_code >= 500:
+                _record(self.name, 'error')
+                self.breaker.failure(key)
+                if attempt < max_retries:
+                    attempt += 1
+                    _record(self.name, 'retry')
+                    self._sleep(self._jitter(attempt))
+                    continue
+                return response
+
+            self.breaker.success(key)
+
+            if response.status_code == 429 and attempt < max_retries:
+                retry_after = self._retry_after(response)
+                if retry_after is not None \
+                        and retry_after <= settings.BOT_API_MAX_RETRY_AFTER:
+                    attempt += 1
+                    _record(self.name, 'retry')
+                    self._sleep(retry_after + self._jitter(0))
+                    continue
+            return response
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return (response.json().get('parameters') or {}).get('retry_after')
+        except ValueError:
+            return None
+
+
+class TelegramClient(ApiClient):
+    name = 'telegram'
+
+    @property
+    def base_url(self):
+        return self._base_url or settings.TELEGRAM_API_URL
+
+    @property
+    def timeout(self):
+        return self._timeout or settings.TELEGRAM_TIMEOUT
+
+    def call(self, bot_token, method, payload, **kwargs):
+        """Ответ Bot API (dict) на метод method."""
+        response = self.request(bot_token, f"/bot{bot_token}/{method}",
+                                json=payload, **kwargs)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise BotMessageSendError(
+                f"telegram: invalid response {response.status_code}: {e}")
+
+
+class BotobotClient(ApiClient):
+    name = 'botobot'
+
+    @property
+    def base_url(self):
+        return self._base_url or settings.BOTOBOT_API_URL
+
+    @property
+    def timeout(self):
+        return self._timeout or settings.BOTOBOT_TIMEOUT
+
+    def update_order_status(self, api_key, order_id, status):
+        """
+        (http-код, ответ) на смену статуса заказа. Повтор безопасен:
+        тот же статус для того же заказа.
+        """
+        response = self.request(api_key,
+                                f"/updateOrderStatus/{api_key}",
+                                data={"id": order_id, "status": status},
+                                idempotent=True)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(client_class):
+    client = _clients.get(client_class)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(client_class)
+            if client is None:
+                client = _clients[client_class] = client_class()
+    return client
+
+
+def get_telegram_client() -> TelegramClient:
+    return _get_client(TelegramClient)
+
+
+def get_botobot_client() -> BotobotClient:
+    return _get_client(BotobotClient)
+
+
+def reset_clients():
+    """Новые клиенты (пул, breaker) — для тестов и после fork."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.session.close()
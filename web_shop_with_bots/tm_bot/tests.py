@@ -0,0 +1,527 @@
+"""
+Тесты уведомления админского чата о новом заказе
+(tmbs.schedule_new_order_admin_notification +
+tm_bot.tasks.send_new_order_admin_notification_task).
+
+Проверяют:
+- таска ставится только после коммита, запись о доставке создаётся
+  в транзакции заказа;
+- успешная отправка фиксируется (статус, message_id, admin_tm_msg_id);
+- повторный запуск таски не шлёт сообщение второй раз;
+- временная ошибка Telegram ретраится, постоянная — нет.
+
+Telegram заменён моком send_message_new_order_to_admin.
+
+TelegramClientTests — общий клиент API ботов (tm_bot.telegram_client)
+на локальном FakeTelegramServer: keep-alive, повторы 5xx/429, без
+повтора read timeout у sendMessage, circuit breaker.
+
+OrderStatusUpdateBatchTests — смены статусов одной транзакции уходят
+одной таской send_order_status_updates_task, Botobot — параллельно.
+OrderChangelistStatusBatchTests — то же для массовой правки статусов
+в списке заказов админки (TransactionTestCase: без обёртки TestCase
+запрос сам отвечает за транзакцию).
+
+BotRegistryTests — справочник ботов и админ-чатов (tm_bot.registry):
+повторные обращения без запросов в БД, сброс по сигналам и поколению;
+BotRegistryRollbackTests — снимок из откатившейся транзакции без
+savepoint не остаётся в процессе.
+"""
+
+from datetime import time
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+import tm_bot.services as tmbs
+from api.utils.core_cache import BOTS_GROUP, bump_generation
+from exceptions import ApiCircuitOpenError, BotMessageSendError
+from delivery_contacts.geocoding import StubGeocoder, set_geocoder
+from delivery_contacts.models import Delivery, Restaurant
+from shop.models import Order
+from tm_bot.fake_telegram import FakeTelegramServer
+from tm_bot.models import (AdminChatTM, AdminOrderNotification,
+                           MessengerAccount, OrdersBot)
+from tm_bot.registry import clear_bot_registry, get_bot_by_city
+from tm_bot.tasks import (send_new_order_admin_notification_task,
+                          send_order_status_updates_task)
+from tm_bot.telegram_client import (TelegramClient, get_client_stats,
+                                    reset_client_stats, reset_clients)
+
+
+GOOGLE_OK = {
+    "status": "OK",
+    "results": [
+        {"geometry": {"location": {"lat": 44.81, "lng": 20.46},
+                      "location_type": "ROOFTOP"}},
+    ],
+}
+TELEGRAM_OK = ("ok", {"ok": True, "result": {"message_id": 77}})
+TELEGRAM_429 = ("rate limited", {"ok": False, "error_code": 429,
+                                 "description": "Too Many Requests",
+                                 "parameters": {"retry_after": 1}})
+TELEGRAM_400 = ("chat not found", {"ok": False, "error_code": 400,
+                                   "description": "Bad Request: chat not found"})
+
+
+class NewOrderAdminNotificationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        delivery = Delivery.objects.create(
+            type='takeaway', city='Beograd', is_active=True)
+        self.order = Order.objects.create(
+            restaurant=restaurant, delivery=delivery, source='4')
+
+        patcher = patch("tm_bot.tasks.send_message_new_order_to_admin")
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _notification(self):
+        return AdminOrderNotification.objects.get(order=self.order)
+
+    def test_task_is_dispatched_on_commit(self):
+        with patch.object(send_new_order_admin_notification_task,
+                          "delay") as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                tmbs.schedule_new_order_admin_notification(self.order)
+
+            self.assertEqual(self._notification().status,
+                             AdminOrderNotification.PENDING)
+            delay.assert_not_called()
+
+            callbacks[0]()
+            delay.assert_called_once_with(self.order.pk)
+
+    def test_sent_notification_is_recorded(self):
+        self.send.return_value = TELEGRAM_OK
+
+        send_new_order_admin_notification_task.apply(args=[self.order.pk])
+
+        notification = self._notification()
+        self.assertEqual(notification.status, AdminOrderNotification.SENT)
+        self.assertEqual(notification.message_id, "77")
+        self.assertEqual(notification.attempts, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.admin_tm_msg_id, "77")
+
+    def test_repeated_task_does_not_send_twice(self):
+        self.send.return_value = TELEGRAM_OK
+
+        send_new_order_admin_notification_task.apply(args=[self.order.pk])
+        send_new_order_admin_notification_task.apply(args=[self.order.pk])
+
+        self.send.assert_called_once()
+
+    def test_temporary_error_is_retried(self):
+        self.send.side_effect = [TELEGRAM_429, TELEGRAM_OK]
+
+        send_new_order_admin_notification_task.apply(args=[self.order.pk])
+
+        notification = self._notification()
+        self.assertEqual(self.send.call_count, 2)
+        self.assertEqual(notification.status, AdminOrderNotification.SENT)
+        self.assertEqual(notification.attempts, 2)
+
+    def test_permanent_error_is_not_retried(self):
+        self.send.return_value = TELEGRAM_400
+
+        send_new_order_admin_notification_task.apply(args=[self.order.pk])
+
+        notification = self._notification()
+        self.send.assert_called_once()
+        self.assertEqual(notification.status, AdminOrderNotification.FAILED)
+        self.assertIn("chat not found", notification.error)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-bot-api-client",
+        }
+    },
+    BOT_API_MAX_RETRIES=2,
+    BOT_API_MAX_RETRY_AFTER=5,
+    BOT_API_CIRCUIT_THRESHOLD=3,
+    BOT_API_CIRCUIT_COOLDOWN=30,
+    STATS_FLUSH_INTERVAL=60,
+)
+class TelegramClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_client_stats("telegram")
+        self.addCleanup(reset_clients)
+
+    def _client(self, server, **kwargs):
+        return TelegramClient(base_url=server.url, sleep=lambda _: None,
+                              **kwargs)
+
+    def test_connection_is_reused(self):
+        with FakeTelegramServer() as server:
+            client = self._client(server)
+            for i in range(5):
+                data = client.call("TOKEN", "sendMessage",
+                                   {"chat_id": i, "text": "hi"})
+                self.assertTrue(data["ok"])
+
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(server.connections, 1)
+        # счётчики копятся в процессе, в кэш — при чтении
+        self.assertIsNone(cache.get("bot_api_stats:telegram:request"))
+        stats = get_client_stats("telegram")
+        self.assertEqual(stats["request"], 5)
+        self.assertEqual(stats["error_rate"], 0)
+
+    def test_server_error_is_retried(self):
+        with FakeTelegramServer(error_first=2) as server:
+            data = self._client(server).call(
+                "TOKEN", "sendMessage", {"chat_id": 1, "text": "hi"})
+
+        self.assertTrue(data["ok"])
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(get_client_stats("telegram")["retry"], 2)
+
+    def test_short_retry_after_is_retried(self):
+        with FakeTelegramServer(flood_first=1, retry_after=0) as server:
+            data = self._client(server).call(
+                "TOKEN", "sendMessage", {"chat_id": 1, "text": "hi"})
+
+        self.assertTrue(data["ok"])
+        self.assertEqual(len(server.requests), 2)
+
+    def test_no_retry_when_disabled(self):
+        with FakeTelegramServer(flood_first=1, retry_after=0) as server:
+            data = self._client(server).call(
+                "TOKEN", "sendMessage", {"chat_id": 1, "text": "hi"},
+                retry=False)
+
+        self.assertEqual(data["error_code"], 429)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_read_timeout_of_send_is_not_retried(self):
+        with FakeTelegramServer(delay=0.5) as server:
+            client = self._client(server, timeout=(1, 0.1))
+            # сообщение могло дойти — второй раз не шлём
+            with self.assertRaises(BotMessageSendError):
+                client.call("TOKEN", "sendMessage",
+                            {"chat_id": 1, "text": "hi"})
+
+        stats = get_client_stats("telegram")
+        self.assertEqual((stats["request"], stats["retry"]), (1, 0))
+
+    def test_circuit_opens_after_failures(self):
+        with FakeTelegramServer() as server:
+            url = server.url
+        # сервер остановлен — соединение отклоняется
+        client = TelegramClient(base_url=url, sleep=lambda _: None,
+                                max_retries=0)
+
+        for _ in range(3):
+            with self.assertRaises(BotMessageSendError):
+                client.call("TOKEN", "sendMessage", {"chat_id": 1})
+        with self.assertRaises(ApiCircuitOpenError):
+            client.call("TOKEN", "sendMessage", {"chat_id": 1})
+        self.assertEqual(get_client_stats("telegram")["circuit_open"], 1)
+
+        # breaker на токен: другой бот не затронут
+        self.assertFalse(client.breaker.is_open("OTHER"))
+
+    def test_send_message_telegram_uses_client(self):
+        with FakeTelegramServer() as server, \
+                override_settings(TELEGRAM_API_URL=server.url):
+            status, data = tmbs.send_message_telegram(
+                "123", "hi", "TOKEN", parse_mode="HTML")
+
+        self.assertEqual(status, "ok")
+        self.assertEqual(server.requests[0][0], "sendMessage")
+        self.assertEqual(server.requests[0][1]["chat_id"], "123")
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-bot-registry",
+        }
+    },
+    CHAT_ID="-100",
+)
+class BotRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_bot_registry()
+        self.addCleanup(clear_bot_registry)
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        self.restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        self.bot = OrdersBot.objects.create(
+            msngr_type="tm", name="Beograd bot", city="Beograd",
+            link="https://t.me/bg_bot", frontend_link="https://t.me/bg_bot",
+            is_active=True)
+        self.other_bot = OrdersBot.objects.create(
+            msngr_type="tm", name="Novi Sad bot", city="NoviSad",
+            link="https://t.me/ns_bot", frontend_link="https://t.me/ns_bot")
+        AdminChatTM.objects.create(chat_id="-1001", city="Beograd",
+                                   restaurant=self.restaurant)
+        self.order = Order(restaurant=self.restaurant, city="Beograd")
+        self.account = MessengerAccount(msngr_type="tm", city="NoviSad")
+
+    def test_lookups_do_not_query_after_warmup(self):
+        tmbs.get_bot_id_by_city("Beograd")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tmbs.get_chat_id_by_order(self.order), "-1001")
+            self.assertEqual(tmbs.get_admin_chat_id_by_city("Beograd"),
+                             "-1001")
+            self.assertEqual(tmbs.get_chat_id_by_bot(self.bot), "-1001")
+            self.assertEqual(tmbs.get_bot_id_by_city("Beograd"),
+                             [self.bot, self.bot.id])
+            self.assertEqual(
+                tmbs.get_candidate_bots_for_user(self.account, "Beograd"),
+                [self.bot, self.other_bot])
+
+    def test_missing_entries(self):
+        self.assertEqual(tmbs.get_admin_chat_id_by_city("NoviSad"), "-100")
+        self.assertEqual(tmbs.get_bot_id_by_city("Kragujevac"), [None, None])
+        self.assertEqual(
+            tmbs.get_candidate_bots_for_user(self.account, "Kragujevac"),
+            [self.other_bot])
+
+    def test_save_signal_refreshes_registry(self):
+        self.assertEqual(tmbs.get_chat_id_by_bot(self.other_bot), "-100")
+
+        AdminChatTM.objects.create(chat_id="-1002", city="NoviSad",
+                                   restaurant=None)
+        self.other_bot.city = "Kragujevac"
+        self.other_bot.save()
+
+        self.assertEqual(tmbs.get_admin_chat_id_by_city("NoviSad"), "-1002")
+        self.assertEqual(tmbs.get_bot_id_by_city("Kragujevac")[0],
+                         self.other_bot)
+        self.assertEqual(tmbs.get_bot_id_by_city("NoviSad"), [None, None])
+
+    def test_generation_bump_refreshes_registry(self):
+        tmbs.get_bot_id_by_city("Beograd")
+        # изменение из другого процесса: сигнала здесь нет,
+        # есть только сдвиг поколения после его коммита
+        OrdersBot.objects.filter(id=self.bot.id).update(city="Kragujevac")
+        self.assertEqual(tmbs.get_bot_id_by_city("Beograd")[0], self.bot)
+
+        bump_generation(BOTS_GROUP)
+
+        self.assertEqual(tmbs.get_bot_id_by_city("Beograd"), [None, None])
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-bot-registry-rollback",
+        }
+    },
+)
+class BotRegistryRollbackTests(TransactionTestCase):
+    def setUp(self):
+        clear_bot_registry()
+        self.addCleanup(clear_bot_registry)
+
+    def test_rolled_back_bot_is_not_cached(self):
+        # внешняя транзакция без savepoint, как сохранение в админке
+        with self.assertRaises(ValueError), transaction.atomic():
+            OrdersBot.objects.create(
+                msngr_type="tm", name="Phantom bot", city="Beograd",
+                link="https://t.me/ph_bot",
+                frontend_link="https://t.me/ph_bot")
+            self.assertIsNotNone(get_bot_by_city("Beograd"))
+            raise ValueError
+
+        self.assertIsNone(get_bot_by_city("Beograd"))
+
+
+@override_settings(SEND_BOTOBOT_UPDATES=True, ORDER_STATUS_WORKERS=4)
+class OrderStatusUpdateBatchTests(TestCase):
+    def setUp(self):
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        delivery = Delivery.objects.create(
+            type='takeaway', city='Beograd', is_active=True)
+        bot = OrdersBot.objects.create(
+            msngr_type="tm", name="Beograd bot", city="Beograd",
+            link="https://t.me/bg_bot", frontend_link="https://t.me/bg_bot",
+            api_key="KEY")
+        self.bot_orders = [
+            Order.objects.create(restaurant=restaurant, delivery=delivery,
+                                 source='3', source_id=str(1000 + i),
+                                 orders_bot=bot)
+            for i in range(3)
+        ]
+        self.site_order = Order.objects.create(
+            restaurant=restaurant, delivery=delivery, source='4')
+        self.other_order = Order.objects.create(
+            restaurant=restaurant, delivery=delivery, source='1')
+
+    def test_one_task_per_transaction(self):
+        with patch.object(send_order_status_updates_task, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for order in (*self.bot_orders, self.site_order,
+                              self.other_order):
+                    tmbs.send_messages_order_status_update_user_bot(
+                        "DLD", order)
+                # до коммита ничего не отправляется
+                delay.assert_not_called()
+
+        delay.assert_called_once()
+        self.assertEqual(
+            sorted(delay.call_args.args[0]),
+            sorted((order.id, "DLD")
+                   for order in (*self.bot_orders, self.site_order)))
+
+    def test_rolled_back_changes_are_dropped(self):
+        with patch.object(send_order_status_updates_task, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        tmbs.send_messages_order_status_update_user_bot(
+                            "CND", self.bot_orders[0])
+                        raise ValueError
+                except ValueError:
+                    pass
+                tmbs.send_messages_order_status_update_user_bot(
+                    "DLD", self.bot_orders[1])
+
+        delay.assert_called_once_with([(self.bot_orders[1].id, "DLD")])
+
+    @patch("tm_bot.tasks.send_status_update_message_to_client")
+    @patch("tm_bot.tasks.send_request_order_status_update")
+    def test_botobot_is_called_concurrently(self, botobot, client):
+        threads = set()
+
+        def update(status, order_id, bot):
+            threads.add(threading.get_ident())
+            return True
+        botobot.side_effect = update
+
+        updates = [(order.id, "OND") for order in self.bot_orders]
+        updates.append((self.site_order.id, "OND"))
+        result = send_order_status_updates_task.apply(args=[updates]).get()
+
+        self.assertEqual(result["botobot"], 3)
+        self.assertEqual(
+            sorted(call.args[1] for call in botobot.call_args_list),
+            [1000, 1001, 1002])
+        self.assertNotIn(threading.get_ident(), threads)
+        client.assert_called_once_with(status="OND", order=self.site_order)
+
+    @patch("tm_bot.tasks.send_order_status_update_task.delay")
+    @patch("tm_bot.tasks.send_status_update_message_to_client",
+           side_effect=BotMessageSendError("timeout"))
+    def test_failed_client_message_is_retried_separately(self, client, delay):
+        result = send_order_status_updates_task.apply(
+            args=[[(self.site_order.id, "CFD")]]).get()
+
+        self.assertEqual(result["retried"], 1)
+        delay.assert_called_once_with("CFD", self.site_order.id)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-changelist-status",
+        }
+    },
+    SEND_BOTOBOT_UPDATES=True,
+)
+class OrderChangelistStatusBatchTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(set_geocoder,
+                        set_geocoder(StubGeocoder(default=GOOGLE_OK)))
+        restaurant = Restaurant.objects.create(
+            short_name='центр',
+            address='Milovana Milovanovića 4',
+            open_time=time(11, 0),
+            close_time=time(22, 0),
+            city='Beograd',
+            is_active=True,
+            is_default=True,
+        )
+        delivery = Delivery.objects.create(
+            type='takeaway', city='Beograd', is_active=True)
+        bot = OrdersBot.objects.create(
+            msngr_type="tm", name="Beograd bot", city="Beograd",
+            link="https://t.me/bg_bot", frontend_link="https://t.me/bg_bot",
+            api_key="KEY")
+        self.orders = [
+            Order.objects.create(restaurant=restaurant, delivery=delivery,
+                                 source='3', source_id=str(2000 + i),
+                                 orders_bot=bot, payment_type='cash')
+            for i in range(3)
+        ]
+        admin = get_user_model().objects.create_user(
+            email="changelist@test.ru", password="12345678aA!",
+            first_name="Петя", last_name="Петин", phone="+79055969163",
+            web_language="ru", city="Beograd",
+            is_active=True, is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+
+    def test_list_editable_statuses_go_in_one_task(self):
+        data = {
+            "form-TOTAL_FORMS": str(len(self.orders)),
+            "form-INITIAL_FORMS": str(len(self.orders)),
+            "form-MIN_NUM_FORMS": "0",
+            "form-MAX_NUM_FORMS": "1000",
+            "_save": "Сохранить",
+        }
+        for i, order in enumerate(self.orders):
+            data.update({
+                f"form-{i}-id": str(order.pk),
+                f"form-{i}-status": "CFD",
+                f"form-{i}-invoice": "on",
+                f"form-{i}-courier": "",
+                f"form-{i}-payment_type": "cash",
+            })
+
+        with patch.object(send_order_status_updates_task, "delay") as delay:
+            self.client.post(
+                reverse("admin:shop_order_changelist") + "?order_period=today",
+                data)
+
+        self.assertEqual(
+            set(Order.objects.values_list("status", flat=True)), {"CFD"})
+        delay.assert_called_once()
+        self.assertEqual(sorted(delay.call_args.args[0]),
+                         sorted((order.id, "CFD") for order in self.orders))
@@ -8,7 +8,7 @@ from rest_framework_simplejwt.token_blacklist.models import (
 
 from users.models import BaseProfile, WEBAccount, UserAddress
 from shop.models import Order
-from audit.models import AuditLog
+from audit.models import AuditLog, AuditLogArchive
 from tm_bot.models import MessengerAccount, MessengerAccountBot
 from promos.models import CampaignOpenEvent
 
@@ -24,6 +24,8 @@ def _total_delete_single_base_profile(base_profile: BaseProfile) -> None:
         # 1.1 AuditLog по web_account и base_profile
         AuditLog.objects.filter(user=web_account).delete()
         AuditLog.objects.filter(base_profile=base_profile).delete()
+        AuditLogArchive.objects.filter(user_id=web_account.id).delete()
+        AuditLogArchive.objects.filter(base_profile_id=base_profile.id).delete()
 
         # 1.2 JWT токены: сначала blacklist, потом сами токены
         BlacklistedToken.objects.filter(token__user=web_account).delete()
@@ -0,0 +1,85 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from delivery_contacts.utils import parce_coordinates
+from delivery_contacts.zone_index import find_delivery_zones
+from users.models import UserAddress
+
+
+def address_point(address: UserAddress):
+    if address.point is not None:
+        return address.point.y, address.point.x
+    try:
+        return parce_coordinates(address.coordinates)
+    except (ValueError, IndexError):
+        return None, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет сохранённые координаты адресов клиентов (UserAddress) "
+        "по текущим зонам доставки: сколько адресов в каждой зоне "
+        "и какие оказались вне зон. Точки города проверяются пачками "
+        "через индекс зон (find_delivery_zones)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--city", help="только этот город")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--show-outside", action="store_true",
+                            help="вывести адреса вне зон")
+
+    def handle(self, *args, **options):
+        cities = ([options["city"]] if options["city"]
+                  else [city for city, _ in settings.CITY_CHOICES])
+        chunk_size = options["chunk_size"]
+
+        for city in cities:
+            addresses = (
+                UserAddress.objects
+                .filter(city=city)
+                .only("id", "address", "point", "coordinates")
+                .order_by("id")
+            )
+            by_zone = Counter()
+            outside = []
+            no_coordinates = 0
+
+            chunk = []
+            for address in addresses.iterator(chunk_size=chunk_size):
+                chunk.append(address)
+                if len(chunk) >= chunk_size:
+                    no_coordinates += self._resolve(city, chunk,
+                                                    by_zone, outside)
+                    chunk = []
+            if chunk:
+                no_coordinates += self._resolve(city, chunk,
+                                                by_zone, outside)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(city))
+            for zone_name, count in by_zone.most_common():
+                self.stdout.write(f"  {zone_name}: {count}")
+            self.stdout.write(
+                self.style.WARNING(f"  вне зон: {len(outside)}"))
+            self.stdout.write(f"  без координат: {no_coordinates}")
+
+            if options["show_outside"]:
+                for address in outside:
+                    self.stdout.write(
+                        f"    UserAddress #{address.id}: {address.address}")
+
+    def _resolve(self, city, chunk, by_zone, outside):
+        points = [address_point(address) for address in chunk]
+        zones = find_delivery_zones(city, points)
+
+        no_coordinates = 0
+        for address, (lat, lon), zone in zip(chunk, points, zones):
+            if lat is None or lon is None:
+                no_coordinates += 1
+            elif zone is None:
+                outside.append(address)
+            else:
+                by_zone[zone.name] += 1
+        return no_coordinates
@@ -1,12 +1,11 @@
-from django.core.cache import cache
+from api.utils.core_cache import invalidate_menu_cache as _invalidate_menu_cache
+
 
 def invalidate_menu_cache(city_id=None):
     """
     Сбрасывает кэш меню.
-    cache_page генерирует ключ на основе URL, поэтому
-    удаляем по паттерну или используем версионирование.
+    Раньше удаляло ключи по паттерну cache.keys("*menu*") — O(keyspace)
+    в redis. Теперь это один INCR поколения группы menu (core_cache),
+    city_id оставлен для совместимости вызовов.
     """
-    # Если используешь django-redis:
-    keys = cache.keys(f"*menu*")  # или более точный паттерн под твой URL
-    if keys:
-        cache.delete_many(keys)
+    _invalidate_menu_cache()
@@ -0,0 +1,92 @@
+"""
+stats.py — счётчики событий, общие для процессов (через кэш).
+
+Раньше каждое событие делало cache.add + cache.incr — два похода в
+redis на сообщение бота, геокод или запись журнала. BatchedCounter
+копит события в процессе (Counter под локом) и сбрасывает их в кэш
+пачкой: не чаще раза в STATS_FLUSH_INTERVAL секунд, при чтении
+get() и при выходе процесса (atexit). После fork несброшенные события
+родителя в дочернем процессе не учитываются — их сбросит родитель.
+
+Ключ в кэше — key.format(event=...). Ошибки кэша метрики теряют, но
+не ломают вызывающий код.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+_counters = []
+
+
+class BatchedCounter:
+
+    def __init__(self, key, events, clock=time.monotonic):
+        self.key = key
+        self.events = events
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._flushed_at = clock()
+        self._pid = os.getpid()
+        _counters.append(self)
+
+    def count(self, event, amount=1):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._counts = Counter()
+                self._pid = os.getpid()
+            self._counts[event] += amount
+            due = (self._clock() - self._flushed_at
+                   >= settings.STATS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = self._clock()
+        self.push(counts)
+
+    def push(self, counts):
+        """Прибавляет counts ({event: n}) к счётчикам в кэше."""
+        for event, amount in counts.items():
+            if not amount:
+                continue
+            key = self.key.format(event=event)
+            try:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, amount)
+            except Exception as e:
+                logger.debug(f"stats {key}: {e}")
+
+    def get(self):
+        """{event: n} по всем процессам, включая несброшенное этого."""
+        self.flush()
+        return {event: cache.get(self.key.format(event=event)) or 0
+                for event in self.events}
+
+    def reset(self):
+        with self._lock:
+            self._counts = Counter()
+            self._flushed_at = self._clock()
+        cache.delete_many([self.key.format(event=event)
+                           for event in self.events])
+
+
+@atexit.register
+def _flush_all():
+    for counter in _counters:
+        try:
+            counter.flush()
+        except Exception as e:
+            logger.debug(f"stats flush at exit: {e}")
@@ -6,7 +6,7 @@ import threading
 import re
 import html
 from django.core.signals import got_request_exception
-from audit.models import AuditLog
+from audit.writer import AuditEntry, is_sampled, submit
 from django.contrib.contenttypes.models import ContentType
 import json
 import urllib.parse
@@ -112,6 +112,7 @@ endpoint_skip = [
     '/api/v1/get_discounts/',
     '/api/v1/get_google_api_key/',
     '/api/v1/calculate_delivery/',
+    '/api/v1/calculate_delivery_bulk/',
     '/api/v1/auth/jwt/refresh/',
     '/summernote/',
     '/redoc/',
@@ -131,8 +132,10 @@ def _should_skip(path):
 
 
 def _get_user_info(request):
+    # base_profile не читаем: это запрос к БД, его добирает AuditEntry
+    # при записи (audit/writer.py)
     if hasattr(request, 'user') and request.user.is_authenticated:
-        return f'User: {request.user.email}', request.user, getattr(request.user, 'base_profile', None)
+        return f'User: {request.user.email}', request.user, None
     return 'Anonymous user', None, None
 
 
@@ -196,27 +199,35 @@ def _format_body(body):
     return lines
 
 
-def _format_get_params(request):
-    """Форматирует GET-параметры из URL, например ?city=Beograd&lang=ru"""
-    if not request.GET:
+def _format_get_params(params):
+    """
+    Форматирует GET-параметры из URL, например ?city=Beograd&lang=ru.
+    params — список (ключ, значения) из request.GET.lists().
+    """
+    if not params:
         return ''
     lines = '\n'.join(
         f"  {key}: {', '.join(values)}"
-        for key, values in request.GET.lists()
+        for key, values in params
     )
     return f"GET ПАРАМЕТРЫ:\n{lines}\n\n"
 
 
-def _format_response(response):
-    if not response.content:
+def _response_content(response):
+    # у потоковых ответов (выгрузки Excel) тела целиком нет
+    return b'' if response.streaming else response.content
+
+
+def _format_response(content):
+    if not content:
         return ''
     try:
-        parsed = json.loads(response.content.decode('utf-8'))
+        parsed = json.loads(content.decode('utf-8'))
         return json.dumps(parsed, indent=4, ensure_ascii=False)
     except (json.JSONDecodeError, UnicodeDecodeError):
         pass
 
-    raw = response.content.decode('utf-8', errors='replace')
+    raw = content.decode('utf-8', errors='replace')
 
     # Если Django вернул HTML — вытаскиваем только суть
     if raw.strip().startswith('<'):
@@ -340,12 +351,15 @@ class AuditMiddleware:
     # --- SUCCESS ---
     def _log_success(self, request, request_body, ip, is_routable, response):
         try:
+            if not is_sampled(request.path):
+                return
             user_info, user, base_profile = _get_user_info(request)
             target_object_id, target_ct = self._extract_target(request)
+            get_params = list(request.GET.lists())
+            response_content = _response_content(response)
 
-            AuditLog.objects.create(
+            submit(AuditEntry(
                 user=user,
-                base_profile=base_profile,
                 status=response.status_code,
                 ip=ip,
                 ip_is_routable=is_routable,
@@ -355,12 +369,12 @@ class AuditMiddleware:
                 is_admin=request._audit_is_admin,
                 target_object_id=target_object_id,
                 target_content_type=target_ct,
-                details=(
-                    f"{_format_get_params(request)}"
+                details=lambda: (
+                    f"{_format_get_params(get_params)}"
                     f"ЗАПРОС:\n{_format_body(request_body)}\n\n"
-                    f"ОТВЕТ:\n{_format_response(response)}\n"
+                    f"ОТВЕТ:\n{_format_response(response_content)}\n"
                 )
-            )
+            ))
         except Exception as log_exc:
             logger.error(f"AuditMiddleware._log_success error: {log_exc}")
 
@@ -368,16 +382,16 @@ class AuditMiddleware:
     def _log_error(self, request, request_body, ip, is_routable, response, exc_tb=None):
         try:
             user_info, user, base_profile = _get_user_info(request)
-            response_body = _format_response(response)
             target_object_id, target_ct = self._extract_target(request)
+            get_params = list(request.GET.lists())
+            response_content = _response_content(response)
 
             traceback_section = ''
             if exc_tb:
                 traceback_section = f"TRACEBACK:\n{exc_tb}\n\n"
 
-            AuditLog.objects.create(
+            submit(AuditEntry(
                 user=user,
-                base_profile=base_profile,
                 action='Error',
                 status=response.status_code,
                 ip=ip,
@@ -387,13 +401,13 @@ class AuditMiddleware:
                 is_admin=request._audit_is_admin,
                 target_object_id=target_object_id,
                 target_content_type=target_ct,
-                details=(
+                details=lambda: (
                     f"{traceback_section}"
-                    f"{_format_get_params(request)}"
-                    f"ОТВЕТ СЕРВЕРА:\n{response_body}\n\n"
+                    f"{_format_get_params(get_params)}"
+                    f"ОТВЕТ СЕРВЕРА:\n{_format_response(response_content)}\n\n"
                     f"ЗАПРОС:\n{_format_body(request_body)}\n"
                 )
-            )
+            ))
         except Exception as log_exc:
             logger.error(f"AuditMiddleware._log_error error: {log_exc}")
 
@@ -406,13 +420,13 @@ class AuditMiddleware:
         try:
             user_info, user, base_profile = _get_user_info(request)
             target_object_id, target_ct = self._extract_target(request)
+            get_params = list(request.GET.lists())
 
             exc_tb = getattr(request, '_admin_exception', '')
             exc_msg = getattr(request, '_admin_exception_msg', '')
 
-            AuditLog.objects.create(
+            submit(AuditEntry(
                 user=user,
-                base_profile=base_profile,
                 action='Error',
                 status=500,
                 ip=ip,
@@ -422,13 +436,13 @@ class AuditMiddleware:
                 is_admin=True,
                 target_object_id=target_object_id,
                 target_content_type=target_ct,
-                details=(
+                details=lambda: (
                     f"ОШИБКА: {exc_msg}\n\n"
                     f"TRACEBACK:\n{exc_tb}\n\n"
-                    f"{_format_get_params(request)}"
+                    f"{_format_get_params(get_params)}"
                     f"ЗАПРОС:\n{_format_body(request_body)}\n"
                 )
-            )
+            ))
         except Exception as log_exc:
             logger.error(f"AuditMiddleware._log_admin_handled_error error: {log_exc}")
 
@@ -437,10 +451,10 @@ class AuditMiddleware:
         try:
             user_info, user, base_profile = _get_user_info(request)
             target_object_id, target_ct = self._extract_target(request)
+            get_params = list(request.GET.lists())
 
-            AuditLog.objects.create(
+            submit(AuditEntry(
                 user=user,
-                base_profile=base_profile,
                 action='Error',
                 status=500,
                 ip=ip,
@@ -450,11 +464,11 @@ class AuditMiddleware:
                 is_admin=request.path.startswith('/admin/'),
                 target_object_id=target_object_id,
                 target_content_type=target_ct,
-                details=(
-                    f"{_format_get_params(request)}"
+                details=lambda: (
+                    f"{_format_get_params(get_params)}"
                     f"ЗАПРОС:\n{_format_body(request_body)}\n\n"
                     f"TRACEBACK:\n{exc_tb}\n"
                 )
-            )
+            ))
         except Exception as log_exc:
             logger.error(f"AuditMiddleware._log_unhandled_exception error: {log_exc}")
@@ -192,6 +192,19 @@ TEST_IP = os.getenv('TEST_IP')
 SERVER = os.getenv('SERVER')
 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+# (connect, read) таймауты запросов к Google Geocoding, сек
+GOOGLE_GEOCODING_TIMEOUT = (
+    float(os.getenv('GOOGLE_GEOCODING_CONNECT_TIMEOUT', 3)),
+    float(os.getenv('GOOGLE_GEOCODING_READ_TIMEOUT', 10)),
+)
+# транспорт геокодирования; для разработки без ключа —
+# 'delivery_contacts.geocoding.StubGeocoder'
+GEOCODER_CLASS = os.getenv('GEOCODER_CLASS',
+                           'delivery_contacts.geocoding.GoogleGeocoder')
+# кэш геокодирования: redis / таблица GeocodeCacheEntry / ZERO_RESULTS
+GEOCODE_CACHE_TIMEOUT = int(os.getenv('GEOCODE_CACHE_TIMEOUT', 60 * 60 * 24))
+GEOCODE_DB_TIMEOUT = int(os.getenv('GEOCODE_DB_TIMEOUT', 60 * 60 * 24 * 90))
+GEOCODE_NEGATIVE_TIMEOUT = int(os.getenv('GEOCODE_NEGATIVE_TIMEOUT', 60 * 60 * 6))
 
 default_allowed_hosts = [
     'localhost',
@@ -503,6 +516,67 @@ PARLER_ENABLE_CACHING = False
 
 CACHE_TIME = int(os.getenv('CACHE_TIME', 0))
 
+# сколько после CACHE_TIME ещё можно отдавать устаревший ответ,
+# пока один воркер пересчитывает его (stale-while-revalidate)
+CACHE_STALE_TIME = int(os.getenv('CACHE_STALE_TIME', 60))
+
+# снапшот меню версионирован, поэтому живёт долго — сбрасывается сменой версии
+MENU_SNAPSHOT_TIMEOUT = int(os.getenv('MENU_SNAPSHOT_TIMEOUT', 60 * 60 * 24))
+
+# контекст формы заказа в админке (меню, зоны, скидки) тоже версионирован
+ORDER_FORM_CACHE_TIMEOUT = int(os.getenv('ORDER_FORM_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# окно (сек), в котором серия правок каталога даёт одну фоновую
+# пересборку снапшота меню; 0 — пересобирать после каждого коммита
+CACHE_INVALIDATION_DEBOUNCE = int(os.getenv('CACHE_INVALIDATION_DEBOUNCE', 5))
+
+# как часто (сек) процесс сбрасывает в кэш счётчики ботов, геокодера
+# и журнала (utils/stats.py); между сбросами они копятся в процессе
+STATS_FLUSH_INTERVAL = float(os.getenv('STATS_FLUSH_INTERVAL', 10))
+
+# -------------------------------- AUDIT ----------------------------------
+# AuditMiddleware пишет журнал отложенно, пачками (audit/writer.py);
+# False — синхронно на каждый запрос, как раньше
+AUDIT_WRITE_BEHIND = os.getenv('AUDIT_WRITE_BEHIND', 'True') == 'True'
+# очередь процесса; сверх неё записи отбрасываются (счётчик dropped)
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1))
+# доля успешных запросов, попадающих в журнал, по префиксу пути
+# (берётся самый длинный совпавший); ошибки пишутся всегда
+AUDIT_SAMPLING = {
+    # '/api/v1/menu/': 0.1,
+}
+# сколько дней запись живёт в журнале до переноса в архив и сколько —
+# в архиве (0 — бессрочно); audit/retention.py
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', 90))
+AUDIT_ARCHIVE_RETENTION_DAYS = int(os.getenv('AUDIT_ARCHIVE_RETENTION_DAYS', 730))
+AUDIT_ARCHIVE_BATCH_SIZE = int(os.getenv('AUDIT_ARCHIVE_BATCH_SIZE', 2000))
+# до скольки строк changelist журнала считает точно, выше — оценка
+AUDIT_EXACT_COUNT_LIMIT = int(os.getenv('AUDIT_EXACT_COUNT_LIMIT', 10000))
+
+# -------------------------------- REPORTS ----------------------------------
+# шапка списка заказов и график продаж на главной читают итоги дня
+# из OrderDayTotals (shop/reports/ledger.py); False — считать по заказам.
+# Итоги за последний год по уже существующим заказам заполняет миграция
+# shop 0076; сверка и исправление — manage.py reconcile_order_totals.
+ORDER_TOTALS_LEDGER = os.getenv('ORDER_TOTALS_LEDGER', 'True') == 'True'
+# сколько дней по вчерашний сверяет ночная shop.tasks.rebuild_order_totals_task
+ORDER_TOTALS_BACKFILL_DAYS = int(os.getenv('ORDER_TOTALS_BACKFILL_DAYS', 7))
+# выгрузка заказов в Excel (shop/reports/excel.py): период длиннее или
+# без начала — только в фоне, ReportJob (shop/reports/jobs.py) на
+# очереди reports; файлы — в MEDIA/XLSX_REPORTS_DIR
+XLSX_SYNC_MAX_DAYS = int(os.getenv('XLSX_SYNC_MAX_DAYS', 31))
+XLSX_REPORTS_DIR = 'reports'
+# через сколько часов выгрузку и файл удаляет
+# shop.tasks.cleanup_report_jobs_task
+REPORT_JOB_TTL_HOURS = int(os.getenv('REPORT_JOB_TTL_HOURS', 24))
+# сколько минут готовая выгрузка отдается на такой же запрос
+REPORT_JOB_REUSE_MINUTES = int(os.getenv('REPORT_JOB_REUSE_MINUTES', 10))
+# через сколько минут в очереди или в работе выгрузка считается
+# зависшей и помечается ошибкой (больше самой долгой выгрузки)
+REPORT_JOB_LEASE_MINUTES = int(os.getenv('REPORT_JOB_LEASE_MINUTES', 60))
+
 # -------------------------------- Celery ----------------------------------
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 # CELERY_BROKER_URL = 'redis://:redisadmin0@redis:6379/0'
@@ -516,18 +590,33 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = 'Europe/Belgrade'
 
+# воркер без -Q слушает все очереди ниже; если очереди раздаются
+# разным воркерам, reports (выгрузки Excel, shop/reports/jobs.py)
+# тоже нужен свой: celery -A celery_app.app worker -Q reports -c 1
 CELERY_TASK_QUEUES = {
     "orders": {},
     "notifications": {},
     "broadcast": {},
+    "reports": {},
 }
 
 CELERY_TASK_ROUTES = {
     "users.tasks.post_order_user_updates_task": {"queue": "orders"},
     "tm_bot.tasks.send_order_status_update_task": {"queue": "notifications"},
+    "tm_bot.tasks.send_order_status_updates_task": {"queue": "notifications"},
     "tm_bot.tasks.send_link_confirmation_message": {"queue": "notifications"},
+    "tm_bot.tasks.send_new_order_admin_notification_task": {"queue": "notifications"},
     "promos.tasks.send_broadcast_test_task": {"queue": "broadcast"},
     "promos.tasks.send_broadcast_task": {"queue": "broadcast"},
+    "promos.tasks.send_broadcast_shard_task": {"queue": "broadcast"},
+    "promos.tasks.resume_stalled_broadcasts_task": {"queue": "broadcast"},
+    "api.tasks.rebuild_menu_snapshot_task": {"queue": "orders"},
+    "api.tasks.process_bot_order_inbox_task": {"queue": "orders"},
+    "api.tasks.process_pending_bot_orders_task": {"queue": "orders"},
+    "audit.tasks.archive_audit_log_task": {"queue": "orders"},
+    "shop.tasks.rebuild_order_totals_task": {"queue": "orders"},
+    "shop.tasks.build_report_job_task": {"queue": "reports"},
+    "shop.tasks.cleanup_report_jobs_task": {"queue": "reports"},
 }
 
 CELERY_TASK_DEFAULT_QUEUE = "orders"
@@ -734,11 +823,41 @@ if ENVIRONMENT in ['test_server', 'production'] and SENTRY_DSN and SENTRY_DSN.lo
 
 
 ADMIN_BOT_TOKEN = os.getenv('ADMIN_BOT_TOKEN')
+# базовый адрес Bot API; для нагрузочных прогонов — локальная заглушка
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
 CHAT_ID = os.getenv('CHAT_ID')
 CHAT_ID1 = os.getenv('CHAT_ID1')   # BR
 CHAT_ID2 = os.getenv('CHAT_ID2')   # NS
 BOTOBOT_API_KEY = os.getenv('BOTOBOT_API_KEY')
 SEND_BOTOBOT_UPDATES = os.getenv("SEND_BOTOBOT_UPDATES", "false").lower() == "true"
+# через сколько секунд необработанный вебхук заказа (BotOrderInbox)
+# подбирает периодическая api.tasks.process_pending_bot_orders_task
+BOT_ORDER_INBOX_RETRY_AFTER = int(os.getenv('BOT_ORDER_INBOX_RETRY_AFTER', 60))
+# сколько секунд тот же payload, что и последнее событие заказа,
+# считается ретраем Botobot, а не новой сменой статуса
+BOT_ORDER_INBOX_DEDUP_WINDOW = int(os.getenv('BOT_ORDER_INBOX_DEDUP_WINDOW', 600))
+BOTOBOT_API_URL = os.getenv('BOTOBOT_API_URL', 'https://www.botobot.ru/api/v1')
+
+# HTTP-клиенты ботов (tm_bot.telegram_client): таймауты (connect, read),
+# повторы с jitter, circuit breaker на токен
+TELEGRAM_TIMEOUT = (
+    float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', 5)),
+    float(os.getenv('TELEGRAM_READ_TIMEOUT', 30)),
+)
+BOTOBOT_TIMEOUT = (
+    float(os.getenv('BOTOBOT_CONNECT_TIMEOUT', 3)),
+    float(os.getenv('BOTOBOT_READ_TIMEOUT', 10)),
+)
+BOT_API_POOL_SIZE = int(os.getenv('BOT_API_POOL_SIZE', 20))
+BOT_API_MAX_RETRIES = int(os.getenv('BOT_API_MAX_RETRIES', 2))
+BOT_API_RETRY_BACKOFF = float(os.getenv('BOT_API_RETRY_BACKOFF', 0.5))
+# 429 с retry_after длиннее этого не ждём внутри запроса — отдаём вызывающему
+BOT_API_MAX_RETRY_AFTER = int(os.getenv('BOT_API_MAX_RETRY_AFTER', 5))
+BOT_API_CIRCUIT_THRESHOLD = int(os.getenv('BOT_API_CIRCUIT_THRESHOLD', 5))
+BOT_API_CIRCUIT_COOLDOWN = int(os.getenv('BOT_API_CIRCUIT_COOLDOWN', 30))
+# сколько запросов в Botobot шлёт параллельно пачка смен статусов
+# (tm_bot.tasks.send_order_status_updates_task)
+ORDER_STATUS_WORKERS = int(os.getenv('ORDER_STATUS_WORKERS', 8))
 
 TELEGRAM_BOT_TOKEN_BG = os.getenv('TELEGRAM_BOT_TOKEN_BG')
 TELEGRAM_BOT_TOKEN_NS = os.getenv('TELEGRAM_BOT_TOKEN_NS')
@@ -758,6 +877,17 @@ TELEGRAM_AUTH_TEST_BOTS = {
     "Beograd": TELEGRAM_BOT_TOKEN_TEST,
 }
 
+# рассылки (promos.sender): общий лимит Telegram ~30 сообщений/с на бота,
+# одному чату — не чаще раза в секунду
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', 25))
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', 8))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', 3))
+# сколько воркеров очереди broadcast параллельно шлют одну рассылку
+# (BROADCAST_RATE делится между ними) и через сколько секунд
+# взятая в отправку пачка считается брошенной
+BROADCAST_SHARDS = int(os.getenv('BROADCAST_SHARDS', 1))
+BROADCAST_LEASE = int(os.getenv('BROADCAST_LEASE', 300))
+
 # -------------------------------- BUSINESS LOGIC SETTINGS  ----------------------------
 
 CITY_CHOICES = [
@@ -767,6 +897,9 @@ CITY_CHOICES = [
 DEFAULT_CITY = 'Beograd'
 DEFAULT_RESTAURANT = 1
 
+# максимум точек в одном запросе /calculate_delivery_bulk/
+DELIVERY_BULK_MAX_POINTS = int(os.getenv('DELIVERY_BULK_MAX_POINTS', 5000))
+
 CREATED_BY = [
     (1, 'user'),
     (2, 'admin'),